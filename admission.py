@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Admission control for the Polpi MX API.
+
+Requests are sorted into endpoint classes by path (cheap reads, CPU-heavy
+analysis, outbound fetches) before any routing or body parsing happens.
+Each class gets:
+
+- a concurrency pool, so a burst of slow analysis calls can only occupy
+  its own slots and never the ones cheap listing reads need;
+- a latency budget: when the expected queueing delay (queue depth over
+  concurrency times the recent average service time) exceeds it, the
+  request is shed immediately with 503 instead of waiting to time out;
+- a per-client token bucket, answered with 429 when it runs dry.
+
+Both rejections carry Retry-After. Paths that match no rule (health checks,
+metrics, admin, static files) bypass admission entirely.
+
+Everything here runs on the event loop thread, so the buckets and counters
+need no locks.
+"""
+
+import asyncio
+import math
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+from fastapi.responses import JSONResponse
+
+import metrics
+
+
+class TokenBucket:
+    """Classic token bucket; `rate` tokens per second up to `capacity`"""
+    
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+    
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+    
+    def take(self, now: float) -> float:
+        """Consume one token; returns 0 if admitted, else seconds until one is available"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class ClientRateLimiter:
+    """Per-client token buckets, least recently seen clients evicted first"""
+    
+    def __init__(self, rate: float, burst: float, max_clients: int = 10000):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.max_clients = max_clients
+        self._buckets: 'OrderedDict[str, TokenBucket]' = OrderedDict()
+    
+    def check(self, client: str) -> float:
+        now = time.monotonic()
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = TokenBucket(self.rate, self.burst, now)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+        return bucket.take(now)
+
+
+class ConcurrencyPool:
+    """Bounded concurrency with a queueing-delay budget"""
+    
+    # Weight of the newest sample in the service-time moving average
+    SMOOTHING = 0.2
+    
+    def __init__(self, name: str, concurrency: int, max_wait: float):
+        self.name = name
+        self.concurrency = max(1, int(concurrency))
+        self.max_wait = max_wait
+        self.active = 0
+        self.waiting = 0
+        self.service_time = 0.0
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._queue_gauge = metrics.ADMISSION_QUEUED.labels(name)
+    
+    def expected_wait(self) -> float:
+        """Rough queueing delay for a request arriving now"""
+        if self.active < self.concurrency:
+            return 0.0
+        return (self.waiting + 1) / self.concurrency * self.service_time
+    
+    async def acquire(self) -> bool:
+        """Take a slot, or return False if the latency budget can't be met"""
+        if self._semaphore.locked():
+            if self.expected_wait() > self.max_wait:
+                return False
+            self.waiting += 1
+            self._queue_gauge.inc()
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.max_wait)
+            except asyncio.TimeoutError:
+                return False
+            finally:
+                self.waiting -= 1
+                self._queue_gauge.dec()
+        else:
+            await self._semaphore.acquire()
+        self.active += 1
+        return True
+    
+    def release(self, elapsed: float):
+        self.active -= 1
+        self.service_time += self.SMOOTHING * (elapsed - self.service_time)
+        self._semaphore.release()
+
+
+def _retry_after(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware applying per-class concurrency pools and client rate limits.
+    
+    `rules` is an ordered list of (pool name, path regex); the first regex
+    that matches the request path picks the pool. `pools` maps pool names to
+    {'concurrency', 'max_wait', 'rate', 'burst'}.
+    """
+    
+    def __init__(self, app, rules: Iterable[Tuple[str, str]], pools: Dict[str, Dict[str, float]],
+                 per_client: bool = True, trust_forwarded: bool = False):
+        self.app = app
+        self.rules = [(name, re.compile(pattern)) for name, pattern in rules]
+        self.pools = {
+            name: ConcurrencyPool(name, settings['concurrency'], settings['max_wait'])
+            for name, settings in pools.items()
+        }
+        self.limiters = {
+            name: ClientRateLimiter(settings['rate'], settings['burst'])
+            for name, settings in pools.items() if per_client and settings.get('rate')
+        }
+        self.trust_forwarded = trust_forwarded
+        self._shed = {name: metrics.ADMISSION_REJECTIONS.labels(name, 'overloaded') for name in self.pools}
+        self._limited = {name: metrics.ADMISSION_REJECTIONS.labels(name, 'rate_limited') for name in self.pools}
+    
+    def classify(self, path: str) -> Optional[str]:
+        for name, pattern in self.rules:
+            if pattern.match(path):
+                return name
+        return None
+    
+    def _client(self, scope) -> str:
+        if self.trust_forwarded:
+            for key, value in scope.get('headers') or ():
+                if key == b'x-forwarded-for':
+                    return value.decode('latin-1').split(',')[0].strip()
+        client = scope.get('client')
+        return client[0] if client else 'unknown'
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        name = self.classify(scope['path'])
+        if name is None:
+            return await self.app(scope, receive, send)
+        
+        limiter = self.limiters.get(name)
+        if limiter is not None:
+            wait = limiter.check(self._client(scope))
+            if wait:
+                self._limited[name].inc()
+                response = JSONResponse(
+                    status_code=429, content={'detail': 'Too many requests'},
+                    headers={'Retry-After': _retry_after(wait)}
+                )
+                return await response(scope, receive, send)
+        
+        pool = self.pools[name]
+        if not await pool.acquire():
+            self._shed[name].inc()
+            response = JSONResponse(
+                status_code=503, content={'detail': 'Server busy, try again shortly'},
+                headers={'Retry-After': _retry_after(pool.expected_wait() or pool.max_wait)}
+            )
+            return await response(scope, receive, send)
+        
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            pool.release(time.perf_counter() - start)
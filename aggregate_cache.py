@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+In-process cache for expensive read-only aggregates.
+
+Homepage stats, city lists, city overviews and neighborhood statistics are
+full GROUP BY passes over the listings table but only change when listings
+do. AggregateCache keeps their results until the listings change feed
+watermark (MAX(updated_at)) moves, checking it at most once per
+refresh_interval, and cache_methods() swaps memoized versions of chosen
+methods onto an instance so existing callers pick them up unchanged.
+
+Results are frozen when stored (dicts become FrozenDicts, lists tuples) and
+handed out shared instead of copied per hit; a caller that wants to change
+one builds its own dict from it.
+"""
+
+import functools
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Iterable
+
+import metrics
+from config import config
+
+_MISSING = object()
+
+
+class FrozenDict(dict):
+    """A dict that refuses changes; still a dict, so it serializes like one"""
+    
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("cached aggregate is read-only; copy it with dict() to modify")
+    
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+
+def freeze(value):
+    """Read-only deep version of a result made of dicts, lists and scalars"""
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+class AggregateCache:
+    """Results keyed by call, dropped wholesale when the listings watermark changes, LRU beyond max_entries"""
+    
+    def __init__(self, db, refresh_interval: float = None, max_entries: int = 4096):
+        self.db = db
+        self.refresh_interval = (config.AGGREGATE_REFRESH_SECONDS
+                                 if refresh_interval is None else refresh_interval)
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Hashable, object]' = OrderedDict()
+        self._watermark = _MISSING
+        self._generation = 0
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self._hits = metrics.CACHE_REQUESTS.labels('aggregates', 'hit')
+        self._misses = metrics.CACHE_REQUESTS.labels('aggregates', 'miss')
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def _validate(self):
+        now = time.time()
+        if now - self._last_check < self.refresh_interval:
+            return
+        with self._lock:
+            if now - self._last_check < self.refresh_interval:
+                return
+            self._last_check = now
+            watermark = self.db.get_change_watermark()
+            if watermark != self._watermark:
+                self._watermark = watermark
+                self._generation += 1
+                self._entries.clear()
+    
+    def get(self, key: Hashable, compute: Callable[[], object]):
+        """Cached value for key, computing it on a miss; the value is frozen and shared"""
+        self._validate()
+        with self._lock:
+            value = self._entries.get(key, _MISSING)
+            if value is not _MISSING:
+                self._entries.move_to_end(key)
+        if value is not _MISSING:
+            self._hits.inc()
+            return value
+        
+        self._misses.inc()
+        generation = self._generation
+        value = freeze(compute())
+        with self._lock:
+            # Don't store a result computed against data that changed meanwhile
+            if generation == self._generation:
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+                if len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
+    
+    def wrap(self, name: str, func: Callable) -> Callable:
+        """Memoized version of func keyed by name and call arguments"""
+        @functools.wraps(func)
+        def cached(*args, **kwargs):
+            key = (name, args, tuple(sorted(kwargs.items())))
+            return self.get(key, lambda: func(*args, **kwargs))
+        return cached
+
+
+def cache_methods(obj, cache: AggregateCache, methods: Iterable[str]):
+    """Replace the named methods on this instance with cached versions; returns obj"""
+    prefix = type(obj).__name__
+    for name in methods:
+        setattr(obj, name, cache.wrap(f"{prefix}.{name}", getattr(obj, name)))
+    return obj
@@ -1,28 +1,55 @@
 #!/usr/bin/env python3
 """Production-grade FastAPI server for Polpi MX"""
 
-from fastapi import FastAPI, HTTPException, Query, Path, Request
+from services import ServiceRegistry, CacheWarmUp
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Path, Request, Header
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse, Response
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 import logging
+import os
 import time
 from database import PolpiDB
 from price_intelligence import PriceIntelligence
 from config import config
-from url_analyzer import URLAnalyzer
 from zoning_lookup import SEDUVIZoningLookup
 from geocoding import CDMXGeocoder, parse_input
+from export import accepts_gzip, stream_export
+from map_clusters import MapClusterIndex
+from vector_tiles import ListingTileLayer
+from hex_heatmap import HexHeatmapIndex
+from facets import FacetIndex
+import read_model
+import metrics
+import profiling
+from admission import AdmissionMiddleware
+from aggregate_cache import AggregateCache, cache_methods
 
 # Configure logging
 logging.basicConfig(level=config.LOG_LEVEL)
 logger = logging.getLogger(__name__)
 
+# Lazily built shared services; see the registrations below
+services = ServiceRegistry()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm up the configured services, then report boot time"""
+    services.warm_up(config.WARMUP_SERVICES)
+    services.mark_ready()
+    report = services.report()
+    built = ', '.join(f"{name} {ms}ms" for name, ms in report['services'].items() if ms is not None)
+    logger.info(f"Ready in {report['boot_ms']}ms (warmed: {built or 'none'})")
+    cache_warmup.start()
+    yield
+
 # Initialize FastAPI app
 app = FastAPI(
+    lifespan=lifespan,
     title="Polpi MX API",
     description="Mexican Real Estate Intelligence Platform",
     version="2.0.0",
@@ -30,6 +57,42 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
+# Instrument routes, DB calls and external services for /metrics
+if config.METRICS_ENABLED:
+    app.router.route_class = metrics.MetricsRoute
+    metrics.instrument_methods(
+        PolpiDB, metrics.DB_QUERY_SECONDS, metrics.DB_ERRORS,
+        exclude=('get_connection', 'init_db', 'generate_listing_id', 'calculate_quality_score')
+    )
+    metrics.instrument_methods(
+        CDMXGeocoder, metrics.EXTERNAL_CALL_SECONDS, metrics.EXTERNAL_CALL_ERRORS,
+        methods=('geocode_address', 'reverse_geocode', 'search_colonia'), labels=('geocoder',)
+    )
+    metrics.instrument_methods(
+        SEDUVIZoningLookup, metrics.EXTERNAL_CALL_SECONDS, metrics.EXTERNAL_CALL_ERRORS,
+        methods=('lookup_by_coordinates', 'lookup_by_address'), labels=('zoning',)
+    )
+
+# Admission control, inside CORS so rejections still carry CORS headers.
+# First matching rule wins; unmatched paths (health, metrics, admin, static) are never shed.
+# Exports hold their slot for the whole transfer, so slow clients get a pool of their own.
+ADMISSION_RULES = (
+    ('fetch', rf'{config.API_V1_PREFIX}/analyze-(url|location)$'),
+    ('export', rf'{config.API_V1_PREFIX}/export/'),
+    ('analysis', rf'{config.API_V1_PREFIX}/(cities/[^/]+/overview|neighborhoods/compare|analyze/batch'
+                 rf'|listings/[^/]+/(investment|report))$'),
+    ('analysis', r'/api/(analyze/|city-overview)'),
+    ('read', r'/api/|/tiles/'),
+)
+if config.ADMISSION_ENABLED:
+    app.add_middleware(
+        AdmissionMiddleware,
+        rules=ADMISSION_RULES,
+        pools=config.ADMISSION_POOLS,
+        per_client=config.ADMISSION_PER_CLIENT,
+        trust_forwarded=config.ADMISSION_TRUST_FORWARDED
+    )
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -39,12 +102,71 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize database and intelligence
-db = PolpiDB()
-intel = PriceIntelligence()
-url_analyzer = URLAnalyzer()
-zoning_lookup = SEDUVIZoningLookup(use_mock_data=True)
-geocoder = CDMXGeocoder()
+# Per-request cProfile via X-Polpi-Profile; only installed when an admin token is configured
+if config.ADMIN_TOKEN:
+    app.add_middleware(profiling.ProfileMiddleware)
+    app.router.route_class = profiling.profiled_route(app.router.route_class)
+
+def _build_url_analyzer():
+    # url_analyzer pulls in cloudscraper and BeautifulSoup, so import it on first use too
+    from url_analyzer import URLAnalyzer
+    if config.METRICS_ENABLED:
+        metrics.instrument_methods(
+            URLAnalyzer, metrics.EXTERNAL_CALL_SECONDS, metrics.EXTERNAL_CALL_ERRORS,
+            methods=('analyze_url',), labels=('url_fetch',)
+        )
+    return URLAnalyzer()
+
+# Shared services, built on first use (or at startup if listed in WARMUP_SERVICES).
+# Aggregates are cached until the listings change; see aggregate_cache.py
+db = services.register('db', lambda: cache_methods(
+    PolpiDB(), aggregates, ('get_stats', 'get_cities_with_stats', 'get_neighborhood_stats_enhanced')))
+intel = services.register('intel', lambda: cache_methods(
+    PriceIntelligence(db=db.get()), aggregates, ('get_city_overview',)))
+aggregates = AggregateCache(db)
+url_analyzer = services.register('url_analyzer', _build_url_analyzer)
+zoning_lookup = services.register('zoning', lambda: SEDUVIZoningLookup(use_mock_data=True))
+geocoder = services.register('geocoder', CDMXGeocoder)
+map_index = MapClusterIndex(db)
+tile_layer = ListingTileLayer(db)
+heatmap_index = HexHeatmapIndex(db)
+facet_index = FacetIndex(db)
+listing_model = (read_model.ListingReadModel(db)
+                 if config.READ_MODEL_ENABLED and read_model.available() else None)
+
+def _paginate_listings(filters: Dict, page: int, per_page: int, sort_by: str = 'newest') -> Dict:
+    """Listings page from the in-memory read model when it covers the query, else SQL"""
+    if listing_model is not None:
+        listing_model.refresh()
+        result = listing_model.paginate(filters, page, per_page, sort_by)
+        if result is not None:
+            return result
+    return db.get_listings_paginated(filters, page, per_page, sort_by)
+
+def _warm_top_cities():
+    db.get_stats()
+    for city in db.get_cities_with_stats()[:config.WARMUP_TOP_CITIES]:
+        intel.get_city_overview(city['city'])
+
+def _warm_top_neighborhoods():
+    seen = set()
+    for row in db.get_top_neighborhoods(config.WARMUP_TOP_NEIGHBORHOODS):
+        db.get_neighborhood_stats_enhanced(row['city'], row['colonia'], row['property_type'])
+        if (row['city'], row['colonia']) not in seen:
+            seen.add((row['city'], row['colonia']))
+            db.get_neighborhood_stats_enhanced(row['city'], row['colonia'])
+
+# Background warm-up after startup; /ready turns healthy when it finishes
+cache_warmup = CacheWarmUp()
+if config.WARMUP_CACHES:
+    cache_warmup.add('top_cities', _warm_top_cities)
+    cache_warmup.add('top_neighborhoods', _warm_top_neighborhoods)
+    cache_warmup.add('map_clusters', lambda: map_index.refresh(force=True))
+    cache_warmup.add('heatmap', lambda: heatmap_index.refresh(force=True))
+    cache_warmup.add('facets', lambda: facet_index.refresh(force=True))
+    cache_warmup.add('tiles', lambda: tile_layer.refresh(force=True))
+    if listing_model is not None:
+        cache_warmup.add('listing_model', lambda: listing_model.refresh(force=True))
 
 # Pydantic models for request/response validation
 class ListingFilters(BaseModel):
@@ -109,6 +231,10 @@ class InvestmentAnalysis(BaseModel):
     cap_rate: float
     investment_grade: str
 
+class BatchAnalysisRequest(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=config.MAX_BATCH_IDS, description="Listing IDs to analyze")
+    include_investment: bool = Field(default=True, description="Also run investment analysis")
+
 class URLAnalysisRequest(BaseModel):
     url: str = Field(..., description="Property listing URL to analyze")
 
@@ -169,11 +295,38 @@ async def get_listings_v1(
     if min_size: filters['min_size'] = min_size
     if max_size: filters['max_size'] = max_size
     
-    result = db.get_listings_paginated(filters, page, per_page, sort_by)
+    result = _paginate_listings(filters, page, per_page, sort_by)
     return result
 
+@app.get(f"{config.API_V1_PREFIX}/listings/facets")
+def get_listing_facets(
+    city: Optional[str] = Query(None),
+    colonia: Optional[str] = Query(None),
+    property_type: Optional[str] = Query(None),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    bedrooms: Optional[int] = Query(None, ge=0),
+    bathrooms: Optional[int] = Query(None, ge=0),
+    min_size: Optional[float] = Query(None, ge=0),
+    max_size: Optional[float] = Query(None, ge=0),
+    colonia_limit: int = Query(50, ge=1, le=1000, description="Max colonias to return")
+):
+    """
+    Listing counts for every filter-sidebar facet under the current filters.
+    
+    Each facet is counted with all filters except its own, so a selected city
+    still shows how many listings the other cities have.
+    """
+    filters = {
+        'city': city, 'colonia': colonia, 'property_type': property_type,
+        'min_price': min_price, 'max_price': max_price, 'bedrooms': bedrooms,
+        'bathrooms': bathrooms, 'min_size': min_size, 'max_size': max_size
+    }
+    facet_index.refresh()
+    return facet_index.query(filters, colonia_limit)
+
 @app.get(f"{config.API_V1_PREFIX}/listings/{{listing_id}}")
-async def get_listing_detail(listing_id: str = Path(..., description="Listing ID")):
+def get_listing_detail(listing_id: str = Path(..., description="Listing ID")):
     """Get single listing with full analysis"""
     # Get basic listing data
     listings = db.get_listings(limit=10000)
@@ -209,13 +362,13 @@ async def get_cities():
     return cities
 
 @app.get(f"{config.API_V1_PREFIX}/cities/{{city}}/overview")
-async def get_city_overview(city: str = Path(..., description="City name")):
+def get_city_overview(city: str = Path(..., description="City name")):
     """Get city market overview with detailed statistics"""
     overview = intel.get_city_overview(city)
     return overview
 
 @app.get(f"{config.API_V1_PREFIX}/neighborhoods/compare")
-async def compare_neighborhoods(
+def compare_neighborhoods(
     colonias: str = Query(..., description="Comma-separated list of 2-3 neighborhoods"),
     city: Optional[str] = Query(None, description="City name (auto-detected if not provided)")
 ):
@@ -258,7 +411,7 @@ async def get_market_trends(
     }
 
 @app.get(f"{config.API_V1_PREFIX}/listings/{{listing_id}}/investment")
-async def get_investment_analysis(listing_id: str = Path(..., description="Listing ID")):
+def get_investment_analysis(listing_id: str = Path(..., description="Listing ID")):
     """Get comprehensive investment analysis"""
     analysis = intel.get_investment_analysis(listing_id)
     
@@ -267,11 +420,24 @@ async def get_investment_analysis(listing_id: str = Path(..., description="Listi
     
     return analysis
 
+@app.post(f"{config.API_V1_PREFIX}/analyze/batch")
+def analyze_listings_batch(request: BatchAnalysisRequest):
+    """
+    Deal and investment analysis for many listings in one round trip.
+    
+    Results are keyed by listing id; unknown ids map to an error entry.
+    """
+    results = intel.analyze_listings_batch(request.ids, request.include_investment)
+    return {
+        'count': len(results),
+        'results': results
+    }
+
 @app.get(f"{config.API_V1_PREFIX}/listings/{{listing_id}}/report")
-async def generate_listing_report(listing_id: str = Path(..., description="Listing ID")):
+def generate_listing_report(listing_id: str = Path(..., description="Listing ID")):
     """Generate comprehensive listing report data (JSON that frontend can render)"""
     # Get listing details
-    listing_detail = await get_listing_detail(listing_id)
+    listing_detail = get_listing_detail(listing_id)
     
     # Get investment analysis
     investment = intel.get_investment_analysis(listing_id)
@@ -302,8 +468,191 @@ async def search_listings(
     results = db.search_listings(q, page, per_page)
     return results
 
+@app.get(f"{config.API_V1_PREFIX}/export/listings")
+async def export_listings(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="Output format"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to include"),
+    gzip: bool = Query(False, description="Gzip the stream even if the client did not ask for it"),
+    city: Optional[str] = Query(None),
+    colonia: Optional[str] = Query(None),
+    property_type: Optional[str] = Query(None),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    bedrooms: Optional[int] = Query(None, ge=0),
+    bathrooms: Optional[int] = Query(None, ge=0),
+    min_size: Optional[float] = Query(None, ge=0),
+    max_size: Optional[float] = Query(None, ge=0)
+):
+    """
+    Stream every active listing matching the filters as NDJSON or CSV.
+    
+    Rows come from a server-side cursor, so a full-inventory pull is a single
+    request with bounded server memory.
+    """
+    filters = {}
+    if city: filters['city'] = city
+    if colonia: filters['colonia'] = colonia
+    if property_type: filters['property_type'] = property_type
+    if min_price: filters['min_price'] = min_price
+    if max_price: filters['max_price'] = max_price
+    if bedrooms: filters['bedrooms'] = bedrooms
+    if bathrooms: filters['bathrooms'] = bathrooms
+    if min_size: filters['min_size'] = min_size
+    if max_size: filters['max_size'] = max_size
+    
+    field_list = [f.strip() for f in fields.split(',') if f.strip()] if fields else None
+    if field_list:
+        unknown = [f for f in field_list if f not in PolpiDB.LISTING_COLUMNS and f != 'price_per_m2']
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    if format == 'csv' and not field_list:
+        field_list = list(PolpiDB.LISTING_COLUMNS) + ['price_per_m2']
+    
+    compress = gzip or accepts_gzip(request.headers.get('accept-encoding'))
+    rows = db.iter_listings(filters, field_list, batch_size=config.EXPORT_BATCH_SIZE)
+    
+    media_type = "text/csv" if format == 'csv' else "application/x-ndjson"
+    headers = {
+        "Content-Disposition": f'attachment; filename="listings.{format}"',
+        # The encoding depends on Accept-Encoding, so caches must key on it
+        "Vary": "Accept-Encoding"
+    }
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    
+    return StreamingResponse(
+        stream_export(rows, format, field_list, compress),
+        media_type=media_type,
+        headers=headers
+    )
+
+def parse_bbox(bbox: str) -> tuple:
+    """Parse a 'west,south,east,north' query value"""
+    try:
+        west, south, east, north = [float(v) for v in bbox.split(',')]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be 'west,south,east,north'")
+    if west >= east or south >= north:
+        raise HTTPException(status_code=400, detail="bbox must satisfy west < east and south < north")
+    return west, south, east, north
+
+@app.get(f"{config.API_V1_PREFIX}/map/clusters")
+def get_map_clusters(
+    bbox: str = Query(..., description="Viewport as west,south,east,north"),
+    zoom: float = Query(..., ge=0, le=22, description="Current map zoom"),
+    property_type: Optional[str] = Query(None),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    bedrooms: Optional[int] = Query(None, ge=0),
+    bathrooms: Optional[int] = Query(None, ge=0),
+    min_size: Optional[float] = Query(None, ge=0),
+    max_size: Optional[float] = Query(None, ge=0)
+):
+    """
+    Clustered listings for a map viewport.
+    
+    Up to MAP_CLUSTER_MAX_ZOOM this returns grid clusters (centroid, count,
+    median price/m²) from the precomputed index; above it, individual pins.
+    Declared sync so index refreshes run in the threadpool, not the event loop.
+    """
+    west, south, east, north = parse_bbox(bbox)
+    
+    filters = {}
+    if min_price: filters['min_price'] = min_price
+    if max_price: filters['max_price'] = max_price
+    if bedrooms: filters['bedrooms'] = bedrooms
+    if bathrooms: filters['bathrooms'] = bathrooms
+    if min_size: filters['min_size'] = min_size
+    if max_size: filters['max_size'] = max_size
+    
+    if zoom > map_index.max_zoom:
+        if property_type: filters['property_type'] = property_type
+        pins = db.get_listings_in_bbox(west, south, east, north, filters, limit=config.MAP_MAX_PINS + 1)
+        return {
+            'zoom': int(zoom),
+            'type': 'listings',
+            'listings': pins[:config.MAP_MAX_PINS],
+            'truncated': len(pins) > config.MAP_MAX_PINS
+        }
+    
+    if filters:
+        # The index only partitions by property type; other filters are aggregated in SQL
+        if property_type: filters['property_type'] = property_type
+        zoom, clusters = MapClusterIndex.cluster_filtered(db, west, south, east, north, zoom, filters)
+    else:
+        map_index.refresh()
+        zoom, clusters = map_index.query(west, south, east, north, zoom, property_type)
+    
+    return {
+        'zoom': zoom,
+        'type': 'clusters',
+        'clusters': clusters,
+        'total': sum(c['count'] for c in clusters)
+    }
+
+@app.get(f"{config.API_V1_PREFIX}/heatmap")
+def get_price_heatmap(
+    res: int = Query(3, ge=0, description="Resolution index into HEX_RESOLUTIONS_M (0 = coarsest)"),
+    bbox: Optional[str] = Query(None, description="Viewport as west,south,east,north"),
+    property_type: Optional[str] = Query(None),
+    min_count: int = Query(1, ge=1, description="Hide hexagons with fewer listings")
+):
+    """
+    Hexagonal price/m² heatmap as a GeoJSON FeatureCollection.
+    
+    Each hexagon carries listing count, median price/m² and average deal
+    score, served from the precomputed HexHeatmapIndex.
+    """
+    if res >= len(heatmap_index.resolutions):
+        raise HTTPException(
+            status_code=400,
+            detail=f"res must be between 0 and {len(heatmap_index.resolutions) - 1}"
+        )
+    bounds = parse_bbox(bbox) if bbox else (None, None, None, None)
+    
+    heatmap_index.refresh()
+    return heatmap_index.query(res, *bounds, property_type=property_type, min_count=min_count)
+
+@app.get("/tiles/listings/{z}/{x}/{y}.mvt")
+def get_listing_tile(
+    z: int = Path(..., ge=0, le=22),
+    x: int = Path(..., ge=0),
+    y: int = Path(..., ge=0),
+    property_type: Optional[str] = Query(None),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    min_deal_score: Optional[float] = Query(None, ge=0, le=100)
+):
+    """
+    Listings as a Mapbox Vector Tile (layer 'listings').
+    
+    Tiles are cached on disk per filter combination and invalidated per tile
+    as listings inside them change.
+    """
+    if x >= (1 << z) or y >= (1 << z):
+        raise HTTPException(status_code=404, detail="Tile out of range")
+    if z > config.MVT_MAX_ZOOM:
+        # Clients overzoom from the deepest level
+        raise HTTPException(status_code=404, detail=f"Max tile zoom is {config.MVT_MAX_ZOOM}")
+    
+    filters = {}
+    if property_type: filters['property_type'] = property_type
+    if min_price: filters['min_price'] = min_price
+    if max_price: filters['max_price'] = max_price
+    if min_deal_score: filters['min_deal_score'] = min_deal_score
+    
+    data, cached = tile_layer.get_tile(z, x, y, filters)
+    headers = {
+        "Cache-Control": "public, max-age=60",
+        "X-Tile-Cache": "hit" if cached else "miss"
+    }
+    if not data:
+        return Response(status_code=204, headers=headers)
+    return Response(content=data, media_type="application/vnd.mapbox-vector-tile", headers=headers)
+
 @app.post(f"{config.API_V1_PREFIX}/analyze-url", response_model=URLAnalysisResponse)
-async def analyze_url(request: URLAnalysisRequest):
+def analyze_url(request: URLAnalysisRequest):
     """
     Analyze a property listing URL and get instant market intelligence.
     
@@ -451,7 +800,7 @@ class LocationAnalysisResponse(BaseModel):
     comparables: List[Dict[str, Any]]
 
 @app.post(f"{config.API_V1_PREFIX}/analyze-location", response_model=LocationAnalysisResponse)
-async def analyze_location(request: LocationAnalysisRequest):
+def analyze_location(request: LocationAnalysisRequest):
     """
     Analyze a location by address, colonia, or coordinates.
     Get zoning information, buildable potential, and market intelligence.
@@ -636,7 +985,7 @@ async def get_listings_legacy(
     if min_size: filters['min_size'] = min_size
     if max_size: filters['max_size'] = max_size
     
-    result = db.get_listings_paginated(filters, page=1, per_page=limit)
+    result = _paginate_listings(filters, page=1, per_page=limit)
     return result['listings']
 
 @app.get("/api/stats")
@@ -645,12 +994,12 @@ async def get_stats_legacy():
     return await get_platform_stats()
 
 @app.get("/api/listing/{listing_id}")
-async def get_listing_legacy(listing_id: str):
+def get_listing_legacy(listing_id: str):
     """Legacy listing detail endpoint"""
-    return await get_listing_detail(listing_id)
+    return get_listing_detail(listing_id)
 
 @app.get("/api/analyze/{listing_id}")
-async def analyze_listing_legacy(listing_id: str):
+def analyze_listing_legacy(listing_id: str):
     """Legacy analysis endpoint"""
     analysis = intel.analyze_listing(listing_id)
     if 'error' in analysis:
@@ -663,9 +1012,9 @@ async def get_cities_legacy():
     return await get_cities()
 
 @app.get("/api/city-overview")
-async def city_overview_legacy(city: str = Query(...)):
+def city_overview_legacy(city: str = Query(...)):
     """Legacy city overview endpoint"""
-    return await get_city_overview(city)
+    return get_city_overview(city)
 
 # Health check endpoint
 @app.get("/health")
@@ -674,9 +1023,66 @@ async def health_check():
     return {
         "status": "healthy",
         "timestamp": time.time(),
-        "version": "2.0.0"
+        "version": "2.0.0",
+        "startup": services.report()
     }
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 503 until the startup cache warm-up has finished"""
+    report = cache_warmup.report()
+    if not report['ready']:
+        return JSONResponse(status_code=503, content={"status": "warming_up", **report})
+    return {"status": "ready", **report}
+
+# Prometheus metrics
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus text-format metrics"""
+    if not config.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics disabled")
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# Admin: on-demand profiling
+def require_admin(token: Optional[str]):
+    """Admin endpoints don't exist without POLPI_ADMIN_TOKEN and need it in X-Admin-Token"""
+    if not config.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not profiling.is_admin_token(token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@app.post("/admin/profile", include_in_schema=False)
+async def start_sampling_profile(
+    seconds: float = Query(10, gt=0, le=config.PROFILE_MAX_SECONDS),
+    interval_ms: float = Query(5, ge=1, le=1000),
+    x_admin_token: Optional[str] = Header(None)
+):
+    """Sample every thread's stack for N seconds and write collapsed stacks to PROFILE_DIR"""
+    require_admin(x_admin_token)
+    try:
+        path = profiling.sampler.start(seconds, interval_ms / 1000)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"status": "sampling", "file": os.path.basename(path), "seconds": seconds}
+
+@app.get("/admin/profile", include_in_schema=False)
+async def get_profile_status(x_admin_token: Optional[str] = Header(None)):
+    """Current sampler state and saved profiles"""
+    require_admin(x_admin_token)
+    return {"sampler": profiling.sampler.status, "profiles": profiling.list_profiles()}
+
+@app.get("/admin/profiles/{name}", include_in_schema=False)
+async def download_profile(name: str, x_admin_token: Optional[str] = Header(None)):
+    """Download a saved .folded or .pstats file"""
+    require_admin(x_admin_token)
+    if name not in {p['file'] for p in profiling.list_profiles()}:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    with open(os.path.join(config.PROFILE_DIR, name), 'rb') as f:
+        content = f.read()
+    media_type = "text/plain" if name.endswith('.folded') else "application/octet-stream"
+    return Response(content=content, media_type=media_type,
+                    headers={"Content-Disposition": f'attachment; filename="{name}"'})
+
 # Root endpoint
 @app.get("/")
 async def root():
@@ -0,0 +1,8 @@
+"""
+Repeatable performance benchmarks for Polpi MX.
+
+Run from the repository root:
+    
+    python3 -m benchmarks.run                     # all suites, compare against baseline
+    python3 -m benchmarks.run --suite db --update-baseline
+"""
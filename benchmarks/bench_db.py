@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Micro-benchmarks for PolpiDB queries and PriceIntelligence methods"""
+
+import random
+from typing import Callable, Dict, List, Tuple
+
+from benchmarks.harness import measure
+
+
+class Workload:
+    """Deterministic query parameters drawn from the benchmark dataset"""
+    
+    def __init__(self, db, seed: int = 7):
+        self.rng = random.Random(seed)
+        conn = db.get_connection()
+        self.neighborhoods = [tuple(row) for row in conn.execute(
+            "SELECT DISTINCT city, colonia FROM listings WHERE is_active = 1 ORDER BY city, colonia")]
+        self.cities = sorted({city for city, _ in self.neighborhoods})
+        self.ids = [row[0] for row in conn.execute(
+            "SELECT id FROM listings WHERE is_active = 1 ORDER BY id LIMIT 2000")]
+        self.points = [tuple(row) for row in conn.execute(
+            "SELECT lat, lng FROM listings WHERE lat IS NOT NULL ORDER BY id LIMIT 500")]
+        conn.close()
+    
+    def listing_id(self) -> str:
+        return self.rng.choice(self.ids)
+    
+    def neighborhood(self) -> Tuple[str, str]:
+        return self.rng.choice(self.neighborhoods)
+    
+    def city(self) -> str:
+        return self.rng.choice(self.cities)
+    
+    def bbox(self, span: float) -> Tuple[float, float, float, float]:
+        lat, lng = self.rng.choice(self.points)
+        return lng - span, lat - span, lng + span, lat + span
+
+
+def db_benchmarks(db, w: Workload) -> List[Tuple[str, Callable, int]]:
+    """(name, callable, iterations) for every PolpiDB read path"""
+    cases = []
+    for sort_by in ('newest', 'price', 'price_desc', 'size', 'price_per_m2', 'deal_score'):
+        cases.append((f"db.get_listings_paginated[{sort_by}]",
+                      lambda s=sort_by: db.get_listings_paginated({'city': w.city()}, page=w.rng.randint(1, 50),
+                                                                  sort_by=s), 30))
+    cases += [
+        ("db.get_listings_paginated[filtered]",
+         lambda: db.get_listings_paginated({'city': w.city(), 'property_type': 'departamento',
+                                            'min_price': 3_000_000, 'bedrooms': 2}, sort_by='price'), 30),
+        ("db.search_listings", lambda: db.search_listings(w.neighborhood()[1]), 30),
+        ("db.get_neighborhood_stats_enhanced",
+         lambda: db.get_neighborhood_stats_enhanced(*w.neighborhood(), 'departamento'), 30),
+        ("db.get_market_trends", lambda: db.get_market_trends(w.city(), 'casa'), 50),
+        ("db.get_cities_with_stats", db.get_cities_with_stats, 10),
+        ("db.get_stats", db.get_stats, 10),
+        ("db.find_comparables", lambda: db.find_comparables(w.listing_id()), 30),
+        ("db.get_listings_by_ids[100]", lambda: db.get_listings_by_ids(w.rng.sample(w.ids, 100)), 30),
+        ("db.find_comparables_batch[50]",
+         lambda: db.find_comparables_batch(list(db.get_listings_by_ids(w.rng.sample(w.ids, 50)).values())), 10),
+        ("db.get_listings_in_bbox", lambda: db.get_listings_in_bbox(*w.bbox(0.005)), 30),
+        ("db.get_thinned_listings_in_bbox", lambda: db.get_thinned_listings_in_bbox(*w.bbox(0.08), grid=68), 20),
+        ("db.iter_listings[full]", lambda: sum(1 for _ in db.iter_listings(fields=['id', 'price_mxn'])), 3),
+    ]
+    return cases
+
+
+def intelligence_benchmarks(intel, w: Workload) -> List[Tuple[str, Callable, int]]:
+    """(name, callable, iterations) for the PriceIntelligence entry points the API uses"""
+    return [
+        ("intel.analyze_listing", lambda: intel.analyze_listing(w.listing_id()), 30),
+        ("intel.get_investment_analysis", lambda: intel.get_investment_analysis(w.listing_id()), 30),
+        ("intel.analyze_listings_batch[50]", lambda: intel.analyze_listings_batch(w.rng.sample(w.ids, 50)), 5),
+        ("intel.get_city_overview", lambda: intel.get_city_overview(w.city()), 10),
+        ("intel.compare_neighborhoods",
+         lambda: intel.compare_neighborhoods([c for _, c in w.rng.sample(w.neighborhoods, 3)]), 20),
+        ("intel.generate_price_trends", lambda: intel.generate_price_trends(w.city()), 30),
+        ("intel.get_trending_listings", lambda: intel.get_trending_listings(w.city()), 10),
+    ]
+
+
+def run(db, intel, suites: Tuple[str, ...] = ('db', 'intel'), scale: float = 1.0,
+        progress: Callable[[str], None] = print) -> Dict[str, Dict]:
+    """Run the selected micro-benchmark suites; iterations are multiplied by `scale`"""
+    w = Workload(db)
+    cases = []
+    if 'db' in suites:
+        cases += db_benchmarks(db, w)
+    if 'intel' in suites:
+        cases += intelligence_benchmarks(intel, w)
+    
+    results = {}
+    for name, func, iterations in cases:
+        results[name] = measure(func, max(1, int(iterations * scale)))
+        progress(f"  {name:45s} p50 {results[name]['p50_ms']:9.2f}ms  p95 {results[name]['p95_ms']:9.2f}ms")
+    return results
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+HTTP load scenario against a locally served API.
+
+Starts benchmarks.serve in a subprocess (so the load generator doesn't
+share the server's GIL), then drives a weighted mix of listings, search,
+detail, city overview and analyze-location requests from N concurrent
+clients for a fixed duration, and reports latency percentiles and
+throughput per endpoint and overall.
+"""
+
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+from urllib.parse import quote
+
+import requests
+
+from benchmarks.harness import summarize
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (name, weight) of each request type in the mix
+SCENARIO = [
+    ('listings', 35),
+    ('search', 20),
+    ('detail', 25),
+    ('overview', 10),
+    ('analyze_location', 10),
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_ready(base_url: str, process: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"API server exited with code {process.returncode}")
+        try:
+            if requests.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("API server did not become ready")
+
+
+class RequestMix:
+    """Builds concrete requests for each scenario entry from dataset samples"""
+    
+    def __init__(self, db_path: str, seed: int):
+        import sqlite3
+        conn = sqlite3.connect(db_path)
+        self.ids = [row[0] for row in conn.execute(
+            "SELECT id FROM listings WHERE is_active = 1 ORDER BY id LIMIT 2000")]
+        self.neighborhoods = [tuple(row) for row in conn.execute(
+            "SELECT DISTINCT city, colonia FROM listings WHERE is_active = 1 ORDER BY city, colonia")]
+        conn.close()
+        self.cities = sorted({city for city, _ in self.neighborhoods})
+        self.seed = seed
+    
+    def build(self, kind: str, rng: random.Random) -> Tuple[str, str, Dict]:
+        """(method, path, json body) for a request of the given kind"""
+        if kind == 'listings':
+            sort_by = rng.choice(['newest', 'price', 'price_desc', 'price_per_m2'])
+            city = quote(rng.choice(self.cities))
+            return 'GET', f"/api/v1/listings?city={city}&sort_by={sort_by}&page={rng.randint(1, 20)}", None
+        if kind == 'search':
+            return 'GET', f"/api/v1/search?q={quote(rng.choice(self.neighborhoods)[1])}", None
+        if kind == 'detail':
+            return 'GET', f"/api/v1/listings/{rng.choice(self.ids)}", None
+        if kind == 'overview':
+            return 'GET', f"/api/v1/cities/{quote(rng.choice(self.cities))}/overview", None
+        if kind == 'analyze_location':
+            return 'POST', "/api/v1/analyze-location", {'location': rng.choice(self.neighborhoods)[1],
+                                                        'lot_size_m2': rng.choice([None, 250, 500])}
+        raise ValueError(kind)
+
+
+def run_load(base_url: str, mix: RequestMix, concurrency: int, duration: float,
+             warmup: float = 2.0) -> Dict[str, Dict]:
+    """Drive the scenario from `concurrency` client threads for `duration` seconds"""
+    kinds = [name for name, _ in SCENARIO]
+    weights = [weight for _, weight in SCENARIO]
+    durations: Dict[str, List[float]] = {kind: [] for kind in kinds}
+    errors: Dict[str, int] = {kind: 0 for kind in kinds}
+    lock = threading.Lock()
+    measure_from = time.perf_counter() + warmup
+    stop_at = measure_from + duration
+    
+    def client(worker: int):
+        rng = random.Random(mix.seed * 1000 + worker)
+        session = requests.Session()
+        local = {kind: [] for kind in kinds}
+        local_errors = {kind: 0 for kind in kinds}
+        while True:
+            now = time.perf_counter()
+            if now >= stop_at:
+                break
+            kind = rng.choices(kinds, weights=weights)[0]
+            method, path, body = mix.build(kind, rng)
+            t0 = time.perf_counter()
+            try:
+                response = session.request(method, base_url + path, json=body, timeout=30)
+                ok = response.status_code < 500
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - t0
+            if t0 >= measure_from:
+                local[kind].append(elapsed)
+                if not ok:
+                    local_errors[kind] += 1
+        with lock:
+            for kind in kinds:
+                durations[kind].extend(local[kind])
+                errors[kind] += local_errors[kind]
+    
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    results = {f"http.{kind}": summarize(durations[kind], duration, errors[kind])
+               for kind in kinds if durations[kind]}
+    everything = [d for kind in kinds for d in durations[kind]]
+    if everything:
+        results['http.total'] = summarize(everything, duration, sum(errors.values()))
+    return results
+
+
+def run(db_path: str, concurrency: int = 8, duration: float = 20.0, seed: int = 42,
+        geocoder_latency_ms: float = 0.0, progress: Callable[[str], None] = print) -> Dict[str, Dict]:
+    """Serve the API on a free port, run the load scenario, shut the server down"""
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    log = tempfile.NamedTemporaryFile(prefix='polpi-bench-server-', suffix='.log', delete=False)
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.serve', '--db', db_path, '--port', str(port),
+         '--geocoder-latency-ms', str(geocoder_latency_ms)],
+        cwd=REPO_ROOT, stdout=log, stderr=subprocess.STDOUT
+    )
+    try:
+        try:
+            _wait_until_ready(base_url, process)
+        except RuntimeError as e:
+            raise RuntimeError(f"{e} (server log: {log.name})")
+        progress(f"  load: {concurrency} clients for {duration:.0f}s against {base_url}")
+        results = run_load(base_url, RequestMix(db_path, seed), concurrency, duration)
+        for name, result in results.items():
+            progress(f"  {name:45s} p50 {result['p50_ms']:9.2f}ms  p95 {result['p95_ms']:9.2f}ms  "
+                     f"p99 {result['p99_ms']:9.2f}ms  {result['ops_per_s']:8.1f} req/s  errors {result['errors']}")
+        return results
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        log.close()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Parse-and-extract benchmark over the saved scraper pages in data/html.
+
+Each page is routed by its file name to the extraction code the scraper
+runs on it: the Century21 and Vivanuncios card parsers, or the Lamudi
+JSON-LD extractor. That code is timed per page under every installed
+HTML_PARSER backend. Listings extracted by the faster backends are
+compared with html.parser's; pages where they differ count as errors, so
+a backend that changes the results fails the regression gate.
+"""
+
+import contextlib
+import io
+import itertools
+import os
+import sys
+from typing import Callable, Dict, List, Tuple
+
+from benchmarks.harness import measure
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES_DIR = os.path.join(REPO_ROOT, 'data', 'html')
+
+# Fields that differ between runs regardless of parser
+VOLATILE_FIELDS = ('scraped_date',)
+
+
+def _extractors() -> Dict[str, Tuple[str, Callable[[str], List[Dict]]]]:
+    """File name prefix -> (site, extract(html) -> listings)"""
+    sys.path.insert(0, os.path.join(REPO_ROOT, 'scrapers'))
+    from century21_scraper import Century21Scraper
+    from vivanuncios_scraper import VivanunciosScraper
+    from lamudi_final_scraper import LamudiScraper
+    from html_parsing import parse
+    
+    century21 = Century21Scraper()
+    vivanuncios = VivanunciosScraper()
+    # Skip __init__, which creates the script's hard-coded HTML directory
+    lamudi = LamudiScraper.__new__(LamudiScraper)
+    return {
+        'century21_': ('century21',
+                       lambda html: century21.parse_listings_page(parse(html), century21.base_url)),
+        'vivanuncios_': ('vivanuncios',
+                         lambda html: vivanuncios.parse_listings_page(parse(html), vivanuncios.base_url)),
+        'lamudi_': ('lamudi', lamudi.extract_listings),
+    }
+
+
+def load_pages(pages_dir: str = PAGES_DIR) -> Dict[str, List[Tuple[str, str]]]:
+    """site -> [(file name, html)] for every saved page an extractor handles"""
+    extractors = _extractors()
+    pages: Dict[str, List[Tuple[str, str]]] = {}
+    for filename in sorted(os.listdir(pages_dir)) if os.path.isdir(pages_dir) else []:
+        for prefix, (site, _) in extractors.items():
+            if filename.startswith(prefix):
+                with open(os.path.join(pages_dir, filename), encoding='utf-8', errors='replace') as f:
+                    pages.setdefault(site, []).append((filename, f.read()))
+                break
+    return pages
+
+
+def _comparable(listings: List[Dict]) -> List[Dict]:
+    return [{k: v for k, v in listing.items() if k not in VOLATILE_FIELDS} for listing in listings]
+
+
+def run(scale: float = 1.0, pages_dir: str = PAGES_DIR,
+        progress: Callable[[str], None] = print) -> Dict[str, Dict]:
+    """Time parse + extract per page for each site and backend"""
+    from config import config
+    from html_parsing import available_backends
+    
+    extract = {site: func for site, func in _extractors().values()}
+    pages = load_pages(pages_dir)
+    if not pages:
+        progress(f"  No saved pages in {pages_dir}; skipping")
+        return {}
+    
+    backends = available_backends()
+    configured = config.HTML_PARSER
+    results = {}
+    try:
+        for site, site_pages in pages.items():
+            func = extract[site]
+            reference = None
+            for backend in reversed(backends):  # html.parser first, as the reference
+                config.HTML_PARSER = backend
+                # Scrapers report what they find on stdout; keep the table readable
+                with contextlib.redirect_stdout(io.StringIO()):
+                    extracted = [_comparable(func(html)) for _, html in site_pages]
+                    if reference is None:
+                        reference = extracted
+                    mismatches = sum(a != b for a, b in zip(extracted, reference))
+                    cycle = itertools.cycle(html for _, html in site_pages)
+                    iterations = max(len(site_pages), int(len(site_pages) * 3 * scale))
+                    result = measure(lambda: func(next(cycle)), iterations, warmup=len(site_pages))
+                result['errors'] = mismatches
+                result['pages'] = len(site_pages)
+                result['listings'] = sum(len(listings) for listings in extracted)
+                name = f"parse.{site}[{backend}]"
+                results[name] = result
+                baseline = results[f"parse.{site}[html.parser]"]['mean_ms']
+                progress(f"  {name:45s} p50 {result['p50_ms']:9.2f}ms  p95 {result['p95_ms']:9.2f}ms  "
+                         f"{baseline / result['mean_ms']:5.1f}x  {result['listings']} listings"
+                         + (f"  {mismatches} page(s) differ from html.parser" if mismatches else ''))
+    finally:
+        config.HTML_PARSER = configured
+    return results
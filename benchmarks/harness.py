@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""Timing, dataset and result helpers shared by the benchmark suites"""
+
+import json
+import math
+import os
+import platform
+import subprocess
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BENCH_DIR, 'data')
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baseline.json')
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(durations: List[float], wall_seconds: float = None, errors: int = 0) -> Dict:
+    """Latency percentiles (ms) and throughput for a list of durations in seconds"""
+    values = sorted(durations)
+    total = sum(values)
+    wall = wall_seconds if wall_seconds is not None else total
+    return {
+        'n': len(values),
+        'p50_ms': round(percentile(values, 50) * 1000, 3),
+        'p95_ms': round(percentile(values, 95) * 1000, 3),
+        'p99_ms': round(percentile(values, 99) * 1000, 3),
+        'mean_ms': round(total / len(values) * 1000, 3) if values else 0.0,
+        'ops_per_s': round(len(values) / wall, 1) if wall > 0 else 0.0,
+        'errors': errors,
+    }
+
+
+def measure(func: Callable, iterations: int, warmup: int = None) -> Dict:
+    """Call func() repeatedly and summarize per-call latency"""
+    for _ in range(max(2, iterations // 5) if warmup is None else warmup):
+        func()
+    durations = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - t0)
+    return summarize(durations, time.perf_counter() - start)
+
+
+def ensure_dataset(listings: int, seed: int, progress: Callable[[str], None] = print) -> str:
+    """Path to a cached synthetic benchmark database, generating it on first use"""
+    from synthetic_data import SyntheticDatasetGenerator
+    
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = os.path.join(DATA_DIR, f"bench-{listings}-{seed}.db")
+    marker = f"{path}.done"
+    if os.path.exists(path) and os.path.exists(marker):
+        return path
+    
+    for stale in (path, marker):
+        if os.path.exists(stale):
+            os.remove(stale)
+    progress(f"Generating benchmark dataset: {listings:,} listings, seed {seed}")
+    summary = SyntheticDatasetGenerator(path, seed=seed).generate(listings, progress=None)
+    with open(marker, 'w') as f:
+        json.dump(summary, f)
+    progress(f"  done in {summary['seconds']}s")
+    return path
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, cwd=BENCH_DIR, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_metadata(dataset: Dict) -> Dict:
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'machine': f"{platform.system()} {platform.machine()} ({os.cpu_count()} cpus)",
+        'dataset': dataset,
+    }
+
+
+def save_results(report: Dict, path: str = None) -> str:
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        path = os.path.join(RESULTS_DIR, f"{stamp}.json")
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    return path
+
+
+def load_results(path: str) -> Optional[Dict]:
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float = 0.20, min_delta_ms: float = 0.5) -> List[Dict]:
+    """
+    Compare benchmark results key by key.
+    
+    A benchmark regresses when its p95 grows by more than `tolerance` (and
+    by at least `min_delta_ms`, so sub-millisecond noise is ignored), its
+    throughput drops by more than `tolerance` (with the same absolute floor
+    on mean latency), or it starts returning errors.
+    """
+    rows = []
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if not base:
+            rows.append({'name': name, 'status': 'new', 'p95_ms': result['p95_ms']})
+            continue
+        p95_change = (result['p95_ms'] - base['p95_ms']) / base['p95_ms'] if base['p95_ms'] else 0.0
+        ops_change = (result['ops_per_s'] - base['ops_per_s']) / base['ops_per_s'] if base['ops_per_s'] else 0.0
+        regressed = (
+            (p95_change > tolerance and result['p95_ms'] - base['p95_ms'] >= min_delta_ms)
+            or (ops_change < -tolerance and result['mean_ms'] - base['mean_ms'] >= min_delta_ms)
+            or result.get('errors', 0) > base.get('errors', 0)
+        )
+        improved = p95_change < -tolerance and base['p95_ms'] - result['p95_ms'] >= min_delta_ms
+        rows.append({
+            'name': name,
+            'status': 'REGRESSION' if regressed else ('improved' if improved else 'ok'),
+            'p95_ms': result['p95_ms'],
+            'baseline_p95_ms': base['p95_ms'],
+            'p95_change': round(p95_change, 3),
+            'ops_change': round(ops_change, 3),
+        })
+    return rows
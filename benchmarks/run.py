@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Run the Polpi MX benchmark suites and gate on regressions.
+
+    python3 -m benchmarks.run [--suite db --suite intel --suite http --suite parse]
+                              [--listings 100000] [--seed 42]
+                              [--baseline benchmarks/baseline.json] [--update-baseline]
+
+Results are written to benchmarks/results/<timestamp>.json. When a
+baseline exists, every benchmark is compared against it and the command
+exits non-zero if any of them regressed beyond --tolerance. The parse
+suite runs the scrapers' extraction code over the pages saved in data/html
+under each installed HTML parser backend and needs no dataset.
+"""
+
+import argparse
+import logging
+import sys
+
+from benchmarks import harness
+
+SUITES = ('db', 'intel', 'http', 'parse')
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Run Polpi MX benchmarks')
+    parser.add_argument('--suite', action='append', choices=SUITES,
+                        help='Suite to run (repeatable; default: all)')
+    parser.add_argument('--listings', type=int, default=100_000, help='Synthetic dataset size')
+    parser.add_argument('--seed', type=int, default=42, help='Synthetic dataset seed')
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiply micro-benchmark iterations')
+    parser.add_argument('--concurrency', type=int, default=8, help='HTTP clients')
+    parser.add_argument('--duration', type=float, default=20.0, help='HTTP load duration in seconds')
+    parser.add_argument('--geocoder-latency-ms', type=float, default=0.0,
+                        help='Simulated latency of the local geocoder stand-in')
+    parser.add_argument('--baseline', default=harness.BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true', help='Save this run as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.20, help='Allowed p95/throughput change')
+    parser.add_argument('--output', help='Result file (default: benchmarks/results/<timestamp>.json)')
+    args = parser.parse_args(argv)
+    suites = tuple(args.suite or SUITES)
+    
+    # Slow-query warnings would swamp the output during micro-benchmarks
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger('query_audit').setLevel(logging.ERROR)
+    
+    dataset = None
+    if set(suites) & {'db', 'intel', 'http'}:
+        db_path = harness.ensure_dataset(args.listings, args.seed)
+        from synthetic_data import SyntheticDatasetGenerator
+        dataset = {'listings': args.listings, 'seed': args.seed,
+                   'fingerprint': SyntheticDatasetGenerator.fingerprint(db_path)}
+    
+    results = {}
+    if 'db' in suites or 'intel' in suites:
+        from config import config
+        config.DB_PATH = db_path
+        from database import PolpiDB
+        from price_intelligence import PriceIntelligence
+        from benchmarks import bench_db
+        
+        print("Micro-benchmarks:")
+        db = PolpiDB(db_path)
+        results.update(bench_db.run(db, PriceIntelligence(db),
+                                    tuple(s for s in suites if s != 'http'), args.scale))
+    
+    if 'http' in suites:
+        from benchmarks import bench_http
+        print("HTTP load:")
+        results.update(bench_http.run(db_path, args.concurrency, args.duration, args.seed,
+                                      args.geocoder_latency_ms))
+    
+    if 'parse' in suites:
+        from benchmarks import bench_parse
+        print("Parse and extract (per page):")
+        results.update(bench_parse.run(args.scale))
+    
+    report = {'meta': harness.run_metadata(dataset), 'results': results}
+    path = harness.save_results(report, args.output)
+    print(f"\nResults saved to {path}")
+    
+    baseline = harness.load_results(args.baseline)
+    exit_code = 0
+    if baseline and not args.update_baseline:
+        if dataset and (baseline['meta'].get('dataset') or {}).get('fingerprint') != dataset['fingerprint']:
+            print("Warning: baseline was recorded against a different dataset")
+        rows = harness.compare(report, baseline, args.tolerance)
+        print(f"\nComparison with baseline ({baseline['meta'].get('commit') or 'unknown commit'}, "
+              f"tolerance {args.tolerance:.0%}):")
+        for row in rows:
+            if row['status'] == 'new':
+                print(f"  {'new':11s} {row['name']}")
+                continue
+            print(f"  {row['status']:11s} {row['name']:45s} p95 {row['baseline_p95_ms']:9.2f} -> "
+                  f"{row['p95_ms']:9.2f}ms ({row['p95_change']:+.0%})  throughput {row['ops_change']:+.0%}")
+        regressions = [row for row in rows if row['status'] == 'REGRESSION']
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) regressed")
+            exit_code = 1
+    
+    if args.update_baseline or baseline is None:
+        harness.save_results(report, args.baseline)
+        print(f"Baseline {'updated' if baseline else 'created'}: {args.baseline}")
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
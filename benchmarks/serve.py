@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""Run api_server against a benchmark database with local stand-ins (used by bench_http)"""
+
+import argparse
+import os
+import tempfile
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the Polpi API for benchmarking')
+    parser.add_argument('--db', required=True)
+    parser.add_argument('--port', type=int, required=True)
+    parser.add_argument('--geocoder-latency-ms', type=float, default=0.0)
+    args = parser.parse_args()
+    
+    # Configuration is read at import time, so set it before importing the app
+    os.environ['DB_PATH'] = args.db
+    os.environ.setdefault('TILE_CACHE_DIR', tempfile.mkdtemp(prefix='polpi-bench-tiles-'))
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ.setdefault('DB_SLOW_QUERY_MS', '0')
+    # All load comes from one address, so per-client limits would only measure the limiter
+    os.environ.setdefault('ADMISSION_PER_CLIENT', 'False')
+    
+    import uvicorn
+    import api_server
+    from benchmarks.standins import LocalGeocoder
+    
+    api_server.geocoder = LocalGeocoder(args.db, args.geocoder_latency_ms)
+    uvicorn.run(api_server.app, host='127.0.0.1', port=args.port, log_level='warning', access_log=False)
+
+
+if __name__ == '__main__':
+    main()
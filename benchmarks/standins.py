@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for external services used during HTTP benchmarks.
+
+The API geocodes through Nominatim, which is rate limited to one request
+per second and would dominate any load test. LocalGeocoder answers the
+same calls from colonia centroids in the benchmark database, with an
+optional fixed delay to model network latency.
+"""
+
+import math
+import sqlite3
+import time
+from typing import Optional
+
+from geocoding import GeocodingResult
+
+
+class LocalGeocoder:
+    """Drop-in replacement for CDMXGeocoder backed by the listings table"""
+    
+    def __init__(self, db_path: str, latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000
+        conn = sqlite3.connect(db_path)
+        self.centroids = [
+            (city, colonia, lat, lng) for city, colonia, lat, lng in conn.execute("""
+                SELECT city, colonia, AVG(lat), AVG(lng) FROM listings
+                WHERE lat IS NOT NULL AND colonia IS NOT NULL
+                GROUP BY city, colonia
+            """)
+        ]
+        conn.close()
+        self._by_name = {row[1].lower(): row for row in self.centroids}
+    
+    def _result(self, row) -> GeocodingResult:
+        city, colonia, lat, lng = row
+        return GeocodingResult(lat=lat, lng=lng, address=f"{colonia}, {city}", colonia=colonia,
+                               city=city, display_name=f"{colonia}, {city}, México")
+    
+    def geocode_address(self, address: str, city: str = "Ciudad de México") -> Optional[GeocodingResult]:
+        if self.latency:
+            time.sleep(self.latency)
+        needle = address.lower()
+        for name, row in self._by_name.items():
+            if name in needle:
+                return self._result(row)
+        return None
+    
+    def reverse_geocode(self, lat: float, lng: float) -> Optional[GeocodingResult]:
+        if self.latency:
+            time.sleep(self.latency)
+        if not self.centroids:
+            return None
+        nearest = min(self.centroids, key=lambda row: math.hypot(row[2] - lat, row[3] - lng))
+        return self._result(nearest)
+    
+    def search_colonia(self, colonia_name: str) -> Optional[GeocodingResult]:
+        return self.geocode_address(colonia_name)
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Pool of reusable headless browsers for the Selenium scrapers.
+
+A BrowserPool starts up to BROWSER_POOL_SIZE drivers from a scraper's
+factory, lazily and through replay.browser_driver, so pooled browsers record
+and replay like a single one. imap() fans pages out across the pool on
+worker threads; each call holds one browser from checkout to release.
+
+Pooled browsers are lean. Images, fonts, stylesheets, media and analytics
+scripts are blocked through the DevTools protocol (BROWSER_BLOCK_RESOURCES).
+load() waits for the DOM to be ready, and optionally for a selector, instead
+of sleeping a fixed time. Every page load still takes a slot from the shared
+per-domain rate limiter, so more browsers never put more load on a site than
+its politeness policy allows.
+
+A browser is quit and replaced when it stops responding (crashed tab or
+chromedriver), after BROWSER_MAX_PAGES page loads, or once its JS heap grows
+past BROWSER_MAX_HEAP_MB. A task whose browser crashed is retried once on a
+fresh one. Scraper callbacks tend to catch their own errors and return None
+or [], so an empty result from a browser that no longer responds counts as
+a crash too.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Iterable, Iterator, List
+
+from config import config
+from rate_limiter import shared_limiter
+from replay import browser_driver, replaying
+
+try:
+    from selenium.common.exceptions import TimeoutException
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+except ImportError:  # replay works without selenium installed
+    WebDriverWait = None
+
+# Requests pooled browsers never make (Network.setBlockedURLs patterns)
+BLOCKED_URLS = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.avif', '*.svg', '*.ico',
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.css', '*.mp4', '*.webm',
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*',
+    '*facebook.net*', '*hotjar.com*', '*clarity.ms*',
+]
+
+
+class BrowserCrashed(Exception):
+    """The browser stopped responding while a task was using it"""
+
+
+def lean_options(options):
+    """Add the pool's resource-saving settings to a scraper's ChromeOptions"""
+    options.add_argument('--blink-settings=imagesEnabled=false')
+    prefs = dict(options.experimental_options.get('prefs', {}))
+    prefs['profile.managed_default_content_settings.images'] = 2
+    options.add_experimental_option('prefs', prefs)
+    # Return from get() at DOMContentLoaded; load() waits for what the scraper needs
+    if options.page_load_strategy == 'normal':
+        options.page_load_strategy = 'eager'
+    return options
+
+
+def wait_until_ready(driver, selector: str = None, timeout: float = None) -> bool:
+    """
+    Wait until the document has been parsed and, if given, an element matches
+    the CSS `selector`. Returns False on timeout; never waits in replay mode.
+    """
+    if replaying() or WebDriverWait is None:
+        return True
+    wait = WebDriverWait(driver, timeout or config.BROWSER_READY_TIMEOUT, poll_frequency=0.1)
+    try:
+        wait.until(lambda d: d.execute_script('return document.readyState') != 'loading')
+        if selector:
+            wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
+        return True
+    except TimeoutException:
+        return False
+
+
+def wait_for_script(driver, script: str, timeout: float = None):
+    """First truthy result of execute_script(script) within timeout, or None"""
+    if replaying() or WebDriverWait is None:
+        return driver.execute_script(script)
+    try:
+        return WebDriverWait(driver, timeout or config.BROWSER_READY_TIMEOUT, poll_frequency=0.1).until(
+            lambda d: d.execute_script(script))
+    except TimeoutException:
+        return None
+
+
+class _Browser:
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages = 0
+
+
+class BrowserPool:
+    """Up to `size` browsers from `factory`, each used by one thread at a time"""
+    
+    def __init__(self, factory: Callable, size: int = None, source: str = None,
+                 max_pages: int = None, max_heap_mb: float = None, block_resources: bool = None):
+        self.factory = factory
+        self.size = max(1, size or config.BROWSER_POOL_SIZE)
+        self.source = source
+        self.max_pages = config.BROWSER_MAX_PAGES if max_pages is None else max_pages
+        self.max_heap_mb = config.BROWSER_MAX_HEAP_MB if max_heap_mb is None else max_heap_mb
+        self.block_resources = config.BROWSER_BLOCK_RESOURCES if block_resources is None else block_resources
+        self.stats = {'started': 0, 'pages': 0, 'recycled': 0, 'crashed': 0}
+        self._idle = queue.LifoQueue()
+        self._browsers = {}  # id(driver) -> _Browser, for page counts
+        self._running = 0
+        self._lock = threading.Lock()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def _start(self) -> _Browser:
+        driver = browser_driver(self.factory, self.source)
+        # ReplayDriver has no DevTools; RecordingDriver passes the calls through
+        if hasattr(driver, 'execute_cdp_cmd'):
+            try:
+                driver.execute_cdp_cmd('Performance.enable', {})
+                if self.block_resources:
+                    driver.execute_cdp_cmd('Network.enable', {})
+                    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_URLS})
+            except Exception as e:
+                print(f"  ⚠ Could not configure browser: {e}")
+        browser = _Browser(driver)
+        with self._lock:
+            self._browsers[id(driver)] = browser
+            self.stats['started'] += 1
+        return browser
+    
+    def _checkout(self) -> _Browser:
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self._lock:
+                start = self._running < self.size
+                if start:
+                    self._running += 1
+            if start:
+                break
+            try:
+                return self._idle.get(timeout=1)
+            except queue.Empty:
+                continue  # a retired browser may have freed a slot
+        try:
+            return self._start()
+        except Exception:
+            with self._lock:
+                self._running -= 1
+            raise
+    
+    def _retire(self, browser: _Browser, reason: str):
+        try:
+            browser.driver.quit()
+        except Exception:
+            pass  # already gone
+        with self._lock:
+            self._browsers.pop(id(browser.driver), None)
+            self._running -= 1
+            self.stats[reason] += 1
+    
+    @staticmethod
+    def _alive(driver) -> bool:
+        try:
+            driver.current_url
+            return True
+        except Exception:
+            return False
+    
+    @staticmethod
+    def _heap_mb(driver) -> float:
+        if not hasattr(driver, 'execute_cdp_cmd'):
+            return 0.0
+        try:
+            metrics = driver.execute_cdp_cmd('Performance.getMetrics', {})['metrics']
+        except Exception:
+            return 0.0
+        return next((m['value'] for m in metrics if m['name'] == 'JSHeapUsedSize'), 0) / 1e6
+    
+    def _worn_out(self, browser: _Browser) -> bool:
+        if self.max_pages and browser.pages >= self.max_pages:
+            return True
+        return bool(self.max_heap_mb) and self._heap_mb(browser.driver) > self.max_heap_mb
+    
+    @contextmanager
+    def browser(self):
+        """
+        Check out a browser for the calling thread. It goes back to the pool
+        afterwards, or is replaced if it crashed or is due for recycling.
+        """
+        browser = self._checkout()
+        try:
+            yield browser.driver
+        except Exception as e:
+            if not self._alive(browser.driver):
+                self._retire(browser, 'crashed')
+                raise BrowserCrashed(str(e)) from e
+            self._idle.put(browser)
+            raise
+        if not self._alive(browser.driver):
+            self._retire(browser, 'crashed')
+        elif self._worn_out(browser):
+            self._retire(browser, 'recycled')
+        else:
+            self._idle.put(browser)
+    
+    def load(self, driver, url: str, ready: str = None, timeout: float = None) -> bool:
+        """
+        driver.get(url) once the domain's rate limiter allows it, then wait
+        until the page is ready (see wait_until_ready). Returns False if the
+        wait timed out.
+        """
+        limiter = shared_limiter()
+        limiter.wait(url)
+        start = time.monotonic()
+        try:
+            driver.get(url)
+        except Exception:
+            limiter.record(url, None, time.monotonic() - start)
+            raise
+        with self._lock:
+            self.stats['pages'] += 1
+            browser = self._browsers.get(id(driver))
+            if browser is not None:
+                browser.pages += 1
+        ready_in_time = wait_until_ready(driver, ready, timeout)
+        limiter.record(url, 200, time.monotonic() - start)
+        return ready_in_time
+    
+    def _run(self, func: Callable, item):
+        for attempt in range(2):
+            try:
+                with self.browser() as driver:
+                    result = func(driver, item)
+                    if not result and not self._alive(driver):
+                        # The callback swallowed the browser's failure
+                        raise BrowserCrashed('browser stopped responding during the task')
+                    return result
+            except BrowserCrashed as e:
+                print(f"  ⚠ Browser crashed on {item} ({e}); {'retrying' if attempt == 0 else 'giving up'}")
+            except Exception as e:
+                print(f"  ✗ Browser task failed for {item}: {e}")
+                return None
+        return None
+    
+    def imap(self, func: Callable, items: Iterable) -> Iterator:
+        """
+        func(driver, item) for every item, spread across the pool's browsers.
+        Results are yielded in input order as they complete; an item whose
+        call raised yields None.
+        """
+        items = list(items)
+        if self.size == 1 or len(items) <= 1:
+            for item in items:
+                yield self._run(func, item)
+            return
+        with ThreadPoolExecutor(max_workers=min(self.size, len(items))) as executor:
+            yield from executor.map(lambda item: self._run(func, item), items)
+    
+    def map(self, func: Callable, items: Iterable) -> List:
+        return list(self.imap(func, items))
+    
+    def close(self):
+        """Quit every idle browser"""
+        while True:
+            try:
+                browser = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                browser.driver.quit()
+            except Exception:
+                pass
+            with self._lock:
+                self._browsers.pop(id(browser.driver), None)
+                self._running -= 1
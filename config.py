@@ -2,7 +2,7 @@
 """Configuration for Polpi MX API"""
 
 import os
-from typing import List
+from typing import Dict, List
 
 class Config:
     # Server settings
@@ -12,6 +12,7 @@ class Config:
     
     # Database settings
     DB_PATH: str = os.getenv("DB_PATH", "data/polpi.db")
+    DB_SLOW_QUERY_MS: float = float(os.getenv("DB_SLOW_QUERY_MS", 200))  # 0 disables the slow-query log
     
     # API settings
     API_V1_PREFIX: str = "/api/v1"
@@ -26,6 +27,162 @@ class Config:
     DEFAULT_PAGE_SIZE: int = 20
     MAX_PAGE_SIZE: int = 100
     
+    # Bulk export
+    EXPORT_BATCH_SIZE: int = int(os.getenv("EXPORT_BATCH_SIZE", 1000))
+    
+    # Batch analysis
+    MAX_BATCH_IDS: int = int(os.getenv("MAX_BATCH_IDS", 300))
+    
+    # Map clustering
+    MAP_CLUSTER_MAX_ZOOM: int = int(os.getenv("MAP_CLUSTER_MAX_ZOOM", 15))
+    MAP_INDEX_REFRESH_SECONDS: float = float(os.getenv("MAP_INDEX_REFRESH_SECONDS", 30))
+    MAP_MAX_PINS: int = int(os.getenv("MAP_MAX_PINS", 500))
+    # Filtered clusters are grouped in SQL; a viewport spanning more cells falls back to coarser ones
+    MAP_CLUSTER_MAX_CELLS: int = int(os.getenv("MAP_CLUSTER_MAX_CELLS", 1024))
+    
+    # Hex heatmap: hexagon circumradius in meters per resolution (coarse to fine)
+    HEX_RESOLUTIONS_M: List[float] = [
+        float(v) for v in os.getenv("HEX_RESOLUTIONS_M", "8000,4000,2000,1000,500,250").split(',')
+    ]
+    
+    # Facet counts: upper bounds of the price ranges shown in the filter sidebar (MXN)
+    FACET_PRICE_BUCKETS: List[float] = [
+        float(v) for v in os.getenv("FACET_PRICE_BUCKETS", "1000000,2000000,3000000,5000000,10000000,20000000").split(',')
+    ]
+    
+    # In-memory NumPy read model for listing pages (needs numpy; falls back to SQL without it)
+    READ_MODEL_ENABLED: bool = os.getenv("READ_MODEL_ENABLED", "True").lower() == "true"
+    
+    # Scraper fetch engine: connections overall and per host, retries and request timeout
+    SCRAPER_MAX_CONNECTIONS: int = int(os.getenv("SCRAPER_MAX_CONNECTIONS", 20))
+    SCRAPER_PER_HOST_CONCURRENCY: int = int(os.getenv("SCRAPER_PER_HOST_CONCURRENCY", 2))
+    SCRAPER_MAX_RETRIES: int = int(os.getenv("SCRAPER_MAX_RETRIES", 3))
+    SCRAPER_TIMEOUT: float = float(os.getenv("SCRAPER_TIMEOUT", 30))
+    
+    # Scraper politeness: per-domain request rate (requests/second) adapted between
+    # the min and max; healthy responses add INCREASE, throttling multiplies by DECREASE.
+    # A response LATENCY_FACTOR times slower than the domain's average counts as throttling
+    SCRAPER_RATE: float = float(os.getenv("SCRAPER_RATE", 0.5))
+    SCRAPER_MIN_RATE: float = float(os.getenv("SCRAPER_MIN_RATE", 0.05))
+    SCRAPER_MAX_RATE: float = float(os.getenv("SCRAPER_MAX_RATE", 4.0))
+    SCRAPER_BURST: float = float(os.getenv("SCRAPER_BURST", 2))
+    SCRAPER_RATE_INCREASE: float = float(os.getenv("SCRAPER_RATE_INCREASE", 0.05))
+    SCRAPER_RATE_DECREASE: float = float(os.getenv("SCRAPER_RATE_DECREASE", 0.5))
+    SCRAPER_LATENCY_FACTOR: float = float(os.getenv("SCRAPER_LATENCY_FACTOR", 3.0))
+    
+    # Conditional-GET cache for crawled pages. Pages younger than the max age (seconds)
+    # are reused without a request; older ones are revalidated with ETag/Last-Modified.
+    # Per-source overrides: "inmuebles24=21600,century21=86400"
+    HTTP_CACHE_ENABLED: bool = os.getenv("HTTP_CACHE_ENABLED", "True").lower() == "true"
+    HTTP_CACHE_PATH: str = os.getenv("HTTP_CACHE_PATH", "data/http_cache.db")
+    HTTP_CACHE_MAX_AGE: float = float(os.getenv("HTTP_CACHE_MAX_AGE", 0))
+    HTTP_CACHE_MAX_AGE_BY_SOURCE: Dict[str, float] = {
+        source.strip(): float(seconds)
+        for source, seconds in (item.split('=') for item in os.getenv("HTTP_CACHE_MAX_AGE_BY_SOURCE", "").split(',') if item)
+    }
+    
+    # Scraper transport: "live", "record" (also archive every response) or "replay"
+    # (serve recorded responses, never touch the network)
+    SCRAPER_MODE: str = os.getenv("SCRAPER_MODE", "live").lower()
+    SCRAPER_ARCHIVE_DIR: str = os.getenv("SCRAPER_ARCHIVE_DIR", "data/archive")
+    
+    # HTML parser backend for scraped pages: "auto" (fastest installed), "selectolax",
+    # "lxml" or "html.parser"
+    HTML_PARSER: str = os.getenv("HTML_PARSER", "auto").lower()
+    
+    # Streaming scrape pipeline (run_scrapers.py): queue size between stages (backpressure),
+    # geocoding threads (keep 1 for the public Nominatim), and DB write batches flushed
+    # when full or after FLUSH_SECONDS
+    PIPELINE_QUEUE_SIZE: int = int(os.getenv("PIPELINE_QUEUE_SIZE", 200))
+    PIPELINE_GEOCODE_WORKERS: int = int(os.getenv("PIPELINE_GEOCODE_WORKERS", 1))
+    PIPELINE_BATCH_SIZE: int = int(os.getenv("PIPELINE_BATCH_SIZE", 50))
+    PIPELINE_FLUSH_SECONDS: float = float(os.getenv("PIPELINE_FLUSH_SECONDS", 2.0))
+    
+    # Crawl scheduler (crawl_scheduler.py): state/queue file, result pages per run and an
+    # optional time limit (seconds, 0 = none), pages in flight overall and per source
+    # (per-source overrides: "lamudi=1,mercadolibre=2"), how soon a page may be crawled
+    # again (seconds), the change rate (new or changed listings/hour) assumed for pages
+    # with no history and the floor that keeps quiet pages from never being revisited,
+    # and extra modules that register sources
+    CRAWL_STATE_PATH: str = os.getenv("CRAWL_STATE_PATH", "data/crawl_state.db")
+    CRAWL_PAGE_BUDGET: int = int(os.getenv("CRAWL_PAGE_BUDGET", 100))
+    CRAWL_TIME_BUDGET: float = float(os.getenv("CRAWL_TIME_BUDGET", 0))
+    CRAWL_CONCURRENCY: int = int(os.getenv("CRAWL_CONCURRENCY", 8))
+    CRAWL_SOURCE_CONCURRENCY: int = int(os.getenv("CRAWL_SOURCE_CONCURRENCY", 2))
+    CRAWL_CONCURRENCY_BY_SOURCE: Dict[str, int] = {
+        source.strip(): int(pages)
+        for source, pages in (item.split('=') for item in os.getenv("CRAWL_CONCURRENCY_BY_SOURCE", "").split(',') if item)
+    }
+    CRAWL_MIN_INTERVAL: float = float(os.getenv("CRAWL_MIN_INTERVAL", 3600))
+    CRAWL_DEFAULT_RATE: float = float(os.getenv("CRAWL_DEFAULT_RATE", 1.0))
+    CRAWL_MIN_RATE: float = float(os.getenv("CRAWL_MIN_RATE", 0.05))
+    CRAWL_PLUGINS: List[str] = [name.strip() for name in os.getenv("CRAWL_PLUGINS", "").split(',') if name.strip()]
+    
+    # Incremental crawls: store only new or re-priced listings, and page a newest-first
+    # source's category only until STOP_AFTER_KNOWN already-stored listings in a row;
+    # the Selenium scrapers also skip detail pages of listings already stored
+    CRAWL_INCREMENTAL: bool = os.getenv("CRAWL_INCREMENTAL", "False").lower() == "true"
+    CRAWL_STOP_AFTER_KNOWN: int = int(os.getenv("CRAWL_STOP_AFTER_KNOWN", 30))
+    
+    # Selenium browser pool: browsers per scraper, page loads and JS heap size (MB) after
+    # which a browser is replaced, readiness wait (seconds), and whether images, fonts,
+    # stylesheets and analytics requests are blocked
+    BROWSER_POOL_SIZE: int = int(os.getenv("BROWSER_POOL_SIZE", min(4, os.cpu_count() or 1)))
+    BROWSER_MAX_PAGES: int = int(os.getenv("BROWSER_MAX_PAGES", 100))
+    BROWSER_MAX_HEAP_MB: float = float(os.getenv("BROWSER_MAX_HEAP_MB", 512))
+    BROWSER_READY_TIMEOUT: float = float(os.getenv("BROWSER_READY_TIMEOUT", 15))
+    BROWSER_BLOCK_RESOURCES: bool = os.getenv("BROWSER_BLOCK_RESOURCES", "True").lower() == "true"
+    
+    # Vector tiles
+    TILE_CACHE_DIR: str = os.getenv("TILE_CACHE_DIR", "data/tiles")
+    MVT_MAX_ZOOM: int = int(os.getenv("MVT_MAX_ZOOM", 16))
+    MVT_DETAIL_ZOOM: int = int(os.getenv("MVT_DETAIL_ZOOM", 14))
+    # Disk budget for cached tiles (every filter combination is cached) and how often it is enforced
+    TILE_CACHE_MAX_MB: float = float(os.getenv("TILE_CACHE_MAX_MB", 512))
+    TILE_CACHE_SWEEP_SECONDS: float = float(os.getenv("TILE_CACHE_SWEEP_SECONDS", 300))
+    
+    # Metrics
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "True").lower() == "true"
+    
+    # Admission control: per endpoint class concurrency, queueing budget in seconds
+    # and per-client rate limit (requests/second with a burst allowance)
+    ADMISSION_ENABLED: bool = os.getenv("ADMISSION_ENABLED", "True").lower() == "true"
+    ADMISSION_PER_CLIENT: bool = os.getenv("ADMISSION_PER_CLIENT", "True").lower() == "true"
+    ADMISSION_TRUST_FORWARDED: bool = os.getenv("ADMISSION_TRUST_FORWARDED", "False").lower() == "true"
+    ADMISSION_POOLS: Dict[str, Dict[str, float]] = {
+        'read': {
+            'concurrency': int(os.getenv("ADMISSION_READ_CONCURRENCY", 64)), 'max_wait': 0.5,
+            'rate': float(os.getenv("ADMISSION_READ_RATE", 30)), 'burst': 120
+        },
+        'analysis': {
+            'concurrency': int(os.getenv("ADMISSION_ANALYSIS_CONCURRENCY", 4)), 'max_wait': 3.0,
+            'rate': float(os.getenv("ADMISSION_ANALYSIS_RATE", 2)), 'burst': 10
+        },
+        'fetch': {
+            'concurrency': int(os.getenv("ADMISSION_FETCH_CONCURRENCY", 8)), 'max_wait': 5.0,
+            'rate': float(os.getenv("ADMISSION_FETCH_RATE", 0.2)), 'burst': 5
+        },
+        # Streaming exports keep a slot until the last byte is sent
+        'export': {
+            'concurrency': int(os.getenv("ADMISSION_EXPORT_CONCURRENCY", 4)), 'max_wait': 1.0,
+            'rate': float(os.getenv("ADMISSION_EXPORT_RATE", 0.1)), 'burst': 3
+        },
+    }
+    
+    # Services built at startup instead of on first request ('*' for all)
+    WARMUP_SERVICES: List[str] = [s for s in os.getenv("WARMUP_SERVICES", "db").split(',') if s]
+    
+    # Aggregate cache and background warm-up (/ready stays 503 until warm-up finishes)
+    AGGREGATE_REFRESH_SECONDS: float = float(os.getenv("AGGREGATE_REFRESH_SECONDS", 30))
+    WARMUP_CACHES: bool = os.getenv("WARMUP_CACHES", "True").lower() == "true"
+    WARMUP_TOP_CITIES: int = int(os.getenv("WARMUP_TOP_CITIES", 5))
+    WARMUP_TOP_NEIGHBORHOODS: int = int(os.getenv("WARMUP_TOP_NEIGHBORHOODS", 50))
+    
+    # Admin / profiling (admin endpoints and profiling are off unless a token is set)
+    ADMIN_TOKEN: str = os.getenv("POLPI_ADMIN_TOKEN", "")
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", "data/profiles")
+    PROFILE_MAX_SECONDS: float = float(os.getenv("PROFILE_MAX_SECONDS", 120))
+    
     # Static files
     STATIC_DIR: str = "web"
     
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Freshness-aware crawl scheduler over the registered sources (sources.py).
+
+The unit of work is one search result page: (source, category, page). For
+every page the scheduler remembers, in a small SQLite file
+(CRAWL_STATE_PATH), when it was last crawled and how fast its inventory
+changes: an exponentially weighted average of new or changed listings
+(listings not in the database yet, or with a different price) per hour
+between crawls. A page's priority is the number of changes expected to be
+waiting on it:
+    
+    priority = max(change rate, CRAWL_MIN_RATE) * hours since its last crawl
+
+Pages never crawled come first, shallow pages before deep ones. A category
+is not paged past a page that came back empty. Pages
+crawled within CRAWL_MIN_INTERVAL are not due. plan() takes the
+CRAWL_PAGE_BUDGET highest-priority due pages. Crawl time therefore goes to
+the pages where inventory actually changes, and quiet pages are still
+revisited now and then through the rate floor.
+
+The planned queue is persisted: a page leaves it only once it has been
+crawled, so a run that is interrupted or hits its time budget
+(CRAWL_TIME_BUDGET) resumes with the leftover pages first. stream() crawls
+the queue in priority order, holding at most CRAWL_CONCURRENCY pages in
+flight overall and each source's budget (CRAWL_SOURCE_CONCURRENCY,
+CRAWL_CONCURRENCY_BY_SOURCE) per source, and yields the listings found.
+
+Each yielded listing carries the page it came from under `_crawl_page`.
+The consumer pops it and calls stored() once the listing is written; when
+every listing of a page is stored, the page is marked processed in the
+page cache, so a page whose listings never made it to the database is not
+reported unchanged next time.
+
+Incremental runs (CRAWL_INCREMENTAL, run_scrapers.py --incremental) make
+refresh cost follow new inventory rather than total inventory. Listings are
+checked against a seen-set of what the database already holds
+(seen_set.py), and only the new or re-priced ones are passed on to be
+geocoded and stored. Sources that can list results newest first
+(Source.newest_first) are crawled in that order: only the first page of
+each category is planned, and a category is paged deeper only while it
+keeps showing new or re-priced listings. Once CRAWL_STOP_AFTER_KNOWN known
+listings appear in a row, the rest of the category is what we already have,
+and paging stops. Other sources are paged to their planned depth.
+"""
+
+import asyncio
+import math
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional
+
+from config import config
+from database import PolpiDB
+from seen_set import KNOWN, SeenSet
+from sources import Source
+from fetch_engine import shared_engine  # importable once sources.py has put scrapers/ on the path
+
+# Priority of a page never crawled, divided by its page number
+UNSEEN_PRIORITY = 1e9
+
+# Weight of the latest crawl in a page's change rate
+RATE_ALPHA = 0.3
+
+
+@dataclass
+class CrawlUnit:
+    source: str
+    category: str
+    page: int
+    priority: float
+    queued: bool = False
+    
+    @property
+    def key(self):
+        return (self.source, self.category, self.page)
+
+
+class CrawlScheduler:
+    """Plans and runs crawls of (source, category, page) units by expected changes"""
+    
+    def __init__(self, sources: List[Source], db: PolpiDB = None, path: str = None, incremental: bool = None):
+        self.sources = {source.name: source for source in sources}
+        self.db = db or PolpiDB()
+        self.path = path or config.CRAWL_STATE_PATH
+        self.incremental = config.CRAWL_INCREMENTAL if incremental is None else incremental
+        self.seen: Optional[SeenSet] = None
+        self.stats = {name: {'pages': 0, 'unchanged': 0, 'listings': 0, 'changed': 0, 'errors': 0}
+                      for name in self.sources}
+        # (source, category) -> known listings in a row at the end of the pages crawled so far
+        self._known_run: Dict[tuple, int] = {}
+        # unit key -> [response, listings not stored yet]
+        self._unstored: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS crawl_pages (
+                source TEXT NOT NULL,
+                category TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                crawls INTEGER NOT NULL DEFAULT 0,
+                last_crawled REAL,
+                last_changed REAL,
+                listings INTEGER NOT NULL DEFAULT 0,
+                change_rate REAL,
+                PRIMARY KEY (source, category, page)
+            );
+            CREATE TABLE IF NOT EXISTS crawl_queue (
+                source TEXT NOT NULL,
+                category TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                priority REAL NOT NULL,
+                queued_at REAL NOT NULL,
+                PRIMARY KEY (source, category, page)
+            );
+        ''')
+        self._conn.commit()
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+    
+    @staticmethod
+    def priority(row: Optional[sqlite3.Row], page: int, now: float) -> float:
+        """Expected new or changed listings waiting on a page"""
+        if row is None or row['last_crawled'] is None:
+            return UNSEEN_PRIORITY / page
+        rate = config.CRAWL_DEFAULT_RATE if row['change_rate'] is None else row['change_rate']
+        hours = max(0.0, now - row['last_crawled']) / 3600
+        return max(rate, config.CRAWL_MIN_RATE) * hours
+    
+    def plan(self, budget: int = None, max_depth: int = None, persist: bool = True) -> List[CrawlUnit]:
+        """
+        The `budget` pages most worth crawling now, after any pages left over
+        from an unfinished run, in crawl order; queued unless `persist` is
+        False. `max_depth` caps how deep any category is paged; incremental
+        runs plan only first pages of newest-first sources and page deeper
+        while they find new listings.
+        """
+        budget = config.CRAWL_PAGE_BUDGET if budget is None else budget
+        now = time.time()
+        with self._lock:
+            pages = {(row['source'], row['category'], row['page']): row
+                     for row in self._conn.execute('SELECT * FROM crawl_pages')}
+            queued = {(row['source'], row['category'], row['page'])
+                      for row in self._conn.execute('SELECT source, category, page FROM crawl_queue')}
+        
+        candidates = []
+        for source in self.sources.values():
+            for category, max_pages in source.categories.items():
+                depth = 1 if self._newest_first(source.name) else min(max_pages, max_depth or max_pages)
+                for page in range(1, depth + 1):
+                    key = (source.name, category, page)
+                    row = pages.get(key)
+                    due = row is None or row['last_crawled'] is None or \
+                        now - row['last_crawled'] >= config.CRAWL_MIN_INTERVAL
+                    if key in queued or due:
+                        candidates.append(CrawlUnit(source.name, category, page,
+                                                    self.priority(row, page, now), key in queued))
+                    # A page that came back empty is the end of the category's results
+                    if row is not None and row['last_crawled'] is not None and row['listings'] == 0:
+                        break
+        
+        candidates.sort(key=lambda unit: (not unit.queued, -unit.priority))
+        units = candidates[:budget] if budget else candidates
+        if persist:
+            self._enqueue(units)
+        return units
+    
+    def _enqueue(self, units: List[CrawlUnit]):
+        with self._lock:
+            self._conn.executemany('''
+                INSERT INTO crawl_queue (source, category, page, priority, queued_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (source, category, page) DO UPDATE SET priority = excluded.priority
+            ''', [(unit.source, unit.category, unit.page, unit.priority, time.time()) for unit in units])
+            self._conn.commit()
+    
+    def _newest_first(self, source: str) -> bool:
+        """Crawl this source newest first, stopping at known inventory"""
+        return self.incremental and bool(self.sources[source].newest_first)
+    
+    def _changed(self, unit: CrawlUnit, listings: List[Dict]) -> List[Dict]:
+        """
+        The listings not stored yet or re-priced. Incremental runs check the
+        seen-set and track how many known listings the category ended on;
+        full runs look the page's ids up in the database.
+        """
+        if not self.incremental:
+            ids = [listing.get('id') or self.db.generate_listing_id(
+                listing['source'], listing.get('url', ''), listing.get('title', '')) for listing in listings]
+            stored = self.db.get_listings_by_ids(ids)
+            return [listing for listing_id, listing in zip(ids, listings)
+                    if listing_id not in stored or stored[listing_id].get('price_mxn') != listing.get('price_mxn')]
+        changed = []
+        run = self._known_run.get((unit.source, unit.category), 0)
+        for listing in listings:
+            if self.seen.classify(listing) == KNOWN:
+                run += 1
+            else:
+                changed.append(listing)
+                run = 0
+            self.seen.add(listing)
+        self._known_run[(unit.source, unit.category)] = run
+        return changed
+    
+    def _next_page(self, unit: CrawlUnit, listings: Optional[List[Dict]]) -> Optional[CrawlUnit]:
+        """Incremental runs: the category's next page, unless it has reached known inventory"""
+        if not listings or unit.page >= self.sources[unit.source].categories.get(unit.category, 0):
+            return None
+        run = self._known_run.get((unit.source, unit.category), 0)
+        if run >= config.CRAWL_STOP_AFTER_KNOWN:
+            print(f"  {unit.source}/{unit.category}: {run} known listings in a row, stopping at page {unit.page}")
+            return None
+        return CrawlUnit(unit.source, unit.category, unit.page + 1, unit.priority)
+    
+    def _record(self, unit: CrawlUnit, listings: Optional[List[Dict]], changed: int):
+        """Update a crawled page's history and take it off the queue"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM crawl_pages WHERE source = ? AND category = ? AND page = ?',
+                                     unit.key).fetchone()
+            rate = None if row is None else row['change_rate']
+            if row is not None and row['last_crawled'] is not None:
+                hours = max(now - row['last_crawled'], 60) / 3600
+                sample = changed / hours
+                rate = sample if rate is None else RATE_ALPHA * sample + (1 - RATE_ALPHA) * rate
+            count = (row['listings'] if row is not None else 0) if listings is None else len(listings)
+            last_changed = now if changed else (row['last_changed'] if row is not None else None)
+            self._conn.execute('''
+                INSERT OR REPLACE INTO crawl_pages
+                    (source, category, page, crawls, last_crawled, last_changed, listings, change_rate)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (*unit.key, (row['crawls'] if row is not None else 0) + 1, now, last_changed, count, rate))
+            self._conn.execute('DELETE FROM crawl_queue WHERE source = ? AND category = ? AND page = ?', unit.key)
+            self._conn.commit()
+    
+    def _drop_deeper(self, unit: CrawlUnit):
+        """A page came back empty: the category has no results past it"""
+        with self._lock:
+            self._conn.execute('DELETE FROM crawl_queue WHERE source = ? AND category = ? AND page > ?', unit.key)
+            self._conn.commit()
+    
+    async def _crawl(self, unit: CrawlUnit):
+        source = self.sources[unit.source]
+        try:
+            listings, response = await source.scrape_page(unit.category, unit.page,
+                                                          self._newest_first(unit.source))
+        except Exception as e:
+            print(f"  ✗ {unit.source}/{unit.category} page {unit.page}: {e}")
+            return unit, None, None, e
+        return unit, listings, response, None
+    
+    def _track(self, unit: CrawlUnit, response, listings: List[Dict]):
+        """Tag a page's outgoing listings; the page is processed once they are all stored"""
+        if not listings:
+            shared_engine().mark_processed(response)
+            return
+        with self._lock:
+            self._unstored[unit.key] = [response, len(listings)]
+        for listing in listings:
+            listing['_crawl_page'] = unit.key
+    
+    def stored(self, page, ok: bool = True):
+        """
+        A listing from `page` (its popped `_crawl_page`) was written, or
+        deliberately dropped; ok=False when writing it failed, which leaves
+        the page to be parsed again next crawl.
+        """
+        if page is None:
+            return
+        with self._lock:
+            entry = self._unstored.get(page)
+            if entry is None:
+                return
+            if not ok:
+                del self._unstored[page]
+                return
+            entry[1] -= 1
+            if entry[1] > 0:
+                return
+            del self._unstored[page]
+        shared_engine().mark_processed(entry[0])
+    
+    async def stream(self, units: List[CrawlUnit] = None, time_budget: float = None,
+                     budget: int = None) -> AsyncIterator[Dict]:
+        """
+        Crawl the queued units in order within the concurrency budgets, yielding
+        listings as pages complete. No new page starts after `time_budget`
+        seconds; the rest stay queued for the next run. Incremental runs add
+        each newest-first category's next page while it still shows new or
+        changed listings, up to `budget` pages in all.
+        """
+        pending = list(self.queue() if units is None else units)
+        if self.incremental and self.seen is None:
+            self.seen = SeenSet.load(self.db, self.sources)
+        budget = config.CRAWL_PAGE_BUDGET if budget is None else budget
+        pages_left = budget - len(pending) if budget else math.inf
+        time_budget = config.CRAWL_TIME_BUDGET if time_budget is None else time_budget
+        deadline = time.monotonic() + time_budget if time_budget else math.inf
+        active = {name: 0 for name in self.sources}
+        exhausted = set()
+        running = set()
+        
+        while pending or running:
+            # Start the highest-priority pages that fit the global and per-source budgets
+            for unit in list(pending):
+                if len(running) >= config.CRAWL_CONCURRENCY or time.monotonic() >= deadline:
+                    break
+                if (unit.source, unit.category) in exhausted:
+                    pending.remove(unit)
+                    continue
+                if active[unit.source] >= self.sources[unit.source].max_concurrency:
+                    continue
+                pending.remove(unit)
+                active[unit.source] += 1
+                running.add(asyncio.ensure_future(self._crawl(unit)))
+            if time.monotonic() >= deadline:
+                pending = []
+            if not running:
+                break
+            
+            done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                unit, listings, response, error = task.result()
+                active[unit.source] -= 1
+                stats = self.stats[unit.source]
+                if error is not None:
+                    # Stays queued, so it is retried first next run
+                    stats['errors'] += 1
+                    continue
+                stats['pages'] += 1
+                if listings is None:
+                    stats['unchanged'] += 1
+                    self._record(unit, None, 0)
+                    continue
+                changed = self._changed(unit, listings)
+                stats['listings'] += len(listings)
+                stats['changed'] += len(changed)
+                self._record(unit, listings, len(changed))
+                print(f"  {unit.source}/{unit.category} page {unit.page}: "
+                      f"{len(listings)} listings, {len(changed)} new or changed")
+                if not listings:
+                    exhausted.add((unit.source, unit.category))
+                    self._drop_deeper(unit)
+                next_unit = (self._next_page(unit, listings)
+                             if self._newest_first(unit.source) and pages_left > 0 else None)
+                if next_unit is not None and all(other.key != next_unit.key for other in pending):
+                    # Ahead of other pages: it continues a category that is still turning up new listings
+                    pages_left -= 1
+                    self._enqueue([next_unit])
+                    pending.insert(0, next_unit)
+                # Incremental runs leave listings stored as they are alone: no re-geocoding or rewriting
+                outgoing = changed if self.incremental else listings
+                self._track(unit, response, outgoing)
+                for listing in outgoing:
+                    yield listing
+    
+    def queue(self) -> List[CrawlUnit]:
+        """Persisted queue for the registered sources, highest priority first"""
+        with self._lock:
+            rows = self._conn.execute('SELECT * FROM crawl_queue ORDER BY priority DESC').fetchall()
+        return [CrawlUnit(row['source'], row['category'], row['page'], row['priority'], True)
+                for row in rows if row['source'] in self.sources]
@@ -5,17 +5,33 @@ import sqlite3
 import json
 import random
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 import hashlib
+import itertools
 from config import config
+from query_audit import AuditedConnection
 
 class PolpiDB:
+    # Columns of the listings table, in schema order
+    LISTING_COLUMNS = (
+        'id', 'source', 'source_id', 'url', 'title', 'price_mxn', 'price_usd',
+        'property_type', 'bedrooms', 'bathrooms', 'size_m2', 'lot_size_m2',
+        'state', 'city', 'colonia', 'lat', 'lng', 'description', 'images',
+        'agent_name', 'agent_phone', 'listed_date', 'scraped_date', 'amenities',
+        'parking_spaces', 'data_quality_score', 'raw_data', 'is_active', 'views_count',
+        'deal_score', 'updated_at'
+    )
+    
+    # Days listing_deletions tombstones are kept for in-memory indexes to catch up
+    TOMBSTONE_DAYS = 7
+    
     def __init__(self, db_path=None):
         self.db_path = db_path or config.DB_PATH
         self.init_db()
     
-    def get_connection(self):
-        conn = sqlite3.connect(self.db_path)
+    def get_connection(self, check_same_thread: bool = True):
+        conn = sqlite3.connect(self.db_path, check_same_thread=check_same_thread,
+                               factory=AuditedConnection)
         conn.row_factory = sqlite3.Row
         return conn
     
@@ -56,10 +72,21 @@ class PolpiDB:
                 raw_data TEXT,
                 is_active BOOLEAN DEFAULT 1,
                 views_count INTEGER DEFAULT 0,
+                deal_score REAL,
+                updated_at TEXT,
                 UNIQUE(source, source_id)
             )
         ''')
         
+        # Columns added after the original schema
+        cursor.execute("PRAGMA table_info(listings)")
+        existing_columns = {row['name'] for row in cursor.fetchall()}
+        if 'deal_score' not in existing_columns:
+            cursor.execute("ALTER TABLE listings ADD COLUMN deal_score REAL")
+        if 'updated_at' not in existing_columns:
+            cursor.execute("ALTER TABLE listings ADD COLUMN updated_at TEXT")
+            cursor.execute("UPDATE listings SET updated_at = scraped_date")
+        
         # Full-text search virtual table
         cursor.execute('''
             CREATE VIRTUAL TABLE IF NOT EXISTS listings_fts USING fts5(
@@ -84,6 +111,74 @@ class PolpiDB:
             )
         ''')
         
+        # Where listings used to be on the map: filled by triggers whenever a
+        # geocoded listing moves, is replaced or is deleted, so tile caches can
+        # drop the tiles it left (the change feed only has the new position)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS listing_moves (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                listing_id TEXT NOT NULL,
+                lat REAL NOT NULL,
+                lng REAL NOT NULL
+            )
+        ''')
+        # Triggers catch every write path, including the standalone scripts
+        # that write listings directly. REPLACE does not fire delete triggers,
+        # so replaced rows are logged before the insert.
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS listing_replaced BEFORE INSERT ON listings
+            BEGIN
+                INSERT INTO listing_moves (listing_id, lat, lng)
+                SELECT id, lat, lng FROM listings
+                WHERE (id = NEW.id OR (source = NEW.source AND source_id = NEW.source_id))
+                    AND lat IS NOT NULL AND lng IS NOT NULL
+                    AND (lat IS NOT NEW.lat OR lng IS NOT NEW.lng);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS listing_moved AFTER UPDATE OF lat, lng ON listings
+            WHEN OLD.lat IS NOT NULL AND OLD.lng IS NOT NULL
+                AND (OLD.lat IS NOT NEW.lat OR OLD.lng IS NOT NEW.lng)
+            BEGIN
+                INSERT INTO listing_moves (listing_id, lat, lng) VALUES (OLD.id, OLD.lat, OLD.lng);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS listing_deleted AFTER DELETE ON listings
+            WHEN OLD.lat IS NOT NULL AND OLD.lng IS NOT NULL
+            BEGIN
+                INSERT INTO listing_moves (listing_id, lat, lng) VALUES (OLD.id, OLD.lat, OLD.lng);
+            END
+        ''')
+        
+        # Tombstones of listings that no longer exist under their id: deleted, or
+        # replaced by a row with the same (source, source_id) and a new id. The
+        # change feed only sees rows that are still there, so in-memory indexes
+        # read these to drop what was removed. Kept TOMBSTONE_DAYS days.
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS listing_deletions (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                listing_id TEXT NOT NULL,
+                deleted_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS listing_tombstone AFTER DELETE ON listings
+            BEGIN
+                INSERT INTO listing_deletions (listing_id) VALUES (OLD.id);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS listing_superseded BEFORE INSERT ON listings
+            BEGIN
+                INSERT INTO listing_deletions (listing_id)
+                SELECT id FROM listings
+                WHERE source = NEW.source AND source_id = NEW.source_id AND id != NEW.id;
+            END
+        ''')
+        cursor.execute("DELETE FROM listing_deletions WHERE deleted_at < datetime('now', ?)",
+                       (f'-{self.TOMBSTONE_DAYS} days',))
+        
         # Enhanced price history for trend tracking
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS price_history (
@@ -149,6 +244,8 @@ class PolpiDB:
             'CREATE INDEX IF NOT EXISTS idx_active ON listings(is_active)',
             'CREATE INDEX IF NOT EXISTS idx_data_quality ON listings(data_quality_score)',
             'CREATE INDEX IF NOT EXISTS idx_city_colonia_type ON listings(city, colonia, property_type)',
+            'CREATE INDEX IF NOT EXISTS idx_deal_score ON listings(deal_score)',
+            'CREATE INDEX IF NOT EXISTS idx_updated_at ON listings(updated_at)',
             
             # Price history indexes
             'CREATE INDEX IF NOT EXISTS idx_price_history_listing ON price_history(listing_id)',
@@ -257,6 +354,35 @@ class PolpiDB:
         conn = self.get_connection()
         cursor = conn.cursor()
         
+        try:
+            listing_id = self._write_listing(cursor, listing)
+            conn.commit()
+            return listing_id
+        except Exception as e:
+            print(f"Error inserting listing: {e}")
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    
+    def insert_listings(self, listings: List[Dict]) -> List[str]:
+        """Insert or update a batch of listings in one transaction"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            listing_ids = [self._write_listing(cursor, listing) for listing in listings]
+            conn.commit()
+            return listing_ids
+        except Exception as e:
+            print(f"Error inserting {len(listings)} listings: {e}")
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    
+    def _write_listing(self, cursor, listing: Dict) -> str:
+        """Listing row, FTS entry and price history; the caller commits"""
         # Generate ID if not provided
         if 'id' not in listing:
             listing['id'] = self.generate_listing_id(
@@ -276,60 +402,55 @@ class PolpiDB:
         
         # Add scraped date
         listing['scraped_date'] = datetime.now().isoformat()
+        listing['updated_at'] = listing['scraped_date']
         
         # Store raw data
         if 'raw_data' in listing and isinstance(listing['raw_data'], dict):
             listing['raw_data'] = json.dumps(listing['raw_data'])
         
-        columns = ', '.join(listing.keys())
-        placeholders = ', '.join(['?' for _ in listing])
+        # Keys without a column (e.g. MercadoLibre's listing_type) are kept only in raw_data
+        fields = [field for field in listing if field in self.LISTING_COLUMNS]
+        columns = ', '.join(fields)
+        placeholders = ', '.join(['?' for _ in fields])
         
-        try:
-            cursor.execute(f'''
-                INSERT OR REPLACE INTO listings ({columns})
-                VALUES ({placeholders})
-            ''', list(listing.values()))
-            
-            # Update FTS index
-            amenities_str = listing.get('amenities', '')
-            if isinstance(amenities_str, str) and amenities_str.startswith('['):
-                try:
-                    amenities_str = ' '.join(json.loads(amenities_str))
-                except:
-                    pass
-            
+        cursor.execute(f'''
+            INSERT OR REPLACE INTO listings ({columns})
+            VALUES ({placeholders})
+        ''', [listing[field] for field in fields])
+        
+        # Update FTS index
+        amenities_str = listing.get('amenities', '')
+        if isinstance(amenities_str, str) and amenities_str.startswith('['):
+            try:
+                amenities_str = ' '.join(json.loads(amenities_str))
+            except:
+                pass
+        
+        cursor.execute('''
+            INSERT OR REPLACE INTO listings_fts 
+            (id, title, description, city, colonia, amenities)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (
+            listing['id'],
+            listing.get('title', ''),
+            listing.get('description', ''),
+            listing.get('city', ''),
+            listing.get('colonia', ''),
+            amenities_str
+        ))
+        
+        # Record price history
+        if 'price_mxn' in listing and listing['price_mxn']:
             cursor.execute('''
-                INSERT OR REPLACE INTO listings_fts 
-                (id, title, description, city, colonia, amenities)
-                VALUES (?, ?, ?, ?, ?, ?)
+                INSERT INTO price_history (listing_id, price_mxn, recorded_date)
+                VALUES (?, ?, ?)
             ''', (
-                listing['id'],
-                listing.get('title', ''),
-                listing.get('description', ''),
-                listing.get('city', ''),
-                listing.get('colonia', ''),
-                amenities_str
+                listing['id'], 
+                listing['price_mxn'], 
+                datetime.now().isoformat()
             ))
-            
-            # Record price history
-            if 'price_mxn' in listing and listing['price_mxn']:
-                cursor.execute('''
-                    INSERT INTO price_history (listing_id, price_mxn, recorded_date)
-                    VALUES (?, ?, ?)
-                ''', (
-                    listing['id'], 
-                    listing['price_mxn'], 
-                    datetime.now().isoformat()
-                ))
-            
-            conn.commit()
-            return listing['id']
-        except Exception as e:
-            print(f"Error inserting listing: {e}")
-            conn.rollback()
-            raise
-        finally:
-            conn.close()
+        
+        return listing['id']
     
     def calculate_quality_score(self, listing: Dict) -> float:
         """Calculate data quality score (0-1)"""
@@ -357,54 +478,77 @@ class PolpiDB:
         
         return round(score / total_fields, 2)
     
-    def get_listings_paginated(self, filters: Dict = None, page: int = 1, 
-                             per_page: int = None, sort_by: str = 'newest') -> Dict:
-        """Get listings with pagination and sorting"""
-        per_page = per_page or config.DEFAULT_PAGE_SIZE
-        per_page = min(per_page, config.MAX_PAGE_SIZE)
-        offset = (page - 1) * per_page
-        
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Build query
-        base_query = "FROM listings WHERE is_active = 1"
-        count_query = f"SELECT COUNT(*) as total {base_query}"
+    def _build_filter_clause(self, filters: Dict = None) -> Tuple[str, List]:
+        """Build the AND-ed WHERE fragment and params for the standard listing filters"""
+        conditions = []
         params = []
         
         if filters:
-            filter_conditions = []
             if filters.get('city'):
-                filter_conditions.append("city = ?")
+                conditions.append("city = ?")
                 params.append(filters['city'])
             if filters.get('colonia'):
-                filter_conditions.append("colonia = ?")
+                conditions.append("colonia = ?")
                 params.append(filters['colonia'])
             if filters.get('property_type'):
-                filter_conditions.append("property_type = ?")
+                conditions.append("property_type = ?")
                 params.append(filters['property_type'])
             if filters.get('min_price'):
-                filter_conditions.append("price_mxn >= ?")
+                conditions.append("price_mxn >= ?")
                 params.append(filters['min_price'])
             if filters.get('max_price'):
-                filter_conditions.append("price_mxn <= ?")
+                conditions.append("price_mxn <= ?")
                 params.append(filters['max_price'])
             if filters.get('bedrooms'):
-                filter_conditions.append("bedrooms >= ?")
+                conditions.append("bedrooms >= ?")
                 params.append(filters['bedrooms'])
             if filters.get('bathrooms'):
-                filter_conditions.append("bathrooms >= ?")
+                conditions.append("bathrooms >= ?")
                 params.append(filters['bathrooms'])
             if filters.get('min_size'):
-                filter_conditions.append("size_m2 >= ?")
+                conditions.append("size_m2 >= ?")
                 params.append(filters['min_size'])
             if filters.get('max_size'):
-                filter_conditions.append("size_m2 <= ?")
+                conditions.append("size_m2 <= ?")
                 params.append(filters['max_size'])
-            
-            if filter_conditions:
-                base_query += " AND " + " AND ".join(filter_conditions)
-                count_query += " AND " + " AND ".join(filter_conditions)
+            if filters.get('min_deal_score'):
+                conditions.append("deal_score >= ?")
+                params.append(filters['min_deal_score'])
+        
+        if not conditions:
+            return "", params
+        return " AND " + " AND ".join(conditions), params
+    
+    @staticmethod
+    def _decode_listing(row) -> Dict:
+        """Listing row as a dict with its JSON fields parsed"""
+        listing = dict(row)
+        if listing.get('images'):
+            try:
+                listing['images'] = json.loads(listing['images'])
+            except:
+                listing['images'] = []
+        if listing.get('amenities'):
+            try:
+                listing['amenities'] = json.loads(listing['amenities'])
+            except:
+                listing['amenities'] = []
+        return listing
+    
+    def get_listings_paginated(self, filters: Dict = None, page: int = 1, 
+                             per_page: int = None, sort_by: str = 'newest') -> Dict:
+        """Get listings with pagination and sorting"""
+        per_page = per_page or config.DEFAULT_PAGE_SIZE
+        per_page = min(per_page, config.MAX_PAGE_SIZE)
+        offset = (page - 1) * per_page
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        # Build query
+        filter_sql, params = self._build_filter_clause(filters)
+        base_query = "FROM listings WHERE is_active = 1" + filter_sql
+        count_query = f"SELECT COUNT(*) as total {base_query}"
         
         # Get total count
         cursor.execute(count_query, params)
@@ -435,21 +579,7 @@ class PolpiDB:
         rows = cursor.fetchall()
         conn.close()
         
-        listings = []
-        for row in rows:
-            listing = dict(row)
-            # Parse JSON fields
-            if listing.get('images'):
-                try:
-                    listing['images'] = json.loads(listing['images'])
-                except:
-                    listing['images'] = []
-            if listing.get('amenities'):
-                try:
-                    listing['amenities'] = json.loads(listing['amenities'])
-                except:
-                    listing['amenities'] = []
-            listings.append(listing)
+        listings = [self._decode_listing(row) for row in rows]
         
         return {
             'listings': listings,
@@ -461,6 +591,282 @@ class PolpiDB:
             'has_prev': page > 1
         }
     
+    def iter_listings(self, filters: Dict = None, fields: List[str] = None,
+                      batch_size: int = 1000):
+        """
+        Stream active listings matching filters from a server-side cursor.
+        
+        Rows are pulled from SQLite in batches of batch_size, so memory stays
+        constant no matter how many listings match. The connection is opened
+        lazily and closed when the generator is exhausted or closed.
+        
+        Args:
+            filters: Same filter dict accepted by get_listings_paginated
+            fields: Columns to project (plus 'price_per_m2'); None for all
+            batch_size: Rows fetched per round trip to SQLite
+        """
+        if fields:
+            unknown = [f for f in fields if f not in self.LISTING_COLUMNS and f != 'price_per_m2']
+            if unknown:
+                raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+            columns = ', '.join(f for f in fields if f != 'price_per_m2')
+        else:
+            columns = '*'
+        
+        select = columns if columns else 'id'
+        if not fields or 'price_per_m2' in fields:
+            select += ", CASE WHEN size_m2 > 0 THEN price_mxn / size_m2 ELSE NULL END as price_per_m2"
+        
+        filter_sql, params = self._build_filter_clause(filters)
+        
+        # Iteration may resume on a different worker thread between batches
+        conn = self.get_connection(check_same_thread=False)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"SELECT {select} FROM listings WHERE is_active = 1{filter_sql} ORDER BY rowid",
+                params
+            )
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    listing = dict(row)
+                    if fields and not columns:
+                        listing.pop('id', None)
+                    yield listing
+        finally:
+            conn.close()
+    
+    def iter_listing_changes(self, since: str = None, fields: List[str] = None,
+                             batch_size: int = 1000):
+        """
+        Stream listings (active or not) written at or after the `since` timestamp.
+        
+        updated_at is bumped by every write (insert_listing upserts and derived
+        column updates such as deal scores), so this works as a change feed
+        for in-memory indexes: pass the largest updated_at seen so far to pick
+        up only what changed since. Rows are ordered by updated_at so the
+        caller can advance its watermark as it goes.
+        """
+        columns = ', '.join(fields) if fields else '*'
+        if fields and 'updated_at' not in fields:
+            columns += ', updated_at'
+        
+        query = f"SELECT {columns} FROM listings"
+        params = []
+        if since:
+            query += " WHERE updated_at >= ?"
+            params.append(since)
+        query += " ORDER BY updated_at"
+        
+        conn = self.get_connection(check_same_thread=False)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield dict(row)
+        finally:
+            conn.close()
+    
+    def get_change_watermark(self) -> Optional[str]:
+        """Latest updated_at across all listings; changes whenever any listing is written"""
+        conn = self.get_connection()
+        row = conn.execute("SELECT MAX(updated_at) FROM listings").fetchone()
+        conn.close()
+        return row[0]
+    
+    def get_listing_moves(self, after: int = 0) -> Tuple[int, List[Tuple[float, float]]]:
+        """Former (lng, lat) of listings moved or removed after move `after`, and the last move seq"""
+        conn = self.get_connection()
+        rows = conn.execute(
+            "SELECT seq, lng, lat FROM listing_moves WHERE seq > ? ORDER BY seq", (after,)
+        ).fetchall()
+        conn.close()
+        last = rows[-1]['seq'] if rows else after
+        return last, [(row['lng'], row['lat']) for row in rows]
+    
+    def get_listing_deletions(self, after: Optional[int],
+                              known: Iterable[str] = ()) -> Tuple[int, List[str]]:
+        """
+        Ids of listings removed after tombstone `after`, and the last tombstone
+        seq; `after` None starts from now. If tombstones past `after` were
+        already pruned, the ids in `known` that no longer exist are returned.
+        """
+        conn = self.get_connection()
+        try:
+            row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'listing_deletions'").fetchone()
+            last = row[0] if row else 0
+            if after is None or after >= last:
+                return last, []
+            oldest = conn.execute("SELECT MIN(seq) FROM listing_deletions").fetchone()[0]
+            if oldest is None or oldest > after + 1:
+                stored = {row[0] for row in conn.execute("SELECT id FROM listings")}
+                return last, [listing_id for listing_id in list(known) if listing_id not in stored]
+            rows = conn.execute("SELECT listing_id FROM listing_deletions WHERE seq > ? AND seq <= ?",
+                                (after, last)).fetchall()
+            return last, [row[0] for row in rows]
+        finally:
+            conn.close()
+    
+    def get_index_changes(self, since: Optional[str], fields: List[str], deletions: Optional[int],
+                          known: Iterable[str] = ()):
+        """
+        Change feed for in-memory indexes: (last tombstone seq, iterator). The
+        iterator yields {'id', 'is_active': 0} for listings removed after
+        tombstone `deletions` (see get_listing_deletions), then
+        iter_listing_changes(since, fields). Indexes already drop inactive
+        listings, so they apply both alike.
+        """
+        last, removed = self.get_listing_deletions(deletions, known)
+        removals = ({'id': listing_id, 'is_active': 0} for listing_id in removed)
+        return last, itertools.chain(removals, self.iter_listing_changes(since, fields))
+    
+    def prune_listing_moves(self, up_to: int):
+        """Forget moves already applied to the tile cache"""
+        conn = self.get_connection()
+        conn.execute("DELETE FROM listing_moves WHERE seq <= ?", (up_to,))
+        conn.commit()
+        conn.close()
+    
+    def get_listings_in_bbox(self, west: float, south: float, east: float, north: float,
+                             filters: Dict = None, limit: int = None) -> List[Dict]:
+        """Get active geocoded listings inside a lat/lng bounding box"""
+        filter_sql, params = self._build_filter_clause(filters)
+        
+        query = f"""
+            SELECT id, title, price_mxn, property_type, bedrooms, bathrooms, size_m2,
+                   colonia, lat, lng, deal_score,
+                   CASE WHEN size_m2 > 0 THEN price_mxn / size_m2 ELSE NULL END as price_per_m2
+            FROM listings
+            WHERE lat BETWEEN ? AND ? AND lng BETWEEN ? AND ?
+                AND is_active = 1{filter_sql}
+        """
+        params = [south, north, west, east] + params
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [dict(row) for row in rows]
+    
+    def get_thinned_listings_in_bbox(self, west: float, south: float, east: float, north: float,
+                                     grid: int, filters: Dict = None) -> List[Dict]:
+        """
+        One representative listing per grid x grid cell of a bounding box.
+        
+        The representative is the best deal in its cell (SQLite returns the
+        bare columns of the row that produced MAX()), and point_count says
+        how many listings it stands in for.
+        """
+        filter_sql, params = self._build_filter_clause(filters)
+        cell_w = (east - west) / grid
+        cell_h = (north - south) / grid
+        
+        query = f"""
+            SELECT id, price_mxn, property_type, size_m2, lat, lng, deal_score,
+                   CASE WHEN size_m2 > 0 THEN price_mxn / size_m2 ELSE NULL END as price_per_m2,
+                   MAX(COALESCE(deal_score, -1)) as best_score,
+                   COUNT(*) as point_count
+            FROM listings
+            WHERE lat BETWEEN ? AND ? AND lng BETWEEN ? AND ?
+                AND is_active = 1{filter_sql}
+            GROUP BY CAST((lng - ?) / ? AS INTEGER), CAST((lat - ?) / ? AS INTEGER)
+        """
+        params = [south, north, west, east] + params + [west, cell_w, south, cell_h]
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        conn.close()
+        
+        listings = []
+        for row in rows:
+            listing = dict(row)
+            listing.pop('best_score')
+            listings.append(listing)
+        return listings
+    
+    def get_grid_clusters_in_bbox(self, west: float, south: float, east: float, north: float,
+                                  scale: int, row_edges: List[float], first_row: int,
+                                  filters: Dict = None) -> List[Dict]:
+        """
+        Aggregate active listings in a bounding box per Web Mercator grid cell.
+        
+        Columns are (lng + 180) / 360 * scale. Rows are not linear in lat, so
+        the caller passes the lat of the top edge of every row after
+        `first_row`, top to bottom. Returns one row per non-empty cell with
+        cx, cy, count, mean lat/lng, avg_price and an exact median price/m²,
+        all computed in SQLite.
+        """
+        filter_sql, params = self._build_filter_clause(filters)
+        
+        # lat > top edge of the next row -> still in this row
+        row_sql = "CASE " + " ".join(
+            f"WHEN lat > ? THEN {first_row + i}" for i in range(len(row_edges))
+        ) + f" ELSE {first_row + len(row_edges)} END" if row_edges else str(first_row)
+        
+        query = f"""
+            WITH points AS (
+                SELECT CAST((lng + 180.0) / 360.0 * ? AS INTEGER) AS cx,
+                       {row_sql} AS cy,
+                       lat, lng, price_mxn,
+                       CASE WHEN size_m2 > 0 AND price_mxn > 0 THEN price_mxn / size_m2 END AS ppm2
+                FROM listings
+                WHERE lat BETWEEN ? AND ? AND lng BETWEEN ? AND ?
+                    AND is_active = 1{filter_sql}
+            ),
+            ranked AS (
+                SELECT cx, cy, ppm2,
+                       ROW_NUMBER() OVER (PARTITION BY cx, cy ORDER BY ppm2) AS rn,
+                       COUNT(*) OVER (PARTITION BY cx, cy) AS n
+                FROM points WHERE ppm2 IS NOT NULL
+            ),
+            medians AS (
+                SELECT cx, cy, AVG(ppm2) AS median_ppm2
+                FROM ranked WHERE rn IN ((n + 1) / 2, (n + 2) / 2)
+                GROUP BY cx, cy
+            )
+            SELECT p.cx, p.cy, COUNT(*) AS count, AVG(p.lat) AS lat, AVG(p.lng) AS lng,
+                   AVG(NULLIF(p.price_mxn, 0)) AS avg_price, m.median_ppm2
+            FROM points p LEFT JOIN medians m ON m.cx = p.cx AND m.cy = p.cy
+            GROUP BY p.cx, p.cy
+        """
+        params = [scale] + list(row_edges) + [south, north, west, east] + params
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [dict(row) for row in rows]
+    
+    def update_deal_scores(self, scores: Dict[str, float]):
+        """Persist precomputed deal scores (bumps updated_at, not scraped_date)"""
+        if not scores:
+            return
+        now = datetime.now().isoformat()
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.executemany(
+            "UPDATE listings SET deal_score = ?, updated_at = ? WHERE id = ?",
+            [(score, now, listing_id) for listing_id, score in scores.items()]
+        )
+        conn.commit()
+        conn.close()
+    
     def search_listings(self, query: str, page: int = 1, per_page: int = None) -> Dict:
         """Full-text search across listings"""
         if len(query.strip()) < config.SEARCH_MIN_LENGTH:
@@ -641,6 +1047,25 @@ class PolpiDB:
         
         return [dict(row) for row in rows]
     
+    def get_top_neighborhoods(self, limit: int = 50) -> List[Dict]:
+        """(city, colonia, property_type) groups with the most active listings"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT city, colonia, property_type, COUNT(*) as listing_count
+            FROM listings
+            WHERE city IS NOT NULL AND colonia IS NOT NULL AND is_active = 1
+            GROUP BY city, colonia, property_type
+            ORDER BY listing_count DESC
+            LIMIT ?
+        """, (limit,))
+        
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [dict(row) for row in rows]
+    
     def get_listings(self, filters: Dict = None, limit: int = 100) -> List[Dict]:
         """Legacy method for backward compatibility"""
         result = self.get_listings_paginated(filters, page=1, per_page=limit, sort_by='newest')
@@ -696,7 +1121,8 @@ class PolpiDB:
             query += " AND colonia = ?"
             params.append(listing['colonia'])
         
-        query += " ORDER BY size_diff ASC, price_diff ASC LIMIT ?"
+        # Keep in step with find_comparables_batch: unpriced comparables last, ties by id
+        query += " ORDER BY size_diff ASC, price_diff ASC NULLS LAST, id ASC LIMIT ?"
         params.append(limit)
         
         cursor.execute(query, params)
@@ -715,6 +1141,128 @@ class PolpiDB:
         
         return comparables
     
+    def get_listings_by_ids(self, listing_ids: List[str]) -> Dict[str, Dict]:
+        """Load raw listing rows for many ids at once, keyed by id"""
+        listings = {}
+        if not listing_ids:
+            return listings
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        # Stay well under SQLite's host parameter limit
+        unique_ids = list(dict.fromkeys(listing_ids))
+        for start in range(0, len(unique_ids), 500):
+            chunk = unique_ids[start:start + 500]
+            placeholders = ', '.join(['?' for _ in chunk])
+            cursor.execute(f"SELECT * FROM listings WHERE id IN ({placeholders})", chunk)
+            for row in cursor.fetchall():
+                listings[row['id']] = dict(row)
+        
+        conn.close()
+        return listings
+    
+    def get_listings_in_order(self, listing_ids: List[str]) -> List[Dict]:
+        """Active listings for the given ids in that order, shaped like get_listings_paginated rows"""
+        if not listing_ids:
+            return []
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        rows = {}
+        for start in range(0, len(listing_ids), 500):
+            chunk = listing_ids[start:start + 500]
+            placeholders = ', '.join(['?' for _ in chunk])
+            cursor.execute(f"""
+                SELECT *,
+                       CASE WHEN size_m2 > 0 THEN price_mxn / size_m2 ELSE NULL END as price_per_m2
+                FROM listings WHERE is_active = 1 AND id IN ({placeholders})
+            """, chunk)
+            for row in cursor.fetchall():
+                rows[row['id']] = row
+        
+        conn.close()
+        return [self._decode_listing(rows[i]) for i in listing_ids if i in rows]
+    
+    def find_comparables_batch(self, listings: List[Dict], limit: int = 5) -> Dict[str, List[Dict]]:
+        """
+        Find comparables for many listings with one query per
+        (city, property_type, colonia) group instead of one per listing.
+        
+        Applies the same rules as find_comparables: active listings of the same
+        city and type (and colonia when known) within 30% of the size, ordered
+        by size difference, then price difference with unpriced listings last,
+        then id.
+        """
+        size_tolerance = 0.3  # 30% size variance
+        results = {listing['id']: [] for listing in listings}
+        
+        groups = {}
+        for listing in listings:
+            if not listing.get('city') or not listing.get('property_type'):
+                continue
+            key = (listing['city'], listing['property_type'], listing.get('colonia'))
+            groups.setdefault(key, []).append(listing)
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        for (city, property_type, colonia), members in groups.items():
+            sizes = [m['size_m2'] for m in members if m.get('size_m2')]
+            if len(sizes) == len(members):
+                min_size = min(sizes) * (1 - size_tolerance)
+                max_size = max(sizes) * (1 + size_tolerance)
+            else:
+                min_size, max_size = 0, 999999
+            
+            query = """
+                SELECT *,
+                    CASE WHEN size_m2 > 0 THEN price_mxn / size_m2 ELSE NULL END as price_per_m2
+                FROM listings
+                WHERE city = ?
+                    AND property_type = ?
+                    AND size_m2 BETWEEN ? AND ?
+                    AND is_active = 1
+            """
+            params = [city, property_type, min_size, max_size]
+            if colonia:
+                query += " AND colonia = ?"
+                params.append(colonia)
+            
+            cursor.execute(query, params)
+            candidates = [dict(row) for row in cursor.fetchall()]
+            
+            for listing in members:
+                size = listing.get('size_m2') or 0
+                price = listing.get('price_mxn') or 0
+                low = size * (1 - size_tolerance) if size else 0
+                high = size * (1 + size_tolerance) if size else 999999
+                
+                comps = [
+                    c for c in candidates
+                    if c['id'] != listing['id'] and c['size_m2'] is not None and low <= c['size_m2'] <= high
+                ]
+                for comp in comps:
+                    comp['size_diff'] = abs(comp['size_m2'] - size)
+                    # NULL like ABS(price_mxn - ?) in SQL, sorted after every priced comparable
+                    comp['price_diff'] = abs(comp['price_mxn'] - price) if comp['price_mxn'] is not None else None
+                comps.sort(key=lambda c: (c['size_diff'], c['price_diff'] is None, c['price_diff'] or 0, c['id']))
+                
+                selected = []
+                for comp in comps[:limit]:
+                    comp = dict(comp)
+                    if comp.get('images'):
+                        try:
+                            comp['images'] = json.loads(comp['images'])
+                        except:
+                            comp['images'] = []
+                    selected.append(comp)
+                results[listing['id']] = selected
+        
+        conn.close()
+        return results
+    
     def get_stats(self) -> Dict:
         """Get overall database statistics"""
         conn = self.get_connection()
@@ -8,8 +8,8 @@ Target: 200+ terrenos, 100+ commercial
 import sys
 import json
 import re
-import time
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Dict, List, Optional
 
@@ -21,12 +21,22 @@ from selenium.webdriver.support import expected_conditions as EC
 
 sys.path.insert(0, '/Users/isaachomefolder/Desktop/polpi-mx')
 from database import PolpiDB
+from embedded_state import BROWSER_SCRIPT, browser_session, fetch_state
+from browser_pool import BrowserPool, lean_options, wait_for_script
 
 class DeveloperPropertiesScraper:
     """Scraper targeting DEVELOPERS, not homebuyers"""
     
     def __init__(self):
-        """Initialize Chrome driver"""
+        """Set up the HTTP session; Chrome is only started if a page needs rendering"""
+        self.session = browser_session()
+        self.pool = BrowserPool(self.new_browser, source='mercadolibre')
+        self.base_url = 'https://inmuebles.mercadolibre.com.mx'
+        self.data_dir = '/Users/isaachomefolder/Desktop/polpi-mx/data/developer_properties'
+        os.makedirs(self.data_dir, exist_ok=True)
+
+    def new_browser(self):
+        """Start one Chrome driver for the browser pool"""
         options = Options()
         options.add_argument('--headless=new')
         options.add_argument('--no-sandbox')
@@ -36,11 +46,9 @@ class DeveloperPropertiesScraper:
         # Disable images for faster loading
         prefs = {"profile.managed_default_content_settings.images": 2}
         options.add_experimental_option("prefs", prefs)
+        lean_options(options)
         
-        self.driver = webdriver.Chrome(options=options)
-        self.base_url = 'https://inmuebles.mercadolibre.com.mx'
-        self.data_dir = '/Users/isaachomefolder/Desktop/polpi-mx/data/developer_properties'
-        os.makedirs(self.data_dir, exist_ok=True)
+        return webdriver.Chrome(options=options)
 
     def get_search_urls(self, max_pages_per_category=20):
         """Generate search URLs for developer-focused properties"""
@@ -92,33 +100,34 @@ class DeveloperPropertiesScraper:
         return urls
 
     def extract_preloaded_state(self, url: str) -> Optional[Dict]:
-        """Load page and extract window.__PRELOADED_STATE__"""
+        """Read the page's embedded state over HTTP; render it in Chrome only if that fails"""
+        print(f"  Loading: {url}")
+        state = fetch_state(self.session, url)
+        if state:
+            print(f"  ✓ Found data object")
+            return state
+        print(f"  No embedded state in the HTML, falling back to Chrome")
+        return self.extract_preloaded_state_browser(url)
+
+    def extract_preloaded_state_browser(self, url: str) -> Optional[Dict]:
+        """Load page in Chrome and extract window.__PRELOADED_STATE__"""
         try:
-            print(f"  Loading: {url}")
-            self.driver.get(url)
-            
-            # Wait for page to load
-            max_attempts = 3
-            for attempt in range(max_attempts):
-                time.sleep(5 if attempt == 0 else 3)
-                
-                # Check for error page
-                if "Hubo un error" in self.driver.page_source:
-                    print(f"  ⚠ Error page detected, attempt {attempt + 1}/{max_attempts}")
-                    if attempt < max_attempts - 1:
-                        time.sleep(2)
-                        self.driver.refresh()
+            with self.pool.browser() as driver:
+                max_attempts = 3
+                for attempt in range(max_attempts):
+                    self.pool.load(driver, url)
+                    
+                    # Check for error page
+                    if "Hubo un error" in driver.page_source:
+                        print(f"  ⚠ Error page detected, attempt {attempt + 1}/{max_attempts}")
                         continue
-                    else:
-                        return None
-                
-                # Try to extract preloaded state
-                script = "return window.__PRELOADED_STATE__ || window.__NEXT_DATA__ || null;"
-                preloaded_state = self.driver.execute_script(script)
-                
-                if preloaded_state:
-                    print(f"  ✓ Found data object")
-                    return preloaded_state
+                    
+                    # Wait for the page's scripts to publish the preloaded state
+                    preloaded_state = wait_for_script(driver, BROWSER_SCRIPT)
+                    
+                    if preloaded_state:
+                        print(f"  ✓ Found data object")
+                        return preloaded_state
             
             print(f"  ⚠ No data object found after {max_attempts} attempts")
             return None
@@ -377,27 +386,29 @@ class DeveloperPropertiesScraper:
         print(f"   Focus: TERRENOS (200+), COMMERCIAL (100+), DEVELOPMENT")
         print(f"   Goal: {max_listings}+ listings\n")
         
-        for i, search_info in enumerate(urls):
-            print(f"\n[{i+1}/{len(urls)}]", end=" ")
-            
+        def scrape(search_info):
             try:
-                listings = self.scrape_page(search_info)
-                all_listings.extend(listings)
-                
-                category = search_info['category']
-                stats_by_category[category] = stats_by_category.get(category, 0) + len(listings)
+                return self.scrape_page(search_info)
+            except Exception as e:
+                print(f"  ✗ Error: {e}")
+                return []
+        
+        # Pages are fetched pool-size at a time; the shared rate limiter paces requests to the site
+        workers = self.pool.size
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for start in range(0, len(urls), workers):
+                batch = urls[start:start + workers]
+                for search_info, listings in zip(batch, executor.map(scrape, batch)):
+                    all_listings.extend(listings)
+                    
+                    category = search_info['category']
+                    stats_by_category[category] = stats_by_category.get(category, 0) + len(listings)
                 
-                print(f"  Total: {len(all_listings)}")
+                print(f"\n[{start + len(batch)}/{len(urls)}]  Total: {len(all_listings)}")
                 
                 if len(all_listings) >= max_listings:
                     print(f"\n✓ Reached goal ({len(all_listings)} listings)")
                     break
-                
-                time.sleep(2)
-                
-            except Exception as e:
-                print(f"  ✗ Error: {e}")
-                continue
         
         return all_listings, stats_by_category
 
@@ -419,9 +430,8 @@ class DeveloperPropertiesScraper:
         return stored
 
     def close(self):
-        """Close browser"""
-        if self.driver:
-            self.driver.quit()
+        """Close browsers"""
+        self.pool.close()
 
 def main():
     scraper = None
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Browserless extraction of the state object MercadoLibre-family pages embed.
+
+Search result pages ship their data as `window.__PRELOADED_STATE__ = {...}`
+(or in a `<script id="__PRELOADED_STATE__" type="application/json">`
+block, or as Next.js `__NEXT_DATA__`) inside the server-rendered HTML.
+Reading it from the HTML avoids starting Chrome, waiting seconds for the
+page's JavaScript and calling execute_script.
+
+extract_state() finds the assignment and, in the common case where the
+value fills the rest of its <script>, parses it straight away (with orjson
+when installed). Otherwise StateLocator follows the value to its matching
+closing bracket, skipping over JSON strings, so brackets inside strings and
+whatever script follows the value are handled. StateLocator takes the page
+in chunks and stops as soon as the value is complete, so it also works on a
+streamed response.
+
+fetch_state() returns None for pages without embedded state (challenge
+pages, error pages, pages that build their state client-side). The
+scrapers then fall back to their Selenium path.
+"""
+
+import functools
+import json
+import re
+from typing import Iterable, Optional, Tuple
+
+import requests
+
+from rate_limiter import is_challenge_page, polite_get
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+# Globals the scrapers read with execute_script, in order of preference
+STATE_NAMES = ('__PRELOADED_STATE__', '__PRELOADED_STATES__', '__NEXT_DATA__')
+
+# What the Selenium fallback evaluates
+BROWSER_SCRIPT = "return window.__PRELOADED_STATE__ || window.__PRELOADED_STATES__ || window.__NEXT_DATA__ || null;"
+
+# Unscanned text kept between chunks so a marker split across them is still found
+MARKER_OVERLAP = 512
+
+# Outside strings: a whole string (or its start, if the chunk ends inside it) or a bracket
+_TOKEN = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*(?:(")|(\\)?\Z)|[{}\[\]]', re.S)
+# Inside a string continued from the previous chunk: up to the closing quote or chunk end
+_STRING_REST = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*(?:(")|(\\)?\Z)', re.S)
+
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'es-MX,es;q=0.9,en;q=0.8',
+}
+
+
+@functools.lru_cache(maxsize=16)
+def _marker(names: Tuple[str, ...]) -> re.Pattern:
+    alternatives = '|'.join(re.escape(name) for name in names)
+    return re.compile(
+        rf'(?:window\.|\b)({alternatives})\s*=\s*(?=[{{\[])'
+        rf'|<script\b[^>]*\bid=["\']?({alternatives})["\']?[^>]*>\s*(?=[{{\[])'
+    )
+
+
+class StateLocator:
+    """
+    Incremental locator for an embedded state value: feed() HTML chunks
+    until it returns the JSON text of the first assignment to one of `names`.
+    """
+    
+    def __init__(self, names: Iterable[str] = STATE_NAMES):
+        self.names = tuple(names)
+        self._marker = _marker(self.names)
+        self._pending = ''
+        self._parts = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self.name: Optional[str] = None
+        self.text: Optional[str] = None
+    
+    def feed(self, chunk: str) -> Optional[str]:
+        """Scan the next chunk; returns the complete JSON text once its closing bracket is seen"""
+        if self.text is not None:
+            return self.text
+        if self.name is None:
+            chunk = self._pending + chunk
+            match = self._marker.search(chunk)
+            if match is None:
+                self._pending = chunk[-MARKER_OVERLAP:]
+                return None
+            self.name = match.group(1) or match.group(2)
+            self._pending = ''
+            chunk = chunk[match.end():]
+        return self._scan(chunk)
+    
+    def _scan(self, chunk: str) -> Optional[str]:
+        pos, end = 0, len(chunk)
+        if self._escaped and chunk:
+            # The previous chunk ended on a backslash inside a string
+            pos, self._escaped = 1, False
+        while pos < end:
+            if self._in_string:
+                match = _STRING_REST.match(chunk, pos)
+            else:
+                match = _TOKEN.search(chunk, pos)
+                if match is None:
+                    break
+            token = match.group()
+            pos = match.end()
+            if self._in_string or token[0] == '"':
+                # Group 1: the closing quote; group 2: a backslash at the very end of the chunk
+                self._in_string = match.group(1) is None
+                self._escaped = match.group(2) is not None
+            elif token in '{[':
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._parts.append(chunk[:pos])
+                    self.text = ''.join(self._parts)
+                    self._parts = []
+                    return self.text
+        self._parts.append(chunk)
+        return None
+
+
+def loads(text: str):
+    return orjson.loads(text) if orjson is not None else json.loads(text)
+
+
+def extract_state(html: str, names: Iterable[str] = STATE_NAMES) -> Optional[dict]:
+    """The page's embedded state as a dict, or None if it has none or it isn't valid JSON"""
+    html = html or ''
+    # Preference order of the names, as with `a || b` in the browser, not page order
+    for name in names:
+        match = _marker((name,)).search(html)
+        if match is None:
+            continue
+        start = match.end()
+        # Usually the value is all that's left of its <script> (JSON in HTML can't contain
+        # "</script"), so try parsing that before walking the value bracket by bracket
+        close = html.find('</script', start)
+        candidate = html[start:close if close != -1 else len(html)].rstrip().rstrip(';').rstrip()
+        try:
+            return loads(candidate) or None
+        except ValueError:
+            pass
+        locator = StateLocator((name,))
+        locator.name = name  # already past the marker
+        text = locator.feed(html[start:close if close != -1 else len(html)])
+        if text is None:
+            continue
+        try:
+            return loads(text) or None
+        except ValueError:
+            continue
+    return None
+
+
+def browser_session() -> requests.Session:
+    """requests session with the desktop-browser headers MercadoLibre expects"""
+    session = requests.Session()
+    session.headers.update(BROWSER_HEADERS)
+    return session
+
+
+def fetch_state(session: requests.Session, url: str, timeout: float = 30) -> Optional[dict]:
+    """
+    GET url (paced by the shared rate limiter) and read its embedded state,
+    or None when the page must be rendered in a browser.
+    """
+    try:
+        response = polite_get(session, url, timeout=timeout)
+    except Exception as e:
+        print(f"  HTTP fetch failed for {url}: {e}")
+        return None
+    if response.status_code != 200 or is_challenge_page(response.text):
+        return None
+    return extract_state(response.text)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""Streaming bulk export encoders (NDJSON / CSV) for Polpi MX"""
+
+import csv
+import io
+import json
+import zlib
+from typing import Dict, Iterable, Iterator, List
+
+# JSON-encoded list columns that are decoded for NDJSON output
+JSON_LIST_FIELDS = ('images', 'amenities')
+
+# Flush the encoder once this many bytes are buffered
+CHUNK_SIZE = 64 * 1024
+
+
+def _decode_json_lists(listing: Dict) -> Dict:
+    """Turn stored JSON list columns back into lists"""
+    for key in JSON_LIST_FIELDS:
+        value = listing.get(key)
+        if isinstance(value, str) and value.startswith('['):
+            try:
+                listing[key] = json.loads(value)
+            except ValueError:
+                pass
+    return listing
+
+
+def iter_ndjson(listings: Iterable[Dict]) -> Iterator[str]:
+    """Encode listings as newline-delimited JSON, one object per line"""
+    for listing in listings:
+        yield json.dumps(_decode_json_lists(listing), ensure_ascii=False) + '\n'
+
+
+def iter_csv(listings: Iterable[Dict], fields: List[str] = None) -> Iterator[str]:
+    """Encode listings as CSV with a header row taken from fields or the first row"""
+    buffer = io.StringIO()
+    writer = None
+    
+    for listing in listings:
+        if writer is None:
+            writer = csv.DictWriter(buffer, fieldnames=fields or list(listing.keys()),
+                                    extrasaction='ignore')
+            writer.writeheader()
+        writer.writerow(listing)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    
+    if writer is None and fields:
+        # Empty result set still gets a header
+        csv.DictWriter(buffer, fieldnames=fields).writeheader()
+        yield buffer.getvalue()
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """Whether an Accept-Encoding header allows gzip: listed (or covered by *) with q > 0"""
+    codings = {}
+    for item in (accept_encoding or '').split(','):
+        coding, _, params = item.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        codings[coding] = quality
+    for coding in ('gzip', 'x-gzip', '*'):
+        if coding in codings:
+            return codings[coding] > 0
+    return False
+
+
+def stream_export(listings: Iterable[Dict], fmt: str = 'ndjson', fields: List[str] = None,
+                  compress: bool = False) -> Iterator[bytes]:
+    """
+    Encode a listing iterator into byte chunks suitable for a streaming response.
+    
+    Lines are batched into ~64KB chunks to keep syscall overhead low, and
+    optionally gzip-compressed on the fly with a bounded window.
+    
+    Args:
+        listings: Iterator of listing dicts (e.g. PolpiDB.iter_listings)
+        fmt: 'ndjson' or 'csv'
+        fields: Column order for CSV output
+        compress: Emit a gzip stream instead of plain text
+    """
+    if fmt == 'csv':
+        lines = iter_csv(listings, fields)
+    elif fmt == 'ndjson':
+        lines = iter_ndjson(listings)
+    else:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    
+    # wbits=31 produces a gzip header/trailer instead of a raw zlib stream
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    pending = []
+    pending_size = 0
+    
+    for line in lines:
+        pending.append(line)
+        pending_size += len(line)
+        if pending_size >= CHUNK_SIZE:
+            data = ''.join(pending).encode('utf-8')
+            pending = []
+            pending_size = 0
+            if compressor:
+                data = compressor.compress(data)
+            if data:
+                yield data
+    
+    data = ''.join(pending).encode('utf-8')
+    if compressor:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        yield data
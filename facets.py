@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Faceted search counts for Polpi MX.
+
+FacetIndex keeps one bitmap per facet value over all active listings:
+each listing gets a slot number, and a bitmap is a Python int with bit
+`slot` set for every listing having that value. A filter set becomes the
+AND of a few bitmaps, and a facet count is the popcount of that mask ANDed
+with the value's bitmap, so counting every facet under any filter is a few
+hundred big-int operations instead of one GROUP BY scan per facet.
+
+Price and size ranges use log-scale bucket bitmaps (5% wide): buckets fully
+inside the range are ORed in, and only listings in the two boundary buckets
+are checked against their exact values. Facets are disjunctive: each facet
+is counted under every filter except its own, so the sidebar keeps showing
+the alternatives to the current selection.
+
+Like MapClusterIndex, the index follows the updated_at change feed and only
+re-indexes listings that changed. Results are cached per filter signature
+until the index changes.
+"""
+
+import math
+import re
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import config
+
+# Columns the index needs from the change feed
+INDEX_FIELDS = ['id', 'city', 'colonia', 'property_type', 'source', 'bedrooms', 'bathrooms',
+                'price_mxn', 'size_m2', 'is_active']
+
+# Categorical facets: name -> listing column
+CATEGORICAL = {
+    'city': 'city',
+    'colonia': 'colonia',
+    'property_type': 'property_type',
+    'source': 'source',
+    'bedrooms': 'bedrooms',
+    'bathrooms': 'bathrooms',
+}
+
+# Range-filtered numeric columns, indexed by log-scale bucket
+NUMERIC = ('price_mxn', 'size_m2')
+
+# Every bitmap table: categorical facets, price ranges ('price') and numeric buckets
+DIMENSIONS = tuple(CATEGORICAL) + ('price',) + NUMERIC
+
+# Which facet each filter belongs to (a facet ignores its own filters)
+FILTER_FACETS = {
+    'city': 'city', 'colonia': 'colonia', 'property_type': 'property_type',
+    'bedrooms': 'bedrooms', 'bathrooms': 'bathrooms',
+    'min_price': 'price', 'max_price': 'price',
+    'min_size': None, 'max_size': None,
+}
+
+_BUCKET_RATIO = math.log(1.05)
+# Bucket for zero and negative values
+_NON_POSITIVE = -(1 << 30)
+
+_ONE_BITS = re.compile('1')
+
+
+def _bucket(value: float) -> int:
+    return int(math.floor(math.log(value) / _BUCKET_RATIO)) if value > 0 else _NON_POSITIVE
+
+
+def _mask(slots: List[int]) -> int:
+    """Bitmap with the given slots set"""
+    if len(slots) <= 16:
+        mask = 0
+        for slot in slots:
+            mask |= 1 << slot
+        return mask
+    bits = bytearray((max(slots) >> 3) + 1)
+    for slot in slots:
+        bits[slot >> 3] |= 1 << (slot & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def _iter_slots(bitmap: int) -> Iterable[int]:
+    """Positions of the set bits, highest first"""
+    binary = format(bitmap, 'b')
+    top = len(binary) - 1
+    for match in _ONE_BITS.finditer(binary):
+        yield top - match.start()
+
+
+class FacetIndex:
+    """Bitmap index over active listings for single-pass facet counts"""
+    
+    def __init__(self, db, refresh_interval: float = None, cache_size: int = 1024):
+        self.db = db
+        self.refresh_interval = (config.MAP_INDEX_REFRESH_SECONDS
+                                 if refresh_interval is None else refresh_interval)
+        self.price_buckets = list(config.FACET_PRICE_BUCKETS)
+        # dimension -> key -> bitmap
+        self._bitmaps: Dict[str, Dict] = {name: {} for name in DIMENSIONS}
+        # Per-slot columns: bitmap key per dimension (None when missing) and exact numbers (NaN when missing)
+        self._columns: Dict[str, List] = {name: [] for name in DIMENSIONS}
+        self._values: Dict[str, array] = {column: array('d') for column in NUMERIC}
+        self._active = 0
+        # listing id -> slot, for listings currently indexed
+        self._members: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._next_slot = 0
+        self._version = 0
+        self._cache: 'OrderedDict[Tuple, Dict]' = OrderedDict()
+        self._cache_size = cache_size
+        self._watermark = None
+        # Last listing_deletions tombstone applied
+        self._deletions = None
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._members)
+    
+    def _keys(self, listing: Dict) -> Tuple:
+        """Bitmap key per dimension (None when the listing has no value)"""
+        get = listing.get
+        keys = [get(column) for column in CATEGORICAL.values()]
+        for i, value in enumerate(keys):
+            if value.__class__ is str:
+                keys[i] = sys.intern(value)
+        price, size = get('price_mxn'), get('size_m2')
+        keys.append(bisect_right(self.price_buckets, price) if price and price > 0 else None)
+        keys.append(None if price is None else _bucket(price))
+        keys.append(None if size is None else _bucket(size))
+        return keys
+    
+    def apply_changes(self, listings: Iterable[Dict]) -> int:
+        """Fold a batch of changed listings into the index"""
+        columns = [self._columns[name] for name in DIMENSIONS]
+        prices, sizes = self._values['price_mxn'], self._values['size_m2']
+        members, free = self._members, self._free
+        applied = 0
+        with self._lock:
+            # Per dimension: key -> slots to set / clear, applied once per bitmap at the end
+            added = [defaultdict(list) for _ in DIMENSIONS]
+            removed = [defaultdict(list) for _ in DIMENSIONS]
+            active_added, active_removed = [], []
+            
+            for listing in listings:
+                applied += 1
+                updated = listing.get('updated_at')
+                if updated and (self._watermark is None or updated > self._watermark):
+                    self._watermark = updated
+                
+                slot = members.pop(listing['id'], None)
+                if slot is not None:
+                    for column, slots in zip(columns, removed):
+                        key = column[slot]
+                        if key is not None:
+                            slots[key].append(slot)
+                    active_removed.append(slot)
+                    free.append(slot)
+                
+                if not listing.get('is_active', 1):
+                    continue
+                if free:
+                    slot = free.pop()
+                else:
+                    slot = self._next_slot
+                    self._next_slot += 1
+                    for column in columns:
+                        column.append(None)
+                    prices.append(math.nan)
+                    sizes.append(math.nan)
+                for column, slots, key in zip(columns, added, self._keys(listing)):
+                    column[slot] = key
+                    if key is not None:
+                        slots[key].append(slot)
+                price, size = listing.get('price_mxn'), listing.get('size_m2')
+                prices[slot] = math.nan if price is None else price
+                sizes[slot] = math.nan if size is None else size
+                active_added.append(slot)
+                members[listing['id']] = slot
+            
+            if not applied:
+                return 0
+            for name, adds, removes in zip(DIMENSIONS, added, removed):
+                table = self._bitmaps[name]
+                for key in set(adds) | set(removes):
+                    bitmap = table.get(key, 0)
+                    if key in removes:
+                        bitmap &= ~_mask(removes[key])
+                    if key in adds:
+                        bitmap |= _mask(adds[key])
+                    if bitmap:
+                        table[key] = bitmap
+                    else:
+                        table.pop(key, None)
+            if active_removed:
+                self._active &= ~_mask(active_removed)
+            if active_added:
+                self._active |= _mask(active_added)
+            self._version += 1
+            self._cache.clear()
+        return applied
+    
+    def refresh(self, force: bool = False) -> int:
+        """Pull listings changed since the last refresh; throttled by refresh_interval"""
+        now = time.time()
+        if not force and now - self._last_refresh < self.refresh_interval:
+            return 0
+        self._last_refresh = now
+        self._deletions, changes = self.db.get_index_changes(
+            self._watermark, INDEX_FIELDS, self._deletions, self._members)
+        return self.apply_changes(changes)
+    
+    def _range_mask(self, column: str, low: Optional[float], high: Optional[float]) -> int:
+        """Listings with low <= value <= high (either bound optional)"""
+        buckets = self._bitmaps[column]
+        values = self._values[column]
+        low_bucket = _bucket(low) if low is not None else None
+        high_bucket = _bucket(high) if high is not None else None
+        
+        mask = 0
+        for key, bitmap in buckets.items():
+            if (low_bucket is None or key > low_bucket) and (high_bucket is None or key < high_bucket):
+                mask |= bitmap
+        
+        # Boundary buckets hold values on both sides of the bound: check those exactly
+        exact = []
+        for key in {low_bucket, high_bucket} - {None}:
+            for slot in _iter_slots(buckets.get(key, 0)):
+                value = values[slot]
+                if (low is None or value >= low) and (high is None or value <= high):
+                    exact.append(slot)
+        if exact:
+            mask |= _mask(exact)
+        return mask
+    
+    def _at_least(self, name: str, minimum: int) -> int:
+        mask = 0
+        for value, bitmap in self._bitmaps[name].items():
+            if value >= minimum:
+                mask |= bitmap
+        return mask
+    
+    def _filter_masks(self, filters: Dict) -> Dict[str, int]:
+        """One bitmap per active filter, keyed by filter name"""
+        masks = {}
+        for name in ('city', 'colonia', 'property_type'):
+            if filters.get(name):
+                masks[name] = self._bitmaps[name].get(filters[name], 0)
+        for name in ('bedrooms', 'bathrooms'):
+            if filters.get(name):
+                masks[name] = self._at_least(name, filters[name])
+        for column, low_key, high_key in (('price_mxn', 'min_price', 'max_price'),
+                                          ('size_m2', 'min_size', 'max_size')):
+            low, high = filters.get(low_key) or None, filters.get(high_key) or None
+            if low is not None or high is not None:
+                masks[low_key] = self._range_mask(column, low, high)
+        return masks
+    
+    def _counts(self, facet: str, mask: Optional[int], limit: int = None) -> List[Dict]:
+        if mask is None:
+            counts = [(value, bitmap.bit_count()) for value, bitmap in self._bitmaps[facet].items()]
+        else:
+            counts = [(value, (bitmap & mask).bit_count()) for value, bitmap in self._bitmaps[facet].items()]
+        counts = [(value, count) for value, count in counts if count]
+        if facet in ('bedrooms', 'bathrooms'):
+            counts.sort(key=lambda item: item[0])
+        else:
+            counts.sort(key=lambda item: (-item[1], str(item[0])))
+        if limit:
+            counts = counts[:limit]
+        return [{'value': value, 'count': count} for value, count in counts]
+    
+    def _price_counts(self, mask: Optional[int]) -> List[Dict]:
+        ranges = []
+        bitmaps = self._bitmaps['price']
+        bounds = [0] + self.price_buckets + [None]
+        for index in range(len(bounds) - 1):
+            bitmap = bitmaps.get(index, 0)
+            count = bitmap.bit_count() if mask is None else (bitmap & mask).bit_count()
+            ranges.append({'min': bounds[index], 'max': bounds[index + 1], 'count': count})
+        return ranges
+    
+    def query(self, filters: Dict = None, colonia_limit: int = 50) -> Dict:
+        """Total and per-facet counts for a filter set (same filters as get_listings_paginated)"""
+        filters = {k: v for k, v in (filters or {}).items() if v}
+        key = (tuple(sorted(filters.items())), colonia_limit)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+            version = self._version
+            
+            masks = self._filter_masks(filters)
+            
+            def combined(exclude: Optional[str] = None) -> Optional[int]:
+                selected = [mask for name, mask in masks.items()
+                            if exclude is None or FILTER_FACETS[name] != exclude]
+                if not selected:
+                    return None
+                result = selected[0]
+                for mask in selected[1:]:
+                    result &= mask
+                return result
+            
+            everything = combined()
+            facets = {}
+            for facet in CATEGORICAL:
+                # Facets without a filter of their own share the full mask
+                own = any(FILTER_FACETS[name] == facet for name in masks)
+                facets[facet] = self._counts(facet, combined(facet) if own else everything,
+                                             colonia_limit if facet == 'colonia' else None)
+            own_price = any(FILTER_FACETS[name] == 'price' for name in masks)
+            facets['price'] = self._price_counts(combined('price') if own_price else everything)
+            
+            result = {
+                'total': self._active.bit_count() if everything is None else everything.bit_count(),
+                'filters': filters,
+                'facets': facets
+            }
+            if version == self._version:
+                self._cache[key] = result
+                if len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+            return result
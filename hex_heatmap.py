@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Hexagonal price-per-m² heatmap aggregation for Polpi MX.
+
+Every geocoded listing is assigned to one pointy-top hexagon per resolution
+on an axial grid laid over Web Mercator meters. Each cell maintains its
+listing count, a price/m² histogram (for the median) and deal-score sums,
+updated incrementally from the PolpiDB change feed, so serving a heatmap is
+a lookup over precomputed cells instead of an aggregation over raw listings.
+"""
+
+import math
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import config
+from map_clusters import PriceHistogram
+
+EARTH_RADIUS_M = 6378137.0
+SQRT3 = math.sqrt(3)
+
+# Columns the index needs from the change feed
+INDEX_FIELDS = ['id', 'lat', 'lng', 'property_type', 'price_mxn', 'size_m2', 'deal_score', 'is_active']
+
+
+def lnglat_to_meters(lng: float, lat: float) -> Tuple[float, float]:
+    """Spherical Web Mercator projection"""
+    lat = max(-85.05112878, min(85.05112878, lat))
+    x = math.radians(lng) * EARTH_RADIUS_M
+    y = math.log(math.tan(math.pi / 4 + math.radians(lat) / 2)) * EARTH_RADIUS_M
+    return x, y
+
+
+def meters_to_lnglat(x: float, y: float) -> Tuple[float, float]:
+    """Inverse of lnglat_to_meters"""
+    lng = math.degrees(x / EARTH_RADIUS_M)
+    lat = math.degrees(2 * math.atan(math.exp(y / EARTH_RADIUS_M)) - math.pi / 2)
+    return lng, lat
+
+
+def point_to_hex(x: float, y: float, size: float) -> Tuple[int, int]:
+    """Axial (q, r) of the pointy-top hexagon with circumradius `size` containing (x, y)"""
+    qf = (SQRT3 / 3 * x - y / 3) / size
+    rf = (2 / 3 * y) / size
+    sf = -qf - rf
+    
+    # Cube rounding: fix the coordinate with the largest rounding error
+    q, r, s = round(qf), round(rf), round(sf)
+    dq, dr, ds = abs(q - qf), abs(r - rf), abs(s - sf)
+    if dq > dr and dq > ds:
+        q = -r - s
+    elif dr > ds:
+        r = -q - s
+    return int(q), int(r)
+
+
+def hex_center(q: int, r: int, size: float) -> Tuple[float, float]:
+    """Center of a hexagon in projected meters"""
+    return size * SQRT3 * (q + r / 2), size * 1.5 * r
+
+
+def hex_boundary(q: int, r: int, size: float) -> List[List[float]]:
+    """Closed ring of [lng, lat] vertices for a hexagon"""
+    cx, cy = hex_center(q, r, size)
+    ring = []
+    for i in range(6):
+        angle = math.radians(60 * i - 30)
+        lng, lat = meters_to_lnglat(cx + size * math.cos(angle), cy + size * math.sin(angle))
+        ring.append([round(lng, 6), round(lat, 6)])
+    ring.append(ring[0])
+    return ring
+
+
+class _HexCell:
+    """Running aggregate for one hexagon"""
+    
+    __slots__ = ('count', 'prices_per_m2', 'deal_sum', 'deal_count')
+    
+    def __init__(self):
+        self.count = 0
+        self.prices_per_m2 = PriceHistogram()
+        self.deal_sum = 0.0
+        self.deal_count = 0
+    
+    def add(self, price_per_m2: Optional[float], deal_score: Optional[float], sign: int):
+        self.count += sign
+        if price_per_m2:
+            if sign > 0:
+                self.prices_per_m2.add(price_per_m2)
+            else:
+                self.prices_per_m2.remove(price_per_m2)
+        if deal_score is not None:
+            self.deal_sum += sign * deal_score
+            self.deal_count += sign
+
+
+class HexHeatmapIndex:
+    """
+    Multi-resolution hex aggregation over active geocoded listings.
+    
+    Resolutions are indexes into HEX_RESOLUTIONS_M (hexagon circumradius in
+    meters, coarse to fine). Like MapClusterIndex, the index advances an
+    updated_at watermark and only re-aggregates listings that changed.
+    """
+    
+    def __init__(self, db, resolutions: List[float] = None, refresh_interval: float = None):
+        self.db = db
+        self.resolutions = list(resolutions or config.HEX_RESOLUTIONS_M)
+        self.refresh_interval = (config.MAP_INDEX_REFRESH_SECONDS
+                                 if refresh_interval is None else refresh_interval)
+        # One dict per resolution: (property_type or None, q, r) -> _HexCell
+        self._levels = [dict() for _ in self.resolutions]
+        # listing id -> (hexes per resolution, property_type, price_per_m2, deal_score)
+        self._members = {}
+        self._watermark = None
+        # Last listing_deletions tombstone applied
+        self._deletions = None
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._members)
+    
+    def _apply(self, hexes: Tuple, property_type: Optional[str], price_per_m2: Optional[float],
+               deal_score: Optional[float], sign: int):
+        for level, (q, r) in zip(self._levels, hexes):
+            keys = ((None, q, r), (property_type, q, r)) if property_type else ((None, q, r),)
+            for key in keys:
+                cell = level.get(key)
+                if cell is None:
+                    cell = level[key] = _HexCell()
+                cell.add(price_per_m2, deal_score, sign)
+                if cell.count <= 0:
+                    del level[key]
+    
+    def upsert(self, listing: Dict):
+        """Add, move or remove a single listing depending on its current state"""
+        previous = self._members.pop(listing['id'], None)
+        if previous:
+            self._apply(*previous, -1)
+        
+        if not listing.get('is_active', 1) or listing.get('lat') is None or listing.get('lng') is None:
+            return
+        
+        x, y = lnglat_to_meters(listing['lng'], listing['lat'])
+        hexes = tuple(point_to_hex(x, y, size) for size in self.resolutions)
+        price, size_m2 = listing.get('price_mxn'), listing.get('size_m2')
+        price_per_m2 = price / size_m2 if price and size_m2 and size_m2 > 0 else None
+        entry = (hexes, listing.get('property_type'), price_per_m2, listing.get('deal_score'))
+        self._apply(*entry, 1)
+        self._members[listing['id']] = entry
+    
+    def apply_changes(self, listings: Iterable[Dict]) -> int:
+        """Fold a batch of changed listings into the index"""
+        applied = 0
+        with self._lock:
+            for listing in listings:
+                self.upsert(listing)
+                updated = listing.get('updated_at')
+                if updated and (self._watermark is None or updated > self._watermark):
+                    self._watermark = updated
+                applied += 1
+        return applied
+    
+    def refresh(self, force: bool = False) -> int:
+        """Pull listings changed since the last refresh; throttled by refresh_interval"""
+        now = time.time()
+        if not force and now - self._last_refresh < self.refresh_interval:
+            return 0
+        self._last_refresh = now
+        self._deletions, changes = self.db.get_index_changes(
+            self._watermark, INDEX_FIELDS, self._deletions, self._members)
+        return self.apply_changes(changes)
+    
+    def query(self, resolution: int, west: float = None, south: float = None, east: float = None,
+              north: float = None, property_type: str = None, min_count: int = 1) -> Dict:
+        """Heatmap cells as a GeoJSON FeatureCollection"""
+        size = self.resolutions[resolution]
+        level = self._levels[resolution]
+        
+        if west is not None:
+            x0, y0 = lnglat_to_meters(west, south)
+            x1, y1 = lnglat_to_meters(east, north)
+            # Include hexagons whose center lies up to one radius outside the viewport
+            x0, y0, x1, y1 = x0 - size, y0 - size, x1 + size, y1 + size
+        
+        features = []
+        with self._lock:
+            for (ptype, q, r), cell in level.items():
+                if ptype != property_type or cell.count < min_count:
+                    continue
+                cx, cy = hex_center(q, r, size)
+                if west is not None and not (x0 <= cx <= x1 and y0 <= cy <= y1):
+                    continue
+                lng, lat = meters_to_lnglat(cx, cy)
+                features.append({
+                    'type': 'Feature',
+                    'geometry': {'type': 'Polygon', 'coordinates': [hex_boundary(q, r, size)]},
+                    'properties': {
+                        'hex': f"{resolution}/{q}/{r}",
+                        'center': [round(lng, 6), round(lat, 6)],
+                        'count': cell.count,
+                        'median_price_per_m2': cell.prices_per_m2.median(),
+                        'avg_deal_score': round(cell.deal_sum / cell.deal_count, 1) if cell.deal_count else None
+                    }
+                })
+        
+        return {
+            'type': 'FeatureCollection',
+            'resolution': resolution,
+            'hex_radius_m': size,
+            'features': features
+        }
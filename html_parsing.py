@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+Pluggable HTML parsing for the scrapers.
+
+parse(html) returns a Node with the small slice of the BeautifulSoup API the
+extraction code relies on: find / find_all (tag names, class names or class
+regexes, attribute filters, a `string` regex), select / select_one, text()
+and get(). Three backends implement it:
+
+- selectolax: the Lexbor C parser; tag, attribute and class-name filters run
+  as compiled CSS selectors and only regex filters run in Python
+- lxml: libxml2, with the same filters compiled to XPath
+- html.parser: BeautifulSoup over the pure-Python html.parser, always available
+
+HTML_PARSER picks one ("auto" takes the fastest installed). All backends
+follow BeautifulSoup's text rules: script and style contents and comments
+are not text, and a whitespace-only string outside <pre>/<textarea> reads as
+a single newline or space. In the C backends, scripts are only reachable through
+Document.scripts() and json_ld(), which are the hot path for pages that
+embed their listings as JSON-LD.
+
+make_soup() is for code that still needs a real BeautifulSoup: it uses the
+lxml tree builder when lxml is installed.
+"""
+
+import functools
+import json
+from typing import Dict, List, Optional, Pattern, Union
+
+from bs4 import BeautifulSoup
+
+from config import config
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:  # optional dependency
+    LexborHTMLParser = None
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:  # optional dependency
+    lxml = etree = None
+
+# Fastest first
+BACKENDS = ('selectolax', 'lxml', 'html.parser')
+
+# Elements whose content BeautifulSoup's get_text() leaves out
+NON_TEXT_TAGS = ('script', 'style', 'template')
+
+# BeautifulSoup's tree builder reduces a whitespace-only string to a single '\n'
+# (or ' ') everywhere except inside these
+PRESERVE_WHITESPACE_TAGS = ('pre', 'textarea')
+_ASCII_SPACES = '\x20\x0a\x09\x0c\x0d'
+
+TagFilter = Union[None, str, List[str]]
+ClassFilter = Union[None, str, Pattern]
+
+
+def available_backends() -> List[str]:
+    return [name for name in BACKENDS
+            if (name == 'selectolax' and LexborHTMLParser is not None)
+            or (name == 'lxml' and etree is not None)
+            or name == 'html.parser']
+
+
+def default_backend() -> str:
+    backend = config.HTML_PARSER
+    if backend == 'auto':
+        return available_backends()[0]
+    if backend not in available_backends():
+        raise ValueError(f"HTML_PARSER={backend!r} is not available; "
+                         f"installed: {', '.join(available_backends())}")
+    return backend
+
+
+def _class_matches(value: Optional[str], class_: ClassFilter) -> bool:
+    """BeautifulSoup's rule: any single class, or the whole attribute, matches"""
+    if not value:
+        return False
+    if isinstance(class_, str):
+        return value == class_ or class_ in value.split()
+    return any(class_.search(token) for token in value.split()) or bool(class_.search(value))
+
+
+class Node:
+    """One element; backends implement the underscore methods"""
+    
+    backend = None
+    
+    def find_all(self, tag: TagFilter = None, class_: ClassFilter = None, attrs: Dict = None,
+                 string: Pattern = None, limit: int = None) -> List['Node']:
+        """
+        Descendants matching every filter, in document order. `attrs` values
+        are True (attribute present) or an exact string; `string` is a regex
+        searched in the element's .string, as in BeautifulSoup: its only child
+        when that is text, or the .string of its only child element, so
+        <a><span>Precio</span></a> matches on both tags.
+        """
+        tags = [tag] if isinstance(tag, str) else list(tag or [])
+        attrs = dict(attrs or {})
+        # Plain class names compile into the selector; regexes and multi-class strings are checked here
+        if isinstance(class_, str) and ' ' not in class_:
+            class_name, class_ = class_, None
+        else:
+            class_name = None
+        
+        found = []
+        for node in self._candidates(tags, attrs, class_name):
+            if class_ is not None and not _class_matches(node.get('class'), class_):
+                continue
+            if string is not None:
+                text = node._string()
+                if text is None or not string.search(text):
+                    continue
+            found.append(node)
+            if limit and len(found) >= limit:
+                break
+        return found
+    
+    def find(self, tag: TagFilter = None, class_: ClassFilter = None, attrs: Dict = None,
+             string: Pattern = None) -> Optional['Node']:
+        found = self.find_all(tag, class_, attrs, string, limit=1)
+        return found[0] if found else None
+    
+    def select_one(self, css: str) -> Optional['Node']:
+        found = self.select(css)
+        return found[0] if found else None
+    
+    def __getitem__(self, name: str) -> str:
+        value = self.get(name)
+        if value is None:
+            raise KeyError(name)
+        return value
+    
+    def get_text(self, strip: bool = False) -> str:
+        """Alias of text() for code written against BeautifulSoup"""
+        return self.text(strip)
+
+
+class SelectolaxNode(Node):
+    backend = 'selectolax'
+    
+    def __init__(self, node):
+        self._node = node
+    
+    @property
+    def tag(self) -> str:
+        return self._node.tag
+    
+    def get(self, name: str, default=None):
+        value = self._node.attributes.get(name, default)
+        # Valueless attributes (<div hidden>) come back as None
+        return '' if value is None and name in self._node.attributes else value
+    
+    def text(self, strip: bool = False) -> str:
+        if strip:
+            return self._node.text(deep=True, separator='', strip=True)
+        return ''.join(_soup_whitespace(node.text(deep=False), node)
+                       for node in self._node.traverse(include_text=True) if node.tag == '-text')
+    
+    def _string(self) -> Optional[str]:
+        node = self._node
+        while True:
+            children = list(node.iter(include_text=True))
+            if len(children) != 1:
+                return None
+            node = children[0]
+            if node.tag == '-text':
+                return node.text(deep=False)
+            if node.tag == '-comment':
+                return node.comment_content
+    
+    def _candidates(self, tags: List[str], attrs: Dict, class_name: Optional[str]):
+        suffix = ''.join(f'[{name}]' if value is True else f'[{name}="{_css_escape(value)}"]'
+                         for name, value in attrs.items())
+        if class_name:
+            suffix += f'.{_css_escape(class_name)}'
+        css = ', '.join(f'{tag}{suffix}' for tag in tags) if tags else f'*{suffix}'
+        return self._select(css)
+    
+    def _select(self, css: str) -> List['SelectolaxNode']:
+        # Lexbor includes the node itself in its matches; BeautifulSoup only searches below it
+        own_id = self._node.mem_id
+        return [SelectolaxNode(node) for node in self._node.css(css) if node.mem_id != own_id]
+    
+    def select(self, css: str) -> List['SelectolaxNode']:
+        return self._select(css)
+
+
+def _soup_whitespace(text: str, node) -> str:
+    if not text or text.strip(_ASCII_SPACES):
+        return text
+    parent = node.parent
+    while parent is not None:
+        if parent.tag in PRESERVE_WHITESPACE_TAGS:
+            return text
+        parent = parent.parent
+    return _blank(text)
+
+
+def _css_escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+@functools.lru_cache(maxsize=256)
+def _xpath(tags: tuple, attrs: tuple, class_name: Optional[str]):
+    if len(tags) == 1:
+        path = f'descendant::{tags[0]}'
+    elif tags:
+        path = 'descendant::*[' + ' or '.join(f'self::{tag}' for tag in tags) + ']'
+    else:
+        path = 'descendant::*'
+    for i, (name, value) in enumerate(attrs):
+        path += f'[@{name}]' if value is True else f'[@{name}=$a{i}]'
+    if class_name:
+        path += "[contains(concat(' ', normalize-space(@class), ' '), $cls)]"
+    return etree.XPath(path)
+
+
+def _lxml_text(element, preserve: bool):
+    preserve = preserve or element.tag in PRESERVE_WHITESPACE_TAGS
+    if element.text:
+        yield element.text if preserve or element.text.strip(_ASCII_SPACES) else _blank(element.text)
+    for child in element:
+        if isinstance(child.tag, str):  # comments and processing instructions are not text
+            yield from _lxml_text(child, preserve)
+        if child.tail:
+            yield child.tail if preserve or child.tail.strip(_ASCII_SPACES) else _blank(child.tail)
+
+
+def _blank(text: str) -> str:
+    return '\n' if '\n' in text else ' '
+
+
+class LxmlNode(Node):
+    backend = 'lxml'
+    
+    def __init__(self, element):
+        self._element = element
+    
+    @property
+    def tag(self) -> str:
+        return self._element.tag
+    
+    def get(self, name: str, default=None):
+        return self._element.get(name, default)
+    
+    def text(self, strip: bool = False) -> str:
+        if strip:
+            return ''.join(s.strip() for s in self._element.itertext())
+        preserve = next(self._element.iterancestors(*PRESERVE_WHITESPACE_TAGS), None) is not None
+        return ''.join(_lxml_text(self._element, preserve))
+    
+    def _string(self) -> Optional[str]:
+        element = self._element
+        while True:
+            if not isinstance(element.tag, str):  # comment or processing instruction
+                return element.text
+            children = list(element)
+            if element.text:
+                return None if children else element.text
+            if len(children) != 1 or children[0].tail:
+                return None
+            element = children[0]
+    
+    def _candidates(self, tags: List[str], attrs: Dict, class_name: Optional[str]):
+        variables = {f'a{i}': value for i, value in enumerate(attrs.values()) if value is not True}
+        if class_name:
+            variables['cls'] = f' {class_name} '
+        xpath = _xpath(tuple(tags), tuple(attrs.items()), class_name)
+        return [LxmlNode(element) for element in xpath(self._element, **variables)]
+    
+    def select(self, css: str) -> List['LxmlNode']:
+        # Needs the cssselect package; find_all does not
+        return [LxmlNode(element) for element in self._element.cssselect(css)
+                if element is not self._element]
+
+
+class SoupNode(Node):
+    backend = 'html.parser'
+    
+    def __init__(self, tag):
+        self._tag = tag
+    
+    @property
+    def tag(self) -> str:
+        return self._tag.name
+    
+    def get(self, name: str, default=None):
+        value = self._tag.get(name, default)
+        return ' '.join(value) if isinstance(value, list) else value
+    
+    def text(self, strip: bool = False) -> str:
+        return self._tag.get_text(strip=strip)
+    
+    def _string(self) -> Optional[str]:
+        return self._tag.string
+    
+    def find_all(self, tag: TagFilter = None, class_: ClassFilter = None, attrs: Dict = None,
+                 string: Pattern = None, limit: int = None) -> List['SoupNode']:
+        kwargs = {'class_': class_} if class_ is not None else {}
+        if string is not None:
+            kwargs['string'] = string
+        return [SoupNode(tag) for tag in self._tag.find_all(tag, attrs=attrs or {}, limit=limit, **kwargs)]
+    
+    def select(self, css: str) -> List['SoupNode']:
+        return [SoupNode(tag) for tag in self._tag.select(css)]
+
+
+class Document:
+    """A parsed page: the root Node plus the page's scripts"""
+    
+    def __init__(self, root: Node, scripts: List[tuple]):
+        self.root = root
+        self.backend = root.backend
+        # (type attribute, contents) of every <script>, in document order
+        self._scripts = scripts
+    
+    def __getattr__(self, name):
+        # find, find_all, select, text, ... act on the root element
+        return getattr(self.root, name)
+    
+    def scripts(self, type: str = None) -> List[str]:
+        """Contents of the page's <script> elements, optionally only those of one type"""
+        return [text for script_type, text in self._scripts
+                if type is None or (script_type or '').lower() == type]
+    
+    def json_ld(self) -> List:
+        """Parsed JSON-LD blocks; malformed ones are skipped"""
+        blocks = []
+        for text in self.scripts('application/ld+json'):
+            try:
+                blocks.append(json.loads(text))
+            except ValueError:
+                continue
+        return blocks
+
+
+def _parse_selectolax(html: str) -> Document:
+    tree = LexborHTMLParser(html)
+    scripts = [(node.attributes.get('type'), node.text(deep=True))
+               for node in tree.css('script')]
+    tree.strip_tags(list(NON_TEXT_TAGS))
+    return Document(SelectolaxNode(tree.root), scripts)
+
+
+def _parse_lxml(html: str) -> Document:
+    try:
+        root = lxml.html.document_fromstring(html)
+    except ValueError:
+        # Unicode input with an XML encoding declaration
+        root = lxml.html.document_fromstring(html.encode('utf-8'))
+    except etree.ParserError:
+        root = lxml.html.document_fromstring('<html></html>')
+    scripts = [(element.get('type'), element.text or '') for element in root.iter('script')]
+    for element in list(root.iter(*NON_TEXT_TAGS)):
+        # An empty comment in its place keeps the text on either side as separate
+        # strings (drop_tree() would merge them), as BeautifulSoup sees them
+        placeholder = etree.Comment('')
+        placeholder.tail = element.tail
+        element.getparent().replace(element, placeholder)
+    return Document(LxmlNode(root), scripts)
+
+
+def _parse_soup(html: str) -> Document:
+    soup = BeautifulSoup(html, 'html.parser')
+    scripts = [(script.get('type'), script.string or '') for script in soup.find_all('script')]
+    return Document(SoupNode(soup), scripts)
+
+
+PARSERS = {'selectolax': _parse_selectolax, 'lxml': _parse_lxml, 'html.parser': _parse_soup}
+
+
+def parse(html: str, backend: str = None) -> Document:
+    """Parse a page with `backend`, or the HTML_PARSER default"""
+    return PARSERS[backend or default_backend()](html or '')
+
+
+def make_soup(html: str) -> BeautifulSoup:
+    """BeautifulSoup built by lxml when installed (HTML_PARSER=html.parser keeps the Python builder)"""
+    builder = 'lxml' if etree is not None and config.HTML_PARSER != 'html.parser' else 'html.parser'
+    return BeautifulSoup(html, builder)
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Disk-backed conditional-GET cache for crawled pages.
+
+For every URL the cache keeps the last ETag, Last-Modified, a SHA-256 of
+the body and the (compressed) body itself in a small SQLite file. A
+re-crawl then:
+
+- skips the request entirely while the page is younger than its source's
+  max age (HTTP_CACHE_MAX_AGE, overridable per source),
+- otherwise sends If-None-Match / If-Modified-Since, so unchanged pages come
+  back as a bodiless 304,
+- and flags a 200 whose body hashes the same as last time, for servers that
+  ignore validators.
+
+In all three cases the page is reported unchanged and scrapers skip parsing
+it, so daily re-crawls only download and parse the pages that changed.
+
+"Unchanged" is measured against the last body a scraper finished with, not
+the last one downloaded: storing a response only saves its validators and
+body, and the page counts as processed once the caller says so with
+mark_processed(). A page whose parse or database write failed is handed
+out again on the next crawl, from the cache if it is still fresh or the
+server answers 304.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from config import config
+
+
+@dataclass
+class CacheEntry:
+    url: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    body_hash: str
+    body: bytes
+    content_type: Optional[str]
+    fetched_at: float
+    checked_at: float
+    processed_hash: Optional[str] = None
+    
+    @property
+    def processed(self) -> bool:
+        """The cached body is the one a scraper last finished with"""
+        return self.processed_hash == self.body_hash
+
+
+class HTTPCache:
+    """Per-URL validators, body hashes and bodies, with per-source freshness"""
+    
+    def __init__(self, path: str = None, max_age: float = None,
+                 max_age_by_source: Dict[str, float] = None):
+        self.path = path or config.HTTP_CACHE_PATH
+        self.max_age = config.HTTP_CACHE_MAX_AGE if max_age is None else max_age
+        self.max_age_by_source = (config.HTTP_CACHE_MAX_AGE_BY_SOURCE
+                                  if max_age_by_source is None else max_age_by_source)
+        self.stats = {'fresh': 0, 'not_modified': 0, 'unchanged': 0, 'changed': 0, 'new': 0,
+                      'bytes_downloaded': 0}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                body_hash TEXT NOT NULL,
+                body BLOB,
+                content_type TEXT,
+                fetched_at REAL NOT NULL,
+                checked_at REAL NOT NULL,
+                processed_hash TEXT
+            )
+        ''')
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(pages)')}
+        if 'processed_hash' not in columns:
+            # Caches written before processing was tracked: treat what they hold as processed
+            self._conn.execute('ALTER TABLE pages ADD COLUMN processed_hash TEXT')
+            self._conn.execute('UPDATE pages SET processed_hash = body_hash')
+        self._conn.commit()
+    
+    def lookup(self, url: str) -> Optional[CacheEntry]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT url, etag, last_modified, body_hash, body, content_type, fetched_at, checked_at, '
+                'processed_hash FROM pages WHERE url = ?', (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        entry = CacheEntry(*row)
+        entry.body = zlib.decompress(entry.body) if entry.body else b''
+        return entry
+    
+    def max_age_for(self, source: str = None) -> float:
+        return self.max_age_by_source.get(source, self.max_age)
+    
+    def is_fresh(self, entry: CacheEntry, source: str = None) -> bool:
+        """Young enough to reuse without asking the server"""
+        return time.time() - entry.checked_at < self.max_age_for(source)
+    
+    @staticmethod
+    def validators(entry: CacheEntry) -> Dict[str, str]:
+        """Conditional request headers for a cached page"""
+        headers = {}
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        return headers
+    
+    def record_fresh(self):
+        with self._lock:
+            self.stats['fresh'] += 1
+    
+    def record_not_modified(self, url: str):
+        """A 304 revalidated the cached copy"""
+        with self._lock:
+            self._conn.execute('UPDATE pages SET checked_at = ? WHERE url = ?', (time.time(), url))
+            self._conn.commit()
+            self.stats['not_modified'] += 1
+    
+    def store(self, url: str, body: bytes, headers) -> bool:
+        """Save a full response; returns True if the body is the one last processed"""
+        body_hash = hashlib.sha256(body).hexdigest()
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute('SELECT body_hash, fetched_at, processed_hash FROM pages WHERE url = ?',
+                                     (url,)).fetchone()
+            unchanged = row is not None and row[2] == body_hash
+            self._conn.execute('''
+                INSERT OR REPLACE INTO pages
+                    (url, etag, last_modified, body_hash, body, content_type, fetched_at, checked_at,
+                     processed_hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (url, headers.get('ETag'), headers.get('Last-Modified'), body_hash,
+                  zlib.compress(body), headers.get('Content-Type'),
+                  row[1] if row is not None and row[0] == body_hash else now, now,
+                  row[2] if row is not None else None))
+            self._conn.commit()
+            self.stats['bytes_downloaded'] += len(body)
+            self.stats['unchanged' if unchanged else 'changed' if row else 'new'] += 1
+        return unchanged
+    
+    def mark_processed(self, url: str, body: bytes):
+        """The caller is done with this body of url; identical bodies are reported unchanged from now on"""
+        with self._lock:
+            self._conn.execute('UPDATE pages SET processed_hash = ? WHERE url = ?',
+                               (hashlib.sha256(body).hexdigest(), url))
+            self._conn.commit()
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_shared: Optional[HTTPCache] = None
+_shared_lock = threading.Lock()
+
+
+def shared_cache() -> Optional[HTTPCache]:
+    """Process-wide cache, or None when HTTP_CACHE_ENABLED is off"""
+    global _shared
+    if not config.HTTP_CACHE_ENABLED:
+        return None
+    if _shared is None:
+        with _shared_lock:
+            if _shared is None:
+                _shared = HTTPCache()
+    return _shared
@@ -9,11 +9,11 @@ import time
 import cloudscraper
 import os
 from datetime import datetime
-from bs4 import BeautifulSoup
 
 # Add project root to path for database import
 sys.path.insert(0, '/Users/isaachomefolder/Desktop/polpi-mx')
 from database import PolpiDB
+from html_parsing import make_soup
 
 class Inmuebles24Scraper:
     def __init__(self):
@@ -87,7 +87,7 @@ class Inmuebles24Scraper:
             with open(os.path.join(self.html_dir, filename), 'w', encoding='utf-8') as f:
                 f.write(response.text)
             
-            soup = BeautifulSoup(response.text, 'html.parser')
+            soup = make_soup(response.text)
             
             # Parse JSON-LD data
             json_scripts = soup.find_all('script', type='application/ld+json')
@@ -9,11 +9,12 @@ import time
 import requests
 import os
 from datetime import datetime
-from bs4 import BeautifulSoup
 
 # Add project root to path for database import
 sys.path.insert(0, '/Users/isaachomefolder/Desktop/polpi-mx')
 from database import PolpiDB
+from html_parsing import make_soup
+from rate_limiter import polite_get
 
 class LamudiComprehensiveScraper:
     def __init__(self):
@@ -143,7 +144,7 @@ class LamudiComprehensiveScraper:
         """Extract listings from a single page"""
         try:
             print(f"Scraping {listing_type}/{property_type}: {url}")
-            response = self.session.get(url, timeout=30)
+            response = polite_get(self.session, url, timeout=30)
             response.raise_for_status()
             
             # Save HTML for debugging
@@ -151,7 +152,7 @@ class LamudiComprehensiveScraper:
             with open(os.path.join(self.html_dir, filename), 'w', encoding='utf-8') as f:
                 f.write(response.text)
             
-            soup = BeautifulSoup(response.text, 'html.parser')
+            soup = make_soup(response.text)
             json_scripts = soup.find_all('script', type='application/ld+json')
             
             listings = []
@@ -354,9 +355,6 @@ class LamudiComprehensiveScraper:
             total_rentals = sum(counts['rental'].values())
             print(f"  Running total: {total_sales} sales + {total_rentals} rentals = {len(all_listings)} total")
             
-            # Sleep between requests to be polite
-            time.sleep(2)
-            
             # Stop if we have a lot of listings (safety limit)
             if len(all_listings) >= 300:
                 print(f"\n⚠️  Reached 300 listing safety limit, stopping early")
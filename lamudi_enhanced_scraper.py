@@ -9,11 +9,12 @@ import time
 import requests
 import os
 from datetime import datetime
-from bs4 import BeautifulSoup
 
 # Add project root to path for database import
 sys.path.insert(0, '/Users/isaachomefolder/Desktop/polpi-mx')
 from database import PolpiDB
+from html_parsing import make_soup
+from rate_limiter import polite_get
 
 class LamudiEnhancedScraper:
     def __init__(self):
@@ -101,7 +102,7 @@ class LamudiEnhancedScraper:
         """Extract listings from a single page"""
         try:
             print(f"Scraping {listing_type}: {url}")
-            response = self.session.get(url, timeout=30)
+            response = polite_get(self.session, url, timeout=30)
             response.raise_for_status()
             
             # Save HTML for debugging
@@ -109,7 +110,7 @@ class LamudiEnhancedScraper:
             with open(os.path.join(self.html_dir, filename), 'w', encoding='utf-8') as f:
                 f.write(response.text)
             
-            soup = BeautifulSoup(response.text, 'html.parser')
+            soup = make_soup(response.text)
             json_scripts = soup.find_all('script', type='application/ld+json')
             
             listings = []
@@ -264,9 +265,6 @@ class LamudiEnhancedScraper:
             # Progress update
             print(f"Progress: {sales_count} sales + {rentals_count} rentals = {len(all_listings)} total")
             
-            # Sleep between requests to be polite
-            time.sleep(2)
-            
             # Stop if we have enough listings
             if len(all_listings) >= 200:
                 print(f"\n🎯 Reached target of 200+ listings ({len(all_listings)}), stopping")
@@ -9,11 +9,12 @@ import time
 import requests
 import os
 from datetime import datetime
-from bs4 import BeautifulSoup
 
 # Add project root to path for database import
 sys.path.insert(0, '/Users/isaachomefolder/Desktop/polpi-mx')
 from database import PolpiDB
+from rate_limiter import polite_get
+from html_parsing import parse
 
 class LamudiScraper:
     def __init__(self):
@@ -80,11 +81,51 @@ class LamudiScraper:
         
         return has_cdmx and not has_exclude
 
+    def extract_listings(self, html):
+        """CDMX listings from a search page's JSON-LD"""
+        json_scripts = parse(html).scripts('application/ld+json')
+        
+        listings = []
+        
+        for script in json_scripts:
+            try:
+                data = json.loads(script)
+                
+                # Handle the actual Lamudi structure
+                if isinstance(data, list) and data and '@graph' in data[0]:
+                    graph_data = data[0]['@graph']
+                    
+                    for graph_item in graph_data:
+                        if graph_item.get('@type') == 'SearchResultsPage':
+                            main_entity = graph_item.get('mainEntity', [])
+                            
+                            for entity in main_entity:
+                                if entity.get('@type') == 'ItemList':
+                                    item_list = entity.get('itemListElement', [])
+                                    
+                                    for item in item_list:
+                                        prop_data = item.get('item', {})
+                                        
+                                        if prop_data.get('@type') in ['Apartment', 'House', 'RealEstate']:
+                                            address = prop_data.get('address', {})
+                                            
+                                            # Only process CDMX properties
+                                            if self.is_cdmx_property(address):
+                                                listing = self.parse_property_data(prop_data)
+                                                if listing:
+                                                    listings.append(listing)
+            
+            except Exception as e:
+                print(f"Error parsing JSON: {e}")
+                continue
+        
+        return listings
+
     def extract_listings_from_page(self, url):
         """Extract listings from a single page"""
         try:
             print(f"Scraping: {url}")
-            response = self.session.get(url, timeout=30)
+            response = polite_get(self.session, url, timeout=30)
             response.raise_for_status()
             
             # Save HTML for debugging
@@ -92,42 +133,7 @@ class LamudiScraper:
             with open(os.path.join(self.html_dir, filename), 'w', encoding='utf-8') as f:
                 f.write(response.text)
             
-            soup = BeautifulSoup(response.text, 'html.parser')
-            json_scripts = soup.find_all('script', type='application/ld+json')
-            
-            listings = []
-            
-            for script in json_scripts:
-                try:
-                    data = json.loads(script.string)
-                    
-                    # Handle the actual Lamudi structure
-                    if isinstance(data, list) and data and '@graph' in data[0]:
-                        graph_data = data[0]['@graph']
-                        
-                        for graph_item in graph_data:
-                            if graph_item.get('@type') == 'SearchResultsPage':
-                                main_entity = graph_item.get('mainEntity', [])
-                                
-                                for entity in main_entity:
-                                    if entity.get('@type') == 'ItemList':
-                                        item_list = entity.get('itemListElement', [])
-                                        
-                                        for item in item_list:
-                                            prop_data = item.get('item', {})
-                                            
-                                            if prop_data.get('@type') in ['Apartment', 'House', 'RealEstate']:
-                                                address = prop_data.get('address', {})
-                                                
-                                                # Only process CDMX properties
-                                                if self.is_cdmx_property(address):
-                                                    listing = self.parse_property_data(prop_data)
-                                                    if listing:
-                                                        listings.append(listing)
-                    
-                except Exception as e:
-                    print(f"Error parsing JSON: {e}")
-                    continue
+            listings = self.extract_listings(response.text)
             
             print(f"Extracted {len(listings)} CDMX listings from {url}")
             return listings
@@ -227,9 +233,6 @@ class LamudiScraper:
             # Progress update
             print(f"Total listings so far: {len(all_listings)}")
             
-            # Sleep between requests
-            time.sleep(2)
-            
             # Stop if we have enough listings
             if len(all_listings) >= 150:
                 print(f"Reached target of 150+ listings ({len(all_listings)}), stopping")
@@ -9,11 +9,12 @@ import time
 import requests
 import os
 from datetime import datetime
-from bs4 import BeautifulSoup
 
 # Add project root to path for database import
 sys.path.insert(0, '/Users/isaachomefolder/Desktop/polpi-mx')
 from database import PolpiDB
+from rate_limiter import polite_get
+from html_parsing import parse
 
 class LamudiJSONScraper:
     def __init__(self):
@@ -55,7 +56,7 @@ class LamudiJSONScraper:
         """Fetch a page with retries"""
         try:
             print(f"Fetching: {url}")
-            response = self.session.get(url, timeout=30)
+            response = polite_get(self.session, url, timeout=30)
             response.raise_for_status()
             return response.text
         except Exception as e:
@@ -64,16 +65,14 @@ class LamudiJSONScraper:
 
     def extract_json_listings(self, html_content):
         """Extract listings from JSON-LD structured data"""
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
         # Find JSON-LD script tags
-        json_scripts = soup.find_all('script', type='application/ld+json')
+        json_scripts = parse(html_content).scripts('application/ld+json')
         
         listings = []
         
         for script in json_scripts:
             try:
-                data = json.loads(script.string)
+                data = json.loads(script)
                 
                 # Navigate to listings data
                 if '@graph' in data:
@@ -191,9 +190,6 @@ class LamudiJSONScraper:
             listings = self.scrape_page(url)
             all_listings.extend(listings)
             
-            # Be nice to the server
-            time.sleep(3)
-            
             # Stop if we have enough listings
             if len(all_listings) >= 200:
                 print(f"Reached {len(all_listings)} listings, stopping")
@@ -5,16 +5,16 @@ import sys
 import json
 import re
 import hashlib
-import time
 import requests
 import os
 from datetime import datetime
 from urllib.parse import urljoin
-from bs4 import BeautifulSoup
 
 # Add project root to path for database import
 sys.path.insert(0, '/Users/isaachomefolder/Desktop/polpi-mx')
 from database import PolpiDB
+from html_parsing import make_soup
+from rate_limiter import polite_get
 
 class LamudiScraper:
     def __init__(self):
@@ -70,14 +70,12 @@ class LamudiScraper:
         for attempt in range(max_retries):
             try:
                 print(f"Fetching: {url}")
-                response = self.session.get(url, timeout=30)
+                response = polite_get(self.session, url, timeout=30)
                 response.raise_for_status()
                 return response.text
             except Exception as e:
                 print(f"Attempt {attempt + 1} failed: {e}")
-                if attempt < max_retries - 1:
-                    time.sleep(5 * (attempt + 1))  # Progressive backoff
-                else:
+                if attempt == max_retries - 1:
                     print(f"Failed to fetch {url} after {max_retries} attempts")
                     return None
 
@@ -187,7 +185,7 @@ class LamudiScraper:
         self.save_html(html_content, filename)
         
         # Parse HTML
-        soup = BeautifulSoup(html_content, 'html.parser')
+        soup = make_soup(html_content)
         
         # Find listing containers - try different patterns
         listing_cards = []
@@ -248,9 +246,6 @@ class LamudiScraper:
                 listings = self.scrape_search_page(property_type, city, page)
                 all_listings.extend(listings)
                 
-                # Be nice to the server
-                time.sleep(2)
-                
                 # If no listings found, might have reached the end
                 if not listings and page > 1:
                     print(f"No listings found on page {page}, stopping")
@@ -10,11 +10,12 @@ import requests
 import os
 from datetime import datetime
 from urllib.parse import urljoin
-from bs4 import BeautifulSoup
 
 # Add project root to path for database import
 sys.path.insert(0, '/Users/isaachomefolder/Desktop/polpi-mx')
 from database import PolpiDB
+from html_parsing import make_soup
+from rate_limiter import polite_get
 
 class LamudiRealScraper:
     def __init__(self):
@@ -56,14 +57,12 @@ class LamudiRealScraper:
         for attempt in range(max_retries):
             try:
                 print(f"Fetching: {url}")
-                response = self.session.get(url, timeout=30)
+                response = polite_get(self.session, url, timeout=30)
                 response.raise_for_status()
                 return response.text
             except Exception as e:
                 print(f"Attempt {attempt + 1} failed: {e}")
-                if attempt < max_retries - 1:
-                    time.sleep(3)
-                else:
+                if attempt == max_retries - 1:
                     print(f"Failed to fetch {url}")
                     return None
 
@@ -108,7 +107,7 @@ class LamudiRealScraper:
         filename = f"lamudi_page_{int(time.time())}.html"
         self.save_html(html_content, filename)
 
-        soup = BeautifulSoup(html_content, 'html.parser')
+        soup = make_soup(html_content)
         
         # Look for any text patterns that indicate properties
         listings = []
@@ -195,9 +194,6 @@ class LamudiRealScraper:
             listings = self.scrape_page_simple(url)
             all_listings.extend(listings)
             
-            # Be nice to the server
-            time.sleep(2)
-            
             # Stop if we get enough listings
             if len(all_listings) > 200:
                 print(f"Reached {len(all_listings)} listings, stopping")
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Server-side map clustering for Polpi MX.
+
+Keeps a hierarchical Web Mercator grid over all active geocoded listings.
+Each zoom level splits every map tile into 4x4 cells (roughly 64px on
+screen), and every listing is counted in exactly one cell per level, so a
+viewport query only touches the cells that are on screen no matter how
+much inventory there is. Cells keep a count, a centroid and a price/m²
+histogram so they can report a median without storing every price.
+"""
+
+import math
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import config
+
+# Each tile is split into 2^TILE_SUBDIVISIONS cells per side
+TILE_SUBDIVISIONS = 2
+
+# Price/m² histogram bins are 2% wide on a log scale
+_BIN_RATIO = math.log(1.02)
+
+# Web Mercator cannot represent the poles
+_MAX_LAT = 85.05112878
+
+# Columns the index needs from the change feed
+INDEX_FIELDS = ['id', 'lat', 'lng', 'property_type', 'price_mxn', 'size_m2', 'is_active']
+
+
+def lnglat_to_unit(lng: float, lat: float) -> Tuple[float, float]:
+    """Project lng/lat to Web Mercator coordinates in [0, 1)"""
+    lat = max(-_MAX_LAT, min(_MAX_LAT, lat))
+    x = (lng + 180.0) / 360.0
+    sin_lat = math.sin(math.radians(lat))
+    y = 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return min(max(x, 0.0), 1.0 - 1e-12), min(max(y, 0.0), 1.0 - 1e-12)
+
+
+def unit_to_lnglat(x: float, y: float) -> Tuple[float, float]:
+    """Inverse of lnglat_to_unit"""
+    lng = x * 360.0 - 180.0
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y))))
+    return lng, lat
+
+
+class PriceHistogram:
+    """Sparse log-scale histogram supporting add, remove and approximate median"""
+    
+    __slots__ = ('bins', 'count')
+    
+    def __init__(self):
+        self.bins = {}
+        self.count = 0
+    
+    @staticmethod
+    def _bin(value: float) -> int:
+        return int(math.log(value) / _BIN_RATIO)
+    
+    def add(self, value: float):
+        b = self._bin(value)
+        self.bins[b] = self.bins.get(b, 0) + 1
+        self.count += 1
+    
+    def remove(self, value: float):
+        b = self._bin(value)
+        remaining = self.bins.get(b, 0) - 1
+        if remaining > 0:
+            self.bins[b] = remaining
+        else:
+            self.bins.pop(b, None)
+        self.count -= 1
+    
+    def median(self) -> Optional[float]:
+        """Median estimate, accurate to within one bin (~1%)"""
+        if self.count <= 0:
+            return None
+        target = (self.count + 1) / 2
+        seen = 0
+        for b in sorted(self.bins):
+            seen += self.bins[b]
+            if seen >= target:
+                # Geometric midpoint of the bin
+                return round(math.exp((b + 0.5) * _BIN_RATIO), 2)
+        return None
+
+
+class _Cell:
+    """Aggregate for one grid cell at one zoom level"""
+    
+    __slots__ = ('count', 'sum_x', 'sum_y', 'sum_price', 'priced', 'prices_per_m2')
+    
+    def __init__(self):
+        self.count = 0
+        self.sum_x = 0.0
+        self.sum_y = 0.0
+        self.sum_price = 0.0
+        self.priced = 0
+        self.prices_per_m2 = PriceHistogram()
+    
+    def add(self, x: float, y: float, price: Optional[float], price_per_m2: Optional[float], sign: int = 1):
+        self.count += sign
+        self.sum_x += sign * x
+        self.sum_y += sign * y
+        if price:
+            self.sum_price += sign * price
+            self.priced += sign
+        if price_per_m2:
+            if sign > 0:
+                self.prices_per_m2.add(price_per_m2)
+            else:
+                self.prices_per_m2.remove(price_per_m2)
+    
+    def to_dict(self, zoom: int, cx: int, cy: int) -> Dict:
+        lng, lat = unit_to_lnglat(self.sum_x / self.count, self.sum_y / self.count)
+        return {
+            'type': 'cluster',
+            'cell': f"{zoom}/{cx}/{cy}",
+            'lat': round(lat, 6),
+            'lng': round(lng, 6),
+            'count': self.count,
+            'avg_price': round(self.sum_price / self.priced, 2) if self.priced else None,
+            'median_price_per_m2': self.prices_per_m2.median(),
+            'expansion_zoom': zoom + 1
+        }
+
+
+def _listing_point(listing: Dict) -> Optional[Tuple[float, float, Optional[float], Optional[float]]]:
+    """Extract (x, y, price, price_per_m2) for a listing, or None if not mappable"""
+    if listing.get('lat') is None or listing.get('lng') is None:
+        return None
+    x, y = lnglat_to_unit(listing['lng'], listing['lat'])
+    price = listing.get('price_mxn')
+    size = listing.get('size_m2')
+    price_per_m2 = price / size if price and size and size > 0 else None
+    return x, y, price, price_per_m2
+
+
+class MapClusterIndex:
+    """
+    Hierarchical grid cluster index over active listings.
+    
+    The index is built from PolpiDB.iter_listing_changes and kept current by
+    pulling only listings whose updated_at moved past the last watermark,
+    so ingest never forces a full rebuild.
+    """
+    
+    def __init__(self, db, max_zoom: int = None, refresh_interval: float = None):
+        self.db = db
+        self.max_zoom = config.MAP_CLUSTER_MAX_ZOOM if max_zoom is None else max_zoom
+        self.refresh_interval = (config.MAP_INDEX_REFRESH_SECONDS
+                                 if refresh_interval is None else refresh_interval)
+        # One dict per zoom level: (property_type or None, cx, cy) -> _Cell
+        self._levels = [dict() for _ in range(self.max_zoom + 1)]
+        # listing id -> (x, y, price, price_per_m2, property_type) currently counted
+        self._members = {}
+        self._watermark = None
+        # Last listing_deletions tombstone applied
+        self._deletions = None
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._members)
+    
+    def _apply(self, point: Tuple, property_type: Optional[str], sign: int):
+        x, y, price, price_per_m2 = point
+        for zoom, level in enumerate(self._levels):
+            scale = 1 << (zoom + TILE_SUBDIVISIONS)
+            cx, cy = int(x * scale), int(y * scale)
+            for key in ((None, cx, cy), (property_type, cx, cy)) if property_type else ((None, cx, cy),):
+                cell = level.get(key)
+                if cell is None:
+                    cell = level[key] = _Cell()
+                cell.add(x, y, price, price_per_m2, sign)
+                if cell.count <= 0:
+                    del level[key]
+    
+    def upsert(self, listing: Dict):
+        """Add, move or remove a single listing depending on its current state"""
+        listing_id = listing['id']
+        previous = self._members.pop(listing_id, None)
+        if previous:
+            self._apply(previous[:4], previous[4], -1)
+        
+        if not listing.get('is_active', 1):
+            return
+        point = _listing_point(listing)
+        if point is None:
+            return
+        property_type = listing.get('property_type')
+        self._apply(point, property_type, 1)
+        self._members[listing_id] = point + (property_type,)
+    
+    def apply_changes(self, listings: Iterable[Dict]) -> int:
+        """Fold a batch of changed listings into the index"""
+        applied = 0
+        with self._lock:
+            for listing in listings:
+                self.upsert(listing)
+                updated = listing.get('updated_at')
+                if updated and (self._watermark is None or updated > self._watermark):
+                    self._watermark = updated
+                applied += 1
+        return applied
+    
+    def refresh(self, force: bool = False) -> int:
+        """Pull listings changed since the last refresh; throttled by refresh_interval"""
+        now = time.time()
+        if not force and now - self._last_refresh < self.refresh_interval:
+            return 0
+        self._last_refresh = now
+        self._deletions, changes = self.db.get_index_changes(
+            self._watermark, INDEX_FIELDS, self._deletions, self._members)
+        return self.apply_changes(changes)
+    
+    def query(self, west: float, south: float, east: float, north: float, zoom: float,
+              property_type: str = None) -> Tuple[int, List[Dict]]:
+        """Return the zoom level used and cluster aggregates for every non-empty cell in the viewport"""
+        z = max(0, min(int(zoom), self.max_zoom))
+        scale = 1 << (z + TILE_SUBDIVISIONS)
+        x0, y1 = lnglat_to_unit(west, south)
+        x1, y0 = lnglat_to_unit(east, north)
+        cx0, cx1 = int(x0 * scale), int(x1 * scale)
+        cy0, cy1 = int(y0 * scale), int(y1 * scale)
+        
+        level = self._levels[z]
+        clusters = []
+        with self._lock:
+            if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) <= len(level):
+                for cx in range(cx0, cx1 + 1):
+                    for cy in range(cy0, cy1 + 1):
+                        cell = level.get((property_type, cx, cy))
+                        if cell:
+                            clusters.append(cell.to_dict(z, cx, cy))
+            else:
+                for (ptype, cx, cy), cell in level.items():
+                    if ptype == property_type and cx0 <= cx <= cx1 and cy0 <= cy <= cy1:
+                        clusters.append(cell.to_dict(z, cx, cy))
+        
+        return z, clusters
+    
+    @staticmethod
+    def cluster_filtered(db, west: float, south: float, east: float, north: float, zoom: float,
+                         filters: Dict) -> Tuple[int, List[Dict]]:
+        """
+        Cluster listings matching filters the index does not cover, grouped per
+        grid cell in SQL so no listing rows leave the database. If the viewport
+        spans more than MAP_CLUSTER_MAX_CELLS cells at this zoom, coarser cells
+        are used. Returns the zoom the cells belong to and the clusters.
+        """
+        z = max(0, int(zoom))
+        x0, y1 = lnglat_to_unit(west, south)
+        x1, y0 = lnglat_to_unit(east, north)
+        while True:
+            scale = 1 << (z + TILE_SUBDIVISIONS)
+            cy0, cy1 = int(y0 * scale), int(y1 * scale)
+            cells = (int(x1 * scale) - int(x0 * scale) + 1) * (cy1 - cy0 + 1)
+            if z == 0 or cells <= config.MAP_CLUSTER_MAX_CELLS:
+                break
+            z -= 1
+        
+        # Top edge of each row below the first, north to south
+        row_edges = [unit_to_lnglat(0.0, cy / scale)[1] for cy in range(cy0 + 1, cy1 + 1)]
+        clusters = []
+        for row in db.get_grid_clusters_in_bbox(west, south, east, north, scale, row_edges, cy0, filters):
+            clusters.append({
+                'type': 'cluster',
+                'cell': f"{z}/{row['cx']}/{row['cy']}",
+                'lat': round(row['lat'], 6),
+                'lng': round(row['lng'], 6),
+                'count': row['count'],
+                'avg_price': round(row['avg_price'], 2) if row['avg_price'] is not None else None,
+                'median_price_per_m2': round(row['median_ppm2'], 2) if row['median_ppm2'] is not None else None,
+                'expansion_zoom': z + 1
+            })
+        return z, clusters
+    
+    def stats(self) -> Dict:
+        """Index size and freshness, for diagnostics"""
+        return {
+            'listings': len(self._members),
+            'cells': sum(len(level) for level in self._levels),
+            'max_zoom': self.max_zoom,
+            'watermark': self._watermark
+        }
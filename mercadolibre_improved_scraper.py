@@ -8,10 +8,10 @@ import hashlib
 import time
 import requests
 from datetime import datetime
-from bs4 import BeautifulSoup
 
 sys.path.insert(0, '/Users/isaachomefolder/Desktop/polpi-mx')
 from database import PolpiDB
+from html_parsing import make_soup
 
 class MercadoLibreImprovedScraper:
     def __init__(self):
@@ -193,7 +193,7 @@ class MercadoLibreImprovedScraper:
             response = self.session.get(url, timeout=30)
             response.raise_for_status()
             
-            soup = BeautifulSoup(response.text, 'html.parser')
+            soup = make_soup(response.text)
             listings = self.extract_listings_from_html(soup, listing_type, property_type)
             
             print(f"    → Extracted {len(listings)} listings")
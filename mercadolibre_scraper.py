@@ -17,9 +17,20 @@ from selenium.webdriver.support import expected_conditions as EC
 
 sys.path.insert(0, '/Users/isaachomefolder/Desktop/polpi-mx')
 from database import PolpiDB
+from rate_limiter import shared_limiter
+from embedded_state import BROWSER_SCRIPT, browser_session, fetch_state
+from replay import browser_driver, page_wait
 
 class MercadoLibreScraper:
     def __init__(self):
+        """Set up the HTTP session; Chrome is only started if a page needs rendering"""
+        self.driver = None
+        self.session = browser_session()
+        self.base_url = 'https://inmuebles.mercadolibre.com.mx'
+        self.data_dir = '/Users/isaachomefolder/Desktop/polpi-mx/data/mercadolibre'
+        os.makedirs(self.data_dir, exist_ok=True)
+
+    def init_driver(self):
         """Initialize undetected Chrome driver"""
         options = uc.ChromeOptions()
         options.add_argument('--headless=new')
@@ -32,10 +43,8 @@ class MercadoLibreScraper:
         }
         options.add_experimental_option("prefs", prefs)
         
-        self.driver = uc.Chrome(options=options, version_main=144)
-        self.base_url = 'https://inmuebles.mercadolibre.com.mx'
-        self.data_dir = '/Users/isaachomefolder/Desktop/polpi-mx/data/mercadolibre'
-        os.makedirs(self.data_dir, exist_ok=True)
+        self.driver = browser_driver(lambda: uc.Chrome(options=options, version_main=144),
+                                     source='mercadolibre')
 
     def get_search_urls(self, pages_per_category=10):
         """Generate search URLs for CDMX properties"""
@@ -68,32 +77,48 @@ class MercadoLibreScraper:
         return urls
 
     def extract_preloaded_state(self, url: str) -> Optional[Dict]:
-        """Load page and extract window.__PRELOADED_STATE__"""
+        """Read the page's embedded state over HTTP; render it in Chrome only if that fails"""
+        print(f"  Loading: {url}")
+        state = fetch_state(self.session, url)
+        if state:
+            print(f"  ✓ Found data object")
+            return state
+        print(f"  No embedded state in the HTML, falling back to Chrome")
+        return self.extract_preloaded_state_browser(url)
+
+    def extract_preloaded_state_browser(self, url: str) -> Optional[Dict]:
+        """Load page in Chrome and extract window.__PRELOADED_STATE__"""
         try:
-            print(f"  Loading: {url}")
+            if self.driver is None:
+                self.init_driver()
+            limiter = shared_limiter()
+            limiter.wait(url)
+            start = time.monotonic()
             self.driver.get(url)
             
             # Wait for page to load - try multiple times
             max_attempts = 3
             for attempt in range(max_attempts):
-                time.sleep(5 if attempt == 0 else 3)
+                page_wait(5 if attempt == 0 else 3)
                 
                 # Check for error page
                 if "Hubo un error" in self.driver.page_source:
                     print(f"  ⚠ Error page detected, attempt {attempt + 1}/{max_attempts}")
+                    limiter.record(url, 200, time.monotonic() - start, challenge=True)
                     if attempt < max_attempts - 1:
-                        time.sleep(2)
+                        limiter.wait(url)
+                        start = time.monotonic()
                         self.driver.refresh()
                         continue
                     else:
                         return None
                 
                 # Try to extract preloaded state
-                script = "return window.__PRELOADED_STATE__ || window.__NEXT_DATA__ || null;"
-                preloaded_state = self.driver.execute_script(script)
+                preloaded_state = self.driver.execute_script(BROWSER_SCRIPT)
                 
                 if preloaded_state:
                     print(f"  ✓ Found data object")
+                    limiter.record(url, 200, time.monotonic() - start, challenge=False)
                     return preloaded_state
             
             print(f"  ⚠ No data object found after {max_attempts} attempts")
@@ -321,8 +346,6 @@ class MercadoLibreScraper:
                     print(f"\n✓ Reached goal ({len(all_listings)} listings)")
                     break
                 
-                time.sleep(2)
-                
             except Exception as e:
                 print(f"  ✗ Error: {e}")
                 continue
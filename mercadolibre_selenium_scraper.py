@@ -7,6 +7,7 @@ import re
 import hashlib
 import time
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Dict, List, Optional
 
@@ -20,12 +21,23 @@ from webdriver_manager.chrome import ChromeDriverManager
 
 sys.path.insert(0, '/Users/isaachomefolder/Desktop/polpi-mx')
 from database import PolpiDB
+from embedded_state import BROWSER_SCRIPT, browser_session, fetch_state
+from browser_pool import BrowserPool, lean_options, wait_for_script
 
 class MercadoLibreSeleniumScraper:
     def __init__(self, headless=True):
-        """Initialize Selenium scraper with Chrome"""
+        """Set up the HTTP session; Chrome is only started if a page needs rendering"""
+        self.session = browser_session()
+        self.headless = headless
+        self.pool = BrowserPool(self.new_browser, source='mercadolibre')
+        self.base_url = 'https://inmuebles.mercadolibre.com.mx'
+        self.data_dir = '/Users/isaachomefolder/Desktop/polpi-mx/data/mercadolibre'
+        os.makedirs(self.data_dir, exist_ok=True)
+
+    def new_browser(self):
+        """Start one Chrome for the browser pool"""
         chrome_options = Options()
-        if headless:
+        if self.headless:
             chrome_options.add_argument('--headless=new')
         chrome_options.add_argument('--no-sandbox')
         chrome_options.add_argument('--disable-dev-shm-usage')
@@ -44,15 +56,12 @@ class MercadoLibreSeleniumScraper:
         
         # Use 'none' page load strategy to not wait for full page load
         chrome_options.page_load_strategy = 'none'
+        lean_options(chrome_options)
         
         # Initialize driver with webdriver-manager
-        service = Service(ChromeDriverManager().install())
-        self.driver = webdriver.Chrome(service=service, options=chrome_options)
-        self.driver.set_page_load_timeout(60)
-        
-        self.base_url = 'https://inmuebles.mercadolibre.com.mx'
-        self.data_dir = '/Users/isaachomefolder/Desktop/polpi-mx/data/mercadolibre'
-        os.makedirs(self.data_dir, exist_ok=True)
+        driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
+        driver.set_page_load_timeout(60)
+        return driver
 
     def get_search_urls(self, pages_per_category=10):
         """Generate search URLs for CDMX properties"""
@@ -86,35 +95,22 @@ class MercadoLibreSeleniumScraper:
         return urls
 
     def extract_preloaded_state(self, url: str) -> Optional[Dict]:
+        """Read the page's embedded state over HTTP; render it with Selenium only if that fails"""
+        print(f"  Loading: {url}")
+        state = fetch_state(self.session, url)
+        if state:
+            return state
+        print(f"  No embedded state in the HTML, falling back to Chrome")
+        return self.extract_preloaded_state_browser(url)
+
+    def extract_preloaded_state_browser(self, url: str) -> Optional[Dict]:
         """Load page with Selenium and extract window.__PRELOADED_STATE__"""
         try:
-            print(f"  Loading: {url}")
-            self.driver.get(url)
-            
-            # Wait for the __PRELOADED_STATE__ to be available
-            # Since we're using page_load_strategy='none', we need to wait manually
+            # Since we're using page_load_strategy='none', wait for __PRELOADED_STATE__ itself
             max_wait = 15
-            wait_interval = 0.5
-            elapsed = 0
-            preloaded_state = None
-            
-            while elapsed < max_wait:
-                try:
-                    # Check if __PRELOADED_STATE__ is available
-                    script = """
-                    return window.__PRELOADED_STATE__ || window.__PRELOADED_STATES__ || null;
-                    """
-                    preloaded_state = self.driver.execute_script(script)
-                    
-                    if preloaded_state:
-                        break
-                    
-                    time.sleep(wait_interval)
-                    elapsed += wait_interval
-                    
-                except Exception:
-                    time.sleep(wait_interval)
-                    elapsed += wait_interval
+            with self.pool.browser() as driver:
+                self.pool.load(driver, url, timeout=max_wait)
+                preloaded_state = wait_for_script(driver, BROWSER_SCRIPT, timeout=max_wait)
             
             if preloaded_state:
                 # Save raw data for debugging (only first few pages to save space)
@@ -370,32 +366,31 @@ class MercadoLibreSeleniumScraper:
         print(f"   Target: {len(urls)} pages across {len(set(u['category'] for u in urls))} categories")
         print(f"   Goal: {max_listings}+ listings\n")
         
-        for i, search_info in enumerate(urls):
-            print(f"\n[{i+1}/{len(urls)}]", end=" ")
-            
+        def scrape(search_info):
             try:
-                listings = self.scrape_page(search_info)
-                all_listings.extend(listings)
-                
-                # Track stats
-                category = search_info['category']
-                if category not in stats_by_category:
-                    stats_by_category[category] = 0
-                stats_by_category[category] += len(listings)
+                return self.scrape_page(search_info)
+            except Exception as e:
+                print(f"  ✗ Error: {e}")
+                return []
+        
+        # Pages are fetched pool-size at a time; the shared rate limiter paces requests to the site
+        workers = self.pool.size
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for start in range(0, len(urls), workers):
+                batch = urls[start:start + workers]
+                for search_info, listings in zip(batch, executor.map(scrape, batch)):
+                    all_listings.extend(listings)
+                    
+                    # Track stats
+                    category = search_info['category']
+                    stats_by_category[category] = stats_by_category.get(category, 0) + len(listings)
                 
-                print(f"  Total so far: {len(all_listings)} listings")
+                print(f"\n[{start + len(batch)}/{len(urls)}]  Total so far: {len(all_listings)} listings")
                 
                 # Stop if we hit the goal
                 if len(all_listings) >= max_listings:
                     print(f"\n✓ Reached {max_listings}+ listings goal ({len(all_listings)})")
                     break
-                
-                # Rate limiting
-                time.sleep(2)
-                
-            except Exception as e:
-                print(f"  ✗ Error: {e}")
-                continue
         
         return all_listings, stats_by_category
 
@@ -432,9 +427,8 @@ class MercadoLibreSeleniumScraper:
         return stored_count
 
     def close(self):
-        """Close the browser"""
-        if self.driver:
-            self.driver.quit()
+        """Close the browsers"""
+        self.pool.close()
 
 def main():
     scraper = None
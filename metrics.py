@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Prometheus-style metrics for Polpi MX.
+
+A small dependency-free registry of counters, gauges and histograms that
+renders the Prometheus text exposition format for /metrics. Labelled
+children are resolved once, when a route is registered or a class is
+instrumented, and kept as plain references, so recording a sample on the
+request path is a couple of number updates with no label tuples, dict
+lookups or string formatting.
+"""
+
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+from starlette.exceptions import HTTPException
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+EXTERNAL_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0)
+
+_registry: List['_Metric'] = []
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+# --- Children (one per label combination) ---------------------------------
+
+class _CounterChild:
+    __slots__ = ('value', '_lock')
+    
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+    
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+    
+    def dec(self, amount: float = 1):
+        with self._lock:
+            self.value -= amount
+    
+    def set(self, value: float):
+        self.value = value
+
+
+class _HistogramChild:
+    __slots__ = ('bounds', 'counts', 'sum', '_lock')
+    
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # One slot per bucket plus the +Inf overflow; cumulated at render time
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float):
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+# --- Metric families ------------------------------------------------------
+
+class _Metric:
+    kind = None
+    
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+        _registry.append(self)
+    
+    def _new_child(self):
+        raise NotImplementedError
+    
+    def labels(self, *values) -> object:
+        """Child for a label combination; resolve once and keep the reference"""
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+    
+    def _label_str(self, key: Tuple[str, ...], extra: str = '') -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)]
+        if extra:
+            pairs.append(extra)
+        return '{' + ','.join(pairs) + '}' if pairs else ''
+    
+    def _samples(self, key: Tuple[str, ...], child) -> Iterable[str]:
+        yield f"{self.name}{self._label_str(key)} {_format_value(child.value)}"
+    
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            lines.extend(self._samples(key, child))
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+    
+    def _new_child(self):
+        return _CounterChild()
+    
+    def inc(self, amount: float = 1):
+        self._children[()].inc(amount)
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+    
+    def _new_child(self):
+        return _GaugeChild()
+    
+    def set(self, value: float):
+        self._children[()].set(value)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+    
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+    
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+    
+    def observe(self, value: float):
+        self._children[()].observe(value)
+    
+    def _samples(self, key: Tuple[str, ...], child) -> Iterable[str]:
+        with child._lock:
+            counts = list(child.counts)
+            total = child.sum
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            labels = self._label_str(key, f'le="{_format_value(bound)}"')
+            yield f"{self.name}_bucket{labels} {cumulative}"
+        yield f"{self.name}_sum{self._label_str(key)} {_format_value(total)}"
+        yield f"{self.name}_count{self._label_str(key)} {cumulative}"
+
+
+def render() -> str:
+    """All registered metrics in Prometheus text format"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.collect())
+    return '\n'.join(lines) + '\n'
+
+
+# --- Polpi metrics --------------------------------------------------------
+
+HTTP_REQUEST_SECONDS = Histogram(
+    'polpi_http_request_duration_seconds', 'Time spent in route handlers', ('route', 'method'))
+HTTP_RESPONSES = Counter(
+    'polpi_http_responses_total', 'Responses by route and status code', ('route', 'method', 'status'))
+HTTP_IN_FLIGHT = Gauge(
+    'polpi_http_requests_in_flight', 'Requests currently being handled', ('route',))
+
+ADMISSION_REJECTIONS = Counter(
+    'polpi_admission_rejections_total', 'Requests shed by admission control', ('pool', 'reason'))
+ADMISSION_QUEUED = Gauge(
+    'polpi_admission_queued_requests', 'Requests waiting for an admission slot', ('pool',))
+
+DB_QUERY_SECONDS = Histogram(
+    'polpi_db_query_duration_seconds', 'PolpiDB call latency by method', ('method',))
+DB_ERRORS = Counter(
+    'polpi_db_errors_total', 'PolpiDB calls that raised', ('method',))
+
+CACHE_REQUESTS = Counter(
+    'polpi_cache_requests_total', 'Cache lookups by cache and result', ('cache', 'result'))
+
+EXTERNAL_CALL_SECONDS = Histogram(
+    'polpi_external_call_duration_seconds', 'Latency of calls to external services',
+    ('service', 'operation'), buckets=EXTERNAL_BUCKETS)
+EXTERNAL_CALL_ERRORS = Counter(
+    'polpi_external_call_errors_total', 'External calls that raised', ('service', 'operation'))
+
+
+# --- Instrumentation helpers ----------------------------------------------
+
+class MetricsRoute(APIRoute):
+    """
+    APIRoute that records latency, in-flight requests and status codes.
+    
+    Label children are bound when the route is registered, keyed by the
+    route template (e.g. /api/v1/listings/{listing_id}) rather than the raw
+    path, so cardinality stays bounded.
+    """
+    
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        method = ','.join(sorted(self.methods or ()))
+        latency = HTTP_REQUEST_SECONDS.labels(self.path_format, method)
+        in_flight = HTTP_IN_FLIGHT.labels(self.path_format)
+        status_children = {}
+        
+        def responses(status: int):
+            child = status_children.get(status)
+            if child is None:
+                child = status_children[status] = HTTP_RESPONSES.labels(self.path_format, method, status)
+            return child
+        
+        async def instrumented_handler(request):
+            in_flight.inc()
+            start = time.perf_counter()
+            # Unhandled errors end up as 500s from the catch-all handler
+            status = 500
+            try:
+                response = await handler(request)
+                status = response.status_code
+                return response
+            except HTTPException as exc:
+                status = exc.status_code
+                raise
+            except RequestValidationError:
+                # Answered 422 by FastAPI's handler: bad client input, not a server error
+                status = 422
+                raise
+            finally:
+                latency.observe(time.perf_counter() - start)
+                in_flight.dec()
+                responses(status).inc()
+        
+        return instrumented_handler
+
+
+def _timed(func: Callable, latency: _HistogramChild, errors: _CounterChild) -> Callable:
+    if inspect.isgeneratorfunction(func):
+        # Time the full iteration, not just generator creation
+        @functools.wraps(func)
+        def generator_wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                yield from func(*args, **kwargs)
+            except Exception:
+                errors.inc()
+                raise
+            finally:
+                latency.observe(time.perf_counter() - start)
+        return generator_wrapper
+    
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            latency.observe(time.perf_counter() - start)
+    return wrapper
+
+
+def instrument_methods(cls, latency: Histogram, errors: Counter, methods: Iterable[str] = None,
+                       labels: Tuple[str, ...] = (), exclude: Iterable[str] = ()) -> type:
+    """
+    Wrap methods of a class so every call is timed into `latency`.
+    
+    `labels` are prepended to the method name to form the label values, so
+    DB_QUERY_SECONDS takes no prefix and EXTERNAL_CALL_SECONDS takes the
+    service name. Defaults to every public method defined on the class
+    except those in `exclude`.
+    Safe to call more than once.
+    """
+    if methods is None:
+        methods = [name for name, value in vars(cls).items()
+                   if not name.startswith('_') and inspect.isfunction(value) and name not in exclude]
+    
+    for name in methods:
+        func = vars(cls).get(name)
+        if func is None or getattr(func, '__polpi_instrumented__', False):
+            continue
+        wrapped = _timed(func, latency.labels(*labels, name), errors.labels(*labels, name))
+        wrapped.__polpi_instrumented__ = True
+        setattr(cls, name, wrapped)
+    return cls
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Polpi MX maintenance command line.
+
+Usage:
+    python3 polpi.py db synth --db data/bench.db [--listings 1000000] [--seed 42]
+    python3 polpi.py db audit [--listings 200000] [--db PATH] [--fail-on-scan]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+def run_audit_workload(db, rng: random.Random, rounds: int):
+    """Exercise the read paths the API serves"""
+    conn = db.get_connection()
+    neighborhoods = [tuple(row) for row in conn.execute(
+        "SELECT DISTINCT city, colonia FROM listings WHERE city IS NOT NULL AND colonia IS NOT NULL LIMIT 500")]
+    property_types = [row[0] for row in conn.execute(
+        "SELECT DISTINCT property_type FROM listings WHERE property_type IS NOT NULL")]
+    conn.close()
+    if not neighborhoods or not property_types:
+        return
+    sample_ids = [row['id'] for row in db.get_listings_paginated(per_page=100)['listings']]
+    lats = [lat for lat in (row.get('lat') for row in db.get_listings(limit=100)) if lat is not None] or [19.4]
+    lngs = [lng for lng in (row.get('lng') for row in db.get_listings(limit=100)) if lng is not None] or [-99.15]
+    
+    for _ in range(rounds):
+        city, colonia = rng.choice(neighborhoods)
+        ptype = rng.choice(property_types)
+        for sort_by in ('newest', 'price', 'price_desc', 'size', 'price_per_m2', 'deal_score'):
+            db.get_listings_paginated({'city': city}, page=rng.randint(1, 20), sort_by=sort_by)
+        db.get_listings_paginated({'city': city, 'property_type': ptype, 'min_price': 2_000_000,
+                                   'bedrooms': 2}, sort_by='price')
+        db.search_listings(colonia)
+        db.get_neighborhood_stats_enhanced(city, colonia, ptype)
+        db.get_market_trends(city, ptype)
+        if sample_ids:
+            db.find_comparables(rng.choice(sample_ids))
+            batch = rng.sample(sample_ids, min(20, len(sample_ids)))
+            db.find_comparables_batch(list(db.get_listings_by_ids(batch).values()))
+        lat, lng = rng.choice(lats), rng.choice(lngs)
+        db.get_listings_in_bbox(lng - 0.01, lat - 0.01, lng + 0.01, lat + 0.01)
+        db.get_thinned_listings_in_bbox(lng - 0.1, lat - 0.1, lng + 0.1, lat + 0.1, grid=64)
+    db.get_cities_with_stats()
+    db.get_stats()
+
+
+def cmd_db_synth(args) -> int:
+    from synthetic_data import SyntheticDatasetGenerator
+    
+    print(f"Generating {args.listings:,} synthetic listings into {args.db} (seed {args.seed})...")
+    generator = SyntheticDatasetGenerator(
+        args.db, seed=args.seed, history_years=args.history_years, duplicate_rate=args.duplicate_rate
+    )
+    summary = generator.generate(args.listings, batch_size=args.batch_size, fts=not args.no_fts)
+    print(f"Done: {summary['listings']:,} listings, {summary['price_history']:,} price points, "
+          f"{summary['duplicates']:,} duplicates in {summary['seconds']}s"
+          + (f" ({summary['skipped']:,} skipped: already stored)" if summary['skipped'] else ''))
+    if args.fingerprint:
+        print(f"Fingerprint: {SyntheticDatasetGenerator.fingerprint(args.db)}")
+    return 0
+
+
+def cmd_db_audit(args) -> int:
+    from database import PolpiDB
+    from query_audit import QUERY_STATS, audit_plans
+    from synthetic_data import SyntheticDatasetGenerator
+    
+    tmp_dir = None
+    db_path = args.db
+    if not db_path:
+        tmp_dir = tempfile.mkdtemp(prefix='polpi-audit-')
+        db_path = os.path.join(tmp_dir, 'audit.db')
+    
+    try:
+        if tmp_dir:
+            print(f"Seeding {args.listings:,} synthetic listings into {db_path}...")
+            summary = SyntheticDatasetGenerator(db_path, seed=args.seed).generate(args.listings, progress=None)
+            print(f"  done in {summary['seconds']}s")
+        db = PolpiDB(db_path)
+        
+        QUERY_STATS.reset()
+        start = time.time()
+        run_audit_workload(db, random.Random(args.seed), args.rounds)
+        elapsed = time.time() - start
+        
+        conn = db.get_connection()
+        entries = audit_plans(conn)
+        conn.close()
+        
+        total_s = sum(e['total_s'] for e in entries) or 1e-9
+        hot_flagged = []
+        print(f"\nWorkload: {args.rounds} rounds in {elapsed:.1f}s, {len(entries)} distinct statements\n")
+        print(f"{'share':>6} {'calls':>6} {'avg ms':>9} {'max ms':>9}  statement")
+        for entry in entries:
+            share = entry['total_s'] / total_s
+            flag = '!' if entry['problems'] else ' '
+            print(f"{share:6.1%} {entry['calls']:6d} {entry['avg_ms']:9.2f} {entry['max_s'] * 1000:9.2f} "
+                  f"{flag} {entry['sql'][:110]}")
+            if entry['problems'] and share >= args.hot_share:
+                hot_flagged.append(entry)
+        
+        if hot_flagged:
+            print(f"\nFull scans / temp sorts on hot statements (>= {args.hot_share:.0%} of DB time):")
+            for entry in hot_flagged:
+                print(f"\n  {entry['sql']}")
+                for step in entry['plan']:
+                    marker = '!!' if step in entry['problems'] else '  '
+                    print(f"    {marker} {step}")
+        else:
+            print("\nNo full scans on hot statements.")
+        
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump([{k: v for k, v in e.items() if k not in ('raw_sql', 'params')} for e in entries],
+                          f, indent=2, ensure_ascii=False)
+            print(f"\nReport written to {args.json}")
+        
+        return 1 if hot_flagged and args.fail_on_scan else 0
+    finally:
+        if tmp_dir and not args.keep:
+            for name in os.listdir(tmp_dir):
+                os.remove(os.path.join(tmp_dir, name))
+            os.rmdir(tmp_dir)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='polpi', description='Polpi MX maintenance commands')
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    db_parser = commands.add_parser('db', help='Database tools')
+    db_commands = db_parser.add_subparsers(dest='db_command', required=True)
+    
+    synth = db_commands.add_parser('synth', help='Generate a large deterministic synthetic dataset')
+    synth.add_argument('--db', required=True, help='Target database (created if missing, appended to otherwise)')
+    synth.add_argument('--listings', type=int, default=1_000_000)
+    synth.add_argument('--seed', type=int, default=42)
+    synth.add_argument('--history-years', type=int, default=3, help='Years of price history per listing')
+    synth.add_argument('--duplicate-rate', type=float, default=0.08, help='Share of cross-source duplicates')
+    synth.add_argument('--batch-size', type=int, default=20000, help='Rows per transaction')
+    synth.add_argument('--no-fts', action='store_true', help='Skip the full-text index')
+    synth.add_argument('--fingerprint', action='store_true', help='Print a content hash when done')
+    synth.set_defaults(func=cmd_db_synth)
+    
+    audit = db_commands.add_parser('audit', help='Flag full table scans on hot queries')
+    audit.add_argument('--db', help='Audit an existing database instead of a synthetic one')
+    audit.add_argument('--listings', type=int, default=200_000, help='Synthetic listing count')
+    audit.add_argument('--seed', type=int, default=42)
+    audit.add_argument('--rounds', type=int, default=20, help='Workload iterations')
+    audit.add_argument('--hot-share', type=float, default=0.02,
+                       help='Minimum share of DB time for a statement to count as hot')
+    audit.add_argument('--json', help='Also write the report as JSON')
+    audit.add_argument('--keep', action='store_true', help='Keep the synthetic database')
+    audit.add_argument('--fail-on-scan', action='store_true',
+                       help='Exit non-zero if a hot statement scans or sorts without an index')
+    audit.set_defaults(func=cmd_db_audit)
+    
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -12,8 +12,8 @@ from database import PolpiDB
 import hashlib
 
 class ProductionDataGenerator:
-    def __init__(self):
-        self.db = PolpiDB()
+    def __init__(self, db: PolpiDB = None):
+        self.db = db or PolpiDB()
         
         # CDMX colonias with real coordinates and pricing (MXN/m²)
         self.cities_data = {
@@ -97,6 +97,25 @@ class ProductionDataGenerator:
             "Cuauhtémoc": 4
         }
 
+        # Listings per colonia (weighted by desirability/size)
+        self.colonia_weights = {
+            "Polanco": 12,
+            "Condesa": 10,
+            "Roma Norte": 10,
+            "Roma Sur": 8,
+            "Santa Fe": 9,
+            "Coyoacán": 7,
+            "Del Valle": 8,
+            "Narvarte": 6,
+            "Nápoles": 6,
+            "San Ángel": 5,
+            "Lomas de Chapultepec": 7,
+            "Interlomas": 5,
+            "Pedregal": 4,
+            "Cuauhtémoc": 2,
+            "Juárez": 1
+        }
+
     def clear_existing_data(self):
         """Clear all existing data"""
         print("🧹 Clearing existing data...")
@@ -251,29 +270,10 @@ class ProductionDataGenerator:
         
         listings_generated = 0
         
-        # Calculate listings per colonia (weighted by desirability/size)
-        colonia_weights = {
-            "Polanco": 12,
-            "Condesa": 10,
-            "Roma Norte": 10,
-            "Roma Sur": 8,
-            "Santa Fe": 9,
-            "Coyoacán": 7,
-            "Del Valle": 8,
-            "Narvarte": 6,
-            "Nápoles": 6,
-            "San Ángel": 5,
-            "Lomas de Chapultepec": 7,
-            "Interlomas": 5,
-            "Pedregal": 4,
-            "Cuauhtémoc": 2,
-            "Juárez": 1
-        }
-
         city = "Ciudad de México"
         city_data = self.cities_data[city]
 
-        for colonia, weight in colonia_weights.items():
+        for colonia, weight in self.colonia_weights.items():
             colonia_target = int((weight / 100) * target_count)
             
             for i in range(colonia_target):
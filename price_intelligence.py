@@ -9,8 +9,8 @@ import random
 from datetime import datetime, timedelta
 
 class PriceIntelligence:
-    def __init__(self):
-        self.db = PolpiDB()
+    def __init__(self, db: PolpiDB = None):
+        self.db = db if db is not None else PolpiDB()
     
     def get_price_per_m2(self, listing: Dict) -> float:
         """Calculate price per m²"""
@@ -33,9 +33,6 @@ class PriceIntelligence:
         
         listing = dict(row)
         
-        # Calculate price per m²
-        price_per_m2 = self.get_price_per_m2(listing)
-        
         # Get neighborhood stats
         neighborhood_stats = self.db.get_neighborhood_stats_enhanced(
             listing['city'],
@@ -46,6 +43,13 @@ class PriceIntelligence:
         # Find comparables
         comparables = self.db.find_comparables(listing_id, limit=5)
         
+        return self._build_listing_analysis(listing, neighborhood_stats, comparables)
+    
+    def _build_listing_analysis(self, listing: Dict, neighborhood_stats: Dict, comparables: List[Dict]) -> Dict:
+        """Assemble the analysis payload from already-loaded listing data"""
+        # Calculate price per m²
+        price_per_m2 = self.get_price_per_m2(listing)
+        
         # Calculate deal score with breakdown
         deal_analysis = self.calculate_deal_score_detailed(listing, neighborhood_stats, comparables)
         
@@ -53,7 +57,7 @@ class PriceIntelligence:
         is_anomaly, anomaly_type = self.detect_anomaly(listing, neighborhood_stats)
         
         analysis = {
-            'listing_id': listing_id,
+            'listing_id': listing['id'],
             'price_mxn': listing['price_mxn'],
             'price_usd': listing['price_usd'],
             'size_m2': listing['size_m2'],
@@ -69,6 +73,81 @@ class PriceIntelligence:
         
         return analysis
     
+    def analyze_listings_batch(self, listing_ids: List[str], include_investment: bool = True) -> Dict[str, Dict]:
+        """
+        Analyze many listings at once, keyed by listing id.
+        
+        Listings are loaded in one query, neighborhood stats are computed once
+        per (city, colonia, property_type) group, and comparables are fetched
+        once per group, so cost grows with the number of distinct
+        neighborhoods rather than the number of listings.
+        """
+        listings = self.db.get_listings_by_ids(listing_ids)
+        
+        # Neighborhood stats shared by every listing in the same group
+        stats_cache = {}
+        for listing in listings.values():
+            key = (listing['city'], listing['colonia'], listing['property_type'])
+            if key not in stats_cache:
+                stats_cache[key] = self.db.get_neighborhood_stats_enhanced(*key)
+        
+        comparables = self.db.find_comparables_batch(list(listings.values()), limit=5)
+        
+        results = {}
+        for listing_id in listing_ids:
+            listing = listings.get(listing_id)
+            if not listing:
+                results[listing_id] = {'error': 'Listing not found'}
+                continue
+            
+            key = (listing['city'], listing['colonia'], listing['property_type'])
+            result = {
+                'analysis': self._build_listing_analysis(listing, stats_cache[key], comparables[listing_id])
+            }
+            if include_investment:
+                result['investment'] = self._build_investment_analysis(listing)
+            results[listing_id] = result
+        
+        return results
+    
+    def refresh_deal_scores(self, batch_size: int = 500) -> List[Dict]:
+        """
+        Compute and store deal scores for active listings that do not have one.
+        
+        insert_listing replaces the whole row, so any listing scraped since the
+        last run comes back with a NULL score. Returns id/lat/lng for every
+        rescored listing so callers can invalidate derived caches (map tiles).
+        """
+        rescored = []
+        while True:
+            conn = self.db.get_connection()
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT id FROM listings
+                WHERE deal_score IS NULL AND is_active = 1
+                LIMIT ?
+            """, (batch_size,))
+            ids = [row['id'] for row in cursor.fetchall()]
+            conn.close()
+            
+            if not ids:
+                break
+            
+            results = self.analyze_listings_batch(ids, include_investment=False)
+            scores = {
+                listing_id: result['analysis']['deal_score']
+                for listing_id, result in results.items()
+                if 'analysis' in result
+            }
+            if not scores:
+                break
+            self.db.update_deal_scores(scores)
+            
+            for listing in self.db.get_listings_by_ids(list(scores)).values():
+                rescored.append({'id': listing['id'], 'lat': listing['lat'], 'lng': listing['lng']})
+        
+        return rescored
+    
     def calculate_deal_score_detailed(self, listing: Dict, neighborhood_stats: Dict, comparables: List[Dict]) -> Dict:
         """
         Calculate detailed deal score (0-100) with factor breakdown
@@ -178,6 +257,10 @@ class PriceIntelligence:
         
         listing = dict(row)
         
+        return self._build_investment_analysis(listing)
+    
+    def _build_investment_analysis(self, listing: Dict) -> Dict:
+        """Compute investment metrics for an already-loaded listing"""
         if not listing.get('price_mxn'):
             return {'error': 'No price data available'}
         
@@ -260,7 +343,7 @@ class PriceIntelligence:
         cash_on_cash = (cash_flow / down_payment) * 100 if down_payment > 0 else 0
         
         return {
-            'listing_id': listing_id,
+            'listing_id': listing['id'],
             'purchase_price': price,
             'estimated_yield': round(estimated_yield * 100, 2),
             'monthly_rental': round(monthly_rental, 2),
@@ -409,7 +492,8 @@ class PriceIntelligence:
                 property_types = [dict(row) for row in cursor.fetchall()]
                 conn.close()
                 
-                stats['property_types'] = property_types
+                # Neighborhood stats come from the aggregate cache, which is read-only
+                stats = dict(stats, property_types=property_types)
                 comparison['neighborhoods'].append(stats)
         
         if len(comparison['neighborhoods']) >= 2:
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+On-demand profiling for the Polpi MX API process.
+
+Two admin-only tools, both writing to PROFILE_DIR:
+
+- SamplingProfiler: a background thread that snapshots every thread's
+  stack with sys._current_frames() at a fixed interval for N seconds and
+  writes flamegraph-compatible collapsed stacks (`.folded`, one
+  "frame;frame;frame count" line per unique stack).
+- ProfileMiddleware: runs cProfile around a single request when it carries
+  `X-Polpi-Profile: 1` and a valid `X-Admin-Token`, and writes `.pstats`.
+  cProfile only sees the thread it is enabled in, so routes built with
+  profiled_route() also profile sync endpoints inside the threadpool worker
+  that runs them; both profiles are merged into the one file.
+
+Nothing here is installed unless POLPI_ADMIN_TOKEN is set, so with
+profiling disabled the request path is untouched.
+"""
+
+import cProfile
+import functools
+import hmac
+import inspect
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Type
+
+from config import config
+
+PROFILE_HEADER = b'x-polpi-profile'
+ADMIN_TOKEN_HEADER = b'x-admin-token'
+
+# Profiles of sync endpoint calls made for the request being profiled, if any
+_thread_profiles: ContextVar[Optional[List[cProfile.Profile]]] = ContextVar('polpi_thread_profiles', default=None)
+
+
+def is_admin_token(token: Optional[str]) -> bool:
+    """Constant-time comparison against the configured admin token"""
+    if not config.ADMIN_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode(), config.ADMIN_TOKEN.encode())
+
+
+def _profile_path(kind: str, label: str, extension: str) -> str:
+    os.makedirs(config.PROFILE_DIR, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    slug = re.sub(r'[^A-Za-z0-9]+', '_', label).strip('_')[:60] or 'root'
+    return os.path.join(config.PROFILE_DIR, f"{kind}-{stamp}-{slug}.{extension}")
+
+
+def list_profiles() -> List[Dict]:
+    """Saved profiles, newest first"""
+    if not os.path.isdir(config.PROFILE_DIR):
+        return []
+    profiles = []
+    for name in os.listdir(config.PROFILE_DIR):
+        path = os.path.join(config.PROFILE_DIR, name)
+        stat = os.stat(path)
+        profiles.append({'file': name, 'bytes': stat.st_size, 'modified': stat.st_mtime})
+    return sorted(profiles, key=lambda p: p['modified'], reverse=True)
+
+
+class SamplingProfiler:
+    """Statistical wall-clock profiler over all threads of the process"""
+    
+    def __init__(self):
+        self._thread = None
+        self._stop = threading.Event()
+        self.status = {'running': False}
+    
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+    
+    def start(self, seconds: float, interval: float = 0.005, label: str = 'api') -> str:
+        """Start sampling in the background; returns the path the profile will be written to"""
+        if self.running:
+            raise RuntimeError("A sampling session is already running")
+        path = _profile_path('sample', label, 'folded')
+        self._stop.clear()
+        self.status = {
+            'running': True, 'file': os.path.basename(path), 'started_at': time.time(),
+            'seconds': seconds, 'interval': interval, 'samples': 0
+        }
+        self._thread = threading.Thread(
+            target=self._run, args=(seconds, interval, path), name='polpi-sampler', daemon=True
+        )
+        self._thread.start()
+        return path
+    
+    def stop(self):
+        self._stop.set()
+    
+    def _run(self, seconds: float, interval: float, path: str):
+        own_ident = threading.get_ident()
+        stacks = Counter()
+        samples = 0
+        deadline = time.monotonic() + seconds
+        
+        while time.monotonic() < deadline and not self._stop.is_set():
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}").replace(' ', '_'))
+                stacks[';'.join(reversed(stack))] += 1
+            samples += 1
+            self._stop.wait(interval)
+        
+        with open(path, 'w') as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        self.status.update(running=False, samples=samples, unique_stacks=len(stacks))
+
+
+sampler = SamplingProfiler()
+
+
+class ProfileMiddleware:
+    """ASGI middleware that cProfiles individual requests on demand"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        
+        headers = dict(scope.get('headers') or ())
+        if headers.get(PROFILE_HEADER) != b'1' or not is_admin_token(
+                headers.get(ADMIN_TOKEN_HEADER, b'').decode('latin-1')):
+            return await self.app(scope, receive, send)
+        
+        path = _profile_path('request', scope.get('path', ''), 'pstats')
+        
+        async def send_with_header(message):
+            if message['type'] == 'http.response.start':
+                message.setdefault('headers', [])
+                message['headers'] = list(message['headers']) + [
+                    (b'x-profile-file', os.path.basename(path).encode())
+                ]
+            await send(message)
+        
+        thread_profiles = []
+        token = _thread_profiles.set(thread_profiles)
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_with_header)
+        finally:
+            profiler.disable()
+            _thread_profiles.reset(token)
+            stats = pstats.Stats(profiler)
+            for thread_profile in thread_profiles:
+                stats.add(thread_profile)
+            stats.dump_stats(path)
+
+
+def _profile_in_thread(endpoint: Callable) -> Callable:
+    """Wrap a sync endpoint so a profiled request also profiles the worker thread running it"""
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        profiles = _thread_profiles.get()
+        if profiles is None:
+            return endpoint(*args, **kwargs)
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            profiler.disable()
+            profiles.append(profiler)
+    return wrapper
+
+
+def profiled_route(base: Type) -> Type:
+    """Subclass of the APIRoute class `base` whose sync endpoints ProfileMiddleware can see into"""
+    class ProfiledRoute(base):
+        def __init__(self, path: str, endpoint: Callable, **kwargs):
+            if not inspect.iscoroutinefunction(endpoint):
+                endpoint = _profile_in_thread(endpoint)
+            super().__init__(path, endpoint, **kwargs)
+    
+    return ProfiledRoute
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+SQL instrumentation for PolpiDB.
+
+PolpiDB opens its connections with AuditedConnection, whose cursors time
+every statement from execute() until its rows are read and fold the
+duration into per-statement statistics keyed by normalized SQL (literals
+and IN-lists collapsed). Statements slower than DB_SLOW_QUERY_MS are
+logged together with their EXPLAIN QUERY PLAN, and
+audit_plans() flags statements whose plan scans a whole table or sorts
+through a temporary B-tree.
+"""
+
+import logging
+import re
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+# Statements EXPLAIN QUERY PLAN is meaningful for
+_EXPLAINABLE = ('SELECT', 'WITH', 'UPDATE', 'DELETE')
+
+
+@lru_cache(maxsize=2048)
+def normalize_sql(sql: str) -> str:
+    """Collapse literals, IN-lists and whitespace so equivalent statements share stats"""
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    sql = _PLACEHOLDER_LIST.sub('(?, ...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+class QueryStats:
+    """Thread-safe per-statement call counts and timings"""
+    
+    def __init__(self):
+        self._stats: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+    
+    def record(self, sql: str, params, elapsed: float):
+        key = normalize_sql(sql)
+        with self._lock:
+            entry = self._stats.get(key)
+            if entry is None:
+                # Keep the first parameters seen so the plan can be re-explained later
+                entry = self._stats[key] = {
+                    'sql': key, 'raw_sql': sql,
+                    'params': tuple(params) if isinstance(params, list) else params,
+                    'calls': 0, 'total_s': 0.0, 'max_s': 0.0
+                }
+            entry['calls'] += 1
+            entry['total_s'] += elapsed
+            if elapsed > entry['max_s']:
+                entry['max_s'] = elapsed
+    
+    def snapshot(self) -> List[Dict]:
+        """Copy of all entries, most total time first"""
+        with self._lock:
+            entries = [dict(entry) for entry in self._stats.values()]
+        for entry in entries:
+            entry['avg_ms'] = round(entry['total_s'] / entry['calls'] * 1000, 3)
+        return sorted(entries, key=lambda e: e['total_s'], reverse=True)
+    
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+QUERY_STATS = QueryStats()
+
+
+def explain(conn: sqlite3.Connection, sql: str, params: Sequence = ()) -> List[str]:
+    """EXPLAIN QUERY PLAN detail lines for a statement, or [] if it can't be explained"""
+    if not sql.lstrip().upper().startswith(_EXPLAINABLE):
+        return []
+    try:
+        # Plain cursor so the EXPLAIN itself is not recorded
+        cursor = sqlite3.Cursor(conn)
+    except sqlite3.Error as e:
+        # A cursor dropped after its connection was closed
+        return [f"(explain failed: {e})"]
+    try:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params or ())
+        return [row[3] for row in cursor.fetchall()]
+    except sqlite3.Error as e:
+        return [f"(explain failed: {e})"]
+    finally:
+        cursor.close()
+
+
+def plan_problems(plan: List[str]) -> List[str]:
+    """Plan steps that read a whole table or sort without an index"""
+    problems = []
+    for step in plan:
+        if step.startswith('SCAN ') and ' USING ' not in step and 'VIRTUAL TABLE' not in step:
+            problems.append(step)
+        elif 'USE TEMP B-TREE' in step:
+            problems.append(step)
+    return problems
+
+
+class AuditedCursor(sqlite3.Cursor):
+    """
+    Cursor that times every statement and logs slow ones with their plan.
+    
+    A SELECT's time includes the fetches: SQLite does most of a scan while
+    rows are stepped through, not in execute(). Time spent inside execute
+    and the fetch calls is summed, and the statement is recorded once the
+    rows run out, the cursor is reused or closed, or it is dropped.
+    """
+    
+    _pending = None  # [sql, params, elapsed so far]
+    
+    def execute(self, sql, parameters=()):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._pending = [sql, parameters, time.perf_counter() - start]
+            if self.description is None:
+                self._finish()
+    
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._record(sql, None, time.perf_counter() - start)
+    
+    def fetchone(self):
+        if self._pending is None:
+            return super().fetchone()
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(start, row is None)
+        return row
+    
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        if self._pending is None:
+            return super().fetchmany(size)
+        start = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._fetched(start, len(rows) < size)
+        return rows
+    
+    def fetchall(self):
+        if self._pending is None:
+            return super().fetchall()
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(start, True)
+        return rows
+    
+    def __next__(self):
+        if self._pending is None:
+            return super().__next__()
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(start, True)
+            raise
+        self._fetched(start, False)
+        return row
+    
+    def close(self):
+        self._finish()
+        super().close()
+    
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+    
+    def _fetched(self, start: float, exhausted: bool):
+        self._pending[2] += time.perf_counter() - start
+        if exhausted:
+            self._finish()
+    
+    def _finish(self):
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            self._record(*pending)
+    
+    def _record(self, sql: str, params, elapsed: float):
+        QUERY_STATS.record(sql, params, elapsed)
+        threshold = self.connection.slow_query_s
+        if threshold is not None and elapsed >= threshold:
+            plan = explain(self.connection, sql, params) if params is not None else []
+            logger.warning(
+                f"Slow query ({elapsed * 1000:.1f}ms): {normalize_sql(sql)}"
+                + (f"\n  plan: {' | '.join(plan)}" if plan else "")
+            )
+
+
+class AuditedConnection(sqlite3.Connection):
+    """sqlite3 connection whose cursors, including the ones execute() opens, are AuditedCursors"""
+    
+    slow_query_s: Optional[float] = (config.DB_SLOW_QUERY_MS / 1000
+                                     if config.DB_SLOW_QUERY_MS > 0 else None)
+    
+    def cursor(self, factory=AuditedCursor):
+        return super().cursor(factory)
+    
+    # sqlite3's own shortcuts build a plain cursor without going through cursor()
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def audit_plans(conn: sqlite3.Connection, entries: List[Dict] = None) -> List[Dict]:
+    """
+    Re-explain every recorded statement and attach its plan and problems.
+    
+    Entries default to QUERY_STATS.snapshot(), so the result is ordered by
+    total time and full scans on hot statements come first.
+    """
+    entries = QUERY_STATS.snapshot() if entries is None else entries
+    for entry in entries:
+        plan = explain(conn, entry['raw_sql'], entry['params']) if entry['params'] is not None else []
+        entry['plan'] = plan
+        entry['problems'] = plan_problems(plan)
+    return entries
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Adaptive per-domain rate limiting for the scrapers.
+
+Every request to a site first takes a token from that domain's bucket, so
+requests to one portal are spaced at the domain's current rate while other
+portals proceed independently. The rate adapts AIMD-style: each healthy
+response adds SCRAPER_RATE_INCREASE requests/second, up to
+SCRAPER_MAX_RATE. A 429/503, a CAPTCHA or bot-challenge page, a connection
+failure, or a response much slower than the domain's usual latency
+multiplies the rate by SCRAPER_RATE_DECREASE, down to SCRAPER_MIN_RATE.
+Throttling responses also pause the domain for their Retry-After, or else
+for one interval at the reduced rate, so repeated throttling backs off
+exponentially.
+
+One limiter is shared by the async fetch engine, BaseScraper.fetch_page and
+the standalone portal scripts (via polite_get). snapshot() reports the
+settings and each domain's live state. In replay mode (replay.py) no request
+reaches a site, so the shared limiter is disabled.
+"""
+
+import asyncio
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+from config import config
+from replay import requests_response, shared_archive
+
+# Responses that mean "slow down"
+THROTTLE_STATUSES = {429, 503}
+
+# Fragments of CAPTCHA / bot-challenge pages served instead of content
+CHALLENGE_MARKERS = (
+    'cf-chl', '/cdn-cgi/challenge-platform', 'captcha-delivery.com', 'px-captcha',
+    'are you a robot', 'verify you are human', 'verifica que eres humano',
+    'unusual traffic', '<title>just a moment',
+)
+# Challenge pages are small; only look at the start of the document
+CHALLENGE_SCAN_CHARS = 20000
+
+# Smoothing for the per-domain latency average
+LATENCY_SMOOTHING = 0.2
+# A slow response must also be at least this much slower than average (seconds),
+# so jitter on fast sites isn't mistaken for overload
+SLOW_MARGIN_SECONDS = 0.5
+
+
+def domain_of(url: str) -> str:
+    host = urlsplit(url).netloc.lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+def is_challenge_page(text: Optional[str]) -> bool:
+    if not text:
+        return False
+    head = text[:CHALLENGE_SCAN_CHARS].lower()
+    return any(marker in head for marker in CHALLENGE_MARKERS)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class DomainLimiter:
+    """Token bucket for one domain whose refill rate adapts to the site's responses"""
+    
+    def __init__(self, domain: str, rate: float, min_rate: float, max_rate: float, burst: float,
+                 increase: float, decrease: float, latency_factor: float):
+        self.domain = domain
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.latency: Optional[float] = None
+        self.requests = 0
+        self.throttled = 0
+        self.last_throttle: Optional[str] = None
+        self._last_decrease = 0.0
+    
+    def reserve(self, now: float) -> float:
+        """Take a token; returns how long to wait before the request may start"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        start = now + max(0.0, -self.tokens / self.rate)
+        return max(start, self.paused_until) - now
+    
+    def _slow_down(self, now: float, reason: str, pause: Optional[float]):
+        # One multiplicative decrease per request interval, however many responses report trouble
+        if now - self._last_decrease >= 1 / self.rate:
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self._last_decrease = now
+        if pause is not None:
+            self.paused_until = max(self.paused_until, now + pause)
+        self.throttled += 1
+        self.last_throttle = reason
+    
+    def record(self, now: float, status: Optional[int], latency: Optional[float],
+               challenge: bool, retry_after: Optional[float]) -> Optional[str]:
+        """Adapt to one response; returns why the domain was slowed down, or None"""
+        self.requests += 1
+        if status is None:
+            self._slow_down(now, 'error', 1 / self.rate)
+            return 'error'
+        
+        slow = (latency is not None and self.latency is not None
+                and latency > self.latency * self.latency_factor
+                and latency > self.latency + SLOW_MARGIN_SECONDS)
+        if latency is not None:
+            self.latency = (latency if self.latency is None
+                            else self.latency + LATENCY_SMOOTHING * (latency - self.latency))
+        
+        if status in THROTTLE_STATUSES or challenge:
+            reason = 'challenge' if challenge else f'http_{status}'
+            self._slow_down(now, reason, retry_after if retry_after is not None else 1 / self.rate)
+            return reason
+        if slow:
+            self._slow_down(now, 'latency', None)
+            return 'latency'
+        if status < 400:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+        return None
+    
+    def snapshot(self, now: float) -> Dict:
+        return {
+            'rate': round(self.rate, 3),
+            'tokens': round(min(self.burst, self.tokens + (now - self.updated) * self.rate), 2),
+            'paused_for': round(max(0.0, self.paused_until - now), 2),
+            'latency_ms': round(self.latency * 1000, 1) if self.latency is not None else None,
+            'requests': self.requests,
+            'throttled': self.throttled,
+            'last_throttle': self.last_throttle
+        }
+
+
+class RateLimiter:
+    """Per-domain adaptive limiters, safe to share between threads and event loops"""
+    
+    def __init__(self, rate: float = None, min_rate: float = None, max_rate: float = None,
+                 burst: float = None, increase: float = None, decrease: float = None,
+                 latency_factor: float = None, enabled: bool = True):
+        self.enabled = enabled
+        self.settings = {
+            'rate': config.SCRAPER_RATE if rate is None else rate,
+            'min_rate': config.SCRAPER_MIN_RATE if min_rate is None else min_rate,
+            'max_rate': config.SCRAPER_MAX_RATE if max_rate is None else max_rate,
+            'burst': config.SCRAPER_BURST if burst is None else burst,
+            'increase': config.SCRAPER_RATE_INCREASE if increase is None else increase,
+            'decrease': config.SCRAPER_RATE_DECREASE if decrease is None else decrease,
+            'latency_factor': config.SCRAPER_LATENCY_FACTOR if latency_factor is None else latency_factor,
+        }
+        self._domains: Dict[str, DomainLimiter] = {}
+        self._lock = threading.Lock()
+    
+    def _limiter(self, url: str) -> DomainLimiter:
+        domain = domain_of(url)
+        limiter = self._domains.get(domain)
+        if limiter is None:
+            limiter = self._domains[domain] = DomainLimiter(domain, **self.settings)
+        return limiter
+    
+    def reserve(self, url: str) -> float:
+        if not self.enabled:
+            return 0.0
+        with self._lock:
+            return self._limiter(url).reserve(time.monotonic())
+    
+    def _paused_for(self, url: str) -> float:
+        # A throttle can arrive while a request is already waiting for its slot
+        with self._lock:
+            return self._limiter(url).paused_until - time.monotonic()
+    
+    def wait(self, url: str):
+        """Block until a request to url's domain may start"""
+        delay = self.reserve(url)
+        while delay > 0:
+            time.sleep(delay)
+            delay = self._paused_for(url)
+    
+    async def acquire(self, url: str):
+        """Async version of wait()"""
+        delay = self.reserve(url)
+        while delay > 0:
+            await asyncio.sleep(delay)
+            delay = self._paused_for(url)
+    
+    def record(self, url: str, status: Optional[int], latency: Optional[float] = None,
+               text: str = None, retry_after: str = None, challenge: bool = None) -> Optional[str]:
+        """
+        Feed one outcome back: status None for a failed request, `text` to check
+        for challenge pages (or pass `challenge` directly). Returns the reason the
+        domain was slowed down ('http_429', 'challenge', 'latency', 'error'), or None.
+        """
+        if not self.enabled:
+            return None
+        if challenge is None:
+            challenge = status is not None and status < 400 and is_challenge_page(text)
+        with self._lock:
+            limiter = self._limiter(url)
+            reason = limiter.record(time.monotonic(), status, latency, challenge,
+                                    parse_retry_after(retry_after))
+            rate = limiter.rate
+        if reason and reason != 'latency':
+            print(f"Rate limit: slowing {limiter.domain} to {rate:.2f} req/s ({reason})")
+        return reason
+    
+    def snapshot(self) -> Dict:
+        """Settings plus live per-domain state (rate, tokens, pause, latency, counters)"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                'settings': dict(self.settings),
+                'domains': {domain: limiter.snapshot(now) for domain, limiter in self._domains.items()}
+            }
+
+
+_shared: Optional[RateLimiter] = None
+_shared_lock = threading.Lock()
+
+
+def shared_limiter() -> RateLimiter:
+    global _shared
+    if _shared is None:
+        with _shared_lock:
+            if _shared is None:
+                _shared = RateLimiter(enabled=config.SCRAPER_MODE != 'replay')
+    return _shared
+
+
+def polite_get(session, url: str, limiter: RateLimiter = None, **kwargs):
+    """
+    session.get(url) paced and adapted by the shared per-domain limiter.
+    
+    Records the response in record mode and serves it from the archive in replay mode.
+    """
+    archive = shared_archive()
+    if archive is not None and archive.replaying:
+        return requests_response(archive.get(url))
+    limiter = limiter or shared_limiter()
+    limiter.wait(url)
+    start = time.monotonic()
+    try:
+        response = session.get(url, **kwargs)
+    except Exception:
+        limiter.record(url, None, time.monotonic() - start)
+        raise
+    elapsed = time.monotonic() - start
+    limiter.record(url, response.status_code, elapsed,
+                   response.text, response.headers.get('Retry-After'))
+    if archive is not None:
+        archive.record(url, response.content, response.status_code, response.headers, elapsed=elapsed)
+    return response
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Columnar in-memory read model for listing filtering and sorting.
+
+ListingReadModel mirrors the columns get_listings_paginated filters and
+sorts on into NumPy arrays, one slot per active listing, with city, colonia
+and property type dictionary-encoded. A page query becomes a handful of
+vectorized comparisons, an argpartition for the first offset + per_page
+keys and a sort of just those, after which only the rows on the page are
+read from SQLite. Sorts on expressions such as price per m² that SQLite
+cannot serve from an index no longer touch every row.
+
+The model follows the updated_at change feed like the map indexes. NumPy is
+optional: without it, or for filters and sorts the model does not cover,
+paginate() returns None and callers use PolpiDB.get_listings_paginated.
+"""
+
+import math
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from config import config
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+# Columns the model needs from the change feed
+INDEX_FIELDS = ['id', 'city', 'colonia', 'property_type', 'price_mxn', 'size_m2', 'bedrooms',
+                'bathrooms', 'deal_score', 'data_quality_score', 'scraped_date', 'is_active']
+
+# Dictionary-encoded text columns
+CATEGORICAL = ('city', 'colonia', 'property_type')
+
+# Float columns; NaN stands for NULL
+NUMERIC = ('price_mxn', 'size_m2', 'price_per_m2', 'bedrooms', 'bathrooms', 'deal_score',
+           'data_quality_score', 'scraped_ts')
+
+# Filters the model answers: name -> (column, operator); anything else falls back to SQL
+FILTERS = {
+    'city': ('city', '=='), 'colonia': ('colonia', '=='), 'property_type': ('property_type', '=='),
+    'min_price': ('price_mxn', '>='), 'max_price': ('price_mxn', '<='),
+    'bedrooms': ('bedrooms', '>='), 'bathrooms': ('bathrooms', '>='),
+    'min_size': ('size_m2', '>='), 'max_size': ('size_m2', '<='),
+    'min_deal_score': ('deal_score', '>='),
+}
+
+# Same orderings as get_listings_paginated: sort_by -> (column, descending)
+SORTS = {
+    'newest': ('scraped_ts', True),
+    'price': ('price_mxn', False),
+    'price_desc': ('price_mxn', True),
+    'size': ('size_m2', True),
+    'price_per_m2': ('price_per_m2', False),
+    'deal_score': ('data_quality_score', True),
+}
+
+# Walk the presorted order when at least this share of slots match; below it,
+# argpartition over the matches is cheaper
+DENSE_MATCH_RATIO = 1 / 64
+# Slots examined by the first step of a presorted walk; doubles each step
+SCAN_BLOCK = 4096
+
+
+def available() -> bool:
+    return np is not None
+
+
+def _timestamp(value: Optional[str]) -> float:
+    """Sortable number for an ISO date string; NaN if missing or unparseable"""
+    if not value:
+        return math.nan
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _number(value) -> float:
+    return math.nan if value is None else float(value)
+
+
+class ListingReadModel:
+    """NumPy column store over active listings answering paginated filter/sort queries"""
+    
+    def __init__(self, db, refresh_interval: float = None, initial_capacity: int = 1024):
+        if np is None:
+            raise RuntimeError("ListingReadModel requires numpy")
+        self.db = db
+        self.refresh_interval = (config.MAP_INDEX_REFRESH_SECONDS
+                                 if refresh_interval is None else refresh_interval)
+        self._capacity = initial_capacity
+        self._size = 0
+        self._numeric = {name: np.full(initial_capacity, np.nan) for name in NUMERIC}
+        self._codes = {name: np.full(initial_capacity, -1, dtype=np.int32) for name in CATEGORICAL}
+        self._active = np.zeros(initial_capacity, dtype=bool)
+        # Dictionary encoding per text column: value -> code
+        self._dictionaries: Dict[str, Dict[str, int]] = {name: {} for name in CATEGORICAL}
+        self._ids: List[Optional[str]] = []
+        self._slots: Dict[str, int] = {}
+        self._free: List[int] = []
+        # sort_by -> (version, slots in sort order), rebuilt lazily after changes
+        self._orders: Dict[str, tuple] = {}
+        self._version = 0
+        self._watermark = None
+        # Last listing_deletions tombstone applied
+        self._deletions = None
+        self._last_refresh = 0.0
+        self.ready = False
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._slots)
+    
+    def _grow(self, needed: int):
+        capacity = self._capacity
+        while capacity < needed:
+            capacity *= 2
+        if capacity == self._capacity:
+            return
+        for name, column in self._numeric.items():
+            grown = np.full(capacity, np.nan)
+            grown[:self._capacity] = column
+            self._numeric[name] = grown
+        for name, column in self._codes.items():
+            grown = np.full(capacity, -1, dtype=np.int32)
+            grown[:self._capacity] = column
+            self._codes[name] = grown
+        active = np.zeros(capacity, dtype=bool)
+        active[:self._capacity] = self._active
+        self._active = active
+        self._capacity = capacity
+    
+    def _encode(self, name: str, value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        dictionary = self._dictionaries[name]
+        code = dictionary.get(value)
+        if code is None:
+            code = dictionary[value] = len(dictionary)
+        return code
+    
+    def apply_changes(self, listings: Iterable[Dict]) -> int:
+        """Fold a batch of changed listings into the arrays"""
+        applied = 0
+        with self._lock:
+            slots, rows, vacated = [], [], []
+            for listing in listings:
+                applied += 1
+                updated = listing.get('updated_at')
+                if updated and (self._watermark is None or updated > self._watermark):
+                    self._watermark = updated
+                
+                slot = self._slots.get(listing['id'])
+                if not listing.get('is_active', 1):
+                    if slot is not None:
+                        del self._slots[listing['id']]
+                        self._ids[slot] = None
+                        self._free.append(slot)
+                        vacated.append(slot)
+                    continue
+                if slot is None:
+                    if self._free:
+                        slot = self._free.pop()
+                        self._ids[slot] = listing['id']
+                    else:
+                        slot = len(self._ids)
+                        self._ids.append(listing['id'])
+                    self._slots[listing['id']] = slot
+                slots.append(slot)
+                rows.append(listing)
+            
+            if vacated:
+                self._active[np.array(vacated)] = False
+            if rows:
+                self._grow(len(self._ids))
+                index = np.array(slots)
+                price = np.array([_number(r.get('price_mxn')) for r in rows])
+                size = np.array([_number(r.get('size_m2')) for r in rows])
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    per_m2 = np.where(size != 0, price / size, np.nan)
+                columns = {
+                    'price_mxn': price,
+                    'size_m2': size,
+                    'price_per_m2': per_m2,
+                    'bedrooms': [_number(r.get('bedrooms')) for r in rows],
+                    'bathrooms': [_number(r.get('bathrooms')) for r in rows],
+                    'deal_score': [_number(r.get('deal_score')) for r in rows],
+                    'data_quality_score': [_number(r.get('data_quality_score')) for r in rows],
+                    'scraped_ts': [_timestamp(r.get('scraped_date')) for r in rows],
+                }
+                for name, values in columns.items():
+                    self._numeric[name][index] = values
+                for name in CATEGORICAL:
+                    self._codes[name][index] = [self._encode(name, r.get(name)) for r in rows]
+                self._active[index] = True
+            if vacated or rows:
+                self._version += 1
+            self._size = len(self._ids)
+        return applied
+    
+    def refresh(self, force: bool = False) -> int:
+        """Pull listings changed since the last refresh; throttled by refresh_interval"""
+        now = time.time()
+        if not force and now - self._last_refresh < self.refresh_interval:
+            return 0
+        self._last_refresh = now
+        self._deletions, changes = self.db.get_index_changes(
+            self._watermark, INDEX_FIELDS, self._deletions, self._slots)
+        applied = self.apply_changes(changes)
+        self.ready = True
+        return applied
+    
+    def _sort_keys(self, sort_by: str, slots=None):
+        """Ascending keys for a sort: NULLs ordered as SQLite does, DESC negated"""
+        column, descending = SORTS[sort_by]
+        values = self._numeric[column][:self._size] if slots is None else self._numeric[column][slots]
+        # SQLite orders NULL below every value: first ascending, last descending
+        keys = np.where(np.isnan(values), -np.inf, values)
+        return -keys if descending else keys
+    
+    def _sorted_slots(self, sort_by: str):
+        """All slots (active or not) in sort order, cached until the next change"""
+        cached = self._orders.get(sort_by)
+        if cached is not None and cached[0] == self._version:
+            return cached[1]
+        order = np.argsort(self._sort_keys(sort_by), kind='stable').astype(np.int32)
+        self._orders[sort_by] = (self._version, order)
+        return order
+    
+    def covers(self, filters: Dict, sort_by: str) -> bool:
+        return sort_by in SORTS and all(name in FILTERS for name, value in filters.items() if value)
+    
+    def page_ids(self, filters: Dict, page: int, per_page: int, sort_by: str) -> Dict:
+        """Matching total and the ids on the requested page, in order"""
+        offset = (page - 1) * per_page
+        with self._lock:
+            n = self._size
+            mask = self._active[:n].copy()
+            for name, value in filters.items():
+                # Falsy filters are ignored, as in PolpiDB._build_filter_clause
+                if not value:
+                    continue
+                column, operator = FILTERS[name]
+                if column in self._codes:
+                    code = self._dictionaries[column].get(value)
+                    if code is None:
+                        return {'total': 0, 'ids': []}
+                    mask &= self._codes[column][:n] == code
+                elif operator == '>=':
+                    mask &= self._numeric[column][:n] >= value
+                else:
+                    mask &= self._numeric[column][:n] <= value
+            
+            total = int(np.count_nonzero(mask))
+            if offset >= total:
+                return {'total': total, 'ids': []}
+            end = min(offset + per_page, total)
+            
+            if total >= n * DENSE_MATCH_RATIO:
+                # Many matches: the first `end` of them in presorted order come up quickly
+                order = self._sorted_slots(sort_by)
+                found, needed, start, block = [], end, 0, SCAN_BLOCK
+                while needed > 0:
+                    chunk = order[start:start + block]
+                    hits = chunk[mask[chunk]]
+                    found.append(hits)
+                    needed -= hits.size
+                    start += block
+                    block *= 2
+                slots = np.concatenate(found)[offset:end]
+            else:
+                matches = np.flatnonzero(mask)
+                keys = self._sort_keys(sort_by, matches)
+                if end < total:
+                    candidates = np.argpartition(keys, end - 1)[:end]
+                    order = candidates[np.argsort(keys[candidates], kind='stable')]
+                else:
+                    order = np.argsort(keys, kind='stable')
+                slots = matches[order[offset:end]]
+            ids = [self._ids[slot] for slot in slots]
+        return {'total': total, 'ids': ids}
+    
+    def paginate(self, filters: Dict = None, page: int = 1, per_page: int = None,
+                 sort_by: str = 'newest') -> Optional[Dict]:
+        """
+        Same result as PolpiDB.get_listings_paginated, or None when the model
+        isn't built yet or the query uses a filter or sort it doesn't cover.
+        """
+        filters = filters or {}
+        if not self.ready or not self.covers(filters, sort_by):
+            return None
+        per_page = min(per_page or config.DEFAULT_PAGE_SIZE, config.MAX_PAGE_SIZE)
+        
+        result = self.page_ids(filters, page, per_page, sort_by)
+        total = result['total']
+        return {
+            'listings': self.db.get_listings_in_order(result['ids']),
+            'total': total,
+            'page': page,
+            'per_page': per_page,
+            'total_pages': (total + per_page - 1) // per_page,
+            'has_next': page * per_page < total,
+            'has_prev': page > 1
+        }
@@ -17,18 +17,26 @@ from selenium.common.exceptions import TimeoutException, NoSuchElementException
 # Add project root to path
 sys.path.insert(0, '/Users/isaachomefolder/Desktop/polpi-mx')
 from database import PolpiDB
+from browser_pool import BrowserPool, lean_options
+from config import config
+from seen_set import SeenSet
+from replay import page_wait
 
 class RemaxScraper:
     def __init__(self, headless=True):
         self.db = PolpiDB()
         self.headless = headless
-        self.driver = None
+        self.pool = None
         self.base_url = 'https://remax.com.mx/propiedades'
         self.inserted_count = 0
         self.error_count = 0
         
     def init_driver(self):
-        """Initialize Chrome webdriver"""
+        """Set up the pool of Chrome webdrivers (started on first use)"""
+        self.pool = BrowserPool(self.new_browser, source='remax')
+    
+    def new_browser(self):
+        """Start one Chrome webdriver for the pool"""
         chrome_options = Options()
         if self.headless:
             chrome_options.add_argument('--headless=new')
@@ -38,8 +46,10 @@ class RemaxScraper:
         chrome_options.add_argument('--disable-blink-features=AutomationControlled')
         chrome_options.add_argument('--user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
         
-        self.driver = webdriver.Chrome(options=chrome_options)
-        self.driver.implicitly_wait(5)
+        lean_options(chrome_options)
+        
+        # No implicit wait: pool.load() waits for the page, and missing elements fail fast
+        return webdriver.Chrome(options=chrome_options)
         
     def get_search_urls(self):
         """Generate search URLs for CDMX sales and rentals"""
@@ -90,12 +100,11 @@ class RemaxScraper:
         match = re.search(r'(\d+)', text)
         return int(match.group(1)) if match else None
     
-    def scrape_listing_page(self, listing_url):
+    def scrape_listing_page(self, driver, listing_url):
         """Scrape detailed information from a single listing page"""
         try:
             print(f"  → Scraping details: {listing_url}")
-            self.driver.get(listing_url)
-            time.sleep(2)  # Wait for page to load
+            self.pool.load(driver, listing_url, ready='h1')
             
             listing_data = {
                 'source': 'remax',
@@ -105,14 +114,14 @@ class RemaxScraper:
             
             # Extract title
             try:
-                title_elem = self.driver.find_element(By.CSS_SELECTOR, 'h1.property-title, h1')
+                title_elem = driver.find_element(By.CSS_SELECTOR, 'h1.property-title, h1')
                 listing_data['title'] = title_elem.text.strip()
             except NoSuchElementException:
                 listing_data['title'] = 'RE/MAX Property'
             
             # Extract price
             try:
-                price_elem = self.driver.find_element(By.CSS_SELECTOR, '.property-price, .price, [class*="price"]')
+                price_elem = driver.find_element(By.CSS_SELECTOR, '.property-price, .price, [class*="price"]')
                 listing_data['price_mxn'] = self.extract_price(price_elem.text)
             except NoSuchElementException:
                 pass
@@ -120,7 +129,7 @@ class RemaxScraper:
             # Extract property details
             try:
                 # Look for details section with bedrooms, bathrooms, size
-                details = self.driver.find_elements(By.CSS_SELECTOR, '.property-details li, .details-list li, [class*="detail"]')
+                details = driver.find_elements(By.CSS_SELECTOR, '.property-details li, .details-list li, [class*="detail"]')
                 
                 for detail in details:
                     text = detail.text.lower()
@@ -142,7 +151,7 @@ class RemaxScraper:
             
             # Extract location
             try:
-                location_elem = self.driver.find_element(By.CSS_SELECTOR, '.property-location, .location, [class*="location"]')
+                location_elem = driver.find_element(By.CSS_SELECTOR, '.property-location, .location, [class*="location"]')
                 location_text = location_elem.text
                 
                 # Parse location (usually "Colonia, Ciudad")
@@ -158,20 +167,20 @@ class RemaxScraper:
             
             # Extract description
             try:
-                desc_elem = self.driver.find_element(By.CSS_SELECTOR, '.property-description, .description, [class*="description"]')
+                desc_elem = driver.find_element(By.CSS_SELECTOR, '.property-description, .description, [class*="description"]')
                 listing_data['description'] = desc_elem.text.strip()[:1000]  # Limit to 1000 chars
             except NoSuchElementException:
                 pass
             
             # Extract agent info
             try:
-                agent_name_elem = self.driver.find_element(By.CSS_SELECTOR, '.agent-name, .agente, [class*="agent"]')
+                agent_name_elem = driver.find_element(By.CSS_SELECTOR, '.agent-name, .agente, [class*="agent"]')
                 listing_data['agent_name'] = agent_name_elem.text.strip()
             except NoSuchElementException:
                 pass
             
             try:
-                agent_phone_elem = self.driver.find_element(By.CSS_SELECTOR, '.agent-phone, [class*="telefono"], [class*="phone"]')
+                agent_phone_elem = driver.find_element(By.CSS_SELECTOR, '.agent-phone, [class*="telefono"], [class*="phone"]')
                 listing_data['agent_phone'] = agent_phone_elem.text.strip()
             except NoSuchElementException:
                 pass
@@ -208,7 +217,7 @@ class RemaxScraper:
                 
                 for selector in image_selectors:
                     try:
-                        img_elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
+                        img_elements = driver.find_elements(By.CSS_SELECTOR, selector)
                         for img in img_elements:
                             src = img.get_attribute('src') or img.get_attribute('data-src')
                             if src and 'http' in src and src not in images:
@@ -232,7 +241,7 @@ class RemaxScraper:
             # Try to extract coordinates from map if available
             try:
                 # Look for map data or script with coordinates
-                scripts = self.driver.find_elements(By.TAG_NAME, 'script')
+                scripts = driver.find_elements(By.TAG_NAME, 'script')
                 for script in scripts:
                     script_text = script.get_attribute('innerHTML') or ''
                     
@@ -253,30 +262,23 @@ class RemaxScraper:
             print(f"    ✗ Error scraping listing page: {e}")
             return None
     
-    def scrape_search_page(self, url):
+    def scrape_search_page(self, driver, url):
         """Scrape listing links from a search results page"""
         try:
             print(f"\n📄 Scraping search page: {url}")
-            self.driver.get(url)
-            
-            # Wait and scroll to trigger lazy loading
-            time.sleep(5)  # Initial wait for page load
+            self.pool.load(driver, url, ready='a[href*="/propiedades/"]')
             
-            # Scroll down to load more content
+            # Scroll down to trigger lazy loading of more cards
             for _ in range(3):
-                self.driver.execute_script("window.scrollBy(0, 1000);")
-                time.sleep(1)
-            
-            # Scroll back to top
-            self.driver.execute_script("window.scrollTo(0, 0);")
-            time.sleep(2)
+                driver.execute_script("window.scrollBy(0, 1000);")
+                page_wait(1)
             
             # Extract all listing links - RE/MAX uses cards with data attributes or onclick handlers
             listing_links = set()
             
             # Method 1: Try to find direct property links
             try:
-                links = self.driver.find_elements(By.CSS_SELECTOR, 'a[href*="/propiedades/"]')
+                links = driver.find_elements(By.CSS_SELECTOR, 'a[href*="/propiedades/"]')
                 for link in links:
                     href = link.get_attribute('href')
                     # Look for individual property pages (have specific ID or details)
@@ -287,7 +289,7 @@ class RemaxScraper:
             
             # Method 2: Look for cards with onclick or data attributes
             try:
-                cards = self.driver.find_elements(By.CSS_SELECTOR, '.card, [class*="property"], [class*="listing"]')
+                cards = driver.find_elements(By.CSS_SELECTOR, '.card, [class*="property"], [class*="listing"]')
                 for card in cards:
                     # Try to find links within cards
                     try:
@@ -314,7 +316,7 @@ class RemaxScraper:
             
             # Method 3: Check for JSON data in scripts
             try:
-                scripts = self.driver.find_elements(By.TAG_NAME, 'script')
+                scripts = driver.find_elements(By.TAG_NAME, 'script')
                 for script in scripts:
                     script_content = script.get_attribute('innerHTML') or ''
                     # Look for property URLs in JSON
@@ -329,7 +331,7 @@ class RemaxScraper:
             if not listing_links:
                 debug_file = f'/Users/isaachomefolder/Desktop/polpi-mx/remax_debug_{int(time.time())}.html'
                 with open(debug_file, 'w') as f:
-                    f.write(self.driver.page_source)
+                    f.write(driver.page_source)
                 print(f"  ⚠ No listings found - saved debug HTML to {debug_file}")
             
             return list(listing_links)
@@ -353,21 +355,25 @@ class RemaxScraper:
             
             all_listing_urls = set()
             
-            # Step 1: Collect all listing URLs from search pages
-            for search_url in search_urls:
-                listing_urls = self.scrape_search_page(search_url)
-                all_listing_urls.update(listing_urls)
-                time.sleep(3)  # Respectful delay between search pages
+            # Step 1: Collect all listing URLs from search pages (paced per domain by the pool)
+            for listing_urls in self.pool.imap(self.scrape_search_page, search_urls):
+                all_listing_urls.update(listing_urls or [])
             
             print(f"\n📊 Total unique listings found: {len(all_listing_urls)}")
             
-            # Step 2: Scrape each listing detail page
-            for i, listing_url in enumerate(all_listing_urls, 1):
-                print(f"\n[{i}/{len(all_listing_urls)}] Processing listing...")
+            # Incremental runs only open detail pages of listings not stored yet
+            if config.CRAWL_INCREMENTAL:
+                seen = SeenSet.load(self.db, ['remax'])
+                known = {url for url in all_listing_urls if seen.seen_url('remax', url)}
+                all_listing_urls -= known
+                print(f"⏭  Skipping {len(known)} listings already stored")
+            
+            # Step 2: Scrape listing detail pages across the pool's browsers
+            listing_urls = sorted(all_listing_urls)
+            for i, listing_data in enumerate(self.pool.imap(self.scrape_listing_page, listing_urls), 1):
+                print(f"\n[{i}/{len(listing_urls)}] Processing listing...")
                 
                 try:
-                    listing_data = self.scrape_listing_page(listing_url)
-                    
                     if listing_data and listing_data.get('title'):
                         # Validate minimum data quality
                         if not listing_data.get('price_mxn'):
@@ -390,9 +396,6 @@ class RemaxScraper:
                         print(f"    ⚠ Skipping: Insufficient data")
                         self.error_count += 1
                     
-                    # Respectful delay between listings
-                    time.sleep(2.5)
-                    
                 except Exception as e:
                     print(f"    ✗ Error processing listing: {e}")
                     self.error_count += 1
@@ -405,11 +408,12 @@ class RemaxScraper:
             print(f"✓ Successfully inserted: {self.inserted_count} listings")
             print(f"✗ Errors/Skipped: {self.error_count}")
             print(f"📸 Focus: High-quality professional images")
+            print(f"🌐 Browsers: {self.pool.stats}")
             print("=" * 60)
             
         finally:
-            if self.driver:
-                self.driver.quit()
+            if self.pool:
+                self.pool.close()
 
 def main():
     scraper = RemaxScraper(headless=True)
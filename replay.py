@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+Record/replay transport for the scrapers.
+
+SCRAPER_MODE picks how scrapers reach the sites:
+
+- live (default): plain network requests.
+- record: requests go out as usual and every response is archived in
+  SCRAPER_ARCHIVE_DIR. The archive holds the body plus its URL, status,
+  headers, source and timing. Selenium scrapers archive the rendered page
+  source and the results of their execute_script calls.
+- replay: nothing touches the network. polite_get, the async fetch engine
+  and the Selenium scrapers answer from the archive. The rate limiter and
+  page-load waits are skipped, so the whole scrape -> parse -> normalize ->
+  store pipeline runs at CPU speed against a fixed corpus. A URL missing
+  from the archive raises ReplayMissError like any other failed request.
+
+Bodies are stored one file per URL next to an append-only index.jsonl. The
+latest record for a URL wins, so re-recording refreshes the corpus in place.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from urllib.parse import urljoin
+
+from config import config
+
+MODES = ('live', 'record', 'replay')
+
+# Selenium's By values the replay driver understands
+CSS_SELECTOR = 'css selector'
+TAG_NAME = 'tag name'
+CLASS_NAME = 'class name'
+ID = 'id'
+NAME = 'name'
+
+# Attributes Selenium resolves to absolute URLs
+URL_ATTRIBUTES = {'href', 'src'}
+
+try:
+    from selenium.common.exceptions import NoSuchElementException
+except ImportError:  # replay works without selenium installed
+    class NoSuchElementException(Exception):
+        pass
+
+
+class ReplayMissError(LookupError):
+    """Replay asked for a URL that was never recorded"""
+
+
+@dataclass
+class ArchivedPage:
+    url: str
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+    recorded_at: str
+    source: Optional[str] = None
+    kind: str = 'http'
+    elapsed: Optional[float] = None
+    scripts: Dict[str, Any] = field(default_factory=dict)
+    
+    @property
+    def text(self) -> str:
+        return self.body.decode('utf-8', errors='replace')
+
+
+class PageArchive:
+    """Archived responses keyed by URL, plus small recorded values such as geocodes"""
+    
+    def __init__(self, directory: str = None, mode: str = None):
+        self.directory = directory or config.SCRAPER_ARCHIVE_DIR
+        self.mode = mode or config.SCRAPER_MODE
+        if self.mode not in MODES:
+            raise ValueError(f"SCRAPER_MODE must be one of {', '.join(MODES)}, not {self.mode!r}")
+        self.index_path = os.path.join(self.directory, 'index.jsonl')
+        self.stats = {'recorded': 0, 'replayed': 0, 'missed': 0}
+        self._entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries[entry['url']] = entry
+    
+    @property
+    def replaying(self) -> bool:
+        return self.mode == 'replay'
+    
+    @property
+    def recording(self) -> bool:
+        return self.mode == 'record'
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def _append(self, entry: Dict):
+        with self._lock:
+            self._entries[entry['url']] = entry
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self.stats['recorded'] += 1
+    
+    def record(self, url: str, body, status: int = 200, headers=None, source: str = None,
+               kind: str = 'http', elapsed: float = None, scripts: Dict = None):
+        """Archive one response; body may be str or bytes"""
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        filename = hashlib.sha1(url.encode('utf-8')).hexdigest() + '.html'
+        with open(os.path.join(self.directory, filename), 'wb') as f:
+            f.write(body)
+        self._append({
+            'url': url,
+            'file': filename,
+            'status': status,
+            # Drop transport headers that no longer describe the stored (decoded) body
+            'headers': {k: v for k, v in dict(headers or {}).items()
+                        if k.lower() not in ('content-encoding', 'content-length', 'transfer-encoding')},
+            'recorded_at': datetime.now().isoformat(),
+            'source': source,
+            'kind': kind,
+            'elapsed': round(elapsed, 3) if elapsed is not None else None,
+            'scripts': scripts or {}
+        })
+    
+    def lookup(self, url: str) -> Optional[ArchivedPage]:
+        entry = self._entries.get(url)
+        if entry is None or 'file' not in entry:
+            return None
+        with open(os.path.join(self.directory, entry['file']), 'rb') as f:
+            body = f.read()
+        return ArchivedPage(url=url, status=entry['status'], headers=entry['headers'], body=body,
+                            recorded_at=entry['recorded_at'], source=entry.get('source'),
+                            kind=entry.get('kind', 'http'), elapsed=entry.get('elapsed'),
+                            scripts=entry.get('scripts') or {})
+    
+    def get(self, url: str) -> ArchivedPage:
+        """Archived page for url; raises ReplayMissError if it was never recorded"""
+        page = self.lookup(url)
+        with self._lock:
+            self.stats['replayed' if page else 'missed'] += 1
+        if page is None:
+            raise ReplayMissError(f"No archived response for {url}")
+        return page
+    
+    def record_value(self, key: str, value):
+        """Archive a JSON-serializable result (e.g. a geocode) under a non-URL key"""
+        self._append({'url': key, 'value': value, 'recorded_at': datetime.now().isoformat(),
+                      'kind': 'value'})
+    
+    def value(self, key: str, default=None):
+        entry = self._entries.get(key)
+        return entry['value'] if entry is not None and 'value' in entry else default
+    
+    def urls(self, source: str = None) -> List[str]:
+        """Recorded page URLs, optionally for one source"""
+        return [url for url, entry in self._entries.items()
+                if 'file' in entry and (source is None or entry.get('source') == source)]
+
+
+_shared: Optional[PageArchive] = None
+_shared_lock = threading.Lock()
+
+
+def replaying() -> bool:
+    return config.SCRAPER_MODE == 'replay'
+
+
+def shared_archive() -> Optional[PageArchive]:
+    """Process-wide archive, or None in live mode"""
+    global _shared
+    if config.SCRAPER_MODE == 'live':
+        return None
+    if _shared is None:
+        with _shared_lock:
+            if _shared is None:
+                _shared = PageArchive()
+    return _shared
+
+
+def requests_response(page: ArchivedPage):
+    """Rebuild a requests.Response from an archived page"""
+    import requests
+    from requests.structures import CaseInsensitiveDict
+    
+    response = requests.Response()
+    response.status_code = page.status
+    response._content = page.body
+    response.headers = CaseInsensitiveDict(page.headers)
+    response.url = page.url
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers) or 'utf-8'
+    response.reason = 'Replayed'
+    return response
+
+
+def page_wait(seconds: float):
+    """time.sleep for page loads and politeness delays; skipped in replay"""
+    if not replaying():
+        time.sleep(seconds)
+
+
+# --- Selenium -------------------------------------------------------------------------------
+
+
+class RecordingDriver:
+    """
+    Wraps a live WebDriver and archives each page's final source when the
+    scraper moves on (next get() or quit()), so lazy-loaded content that
+    scrolling revealed is included. Non-empty execute_script results are
+    stored with the page for ReplayDriver to return.
+    """
+    
+    def __init__(self, driver, archive: PageArchive, source: str = None):
+        self._driver = driver
+        self._archive = archive
+        self._source = source
+        self._url = None
+        self._scripts = {}
+        self._started = None
+    
+    def __getattr__(self, name):
+        return getattr(self._driver, name)
+    
+    def _flush(self):
+        if self._url is None:
+            return
+        try:
+            source = self._driver.page_source
+        except Exception as e:
+            print(f"Could not archive {self._url}: {e}")
+        else:
+            self._archive.record(self._url, source, source=self._source, kind='browser',
+                                 elapsed=time.monotonic() - self._started, scripts=self._scripts)
+        self._url = None
+    
+    def get(self, url: str):
+        self._flush()
+        self._started = time.monotonic()
+        self._driver.get(url)
+        self._url = url
+        self._scripts = {}
+    
+    def execute_script(self, script: str, *args):
+        result = self._driver.execute_script(script, *args)
+        if self._url is not None and not args and result is not None:
+            try:
+                json.dumps(result)
+            except (TypeError, ValueError):
+                pass  # WebElements and other live objects can't be replayed
+            else:
+                self._scripts[script] = result
+        return result
+    
+    def quit(self):
+        self._flush()
+        self._driver.quit()
+
+
+def _select(tag, by: str, value: str):
+    if by == CSS_SELECTOR:
+        return tag.select(value)
+    if by == TAG_NAME:
+        return tag.find_all(value)
+    if by == CLASS_NAME:
+        return tag.find_all(class_=value)
+    if by == ID:
+        return tag.find_all(id=value)
+    if by == NAME:
+        return tag.find_all(attrs={'name': value})
+    raise NotImplementedError(f"Replay driver does not support locating by {by!r}")
+
+
+class ReplayElement:
+    """The parts of a WebElement the scrapers use, over a BeautifulSoup tag"""
+    
+    def __init__(self, tag, base_url: str = None):
+        self._tag = tag
+        self._base_url = base_url
+    
+    @property
+    def tag_name(self) -> str:
+        return self._tag.name
+    
+    @property
+    def text(self) -> str:
+        # Approximates Selenium's rendered text: one line per text block, trimmed
+        lines = (line.strip() for line in self._tag.get_text('\n').splitlines())
+        return '\n'.join(line for line in lines if line)
+    
+    def get_attribute(self, name: str) -> Optional[str]:
+        if name == 'innerHTML':
+            return self._tag.decode_contents()
+        if name == 'outerHTML':
+            return str(self._tag)
+        if name in ('textContent', 'innerText'):
+            return self._tag.get_text()
+        value = self._tag.get(name)
+        if value is None:
+            return None
+        if isinstance(value, list):
+            value = ' '.join(value)
+        if name in URL_ATTRIBUTES and self._base_url:
+            value = urljoin(self._base_url, value)
+        return value
+    
+    def is_displayed(self) -> bool:
+        return True
+    
+    def find_elements(self, by: str, value: str) -> List['ReplayElement']:
+        return [ReplayElement(tag, self._base_url) for tag in _select(self._tag, by, value)]
+    
+    def find_element(self, by: str, value: str) -> 'ReplayElement':
+        elements = self.find_elements(by, value)
+        if not elements:
+            raise NoSuchElementException(f"No element matching {by}={value!r}")
+        return elements[0]
+
+
+class ReplayDriver:
+    """Stands in for a WebDriver in replay mode, serving recorded pages without a browser"""
+    
+    def __init__(self, archive: PageArchive):
+        self._archive = archive
+        self._page: Optional[ArchivedPage] = None
+        self._soup = None
+        self.current_url = None
+    
+    def get(self, url: str):
+        self._page = self._archive.get(url)
+        self._soup = None
+        self.current_url = url
+    
+    @property
+    def page_source(self) -> str:
+        return self._page.text if self._page else ''
+    
+    def _root(self) -> ReplayElement:
+        if self._soup is None:
+            from bs4 import BeautifulSoup
+            self._soup = BeautifulSoup(self.page_source, 'html.parser')
+        return ReplayElement(self._soup, self.current_url)
+    
+    def find_elements(self, by: str, value: str) -> List[ReplayElement]:
+        return self._root().find_elements(by, value)
+    
+    def find_element(self, by: str, value: str) -> ReplayElement:
+        return self._root().find_element(by, value)
+    
+    def execute_script(self, script: str, *args):
+        return self._page.scripts.get(script) if self._page else None
+    
+    def refresh(self):
+        pass
+    
+    def implicitly_wait(self, seconds: float):
+        pass
+    
+    def set_page_load_timeout(self, seconds: float):
+        pass
+    
+    def quit(self):
+        pass
+
+
+def browser_driver(factory, source: str = None):
+    """
+    WebDriver for the current mode: factory() in live mode, factory() wrapped
+    in a RecordingDriver when recording, a ReplayDriver (no browser) in replay.
+    """
+    archive = shared_archive()
+    if archive is None:
+        return factory()
+    if archive.replaying:
+        return ReplayDriver(archive)
+    return RecordingDriver(factory(), archive, source)
@@ -1,109 +1,9 @@
 #!/usr/bin/env python3
-import sys
-sys.path.insert(0, '/Users/isaachomefolder/Desktop/polpi-mx')
+"""Full Lamudi CDMX crawl through the crawl scheduler (run_scrapers.py --sources lamudi)"""
 
-from lamudi_final_scraper import LamudiScraper
-from database import PolpiDB
-
-def main():
-    print("🚀 Starting full Lamudi CDMX scraper...")
-    
-    # Check current database count
-    db = PolpiDB()
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT COUNT(*) FROM listings WHERE source = "lamudi"')
-    initial_count = cursor.fetchone()[0]
-    conn.close()
-    print(f"Starting with {initial_count} existing Lamudi listings")
-    
-    scraper = LamudiScraper()
-    
-    # Define URLs to scrape (limited set to get ~150 listings efficiently)
-    urls = [
-        'https://www.lamudi.com.mx/departamento/for-sale/',
-        'https://www.lamudi.com.mx/departamento/for-sale/?page=2',
-        'https://www.lamudi.com.mx/departamento/for-sale/?page=3',
-        'https://www.lamudi.com.mx/departamento/for-sale/?page=4',
-        'https://www.lamudi.com.mx/departamento/for-sale/?page=5',
-        'https://www.lamudi.com.mx/departamento/for-sale/?page=6',
-        'https://www.lamudi.com.mx/departamento/for-sale/?page=7',
-        'https://www.lamudi.com.mx/departamento/for-sale/?page=8',
-        'https://www.lamudi.com.mx/casa/for-sale/',
-        'https://www.lamudi.com.mx/casa/for-sale/?page=2',
-        'https://www.lamudi.com.mx/casa/for-sale/?page=3',
-        'https://www.lamudi.com.mx/casa/for-sale/?page=4',
-        'https://www.lamudi.com.mx/casa/for-sale/?page=5',
-        'https://www.lamudi.com.mx/terreno/for-sale/',
-        'https://www.lamudi.com.mx/terreno/for-sale/?page=2'
-    ]
-    
-    all_listings = []
-    
-    for i, url in enumerate(urls):
-        print(f"\n--- Page {i+1}/{len(urls)} ---")
-        
-        listings = scraper.extract_listings_from_page(url)
-        all_listings.extend(listings)
-        
-        print(f"Running total: {len(all_listings)} listings")
-        
-        # Store every few pages to avoid losing data
-        if (i + 1) % 3 == 0 and listings:
-            batch = all_listings[-len(listings):]  # Get just the new listings
-            stored = scraper.store_in_database(batch)
-            print(f"Stored {stored} listings from this batch")
-        
-        # Stop if we have enough
-        if len(all_listings) >= 150:
-            print(f"Reached target! Total: {len(all_listings)} listings")
-            break
-        
-        # Sleep between requests
-        import time
-        time.sleep(3)
-    
-    # Store any remaining listings
-    if all_listings:
-        # Store all listings (replace any duplicates)
-        total_stored = scraper.store_in_database(all_listings)
-        print(f"\n💾 Total stored: {total_stored} listings")
-    
-    # Final database check
-    cursor = conn.cursor()
-    cursor.execute('SELECT COUNT(*) FROM listings WHERE source = "lamudi"')
-    final_count = cursor.fetchone()[0]
-    conn.close()
-    
-    print(f"\n🎯 Results:")
-    print(f"Initial count: {initial_count}")
-    print(f"Final count: {final_count}")
-    print(f"New listings added: {final_count - initial_count}")
-    
-    # Show sample of new listings
-    if all_listings:
-        print(f"\n🏠 Sample of scraped listings:")
-        for i, listing in enumerate(all_listings[:5]):
-            title = listing.get('title', 'No title')[:50]
-            price = listing.get('price_mxn')
-            price_str = f"${price:,.0f}" if price else "Price N/A"
-            size = listing.get('size_m2', 'N/A')
-            beds = listing.get('bedrooms', 'N/A')
-            location = listing.get('colonia', 'Unknown')
-            
-            print(f"{i+1}. {title}")
-            print(f"   {price_str} | {size} m² | {beds} bed(s) | {location}")
-    
-    if final_count >= 150:
-        print("\n🎉 SUCCESS! Target of 150+ real CDMX listings achieved!")
-    elif final_count >= 50:
-        print("\n✅ GOOD! Significant progress made with 50+ real listings!")
-    
-    print("\n📊 Final Summary:")
-    print(f"✓ Removed fake generated data")
-    print(f"✓ Added {final_count} real Lamudi listings from CDMX")
-    print(f"✓ All listings include: title, location, bedrooms, bathrooms, size, estimated prices")
-    print(f"✓ Data source: lamudi.com.mx")
+from run_scrapers import DataPipeline
+from sources import SOURCES
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    # Every result page of every Lamudi category that is due
+    DataPipeline().run_all_scrapers(sources=['lamudi'], pages=sum(SOURCES['lamudi'].categories.values()))
@@ -3,12 +3,21 @@
 
 import sys
 import os
-sys.path.append(os.path.join(os.path.dirname(__file__), 'scrapers'))
+# scrapers/ first: the standalone inmuebles24/vivanuncios scripts at the top level share their module names
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'scrapers'))
 
-from inmuebles24_scraper import Inmuebles24Scraper
-from vivanuncios_scraper import VivanunciosScraper
-from century21_scraper import Century21Scraper
+from crawl_scheduler import CrawlScheduler
+from sources import SOURCES, get_sources
+from fetch_engine import shared_engine
+from rate_limiter import shared_limiter
+from http_cache import shared_cache
+from replay import shared_archive
+from stream_pipeline import StreamPipeline
+from config import config
 from database import PolpiDB
+from price_intelligence import PriceIntelligence
+from vector_tiles import TileCache
+import asyncio
 import json
 from datetime import datetime
 from geopy.geocoders import Nominatim
@@ -20,6 +29,10 @@ class DataPipeline:
         self.db = PolpiDB()
         self.geocoder = Nominatim(user_agent="polpi-mx-prototype")
         self.geocode_cache = {}
+        self._seen_ids = set()
+        self.saved_count = 0
+        # Crawl scheduler feeding stream_all(), told which listings got stored
+        self.scheduler = None
     
     def geocode_location(self, city: str, colonia: str = None, state: str = None) -> tuple:
         """Geocode a location to lat/lng"""
@@ -39,12 +52,21 @@ class DataPipeline:
         if query in self.geocode_cache:
             return self.geocode_cache[query]
         
+        # Geocodes are archived alongside pages so replays stay offline and deterministic
+        archive = shared_archive()
+        if archive is not None and archive.replaying:
+            result = tuple(archive.value(f"geocode:{query}", (None, None)))
+            self.geocode_cache[query] = result
+            return result
+        
         try:
             time.sleep(1)  # Rate limit
             location = self.geocoder.geocode(query, timeout=10)
             if location:
                 result = (location.latitude, location.longitude)
                 self.geocode_cache[query] = result
+                if archive is not None:
+                    archive.record_value(f"geocode:{query}", result)
                 return result
         except GeocoderTimedOut:
             print(f"Geocoding timeout for: {query}")
@@ -55,9 +77,35 @@ class DataPipeline:
     
     def process_listing(self, raw_listing: dict) -> dict:
         """Process and normalize a raw listing"""
+        return self.geocode_listing(self.normalize_listing(raw_listing))
+    
+    def normalize_listing(self, raw_listing: dict) -> dict:
+        """Normalize a raw listing (pipeline stage)"""
         listing = raw_listing.copy()
         
-        # Geocode if no coordinates
+        # Ensure price_usd if we have price_mxn
+        if listing.get('price_mxn') and not listing.get('price_usd'):
+            listing['price_usd'] = round(listing['price_mxn'] / 17.0, 2)
+        
+        # Store raw data for debugging (without crawl bookkeeping such as _crawl_page)
+        listing['raw_data'] = json.dumps({k: v for k, v in raw_listing.items() if not k.startswith('_')})
+        
+        return listing
+    
+    def dedupe_listing(self, listing: dict) -> dict:
+        """Drop a listing already seen in this run, i.e. same source, URL and title (pipeline stage)"""
+        listing_id = listing.get('id') or self.db.generate_listing_id(
+            listing['source'], listing.get('url', ''), listing.get('title', ''))
+        if listing_id in self._seen_ids:
+            if self.scheduler is not None:
+                self.scheduler.stored(listing.pop('_crawl_page', None))
+            return None
+        self._seen_ids.add(listing_id)
+        listing['id'] = listing_id
+        return listing
+    
+    def geocode_listing(self, listing: dict) -> dict:
+        """Geocode if no coordinates (pipeline stage)"""
         if not listing.get('lat') or not listing.get('lng'):
             if listing.get('city'):
                 lat, lng = self.geocode_location(
@@ -68,16 +116,34 @@ class DataPipeline:
                 if lat and lng:
                     listing['lat'] = lat
                     listing['lng'] = lng
-        
-        # Ensure price_usd if we have price_mxn
-        if listing.get('price_mxn') and not listing.get('price_usd'):
-            listing['price_usd'] = round(listing['price_mxn'] / 17.0, 2)
-        
-        # Store raw data for debugging
-        listing['raw_data'] = json.dumps(raw_listing)
-        
         return listing
     
+    def store_batch(self, listings: list) -> int:
+        """Write a batch in one transaction, row by row if that fails (pipeline sink)"""
+        pages = [listing.pop('_crawl_page', None) for listing in listings]
+        try:
+            self.db.insert_listings(listings)
+            stored = len(listings)
+            ok = [True] * len(listings)
+        except Exception:
+            stored = 0
+            ok = []
+            for listing in listings:
+                try:
+                    self.db.insert_listing(listing)
+                    stored += 1
+                    ok.append(True)
+                except Exception as e:
+                    print(f"Error processing listing: {e}")
+                    ok.append(False)
+        if self.scheduler is not None:
+            # Pages count as processed in the page cache only once all their listings are stored
+            for page, written in zip(pages, ok):
+                self.scheduler.stored(page, written)
+        self.saved_count += stored
+        print(f"Stored {stored} listings ({self.saved_count} so far)")
+        return stored
+    
     def detect_duplicates(self):
         """Detect and mark duplicate listings"""
         print("\nDetecting duplicates...")
@@ -117,66 +183,73 @@ class DataPipeline:
         
         print(f"Found {duplicates_found} potential duplicates")
     
-    def run_all_scrapers(self, quick_mode: bool = False):
-        """Run all scrapers and populate database"""
-        print("=" * 60)
-        print("POLPI MX - Data Scraping Pipeline")
-        print("=" * 60)
+    async def stream_all(self, scheduler: CrawlScheduler, units: list, time_budget: float = None,
+                         budget: int = None) -> dict:
+        """
+        Crawl the planned result pages (see crawl_scheduler.py) and stream their
+        listings through normalize -> dedupe -> geocode -> store as pages arrive.
+        The scheduler keeps each source within its concurrency budget; bounded
+        queues between the stages hold the crawl back when geocoding or the
+        database falls behind.
+        """
+        self.scheduler = scheduler
+        pipeline = (StreamPipeline(queue_size=config.PIPELINE_QUEUE_SIZE)
+                    .stage('normalize', self.normalize_listing)
+                    .stage('dedupe', self.dedupe_listing)
+                    .stage('geocode', self.geocode_listing, workers=config.PIPELINE_GEOCODE_WORKERS, blocking=True)
+                    .sink('store', self.store_batch, batch_size=config.PIPELINE_BATCH_SIZE,
+                          flush_interval=config.PIPELINE_FLUSH_SECONDS))
         
-        max_pages = 1 if quick_mode else 2
-        all_listings = []
-        
-        # Scraper 1: Inmuebles24
-        print("\n[1/3] Running Inmuebles24 scraper...")
+        print(f"\nCrawling {len(units)} result pages from {len(scheduler.sources)} sources...")
         try:
-            scraper1 = Inmuebles24Scraper()
-            listings1 = scraper1.scrape(city='ciudad-de-mexico', max_pages=max_pages)
-            all_listings.extend(listings1)
-            print(f"✓ Inmuebles24: {len(listings1)} listings")
-        except Exception as e:
-            print(f"✗ Inmuebles24 failed: {e}")
+            stats = await pipeline.run({'crawl': scheduler.stream(units, time_budget, budget)})
+        finally:
+            await shared_engine().aclose()
         
-        # Scraper 2: Vivanuncios
-        print("\n[2/3] Running Vivanuncios scraper...")
-        try:
-            scraper2 = VivanunciosScraper()
-            listings2 = scraper2.scrape(city='distrito-federal', max_pages=max_pages)
-            all_listings.extend(listings2)
-            print(f"✓ Vivanuncios: {len(listings2)} listings")
-        except Exception as e:
-            print(f"✗ Vivanuncios failed: {e}")
+        if 'error' in stats['sources']['crawl']:
+            print(f"✗ Crawl stopped: {stats['sources']['crawl']['error']}")
+        for name, source in scheduler.stats.items():
+            print(f"✓ {name}: {source['pages']} pages ({source['unchanged']} unchanged), "
+                  f"{source['listings']} listings, {source['changed']} new or changed"
+                  + (f", {source['errors']} failed" if source['errors'] else ''))
+        stats['crawl'] = scheduler.stats
+        return stats
+    
+    def run_all_scrapers(self, quick_mode: bool = False, sources: list = None, pages: int = None,
+                         time_budget: float = None, incremental: bool = None):
+        """Crawl the result pages most likely to have changed and populate database"""
+        print("=" * 60)
+        print("POLPI MX - Data Scraping Pipeline")
+        print("=" * 60)
         
-        # Scraper 3: Century21
-        print("\n[3/3] Running Century21 scraper...")
-        try:
-            scraper3 = Century21Scraper()
-            listings3 = scraper3.scrape(state='ciudad-de-mexico', max_pages=max_pages)
-            all_listings.extend(listings3)
-            print(f"✓ Century21: {len(listings3)} listings")
-        except Exception as e:
-            print(f"✗ Century21 failed: {e}")
+        scheduler = CrawlScheduler(get_sources(sources), db=self.db, incremental=incremental)
+        # Quick mode: only the first result page of each category
+        units = scheduler.plan(budget=pages, max_depth=1 if quick_mode else None)
+        if not units:
+            print("\nNo result pages are due yet (see CRAWL_MIN_INTERVAL)")
+            scheduler.close()
+            return
+        # Listings are normalized, geocoded and saved while the crawl is still running
+        pipeline_stats = asyncio.run(self.stream_all(scheduler, units, time_budget, pages))
+        total_scraped = pipeline_stats['sources']['crawl']['items']
+        still_queued = len(scheduler.queue())
+        scheduler.close()
+        if still_queued:
+            print(f"{still_queued} result pages left queued for the next run")
+        success_count = pipeline_stats['stages']['store']['out']
         
-        # Process and save listings
         print(f"\n{'='*60}")
-        print(f"Processing {len(all_listings)} total listings...")
+        print(f"Pipeline ({pipeline_stats['elapsed_s']}s):")
+        for name, stage in pipeline_stats['stages'].items():
+            print(f"  - {name}: {stage['in']} in, {stage['out']} out, {stage['dropped']} dropped, "
+                  f"{stage['errors']} errors, {stage['busy_s']}s busy")
         
-        success_count = 0
-        for i, raw_listing in enumerate(all_listings):
-            try:
-                # Process listing (normalize, geocode, etc.)
-                processed = self.process_listing(raw_listing)
-                
-                # Insert into database
-                listing_id = self.db.insert_listing(processed)
-                success_count += 1
-                
-                if (i + 1) % 10 == 0:
-                    print(f"Processed {i + 1}/{len(all_listings)} listings...")
-            
-            except Exception as e:
-                print(f"Error processing listing: {e}")
+        print(f"\n✓ Successfully saved {success_count} of {total_scraped} scraped listings to database")
         
-        print(f"\n✓ Successfully saved {success_count} listings to database")
+        # Score new listings and drop cached map tiles that now show stale data
+        rescored = PriceIntelligence().refresh_deal_scores()
+        TileCache().invalidate_points((l['lng'], l['lat']) for l in rescored)
+        print(f"✓ Deal scores refreshed for {len(rescored)} listings")
         
         # Run duplicate detection
         self.detect_duplicates()
@@ -193,12 +266,33 @@ class DataPipeline:
         for source, count in stats['sources'].items():
             print(f"  - {source}: {count}")
         
+        # Where each site's adaptive rate limit ended up
+        rate_limits = shared_limiter().snapshot()
+        print(f"\nRate limits:")
+        for domain, state in rate_limits['domains'].items():
+            print(f"  - {domain}: {state['rate']} req/s, {state['requests']} requests, "
+                  f"{state['throttled']} throttled (last: {state['last_throttle']})")
+        
+        # How much of the crawl the page cache saved
+        cache = shared_cache()
+        if cache is not None:
+            print(f"\nPage cache: {cache.stats}")
+        
+        archive = shared_archive()
+        if archive is not None:
+            print(f"\nArchive ({archive.mode}, {archive.directory}): {archive.stats}")
+        
         # Save summary
         summary = {
             'timestamp': datetime.now().isoformat(),
-            'total_scraped': len(all_listings),
+            'total_scraped': total_scraped,
             'total_saved': success_count,
-            'stats': stats
+            'pipeline': pipeline_stats,
+            'still_queued': still_queued,
+            'stats': stats,
+            'rate_limits': rate_limits,
+            'page_cache': cache.stats if cache is not None else None,
+            'archive': dict(archive.stats, mode=archive.mode) if archive is not None else None
         }
         
         os.makedirs('data', exist_ok=True)
@@ -212,8 +306,24 @@ if __name__ == '__main__':
     import argparse
     
     parser = argparse.ArgumentParser(description='Run Polpi MX scrapers')
-    parser.add_argument('--quick', action='store_true', help='Quick mode (1 page per scraper)')
+    parser.add_argument('--quick', action='store_true', help='Quick mode (first result page of each category)')
+    parser.add_argument('--sources', help=f"Comma-separated sources to crawl (default: all of {', '.join(SOURCES)})")
+    parser.add_argument('--pages', type=int, help='Result pages to crawl this run (default: CRAWL_PAGE_BUDGET)')
+    parser.add_argument('--minutes', type=float, help='Start no new pages after this many minutes')
+    parser.add_argument('--incremental', action='store_true', default=None,
+                        help='Page each category only until it reaches listings already stored')
+    parser.add_argument('--plan', action='store_true', help='Show the pages the next run would crawl, and exit')
     args = parser.parse_args()
+    sources = args.sources.split(',') if args.sources else None
     
-    pipeline = DataPipeline()
-    pipeline.run_all_scrapers(quick_mode=args.quick)
+    if args.plan:
+        scheduler = CrawlScheduler(get_sources(sources), incremental=args.incremental)
+        for unit in scheduler.plan(budget=args.pages, max_depth=1 if args.quick else None, persist=False):
+            print(f"{unit.priority:14.2f}  {unit.source}/{unit.category} page {unit.page}"
+                  + ('  (left over)' if unit.queued else ''))
+        scheduler.close()
+    else:
+        pipeline = DataPipeline()
+        pipeline.run_all_scrapers(quick_mode=args.quick, sources=sources, pages=args.pages,
+                                  time_budget=args.minutes * 60 if args.minutes else None,
+                                  incremental=args.incremental)
@@ -1,13 +1,18 @@
 #!/usr/bin/env python3
 """Base scraper class with common functionality"""
 
+import asyncio
 import requests
-import time
 import random
 import json
-from typing import Dict, List
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from datetime import datetime
 import os
+import sys
+
+# Shared modules (config, rate_limiter) live in the project root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rate_limiter import polite_get
 
 class BaseScraper:
     def __init__(self, name: str, base_url: str):
@@ -22,6 +27,7 @@ class BaseScraper:
         ]
         self.results = []
         self.errors = []
+        self._engine = None
     
     def get_headers(self) -> Dict:
         """Get random headers for requests"""
@@ -38,10 +44,9 @@ class BaseScraper:
         """Fetch a page with retry logic"""
         for attempt in range(max_retries):
             try:
-                # Add delay to respect rate limits
-                time.sleep(random.uniform(1, 3))
-                
-                response = self.session.get(
+                # The shared per-domain limiter paces requests and backs off when the site pushes back
+                response = polite_get(
+                    self.session,
                     url,
                     headers=self.get_headers(),
                     timeout=30
@@ -57,7 +62,69 @@ class BaseScraper:
                         'timestamp': datetime.now().isoformat()
                     })
                     raise
-                time.sleep(random.uniform(2, 5))
+    
+    @property
+    def engine(self):
+        """Async fetch engine shared by all scrapers (see fetch_engine.py)"""
+        if self._engine is None:
+            from fetch_engine import shared_engine
+            self._engine = shared_engine()
+        return self._engine
+    
+    def run(self, coro):
+        """Run a scraping coroutine to completion, closing the engine's connections afterwards"""
+        return self.engine.run(coro)
+    
+    async def fetch(self, url: str):
+        """Fetch a page through the shared engine: per-host limits, politeness delay and retries"""
+        headers = self.get_headers()
+        # Let httpx advertise only the encodings it can decode
+        headers.pop('Accept-Encoding', None)
+        try:
+            return await self.engine.fetch(url, headers=headers, source=self.name)
+        except Exception as e:
+            self.errors.append({
+                'url': url,
+                'error': str(e),
+                'timestamp': datetime.now().isoformat()
+            })
+            raise
+    
+    async def fetch_all(self, urls: List[str]) -> List[Optional[object]]:
+        """Fetch pages concurrently, in order; failed pages come back as None"""
+        async def fetch_or_none(url):
+            try:
+                return await self.fetch(url)
+            except Exception as e:
+                print(f"Giving up on {url}: {e}")
+                return None
+        return await asyncio.gather(*(fetch_or_none(url) for url in urls))
+    
+    async def iter_fetched(self, urls: List[str], window: int = None) -> AsyncIterator[Tuple[int, str, object]]:
+        """
+        Fetch pages concurrently, yielding (page number, url, response) as each
+        arrives; failed pages are skipped. At most `window` pages are in flight
+        or waiting to be consumed, so a slow consumer holds back the crawl.
+        """
+        async def numbered(page, url):
+            try:
+                return page, url, await self.fetch(url)
+            except Exception as e:
+                print(f"Giving up on {url}: {e}")
+                return page, url, None
+        
+        window = window or self.engine.per_host * 2
+        todo = list(enumerate(urls, 1))
+        pending = set()
+        while todo or pending:
+            while todo and len(pending) < window:
+                page, url = todo.pop(0)
+                pending.add(asyncio.ensure_future(numbered(page, url)))
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in sorted(done, key=lambda task: task.result()[0]):
+                page, url, response = task.result()
+                if response is not None:
+                    yield page, url, response
     
     def save_raw_data(self, data: Dict, filename: str):
         """Save raw scraped data for debugging"""
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Asynchronous fetch engine shared by the scrapers.
+
+One httpx.AsyncClient, and so one connection pool, serves every scraper in
+the process. Requests are bounded by the pool size overall and by a
+per-host concurrency limit, and each one first waits for the shared
+per-domain rate limiter (rate_limiter.py). Crawling several portals at
+once is then limited by each site's politeness policy instead of by a
+sleep before every request. Connection errors, timeouts, 429/5xx responses
+and bot-challenge pages are retried. The limiter handles the backoff: it
+lowers the domain's rate and honors Retry-After.
+
+With an HTTPCache (http_cache.py), requests are conditional and every
+response carries `unchanged`. It is True when the page was fresh in the
+cache, answered 304, or came back with the same body as the last one
+processed, so callers can skip parsing it. Callers report a page processed
+with mark_processed(response) once its listings are stored; until then the
+same body keeps coming back as changed.
+
+The client and its connections belong to the event loop they were opened
+in, so each asyncio.run() that uses the engine must end with aclose();
+run(coro) does both.
+
+In record mode every response the engine returns is also archived, and in
+replay mode it is served from the archive with no network, limiter or cache
+involved (replay.py).
+"""
+
+import asyncio
+import time
+import warnings
+from typing import Dict, Iterable, List, Optional, Union
+from urllib.parse import urlsplit
+
+import httpx
+
+from http_cache import HTTPCache, shared_cache
+from rate_limiter import RateLimiter, shared_limiter
+from replay import PageArchive, shared_archive
+
+# Responses worth retrying; other 4xx fail immediately
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class BlockedError(Exception):
+    """The site kept answering with a CAPTCHA or bot-challenge page"""
+
+
+class FetchEngine:
+    """Pooled async HTTP client with per-host politeness and retries"""
+    
+    def __init__(self, max_connections: int = 20, per_host: int = 2, max_retries: int = 3,
+                 timeout: float = 30.0, limiter: RateLimiter = None, cache: HTTPCache = None,
+                 archive: PageArchive = None):
+        self.max_connections = max_connections
+        self.per_host = per_host
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.limiter = limiter or shared_limiter()
+        self.cache = cache
+        self.archive = archive
+        self._client: Optional[httpx.AsyncClient] = None
+        self._hosts: Dict[str, asyncio.Semaphore] = {}
+        self._loop = None
+    
+    def _bind(self):
+        """Client and host semaphores belong to one event loop; start fresh under a new one"""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            if self._client is not None:
+                # Its sockets are tied to the previous loop and can no longer be closed from here
+                warnings.warn('FetchEngine reused under a new event loop without aclose(); '
+                              'use FetchEngine.run() to scope it to one asyncio.run()', ResourceWarning)
+            self._loop = loop
+            self._hosts = {}
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections)
+            )
+        return self._client
+    
+    def _semaphore(self, host: str) -> asyncio.Semaphore:
+        semaphore = self._hosts.get(host)
+        if semaphore is None:
+            semaphore = self._hosts[host] = asyncio.Semaphore(self.per_host)
+        return semaphore
+    
+    @staticmethod
+    def _cached_response(url: str, entry) -> httpx.Response:
+        response = httpx.Response(
+            200, content=entry.body,
+            headers={'Content-Type': entry.content_type} if entry.content_type else None,
+            request=httpx.Request('GET', url)
+        )
+        # A cached body whose processing never finished is served again as changed
+        response.unchanged = entry.processed
+        response.cache_url = url
+        return response
+    
+    @staticmethod
+    def _archived_response(page) -> httpx.Response:
+        response = httpx.Response(page.status, content=page.body, headers=page.headers,
+                                  request=httpx.Request('GET', page.url))
+        response.unchanged = False
+        return response
+    
+    async def fetch(self, url: str, headers: Dict = None, source: str = None) -> httpx.Response:
+        """
+        GET url, retrying transient failures; raises the last error when retries run out.
+        
+        `source` picks the cache max age (see HTTP_CACHE_MAX_AGE_BY_SOURCE).
+        """
+        if self.archive is None:
+            return await self._fetch(url, headers, source)
+        if self.archive.replaying:
+            response = self._archived_response(self.archive.get(url))
+            response.raise_for_status()
+            return response
+        
+        start = time.monotonic()
+        try:
+            response = await self._fetch(url, headers, source)
+        except httpx.HTTPStatusError as e:
+            self.archive.record(url, e.response.content, e.response.status_code, e.response.headers,
+                                source, elapsed=time.monotonic() - start)
+            raise
+        self.archive.record(url, response.content, response.status_code, response.headers,
+                            source, elapsed=time.monotonic() - start)
+        return response
+    
+    async def _fetch(self, url: str, headers: Dict = None, source: str = None) -> httpx.Response:
+        entry = self.cache.lookup(url) if self.cache else None
+        if entry is not None:
+            if self.cache.is_fresh(entry, source):
+                self.cache.record_fresh()
+                return self._cached_response(url, entry)
+            headers = {**(headers or {}), **self.cache.validators(entry)}
+        
+        client = self._bind()
+        semaphore = self._semaphore(urlsplit(url).netloc)
+        
+        for attempt in range(self.max_retries):
+            last_attempt = attempt == self.max_retries - 1
+            async with semaphore:
+                await self.limiter.acquire(url)
+                start = time.monotonic()
+                try:
+                    response = await client.get(url, headers=headers)
+                except httpx.TransportError as e:
+                    self.limiter.record(url, None, time.monotonic() - start)
+                    print(f"Attempt {attempt + 1} failed for {url}: {e}")
+                    if last_attempt:
+                        raise
+                    continue
+            reason = self.limiter.record(url, response.status_code, time.monotonic() - start,
+                                         response.text, response.headers.get('Retry-After'))
+            
+            if response.status_code in RETRY_STATUSES or reason == 'challenge':
+                print(f"Attempt {attempt + 1} failed for {url}: "
+                      f"{'challenge page' if reason == 'challenge' else response.status_code}")
+                if not last_attempt:
+                    continue
+                if reason == 'challenge':
+                    raise BlockedError(f"Challenge page served for {url}")
+            if response.status_code == 304 and entry is not None:
+                self.cache.record_not_modified(url)
+                return self._cached_response(url, entry)
+            response.raise_for_status()
+            response.unchanged = (self.cache.store(url, response.content, response.headers)
+                                  if self.cache else False)
+            response.cache_url = url
+            return response
+    
+    def mark_processed(self, response: httpx.Response):
+        """Record that a response's page was parsed and stored, so the same body counts as unchanged"""
+        url = getattr(response, 'cache_url', None)
+        if self.cache is not None and url is not None:
+            self.cache.mark_processed(url, response.content)
+    
+    async def fetch_many(self, urls: Iterable[str], headers: Dict = None,
+                         source: str = None) -> List[Union[httpx.Response, Exception]]:
+        """Fetch urls concurrently; each slot holds the response or the exception raised"""
+        return await asyncio.gather(*(self.fetch(url, headers, source=source) for url in urls),
+                                    return_exceptions=True)
+    
+    def run(self, coro):
+        """asyncio.run(coro), closing the client before its event loop goes away"""
+        async def scoped():
+            try:
+                return await coro
+            finally:
+                await self.aclose()
+        return asyncio.run(scoped())
+    
+    async def aclose(self):
+        if self._client is not None and self._loop is asyncio.get_running_loop():
+            await self._client.aclose()
+        self._client = None
+        self._loop = None
+
+
+_shared: Optional[FetchEngine] = None
+
+
+def shared_engine() -> FetchEngine:
+    """Process-wide engine configured from config.SCRAPER_* settings"""
+    global _shared
+    if _shared is None:
+        from config import config
+        _shared = FetchEngine(
+            max_connections=config.SCRAPER_MAX_CONNECTIONS,
+            per_host=config.SCRAPER_PER_HOST_CONCURRENCY,
+            max_retries=config.SCRAPER_MAX_RETRIES,
+            timeout=config.SCRAPER_TIMEOUT,
+            cache=shared_cache(),
+            archive=shared_archive()
+        )
+    return _shared
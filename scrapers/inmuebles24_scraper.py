@@ -1,10 +1,10 @@
 #!/usr/bin/env python3
 """Scraper for Inmuebles24.com (largest Mexican listing site)"""
 
-from bs4 import BeautifulSoup
 import re
-from typing import Dict, List
+from typing import AsyncIterator, Dict, List
 from base_scraper import BaseScraper
+from html_parsing import Document, parse
 from datetime import datetime
 
 class Inmuebles24Scraper(BaseScraper):
@@ -13,6 +13,18 @@ class Inmuebles24Scraper(BaseScraper):
     
     def scrape(self, city: str = 'ciudad-de-mexico', property_type: str = 'venta', max_pages: int = 3):
         """Scrape listings from Inmuebles24"""
+        return self.run(self.scrape_async(city, property_type, max_pages))
+    
+    async def scrape_async(self, city: str = 'ciudad-de-mexico', property_type: str = 'venta', max_pages: int = 3):
+        """Scrape listings from Inmuebles24, fetching result pages concurrently"""
+        async for listing in self.stream_async(city, property_type, max_pages):
+            self.results.append(listing)
+        
+        print(f"Total listings scraped: {len(self.results)}")
+        return self.results
+    
+    async def stream_async(self, city: str = 'ciudad-de-mexico', property_type: str = 'venta', max_pages: int = 3) -> AsyncIterator[Dict]:
+        """Yield listings page by page as result pages arrive, without collecting them"""
         print(f"Scraping Inmuebles24: {city}, {property_type}")
         
         # Map property types to URL format
@@ -25,28 +37,29 @@ class Inmuebles24Scraper(BaseScraper):
         
         base_search_url = f"{self.base_url}/{property_type}/{city}"
         
-        for page in range(1, max_pages + 1):
+        urls = [f"{base_search_url}?pagina={page}" if page > 1 else base_search_url
+                for page in range(1, max_pages + 1)]
+        print(f"Fetching {len(urls)} pages from {base_search_url}")
+        async for page, url, response in self.iter_fetched(urls):
+            if response.unchanged:
+                print(f"Page {page} unchanged since the last crawl, skipping")
+                continue
             try:
-                url = f"{base_search_url}?pagina={page}" if page > 1 else base_search_url
-                print(f"Fetching page {page}: {url}")
-                
-                response = self.fetch_page(url)
                 self.save_html(response.text, f"{city}_page{page}.html")
                 
-                soup = BeautifulSoup(response.text, 'html.parser')
+                soup = parse(response.text)
                 listings = self.parse_listings_page(soup, url)
                 
                 print(f"Found {len(listings)} listings on page {page}")
-                self.results.extend(listings)
-                
             except Exception as e:
                 print(f"Error scraping page {page}: {e}")
-                break
-        
-        print(f"Total listings scraped: {len(self.results)}")
-        return self.results
+                continue
+            for listing in listings:
+                yield listing
+            # The consumer has taken the whole page: the same body is unchanged next crawl
+            self.engine.mark_processed(response)
     
-    def parse_listings_page(self, soup: BeautifulSoup, page_url: str) -> List[Dict]:
+    def parse_listings_page(self, soup: Document, page_url: str) -> List[Dict]:
         """Parse listings from search results page"""
         listings = []
         
@@ -54,7 +67,7 @@ class Inmuebles24Scraper(BaseScraper):
         listing_cards = (
             soup.find_all('div', class_=re.compile(r'posting-card|listing-card|property-card', re.I)) or
             soup.find_all('article') or
-            soup.find_all('div', {'data-posting-id': True}) or
+            soup.find_all('div', attrs={'data-posting-id': True}) or
             soup.find_all('div', class_=re.compile(r'card.*posting', re.I))
         )
         
@@ -81,7 +94,7 @@ class Inmuebles24Scraper(BaseScraper):
         }
         
         # Extract URL
-        link = card.find('a', href=True)
+        link = card.find('a', attrs={'href': True})
         if link:
             url = link['href']
             if not url.startswith('http'):
@@ -1,10 +1,10 @@
 #!/usr/bin/env python3
 """Scraper for Vivanuncios.com.mx (eBay classifieds)"""
 
-from bs4 import BeautifulSoup
 import re
-from typing import Dict, List
+from typing import AsyncIterator, Dict, List
 from base_scraper import BaseScraper
+from html_parsing import Document, parse
 from datetime import datetime
 
 class VivanunciosScraper(BaseScraper):
@@ -13,33 +13,45 @@ class VivanunciosScraper(BaseScraper):
     
     def scrape(self, city: str = 'distrito-federal', property_type: str = 'inmuebles', max_pages: int = 3):
         """Scrape listings from Vivanuncios"""
+        return self.run(self.scrape_async(city, property_type, max_pages))
+    
+    async def scrape_async(self, city: str = 'distrito-federal', property_type: str = 'inmuebles', max_pages: int = 3):
+        """Scrape listings from Vivanuncios, fetching result pages concurrently"""
+        async for listing in self.stream_async(city, property_type, max_pages):
+            self.results.append(listing)
+        
+        print(f"Total listings scraped: {len(self.results)}")
+        return self.results
+    
+    async def stream_async(self, city: str = 'distrito-federal', property_type: str = 'inmuebles', max_pages: int = 3) -> AsyncIterator[Dict]:
+        """Yield listings page by page as result pages arrive, without collecting them"""
         print(f"Scraping Vivanuncios: {city}, {property_type}")
         
         base_search_url = f"{self.base_url}/s-{property_type}/{city}/v1c1293l10047p1"
         
-        for page in range(1, max_pages + 1):
+        # Vivanuncios uses /p{page} in URL
+        urls = [base_search_url.replace('p1', f'p{page}') for page in range(1, max_pages + 1)]
+        print(f"Fetching {len(urls)} pages from {base_search_url}")
+        async for page, url, response in self.iter_fetched(urls):
+            if response.unchanged:
+                print(f"Page {page} unchanged since the last crawl, skipping")
+                continue
             try:
-                # Vivanuncios uses /p{page} in URL
-                url = base_search_url.replace('p1', f'p{page}')
-                print(f"Fetching page {page}: {url}")
-                
-                response = self.fetch_page(url)
                 self.save_html(response.text, f"vivanuncios_{city}_page{page}.html")
                 
-                soup = BeautifulSoup(response.text, 'html.parser')
+                soup = parse(response.text)
                 listings = self.parse_listings_page(soup, url)
                 
                 print(f"Found {len(listings)} listings on page {page}")
-                self.results.extend(listings)
-                
             except Exception as e:
                 print(f"Error scraping page {page}: {e}")
-                break
-        
-        print(f"Total listings scraped: {len(self.results)}")
-        return self.results
+                continue
+            for listing in listings:
+                yield listing
+            # The consumer has taken the whole page: the same body is unchanged next crawl
+            self.engine.mark_processed(response)
     
-    def parse_listings_page(self, soup: BeautifulSoup, page_url: str) -> List[Dict]:
+    def parse_listings_page(self, soup: Document, page_url: str) -> List[Dict]:
         """Parse listings from search results page"""
         listings = []
         
@@ -75,7 +87,7 @@ class VivanunciosScraper(BaseScraper):
         # Extract URL
         link = item.find('a', class_=re.compile(r'title|link', re.I))
         if not link:
-            link = item.find('a', href=True)
+            link = item.find('a', attrs={'href': True})
         
         if link and link.get('href'):
             url = link['href']
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Lazily constructed service singletons for the Polpi MX API.
+
+Services are registered with a factory and handed out as LazyService
+proxies, so module import costs nothing and each dependency (database
+schema check, cloudscraper session, ...) is built on first use, once per
+process, no matter how many endpoints share it. warm_up() builds a chosen
+set ahead of traffic, and report() says what was built and how long each
+took, plus the time from process start to ready.
+
+CacheWarmUp runs slower, data-dependent warm-up steps (aggregates, map
+indexes) in a background thread after startup and backs the /ready probe.
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Reference point for the boot-time report; this module is imported first thing by the API
+BOOT_STARTED = time.perf_counter()
+
+
+class LazyService:
+    """Proxy that constructs its target on first attribute access"""
+    
+    def __init__(self, name: str, factory: Callable[[], object], registry: 'ServiceRegistry'):
+        self._name = name
+        self._factory = factory
+        self._registry = registry
+        self._instance = None
+        self._lock = threading.Lock()
+    
+    @property
+    def initialized(self) -> bool:
+        return self._instance is not None
+    
+    def get(self):
+        instance = self._instance
+        if instance is None:
+            with self._lock:
+                if self._instance is None:
+                    start = time.perf_counter()
+                    self._instance = self._factory()
+                    self._registry._record(self._name, time.perf_counter() - start)
+                instance = self._instance
+        return instance
+    
+    def __getattr__(self, attr):
+        return getattr(self.get(), attr)
+    
+    def __repr__(self):
+        state = 'ready' if self.initialized else 'lazy'
+        return f"<LazyService {self._name} ({state})>"
+
+
+class ServiceRegistry:
+    """Named lazy services with warm-up and init-time bookkeeping"""
+    
+    def __init__(self):
+        self._services: Dict[str, LazyService] = {}
+        self._init_seconds: Dict[str, float] = {}
+        self.ready_at: Optional[float] = None
+    
+    def register(self, name: str, factory: Callable[[], object]) -> LazyService:
+        if name in self._services:
+            raise ValueError(f"Service {name!r} already registered")
+        service = self._services[name] = LazyService(name, factory, self)
+        return service
+    
+    def _record(self, name: str, seconds: float):
+        self._init_seconds[name] = seconds
+        logger.info(f"Service {name} initialized in {seconds * 1000:.1f}ms")
+    
+    def warm_up(self, names: Iterable[str] = None) -> Dict[str, float]:
+        """
+        Build services ahead of traffic; returns init seconds per service.
+        
+        `names` defaults to everything registered; '*' also means everything.
+        Unknown names are logged and skipped.
+        """
+        names = list(self._services) if names is None or '*' in names else list(names)
+        for name in names:
+            service = self._services.get(name)
+            if service is None:
+                logger.warning(f"Unknown service in warm-up list: {name}")
+                continue
+            service.get()
+        return {name: self._init_seconds[name] for name in names if name in self._init_seconds}
+    
+    def mark_ready(self):
+        self.ready_at = time.perf_counter()
+    
+    def report(self) -> Dict:
+        """Boot time and per-service init times (None for services not built yet)"""
+        return {
+            'boot_ms': round((self.ready_at - BOOT_STARTED) * 1000, 1) if self.ready_at else None,
+            'services': {
+                name: round(self._init_seconds[name] * 1000, 1) if name in self._init_seconds else None
+                for name in self._services
+            }
+        }
+
+
+class CacheWarmUp:
+    """Named warm-up steps run once, in order, on a background thread"""
+    
+    def __init__(self):
+        self._steps: List[Tuple[str, Callable[[], object]]] = []
+        self._results: Dict[str, object] = {}
+        self._done = threading.Event()
+        self._thread = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+    
+    def add(self, name: str, func: Callable[[], object]):
+        self._steps.append((name, func))
+    
+    @property
+    def ready(self) -> bool:
+        return self._done.is_set()
+    
+    def start(self):
+        """Run all steps in the background; a failing step is logged and skipped"""
+        if self._thread is not None:
+            return
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='polpi-warmup', daemon=True)
+        self._thread.start()
+    
+    def _run(self):
+        for name, func in self._steps:
+            start = time.perf_counter()
+            try:
+                func()
+                self._results[name] = round((time.perf_counter() - start) * 1000, 1)
+            except Exception as e:
+                logger.error(f"Warm-up step {name} failed: {e}")
+                self._results[name] = f"failed: {e}"
+        self.finished_at = time.perf_counter()
+        self._done.set()
+        logger.info(f"Cache warm-up finished in {(self.finished_at - self.started_at) * 1000:.0f}ms")
+    
+    def wait(self, timeout: float = None) -> bool:
+        return self._done.wait(timeout)
+    
+    def report(self) -> Dict:
+        """Readiness plus per-step milliseconds ('pending' until a step has run)"""
+        end = self.finished_at or time.perf_counter()
+        return {
+            'ready': self.ready,
+            'elapsed_ms': round((end - self.started_at) * 1000, 1) if self.started_at else None,
+            'steps': {name: self._results.get(name, 'pending') for name, _ in self._steps}
+        }
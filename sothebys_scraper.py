@@ -3,32 +3,36 @@
 
 import sys
 import json
-import time
 import re
 import hashlib
 from datetime import datetime
 from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.common.exceptions import NoSuchElementException
 
 # Add project root to path
 sys.path.insert(0, '/Users/isaachomefolder/Desktop/polpi-mx')
 from database import PolpiDB
+from browser_pool import BrowserPool, lean_options
+from config import config
+from seen_set import SeenSet
 
 class SothebyScraper:
     def __init__(self, headless=True):
         self.db = PolpiDB()
         self.headless = headless
-        self.driver = None
+        self.pool = None
         self.base_url = 'https://www.sothebysrealty.com'
         self.inserted_count = 0
         self.error_count = 0
         
     def init_driver(self):
-        """Initialize Chrome webdriver"""
+        """Set up the pool of Chrome webdrivers (started on first use)"""
+        self.pool = BrowserPool(self.new_browser, source='sothebys')
+    
+    def new_browser(self):
+        """Start one Chrome webdriver for the pool"""
         chrome_options = Options()
         if self.headless:
             chrome_options.add_argument('--headless=new')
@@ -38,8 +42,10 @@ class SothebyScraper:
         chrome_options.add_argument('--disable-blink-features=AutomationControlled')
         chrome_options.add_argument('--user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
         
-        self.driver = webdriver.Chrome(options=chrome_options)
-        self.driver.implicitly_wait(5)
+        lean_options(chrome_options)
+        
+        # No implicit wait: pool.load() waits for the page, and missing elements fail fast
+        return webdriver.Chrome(options=chrome_options)
         
     def get_search_urls(self):
         """Generate search URLs for Mexico City luxury listings"""
@@ -103,12 +109,11 @@ class SothebyScraper:
         match = re.search(r'(\d+)', text)
         return int(match.group(1)) if match else None
     
-    def scrape_listing_page(self, listing_url):
+    def scrape_listing_page(self, driver, listing_url):
         """Scrape detailed information from a single listing page"""
         try:
             print(f"  → Scraping details: {listing_url}")
-            self.driver.get(listing_url)
-            time.sleep(2.5)  # Wait for luxury site to load fully
+            self.pool.load(driver, listing_url, ready='h1')
             
             listing_data = {
                 'source': 'sothebys',
@@ -127,7 +132,7 @@ class SothebyScraper:
                 
                 for selector in title_selectors:
                     try:
-                        title_elem = self.driver.find_element(By.CSS_SELECTOR, selector)
+                        title_elem = driver.find_element(By.CSS_SELECTOR, selector)
                         listing_data['title'] = title_elem.text.strip()
                         break
                     except:
@@ -149,7 +154,7 @@ class SothebyScraper:
                 
                 for selector in price_selectors:
                     try:
-                        price_elem = self.driver.find_element(By.CSS_SELECTOR, selector)
+                        price_elem = driver.find_element(By.CSS_SELECTOR, selector)
                         price_mxn, price_usd = self.extract_price(price_elem.text)
                         if price_mxn:
                             listing_data['price_mxn'] = price_mxn
@@ -173,7 +178,7 @@ class SothebyScraper:
                 details = []
                 for selector in detail_selectors:
                     try:
-                        details = self.driver.find_elements(By.CSS_SELECTOR, selector)
+                        details = driver.find_elements(By.CSS_SELECTOR, selector)
                         if details:
                             break
                     except:
@@ -216,7 +221,7 @@ class SothebyScraper:
                 
                 for selector in location_selectors:
                     try:
-                        location_elem = self.driver.find_element(By.CSS_SELECTOR, selector)
+                        location_elem = driver.find_element(By.CSS_SELECTOR, selector)
                         location_text = location_elem.text
                         
                         # Parse location
@@ -252,7 +257,7 @@ class SothebyScraper:
                 
                 for selector in desc_selectors:
                     try:
-                        desc_elem = self.driver.find_element(By.CSS_SELECTOR, selector)
+                        desc_elem = driver.find_element(By.CSS_SELECTOR, selector)
                         listing_data['description'] = desc_elem.text.strip()[:1500]  # Luxury listings have longer descriptions
                         break
                     except:
@@ -270,7 +275,7 @@ class SothebyScraper:
                 
                 for selector in agent_selectors:
                     try:
-                        agent_elem = self.driver.find_element(By.CSS_SELECTOR, selector)
+                        agent_elem = driver.find_element(By.CSS_SELECTOR, selector)
                         listing_data['agent_name'] = agent_elem.text.strip()
                         break
                     except:
@@ -287,7 +292,7 @@ class SothebyScraper:
                 
                 for selector in phone_selectors:
                     try:
-                        phone_elem = self.driver.find_element(By.CSS_SELECTOR, selector)
+                        phone_elem = driver.find_element(By.CSS_SELECTOR, selector)
                         listing_data['agent_phone'] = phone_elem.text.strip()
                         break
                     except:
@@ -328,7 +333,7 @@ class SothebyScraper:
                 
                 for selector in image_selectors:
                     try:
-                        img_elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
+                        img_elements = driver.find_elements(By.CSS_SELECTOR, selector)
                         for img in img_elements:
                             # Try multiple attributes
                             src = img.get_attribute('src') or img.get_attribute('data-src') or img.get_attribute('data-lazy-src')
@@ -349,7 +354,7 @@ class SothebyScraper:
                 # Also check for data in scripts (some sites load images via JS)
                 if not images:
                     try:
-                        scripts = self.driver.find_elements(By.TAG_NAME, 'script')
+                        scripts = driver.find_elements(By.TAG_NAME, 'script')
                         for script in scripts:
                             script_text = script.get_attribute('innerHTML') or ''
                             # Look for image URLs in JSON data
@@ -370,7 +375,7 @@ class SothebyScraper:
             # Extract coordinates
             try:
                 # Look for map data in scripts
-                scripts = self.driver.find_elements(By.TAG_NAME, 'script')
+                scripts = driver.find_elements(By.TAG_NAME, 'script')
                 for script in scripts:
                     script_text = script.get_attribute('innerHTML') or ''
                     
@@ -406,7 +411,7 @@ class SothebyScraper:
                 
                 for selector in amenity_selectors:
                     try:
-                        amenity_elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
+                        amenity_elements = driver.find_elements(By.CSS_SELECTOR, selector)
                         for elem in amenity_elements:
                             text = elem.text.strip()
                             if text and len(text) < 100:  # Reasonable amenity length
@@ -428,23 +433,15 @@ class SothebyScraper:
             print(f"    ✗ Error scraping listing page: {e}")
             return None
     
-    def scrape_search_page(self, url):
+    def scrape_search_page(self, driver, url):
         """Scrape listing links from a search results page"""
         try:
             print(f"\n📄 Scraping search page: {url}")
-            self.driver.get(url)
-            
             # Wait for listings to load
-            try:
-                WebDriverWait(self.driver, 15).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, 'a[href*="/property/"], a[href*="/listing/"], [class*="property-card"] a'))
-                )
-            except TimeoutException:
+            if not self.pool.load(driver, url, ready='a[href*="/property/"], a[href*="/listing/"], [class*="property-card"] a'):
                 print("  ⚠ Timeout waiting for listings to load")
                 return []
             
-            time.sleep(3)  # Extra time for luxury site JS
-            
             # Extract all listing links
             listing_links = set()
             
@@ -459,7 +456,7 @@ class SothebyScraper:
             
             for selector in link_selectors:
                 try:
-                    links = self.driver.find_elements(By.CSS_SELECTOR, selector)
+                    links = driver.find_elements(By.CSS_SELECTOR, selector)
                     for link in links:
                         href = link.get_attribute('href')
                         if href and ('property' in href or 'listing' in href) and 'sothebysrealty.com' in href:
@@ -490,21 +487,25 @@ class SothebyScraper:
             
             all_listing_urls = set()
             
-            # Step 1: Collect all listing URLs from search pages
-            for search_url in search_urls:
-                listing_urls = self.scrape_search_page(search_url)
-                all_listing_urls.update(listing_urls)
-                time.sleep(3)  # Respectful delay
+            # Step 1: Collect all listing URLs from search pages (paced per domain by the pool)
+            for listing_urls in self.pool.imap(self.scrape_search_page, search_urls):
+                all_listing_urls.update(listing_urls or [])
             
             print(f"\n📊 Total unique luxury listings found: {len(all_listing_urls)}")
             
-            # Step 2: Scrape each listing detail page
-            for i, listing_url in enumerate(all_listing_urls, 1):
-                print(f"\n[{i}/{len(all_listing_urls)}] Processing luxury listing...")
+            # Incremental runs only open detail pages of listings not stored yet
+            if config.CRAWL_INCREMENTAL:
+                seen = SeenSet.load(self.db, ['sothebys'])
+                known = {url for url in all_listing_urls if seen.seen_url('sothebys', url)}
+                all_listing_urls -= known
+                print(f"⏭  Skipping {len(known)} listings already stored")
+            
+            # Step 2: Scrape listing detail pages across the pool's browsers
+            listing_urls = sorted(all_listing_urls)
+            for i, listing_data in enumerate(self.pool.imap(self.scrape_listing_page, listing_urls), 1):
+                print(f"\n[{i}/{len(listing_urls)}] Processing luxury listing...")
                 
                 try:
-                    listing_data = self.scrape_listing_page(listing_url)
-                    
                     if listing_data and listing_data.get('title'):
                         # Validate minimum data
                         if not listing_data.get('price_mxn') and not listing_data.get('price_usd'):
@@ -529,9 +530,6 @@ class SothebyScraper:
                         print(f"    ⚠ Skipping: Insufficient data")
                         self.error_count += 1
                     
-                    # Respectful delay (luxury site, be extra careful)
-                    time.sleep(3)
-                    
                 except Exception as e:
                     print(f"    ✗ Error processing listing: {e}")
                     self.error_count += 1
@@ -545,11 +543,12 @@ class SothebyScraper:
             print(f"✗ Errors/Skipped: {self.error_count}")
             print(f"📸 Focus: Premium professional photography")
             print(f"🏆 Source: Sotheby's International Realty")
+            print(f"🌐 Browsers: {self.pool.stats}")
             print("=" * 60)
             
         finally:
-            if self.driver:
-                self.driver.quit()
+            if self.pool:
+                self.pool.close()
 
 def main():
     scraper = SothebyScraper(headless=True)
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Registry of the listing sites the crawl scheduler knows how to crawl.
+
+A Source describes a site as categories of paginated search results: for
+each category, how many result pages are worth paging through, how to build
+a page's URL, and how to turn a page into listings. The scheduler
+(crawl_scheduler.py) decides which (source, category, page) to fetch next;
+a source only fetches and parses the one page it is asked for.
+
+Sources register themselves with @register_source. Modules listed in
+CRAWL_PLUGINS are imported by load_plugins(), so a new site can be added
+without touching this file:
+    
+    from sources import Source, register_source
+    
+    @register_source
+    class YourSite(Source):
+        name = 'yoursite'
+        categories = {'venta': 10}
+        
+        def page_url(self, category, page): ...
+        def parse(self, html, category, url): ...
+
+A site that can sort its results newest first declares the query
+parameters for it in `newest_first`. Incremental crawls request that order
+and stop paging a category once they reach listings already stored; other
+sites are paged to their usual depth.
+
+Pages are fetched through the shared async fetch engine, so the per-domain
+rate limiter, the conditional-GET page cache and record/replay apply to
+every source.
+"""
+
+import hashlib
+import importlib
+import os
+import re
+import sys
+from typing import Dict, List, Optional, Tuple, Type
+from urllib.parse import urlencode
+
+from config import config
+from embedded_state import BROWSER_HEADERS
+from html_parsing import make_soup, parse
+
+# The package scrapers; they share module names with standalone scripts at the top level
+SCRAPERS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scrapers')
+if SCRAPERS_DIR not in sys.path:
+    sys.path.insert(0, SCRAPERS_DIR)
+
+from fetch_engine import shared_engine
+
+SOURCES: Dict[str, Type['Source']] = {}
+
+
+def register_source(cls: Type['Source']) -> Type['Source']:
+    """Class decorator adding a Source to the registry under its name"""
+    if not cls.name:
+        raise ValueError(f"{cls.__name__} needs a name")
+    SOURCES[cls.name] = cls
+    return cls
+
+
+def load_plugins(modules: List[str] = None):
+    """Import the CRAWL_PLUGINS modules so their sources register"""
+    for module in config.CRAWL_PLUGINS if modules is None else modules:
+        importlib.import_module(module)
+
+
+def get_sources(names: List[str] = None) -> List['Source']:
+    """Instances of the named sources (all registered ones by default)"""
+    load_plugins()
+    names = list(SOURCES) if not names else names
+    unknown = [name for name in names if name not in SOURCES]
+    if unknown:
+        raise ValueError(f"Unknown source(s): {', '.join(unknown)}; "
+                         f"registered: {', '.join(sorted(SOURCES))}")
+    return [SOURCES[name]() for name in names]
+
+
+class Source:
+    """A site crawled one search result page at a time"""
+    
+    name: str = None
+    # category -> deepest result page worth fetching
+    categories: Dict[str, int] = {}
+    # Pages in flight at once; None uses CRAWL_CONCURRENCY_BY_SOURCE / CRAWL_SOURCE_CONCURRENCY
+    concurrency: Optional[int] = None
+    headers: Dict[str, str] = BROWSER_HEADERS
+    # Query parameters listing a category newest first; empty if the site has no such sort
+    newest_first: Dict[str, str] = {}
+    
+    @property
+    def max_concurrency(self) -> int:
+        if self.concurrency:
+            return self.concurrency
+        return config.CRAWL_CONCURRENCY_BY_SOURCE.get(self.name, config.CRAWL_SOURCE_CONCURRENCY)
+    
+    def page_url(self, category: str, page: int) -> str:
+        raise NotImplementedError
+    
+    def parse(self, html: str, category: str, url: str) -> List[Dict]:
+        raise NotImplementedError
+    
+    def crawl_url(self, category: str, page: int, newest_first: bool = False) -> str:
+        """page_url(), sorted newest first when asked and the site supports it"""
+        url = self.page_url(category, page)
+        if newest_first and self.newest_first:
+            url += ('&' if '?' in url else '?') + urlencode(self.newest_first)
+        return url
+    
+    async def fetch(self, url: str):
+        return await shared_engine().fetch(url, headers=dict(self.headers), source=self.name)
+    
+    async def scrape_page(self, category: str, page: int,
+                          newest_first: bool = False) -> Tuple[Optional[List[Dict]], object]:
+        """
+        (listings on one result page, or None if it is unchanged since the
+        last crawl, and the response); pass the response to
+        shared_engine().mark_processed() once the listings are stored
+        """
+        url = self.crawl_url(category, page, newest_first)
+        response = await self.fetch(url)
+        if response.unchanged:
+            return None, response
+        return self.parse(response.text, category, url), response
+
+
+class ScraperSource(Source):
+    """A source backed by one of the BaseScraper subclasses in scrapers/"""
+    
+    def __init__(self):
+        self.scraper = self.make_scraper()
+    
+    def make_scraper(self):
+        raise NotImplementedError
+    
+    async def fetch(self, url: str):
+        return await self.scraper.fetch(url)
+    
+    def parse(self, html: str, category: str, url: str) -> List[Dict]:
+        return self.scraper.parse_listings_page(parse(html), url)
+
+
+@register_source
+class Inmuebles24Source(ScraperSource):
+    name = 'inmuebles24'
+    categories = {'venta': 10, 'renta': 5}
+    city = 'ciudad-de-mexico'
+    
+    def make_scraper(self):
+        from inmuebles24_scraper import Inmuebles24Scraper
+        return Inmuebles24Scraper()
+    
+    def page_url(self, category: str, page: int) -> str:
+        url = f"{self.scraper.base_url}/{category}/{self.city}"
+        return f"{url}?pagina={page}" if page > 1 else url
+
+
+@register_source
+class VivanunciosSource(ScraperSource):
+    name = 'vivanuncios'
+    categories = {'inmuebles': 10}
+    city = 'distrito-federal'
+    
+    def make_scraper(self):
+        from vivanuncios_scraper import VivanunciosScraper
+        return VivanunciosScraper()
+    
+    def page_url(self, category: str, page: int) -> str:
+        return f"{self.scraper.base_url}/s-{category}/{self.city}/v1c1293l10047p{page}"
+
+
+@register_source
+class Century21Source(ScraperSource):
+    name = 'century21'
+    categories = {'venta': 10}
+    state = 'ciudad-de-mexico'
+    
+    def make_scraper(self):
+        from century21_scraper import Century21Scraper
+        return Century21Scraper()
+    
+    def page_url(self, category: str, page: int) -> str:
+        url = f"{self.scraper.base_url}/propiedades-en-{category}-{self.state}"
+        return f"{url}?page={page}" if page > 1 else url
+
+
+@register_source
+class LamudiSource(Source):
+    name = 'lamudi'
+    categories = {'departamento': 15, 'casa': 10, 'terreno': 5}
+    base_url = 'https://www.lamudi.com.mx'
+    newest_first = {'sorting': 'newest'}
+    
+    def __init__(self):
+        from lamudi_final_scraper import LamudiScraper
+        # Only the JSON-LD extraction is used; __init__ sets up the script's own session and HTML dir
+        self.scraper = LamudiScraper.__new__(LamudiScraper)
+    
+    def page_url(self, category: str, page: int) -> str:
+        url = f"{self.base_url}/{category}/for-sale/"
+        return f"{url}?page={page}" if page > 1 else url
+    
+    def parse(self, html: str, category: str, url: str) -> List[Dict]:
+        listings = self.scraper.extract_listings(html)
+        for listing in listings:
+            # As lamudi_final_scraper.store_in_database() stored them: no source_id, so the id is the key
+            id_string = f"lamudi_{listing.get('url', '')}_{listing.get('title', '')}"
+            listing['id'] = hashlib.md5(id_string.encode()).hexdigest()[:16]
+            listing.setdefault('city', 'Ciudad de Mexico')
+        return listings
+
+
+@register_source
+class MercadoLibreSource(Source):
+    name = 'mercadolibre'
+    # category -> (search path, listing type, property type)
+    searches = {
+        'sale_departamento': ('/departamentos/venta/distrito-federal/', 'sale', 'departamento'),
+        'sale_casa': ('/casas/venta/distrito-federal/', 'sale', 'casa'),
+        'rental_departamento': ('/departamentos/renta/distrito-federal/', 'rental', 'departamento'),
+        'rental_casa': ('/casas/renta/distrito-federal/', 'rental', 'casa'),
+        'sale_terreno': ('/terrenos/venta/distrito-federal/', 'sale', 'terreno'),
+    }
+    categories = {'sale_departamento': 15, 'sale_casa': 15, 'rental_departamento': 10,
+                  'rental_casa': 10, 'sale_terreno': 5}
+    page_size = 50
+    
+    def __init__(self):
+        from mercadolibre_improved_scraper import MercadoLibreImprovedScraper
+        self.scraper = MercadoLibreImprovedScraper()
+    
+    def page_url(self, category: str, page: int) -> str:
+        url = f"{self.scraper.base_url}{self.searches[category][0]}"
+        return f"{url}_Desde_{(page - 1) * self.page_size}" if page > 1 else url
+    
+    def parse(self, html: str, category: str, url: str) -> List[Dict]:
+        _, listing_type, property_type = self.searches[category]
+        listings = self.scraper.extract_listings_from_html(make_soup(html), listing_type, property_type)
+        for listing in listings:
+            # Same id as mercadolibre_improved_scraper.store_in_database() gave them
+            id_string = f"mercadolibre_{listing.get('source_id', '')}_{listing.get('url', '')}"
+            listing['id'] = hashlib.md5(id_string.encode()).hexdigest()[:16]
+        return listings
+
+
+@register_source
+class MetrosCubicosSource(Source):
+    name = 'metroscubicos'
+    categories = {'venta': 5}
+    
+    def __init__(self):
+        from real_estate_scraper import CDMXRealEstateScraper
+        self.scraper = CDMXRealEstateScraper()
+    
+    def page_url(self, category: str, page: int) -> str:
+        url = f"{self.scraper.sites['metroscubicos']}/casas-departamentos/{category}/distrito-federal"
+        return f"{url}?pagina={page}" if page > 1 else url
+    
+    def parse(self, html: str, category: str, url: str) -> List[Dict]:
+        cards = make_soup(html).find_all('div', class_=re.compile(r'result-item|property-card', re.I))
+        return [listing for listing in map(self.scraper.parse_metroscubicos_card, cards) if listing]
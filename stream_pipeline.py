@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Staged streaming pipeline for scraped listings.
+
+Items flow from async sources through a chain of stages into a batching
+sink, with a bounded asyncio.Queue between every two steps. A full queue
+blocks the step feeding it, so a slow stage (geocoding, the database) slows
+the scrapers down rather than letting items pile up in memory. Memory stays
+flat however large the crawl is: at most `queue_size` items wait in front of
+each stage.
+
+Each stage runs `workers` concurrent workers. Blocking functions
+(blocking=True) run in threads through asyncio.to_thread, and the others run
+on the event loop. A stage function returns the item to pass on, or None to
+drop it. The sink gets lists of up to `batch_size` items. A partial batch is
+written once its oldest item has waited `flush_interval` seconds, so results
+land within seconds even when the scrapers are slow.
+
+run() returns per-stage counters (in / out / dropped / errors, plus busy
+seconds and batches for the sink).
+"""
+
+import asyncio
+import time
+from typing import AsyncIterable, Callable, Dict, List
+
+# End-of-stream marker passed down the queues
+_DONE = object()
+
+
+class _Stage:
+    def __init__(self, name: str, func: Callable, workers: int, blocking: bool):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.blocking = blocking
+        self.stats = {'in': 0, 'out': 0, 'dropped': 0, 'errors': 0, 'busy_s': 0.0}
+    
+    async def call(self, arg):
+        start = time.monotonic()
+        try:
+            if self.blocking:
+                return await asyncio.to_thread(self.func, arg)
+            return self.func(arg)
+        finally:
+            self.stats['busy_s'] += time.monotonic() - start
+
+
+class StreamPipeline:
+    """sources -> stage -> ... -> stage -> batching sink, with backpressure between steps"""
+    
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._stages: List[_Stage] = []
+        self._sink: _Stage = None
+        self.batch_size = 1
+        self.flush_interval = None
+    
+    def stage(self, name: str, func: Callable, workers: int = 1, blocking: bool = False) -> 'StreamPipeline':
+        """Add a stage: func(item) returns the item to pass on, or None to drop it"""
+        self._stages.append(_Stage(name, func, workers, blocking))
+        return self
+    
+    def sink(self, name: str, func: Callable, batch_size: int = 50, flush_interval: float = 2.0,
+             blocking: bool = True) -> 'StreamPipeline':
+        """Set the final step: func(batch) stores a list of items and returns how many it kept"""
+        self._sink = _Stage(name, func, 1, blocking)
+        self._sink.stats['batches'] = 0
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        return self
+    
+    async def _feed(self, name: str, source: AsyncIterable, queue: asyncio.Queue, stats: Dict):
+        try:
+            async for item in source:
+                stats['items'] += 1
+                await queue.put(item)
+        except Exception as e:
+            stats['error'] = str(e)
+            print(f"✗ {name} failed: {e}")
+    
+    async def _work(self, stage: _Stage, inbox: asyncio.Queue, outbox: asyncio.Queue):
+        while True:
+            item = await inbox.get()
+            if item is _DONE:
+                return
+            stage.stats['in'] += 1
+            try:
+                result = await stage.call(item)
+            except Exception as e:
+                stage.stats['errors'] += 1
+                print(f"Error in {stage.name} stage: {e}")
+                continue
+            if result is None:
+                stage.stats['dropped'] += 1
+                continue
+            stage.stats['out'] += 1
+            await outbox.put(result)
+    
+    async def _run_stage(self, stage: _Stage, inbox: asyncio.Queue, outbox: asyncio.Queue, downstream: int):
+        await asyncio.gather(*(self._work(stage, inbox, outbox) for _ in range(stage.workers)))
+        for _ in range(downstream):
+            await outbox.put(_DONE)
+    
+    async def _flush(self, batch: List):
+        sink = self._sink
+        sink.stats['in'] += len(batch)
+        sink.stats['batches'] += 1
+        try:
+            kept = await sink.call(batch)
+        except Exception as e:
+            sink.stats['errors'] += len(batch)
+            print(f"Error in {sink.name} stage: {e}")
+            return
+        kept = len(batch) if kept is None else kept
+        sink.stats['out'] += kept
+        sink.stats['dropped'] += len(batch) - kept
+    
+    async def _run_sink(self, inbox: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        batch, deadline = [], None
+        while True:
+            timeout = None if not batch or self.flush_interval is None else max(0.0, deadline - loop.time())
+            try:
+                item = await asyncio.wait_for(inbox.get(), timeout)
+            except asyncio.TimeoutError:
+                await self._flush(batch)
+                batch = []
+                continue
+            if item is _DONE:
+                if batch:
+                    await self._flush(batch)
+                return
+            if not batch and self.flush_interval is not None:
+                deadline = loop.time() + self.flush_interval
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                await self._flush(batch)
+                batch = []
+    
+    async def run(self, sources: Dict[str, AsyncIterable]) -> Dict:
+        """Drain every source through the pipeline; returns per-source and per-stage counters"""
+        if self._sink is None:
+            raise ValueError("StreamPipeline needs a sink")
+        queues = [asyncio.Queue(self.queue_size) for _ in range(len(self._stages) + 1)]
+        source_stats = {name: {'items': 0} for name in sources}
+        
+        async def feed_all():
+            await asyncio.gather(*(self._feed(name, source, queues[0], source_stats[name])
+                                   for name, source in sources.items()))
+            first = self._stages[0].workers if self._stages else 1
+            for _ in range(first):
+                await queues[0].put(_DONE)
+        
+        tasks = [feed_all()]
+        for i, stage in enumerate(self._stages):
+            downstream = self._stages[i + 1].workers if i + 1 < len(self._stages) else 1
+            tasks.append(self._run_stage(stage, queues[i], queues[i + 1], downstream))
+        tasks.append(self._run_sink(queues[-1]))
+        
+        start = time.monotonic()
+        await asyncio.gather(*tasks)
+        return {
+            'elapsed_s': round(time.monotonic() - start, 3),
+            'sources': source_stats,
+            'stages': {stage.name: dict(stage.stats, busy_s=round(stage.stats['busy_s'], 3))
+                       for stage in self._stages + [self._sink]}
+        }
@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+Synthetic large-scale dataset generator for benchmarking Polpi MX.
+
+Produces 100k-5M realistic listings across the ProductionDataGenerator
+colonias (same coordinates, price/m² ranges, property type mix, agents,
+amenities and source weights), with multi-year price_history, delisted
+inventory and cross-source duplicates recorded in the duplicates table.
+
+Rows are written straight to SQLite with executemany in large
+transactions instead of one insert_listing() call per row. Into a database
+with no listings yet, the load also runs without a rollback journal or
+fsyncs and with secondary indexes dropped until the end; a database that
+already has listings is appended to with its indexes and durability left
+alone. Appended listings are numbered after the synthetic ones already
+there, so a run never replaces an earlier run's listings (or their price
+history and duplicate pairs). Everything is drawn from a single
+random.Random(seed) against a fixed reference date, so the same seed and
+count always produce the same database.
+"""
+
+import hashlib
+import json
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Callable, Dict, List, Optional, Tuple
+
+from database import PolpiDB
+from populate_production_data import ProductionDataGenerator
+
+USD_RATE = 17.0
+
+TYPE_PRICE_MULTIPLIERS = {
+    "penthouse": (1.5, 1.5),
+    "casa": (1.1, 1.3),
+    "terreno": (0.8, 1.2),
+    "oficina": (0.9, 1.2),
+}
+
+TITLE_PREFIXES = {
+    "departamento": ["Departamento de lujo", "Hermoso departamento", "Departamento moderno",
+                     "Departamento con vista", "Exclusivo departamento"],
+    "casa": ["Casa moderna", "Hermosa casa", "Casa con jardín", "Residencia", "Casa familiar"],
+    "terreno": ["Terreno", "Lote en zona de plusvalía", "Terreno comercial", "Terreno residencial"],
+    "oficina": ["Oficina", "Espacio comercial", "Local comercial", "Oficina ejecutiva"],
+    "penthouse": ["Penthouse de lujo", "Exclusivo penthouse", "Penthouse con vista panorámica"],
+}
+
+LISTING_INSERT_COLUMNS = (
+    'id', 'source', 'source_id', 'url', 'title', 'price_mxn', 'price_usd', 'property_type',
+    'bedrooms', 'bathrooms', 'size_m2', 'lot_size_m2', 'state', 'city', 'colonia', 'lat', 'lng',
+    'description', 'images', 'agent_name', 'agent_phone', 'listed_date', 'scraped_date',
+    'amenities', 'parking_spaces', 'data_quality_score', 'is_active', 'updated_at'
+)
+
+
+class SyntheticDatasetGenerator:
+    """Deterministic bulk generator for benchmark-scale Polpi databases"""
+    
+    def __init__(self, db_path: str, seed: int = 42, history_years: int = 3,
+                 duplicate_rate: float = 0.08, inactive_rate: float = 0.12,
+                 reference_date: datetime = datetime(2026, 1, 1)):
+        self.db_path = db_path
+        self.seed = seed
+        self.history_years = history_years
+        self.duplicate_rate = duplicate_rate
+        self.inactive_rate = inactive_rate
+        self.reference_date = reference_date
+        self.rng = random.Random(seed)
+        
+        # Creates the schema; reference data comes from the production generator
+        self.db = PolpiDB(db_path)
+        self.reference = ProductionDataGenerator(db=self.db)
+        
+        # Cumulative weights so rng.choices doesn't re-sum them for every row
+        self._colonias = []
+        colonia_weights = []
+        for city, city_data in self.reference.cities_data.items():
+            for colonia, data in city_data["neighborhoods"].items():
+                self._colonias.append((city, city_data, colonia, data))
+                colonia_weights.append(self.reference.colonia_weights.get(colonia, 1))
+        self._colonia_cum = list(accumulate(colonia_weights))
+        self._types = self.reference.property_types
+        self._type_cum = list(accumulate(weight for _, weight, _ in self._types))
+        self._sources = [source for source, _ in self.reference.sources]
+        self._source_cum = list(accumulate(weight for _, weight in self.reference.sources))
+        
+        # Recent canonical listings that later rows may duplicate on another source
+        self._recent = []
+    
+    # --- Row generation ---------------------------------------------------
+    
+    def _price_at(self, price_now: float, colonia: str, days_before: int) -> float:
+        """Back out an older asking price from the colonia's annual growth"""
+        growth = self.reference.market_trends.get(colonia, 6) / 100
+        return price_now / (1 + growth) ** (days_before / 365) * self.rng.uniform(0.97, 1.03)
+    
+    def _new_listing(self, n: int) -> Dict:
+        rng = self.rng
+        city, city_data, colonia, location = rng.choices(self._colonias, cum_weights=self._colonia_cum)[0]
+        property_type, _, type_config = rng.choices(self._types, cum_weights=self._type_cum)[0]
+        source = rng.choices(self._sources, cum_weights=self._source_cum)[0]
+        
+        size_m2 = round(rng.uniform(type_config["min_size"], type_config["max_size"]), 2)
+        price_per_m2 = rng.uniform(*location["price_range"])
+        if property_type in TYPE_PRICE_MULTIPLIERS:
+            price_per_m2 *= rng.uniform(*TYPE_PRICE_MULTIPLIERS[property_type])
+        # Log-normal noise gives the long tails real inventory has
+        price_mxn = round(price_per_m2 * size_m2 * rng.lognormvariate(0, 0.12), -3)
+        
+        if property_type == "terreno":
+            bedrooms = bathrooms = parking = None
+            lot_size = size_m2
+        else:
+            min_bed, max_bed = type_config["bedrooms"]
+            bedrooms = rng.randint(min_bed, max_bed) if max_bed > 0 else None
+            bathrooms = rng.randint(1, min(4, bedrooms + 1)) if bedrooms else 1
+            parking = rng.randint(0, 3)
+            lot_size = round(size_m2 * rng.uniform(1.5, 3.0), 2) if property_type == "casa" else None
+        
+        amenities = rng.sample(self.reference.amenities_pool, rng.randint(2, 6))
+        listed = self.reference_date - timedelta(days=rng.randint(1, 365 * self.history_years),
+                                                 seconds=rng.randint(0, 86399))
+        scraped = min(self.reference_date, listed + timedelta(days=rng.randint(0, 30)))
+        title = f"{rng.choice(TITLE_PREFIXES[property_type])} en {colonia}"
+        
+        return {
+            'source': source,
+            'source_id': f"syn-{source}-{n:08d}",
+            'url': f"https://{source}.com.mx/propiedad/syn-{n:08d}",
+            'title': title,
+            'price_mxn': price_mxn,
+            'price_usd': round(price_mxn / USD_RATE, 2),
+            'property_type': property_type,
+            'bedrooms': bedrooms,
+            'bathrooms': bathrooms,
+            'size_m2': size_m2,
+            'lot_size_m2': lot_size,
+            'state': city_data["state"],
+            'city': city,
+            'colonia': colonia,
+            'lat': round(location["lat"] + rng.gauss(0, 0.006), 6),
+            'lng': round(location["lng"] + rng.gauss(0, 0.006), 6),
+            'description': f"{title}, {city}. Cuenta con {size_m2:.0f}m². Incluye {', '.join(amenities[:3])}.",
+            'agent_name': rng.choice(self.reference.agent_names),
+            'agent_phone': f"{city_data['phone_prefix']}-{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}",
+            'listed_date': listed.isoformat(),
+            'scraped_date': scraped.isoformat(),
+            'amenities': amenities,
+            'parking_spaces': parking,
+        }
+    
+    def _duplicate_of(self, canonical: Dict, n: int) -> Dict:
+        """Same property re-listed on another portal with slightly different data"""
+        rng = self.rng
+        source = rng.choice([s for s in self._sources if s != canonical['source']])
+        price_mxn = round(canonical['price_mxn'] * rng.uniform(0.97, 1.03), -3)
+        listing = dict(canonical)
+        listing.update(
+            source=source,
+            source_id=f"syn-{source}-{n:08d}",
+            url=f"https://{source}.com.mx/propiedad/syn-{n:08d}",
+            price_mxn=price_mxn,
+            price_usd=round(price_mxn / USD_RATE, 2),
+            lat=round(canonical['lat'] + rng.uniform(-0.0002, 0.0002), 6),
+            lng=round(canonical['lng'] + rng.uniform(-0.0002, 0.0002), 6),
+            agent_name=rng.choice(self.reference.agent_names),
+        )
+        return listing
+    
+    def _finish(self, listing: Dict) -> Tuple[tuple, tuple, List[tuple]]:
+        """Fill derived columns; returns (listing row, fts row, price history rows)"""
+        listing['id'] = self.db.generate_listing_id(listing['source'], listing['url'], listing['title'])
+        listing['images'] = [f"https://picsum.photos/seed/{listing['id'][:8]}/800/600"]
+        listing['data_quality_score'] = self.db.calculate_quality_score(listing)
+        listing['is_active'] = 0 if self.rng.random() < self.inactive_rate else 1
+        listing['updated_at'] = listing['scraped_date']
+        
+        encoded = dict(listing, images=json.dumps(listing['images']),
+                       amenities=json.dumps(listing['amenities'], ensure_ascii=False))
+        row = tuple(map(encoded.get, LISTING_INSERT_COLUMNS))
+        fts = (listing['id'], listing['title'], listing['description'], listing['city'],
+               listing['colonia'], ' '.join(listing['amenities']))
+        
+        # One observation roughly every quarter since listing, ending at the current price
+        listed = datetime.fromisoformat(listing['listed_date'])
+        days_listed = (self.reference_date - listed).days
+        history = []
+        for days_before in range(days_listed, 0, -self.rng.randint(60, 120)):
+            price = round(self._price_at(listing['price_mxn'], listing['colonia'], days_before), -3)
+            recorded = (self.reference_date - timedelta(days=days_before)).isoformat()
+            history.append((listing['id'], price, round(price / USD_RATE, 2), recorded, listing['source']))
+        history.append((listing['id'], listing['price_mxn'], listing['price_usd'],
+                        listing['scraped_date'], listing['source']))
+        return row, fts, history
+    
+    # --- Bulk load --------------------------------------------------------
+    
+    def _connect(self, unsafe: bool = False) -> sqlite3.Connection:
+        """Connection tuned for bulk writes; `unsafe` trades crash safety for speed (fresh files only)"""
+        conn = sqlite3.connect(self.db_path)
+        if unsafe:
+            conn.execute("PRAGMA journal_mode = MEMORY")
+            conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA cache_size = -200000")
+        return conn
+    
+    @staticmethod
+    def _drop_indexes(conn: sqlite3.Connection, tables: Tuple[str, ...]) -> List[str]:
+        """Drop secondary indexes on the bulk-loaded tables; returns their CREATE statements"""
+        placeholders = ', '.join('?' for _ in tables)
+        rows = conn.execute(
+            f"SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL "
+            f"AND tbl_name IN ({placeholders})", tables
+        ).fetchall()
+        for name, _ in rows:
+            conn.execute(f"DROP INDEX {name}")
+        return [sql for _, sql in rows]
+    
+    def generate(self, count: int, batch_size: int = 20000, fts: bool = True,
+                 progress: Optional[Callable[[str], None]] = print) -> Dict:
+        """Append `count` listings to the database; returns a summary"""
+        start = time.time()
+        conn = sqlite3.connect(self.db_path)
+        fresh = conn.execute("SELECT NOT EXISTS (SELECT 1 FROM listings)").fetchone()[0]
+        # Continue numbering after earlier runs: source_id is 'syn-{source}-{n}'
+        first = conn.execute(
+            "SELECT COALESCE(MAX(CAST(substr(source_id, length(source) + 6) AS INTEGER)) + 1, 0) "
+            "FROM listings WHERE source_id LIKE 'syn-%'"
+        ).fetchone()[0]
+        conn.close()
+        
+        conn = self._connect(unsafe=fresh)
+        index_sql = self._drop_indexes(conn, ('listings', 'price_history')) if fresh else []
+        # Appending re-inserts ids a previous run may have written, and FTS5 has
+        # no key to replace on, so the index is rebuilt once at the end instead
+        fts_per_row = fts and fresh
+        
+        listing_sql = (f"INSERT OR REPLACE INTO listings ({', '.join(LISTING_INSERT_COLUMNS)}) "
+                       f"VALUES ({', '.join('?' for _ in LISTING_INSERT_COLUMNS)})")
+        fts_sql = "INSERT INTO listings_fts (id, title, description, city, colonia, amenities) VALUES (?, ?, ?, ?, ?, ?)"
+        history_sql = ("INSERT INTO price_history (listing_id, price_mxn, price_usd, recorded_date, source) "
+                       "VALUES (?, ?, ?, ?, ?)")
+        duplicate_sql = "INSERT INTO duplicates (canonical_id, duplicate_id, confidence) VALUES (?, ?, ?)"
+        
+        totals = {'listings': 0, 'price_history': 0, 'duplicates': 0, 'skipped': 0}
+        # (listing, listing row, fts row, price history rows, duplicates row or None)
+        pending = []
+        
+        def flush():
+            if not fresh:
+                # Never replace a stored listing: its history and duplicate pairs would be left behind
+                taken = self._stored_keys(conn, [entry[0] for entry in pending])
+                kept = [entry for entry in pending
+                        if entry[0]['id'] not in taken and (entry[0]['source'], entry[0]['source_id']) not in taken]
+                totals['skipped'] += len(pending) - len(kept)
+                pending[:] = kept
+            history_rows = [row for entry in pending for row in entry[3]]
+            duplicate_rows = [entry[4] for entry in pending if entry[4] is not None]
+            conn.executemany(listing_sql, [entry[1] for entry in pending])
+            if fts_per_row:
+                conn.executemany(fts_sql, [entry[2] for entry in pending])
+            conn.executemany(history_sql, history_rows)
+            conn.executemany(duplicate_sql, duplicate_rows)
+            conn.commit()
+            totals['listings'] += len(pending)
+            totals['price_history'] += len(history_rows)
+            totals['duplicates'] += len(duplicate_rows)
+            pending.clear()
+        
+        try:
+            for n in range(first, first + count):
+                duplicate_row = None
+                if self._recent and self.rng.random() < self.duplicate_rate:
+                    canonical = self.rng.choice(self._recent)
+                    listing = self._duplicate_of(canonical, n)
+                    row, fts_row, history = self._finish(listing)
+                    duplicate_row = (canonical['id'], listing['id'], round(self.rng.uniform(0.8, 0.99), 2))
+                else:
+                    listing = self._new_listing(n)
+                    row, fts_row, history = self._finish(listing)
+                    if len(self._recent) < 5000:
+                        self._recent.append(listing)
+                    else:
+                        self._recent[self.rng.randrange(5000)] = listing
+                
+                pending.append((listing, row, fts_row, history, duplicate_row))
+                
+                if len(pending) >= batch_size:
+                    flush()
+                    if progress:
+                        rate = totals['listings'] / (time.time() - start)
+                        progress(f"  {totals['listings']:,}/{count:,} listings ({rate:,.0f}/s)")
+            flush()
+            
+            if fts and not fts_per_row:
+                if progress:
+                    progress("  rebuilding full-text index...")
+                self._rebuild_fts(conn)
+        finally:
+            # Put the indexes back even if the load failed part way
+            if index_sql and progress:
+                progress(f"  rebuilding {len(index_sql)} indexes...")
+            for sql in index_sql:
+                conn.execute(sql)
+            conn.execute("ANALYZE")
+            conn.commit()
+            conn.close()
+        
+        self._build_aggregates()
+        
+        totals['seconds'] = round(time.time() - start, 1)
+        totals['seed'] = self.seed
+        return totals
+    
+    @staticmethod
+    def _stored_keys(conn: sqlite3.Connection, listings: List[Dict]) -> set:
+        """Ids and (source, source_id) pairs of these listings that are already stored"""
+        taken = set()
+        for i in range(0, len(listings), 5000):
+            chunk = listings[i:i + 5000]
+            placeholders = ', '.join('?' for _ in chunk)
+            taken.update(row[0] for row in conn.execute(
+                f"SELECT id FROM listings WHERE id IN ({placeholders})", [listing['id'] for listing in chunk]))
+            taken.update(conn.execute(
+                f"SELECT source, source_id FROM listings WHERE source_id IN ({placeholders})",
+                [listing['source_id'] for listing in chunk]))
+        return taken
+    
+    @staticmethod
+    def _rebuild_fts(conn: sqlite3.Connection):
+        """Re-index every listing in listings_fts, amenities space-joined as in insert_listing"""
+        conn.execute("DELETE FROM listings_fts")
+        conn.execute("""
+            INSERT INTO listings_fts (id, title, description, city, colonia, amenities)
+            SELECT id, title, description, city, colonia,
+                   CASE WHEN json_valid(amenities)
+                        THEN (SELECT group_concat(value, ' ') FROM json_each(listings.amenities))
+                        ELSE amenities END
+            FROM listings
+        """)
+        conn.commit()
+    
+    def _build_aggregates(self):
+        """Rebuild market_trends and neighborhood_stats from the generated data in single passes"""
+        as_of = self.reference_date.isoformat()
+        since = (self.reference_date - timedelta(days=365)).strftime('%Y-%m')
+        conn = self._connect()
+        # Medians: rank prices within each group (NULLs last) and average the middle one or two
+        conn.execute("DELETE FROM market_trends")
+        conn.execute("""
+            INSERT INTO market_trends
+                (city, property_type, year_month, avg_price_mxn, avg_price_per_m2,
+                 median_price_mxn, listing_count, created_date)
+            WITH observations AS (
+                SELECT l.city, l.property_type, substr(ph.recorded_date, 1, 7) AS year_month,
+                       l.id AS listing_id, ph.price_mxn, ph.price_mxn / NULLIF(l.size_m2, 0) AS price_per_m2
+                FROM price_history ph
+                JOIN listings l ON l.id = ph.listing_id
+                WHERE substr(ph.recorded_date, 1, 7) >= :since
+            ),
+            ranked AS (
+                SELECT *,
+                       ROW_NUMBER() OVER (PARTITION BY city, property_type, year_month
+                                          ORDER BY price_mxn NULLS LAST) AS rn,
+                       COUNT(price_mxn) OVER (PARTITION BY city, property_type, year_month) AS n
+                FROM observations
+            )
+            SELECT city, property_type, year_month,
+                   ROUND(AVG(price_mxn), 2), ROUND(AVG(price_per_m2), 2),
+                   ROUND(AVG(CASE WHEN rn IN ((n + 1) / 2, (n + 2) / 2) THEN price_mxn END), 2),
+                   COUNT(DISTINCT listing_id), :as_of
+            FROM ranked
+            GROUP BY city, property_type, year_month
+        """, {'since': since, 'as_of': as_of})
+        conn.execute("DELETE FROM neighborhood_stats")
+        conn.execute("""
+            INSERT INTO neighborhood_stats
+                (city, colonia, property_type, avg_price_mxn, avg_price_per_m2,
+                 median_price_mxn, listing_count, last_updated)
+            WITH ranked AS (
+                SELECT city, colonia, property_type, price_mxn, size_m2,
+                       ROW_NUMBER() OVER (PARTITION BY city, colonia, property_type
+                                          ORDER BY price_mxn NULLS LAST) AS rn,
+                       COUNT(price_mxn) OVER (PARTITION BY city, colonia, property_type) AS n
+                FROM listings
+                WHERE is_active = 1
+            )
+            SELECT city, colonia, property_type, ROUND(AVG(price_mxn), 2),
+                   ROUND(AVG(price_mxn / NULLIF(size_m2, 0)), 2),
+                   ROUND(AVG(CASE WHEN rn IN ((n + 1) / 2, (n + 2) / 2) THEN price_mxn END), 2),
+                   COUNT(*), ?
+            FROM ranked
+            GROUP BY city, colonia, property_type
+        """, (as_of,))
+        conn.commit()
+        conn.close()
+    
+    @staticmethod
+    def fingerprint(db_path: str) -> str:
+        """Hash of listing ids and prices, for checking that a seed reproduces the same data"""
+        digest = hashlib.md5()
+        conn = sqlite3.connect(db_path)
+        for listing_id, price in conn.execute("SELECT id, price_mxn FROM listings ORDER BY id"):
+            digest.update(f"{listing_id}:{price};".encode())
+        conn.close()
+        return digest.hexdigest()
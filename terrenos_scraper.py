@@ -17,11 +17,19 @@ from selenium.webdriver.chrome.options import Options
 
 sys.path.insert(0, '/Users/isaachomefolder/Desktop/polpi-mx')
 from database import PolpiDB
+from embedded_state import BROWSER_SCRIPT, browser_session, fetch_state
+from replay import browser_driver, page_wait
 
 class TerrenosScraper:
     """Specialized scraper for land/terrenos targeting developers"""
     
     def __init__(self):
+        """Set up the HTTP session; Chrome is only started if a page needs rendering"""
+        self.driver = None
+        self.session = browser_session()
+        self.base_url = 'https://inmuebles.mercadolibre.com.mx'
+
+    def init_driver(self):
         """Initialize Chrome driver"""
         print("🌐 Initializing Chrome driver...")
         options = Options()
@@ -34,8 +42,8 @@ class TerrenosScraper:
         prefs = {"profile.managed_default_content_settings.images": 2}
         options.add_experimental_option("prefs", prefs)
         
-        self.driver = webdriver.Chrome(options=options)
-        self.base_url = 'https://inmuebles.mercadolibre.com.mx'
+        self.driver = browser_driver(lambda: webdriver.Chrome(options=options),
+                                     source='terrenos')
         print("✓ Chrome driver ready\n")
 
     def get_terreno_urls(self, max_pages=25):
@@ -55,13 +63,22 @@ class TerrenosScraper:
         return urls
 
     def extract_preloaded_state(self, url: str) -> Optional[Dict]:
-        """Load page and extract data"""
+        """Read the page's embedded state over HTTP; render it in Chrome only if that fails"""
+        state = fetch_state(self.session, url)
+        if state:
+            return state
+        print(f"  No embedded state in the HTML, falling back to Chrome")
+        return self.extract_preloaded_state_browser(url)
+
+    def extract_preloaded_state_browser(self, url: str) -> Optional[Dict]:
+        """Load page in Chrome and extract data"""
         try:
+            if self.driver is None:
+                self.init_driver()
             self.driver.get(url)
-            time.sleep(4)  # Wait for JS to load
+            page_wait(4)  # Wait for JS to load
             
-            script = "return window.__PRELOADED_STATE__ || window.__NEXT_DATA__ || null;"
-            data = self.driver.execute_script(script)
+            data = self.driver.execute_script(BROWSER_SCRIPT)
             
             return data
             
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The modules under test live at the repository root, the package scrapers in scrapers/
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, 'scrapers')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
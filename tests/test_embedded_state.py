@@ -0,0 +1,79 @@
+"""StateLocator must find the same JSON text however the page is split into chunks"""
+
+import json
+
+import pytest
+
+from embedded_state import StateLocator, extract_state
+
+TRICKY = {
+    'brackets': '}{] ][ {"x": [1, {2}]}',
+    'quotes': 'say "}" and \\"{\\" now',
+    'backslash': 'C:\\',
+    'backslashes': '\\\\"]',
+    'nested': [{'a': '}'}, ['[', ']'], {}],
+    'unicode': 'Ñuñoa \u00e9 \u2603',
+}
+VALUE = json.dumps(TRICKY)
+
+PAGES = {
+    'assignment': (f'<html><script>var x = 1; window.__PRELOADED_STATE__ = {VALUE};'
+                   f'window.other = {{"a": ["}}"]}};</script></html>'),
+    'next_data': (f'<html><body><script id="__NEXT_DATA__" type="application/json">{VALUE}</script>'
+                  f'<script>self.__next_f = [{{"b": 1}}]</script></body></html>'),
+    'trailing': f'<script>__PRELOADED_STATE__={VALUE}\n;init({{"c": "{{"}})</script>',
+}
+
+
+def feed_all(chunks):
+    locator = StateLocator()
+    result = None
+    for chunk in chunks:
+        result = locator.feed(chunk)
+    return locator, result
+
+
+@pytest.mark.parametrize('page', sorted(PAGES))
+def test_whole_page(page):
+    locator, text = feed_all([PAGES[page]])
+    assert text == VALUE
+    assert json.loads(text) == TRICKY
+    assert extract_state(PAGES[page]) == TRICKY
+
+
+@pytest.mark.parametrize('page', sorted(PAGES))
+def test_every_split_point(page):
+    html = PAGES[page]
+    for cut in range(1, len(html)):
+        assert feed_all([html[:cut], html[cut:]])[1] == VALUE, cut
+        # Streamed responses can yield empty chunks, which must not reset the scanner state
+        assert feed_all([html[:cut], '', html[cut:]])[1] == VALUE, cut
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7])
+def test_small_chunks(size):
+    html = PAGES['assignment']
+    locator, text = feed_all(html[i:i + size] for i in range(0, len(html), size))
+    assert text == VALUE
+    assert locator.name == '__PRELOADED_STATE__'
+
+
+def test_backslash_at_chunk_end():
+    html = PAGES['assignment']
+    cut = html.index('C:\\\\') + len('C:\\')
+    # The first chunk ends on the backslash of an escape; an empty chunk in between keeps it pending
+    assert html[cut - 1] == '\\'
+    assert feed_all([html[:cut], '', html[cut:]])[1] == VALUE
+
+
+def test_next_data_script():
+    locator, text = feed_all([PAGES['next_data']])
+    assert locator.name == '__NEXT_DATA__'
+    assert text == VALUE
+
+
+def test_incomplete_value():
+    html = PAGES['assignment']
+    locator, text = feed_all([html[:html.index('"nested"')]])
+    assert text is None
+    assert locator.name == '__PRELOADED_STATE__'
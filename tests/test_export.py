@@ -0,0 +1,23 @@
+import pytest
+
+from export import accepts_gzip
+
+
+@pytest.mark.parametrize('header, expected', [
+    (None, False),
+    ('', False),
+    ('gzip', True),
+    ('GZip, deflate, br', True),
+    ('br;q=1.0, gzip;q=0.8', True),
+    ('x-gzip', True),
+    ('*', True),
+    ('gzip;q=0', False),
+    ('gzip; q=0.0, deflate', False),
+    ('identity', False),
+    ('deflate, *;q=0', False),
+    ('gzip;q=0, *', False),
+    ('*;q=0.5, gzip;q=0', False),
+    ('gzip;q=abc', False),
+])
+def test_accepts_gzip(header, expected):
+    assert accepts_gzip(header) is expected
@@ -0,0 +1,102 @@
+"""The selectolax and lxml backends must answer like BeautifulSoup's html.parser"""
+
+import re
+
+import pytest
+
+from html_parsing import available_backends, parse
+
+FAST_BACKENDS = [name for name in available_backends() if name != 'html.parser']
+
+PAGE = '''
+<html><head><title>Resultados</title><style>.card { color: red }</style></head>
+<body>
+  <div class="listing card featured" data-id="1">
+    <a id="a1" href="/p/1"><span>Precio</span></a>
+    <h2 class="title">Departamento en Roma Norte</h2>
+    <p class="price">$ 4,500,000 <small>MXN</small></p>
+    <script>window.state = {"price": 1}</script>
+  </div>
+  <div class="listing card" data-id="2">
+    <a id="a2" href="/p/2">Precio <b>a consultar</b></a>
+    <h2 class="title">Casa en Coyoacán</h2>
+    <p class="price">$ 9,800,000</p>
+    <!-- Precio oculto -->
+  </div>
+  <div class="listing-ad" data-id="3" hidden>
+    <a id="a3"> <span>Precio 3</span></a>
+    <a id="a4"><span><i>Precio 4</i></span></a>
+    <a id="a5"><!--Precio 5--></a>
+    <a id="a6"></a>
+    <a id="a7"><span>Precio</span>tail</a>
+  </div>
+  <div class="notes">Notas:<span> </span><pre>  Amueblado
+    <b> </b>
+</pre></div>
+</body></html>
+'''
+
+
+def describe(nodes):
+    return [(node.tag, node.get('id'), node.get('data-id'), node.text(strip=True)) for node in nodes]
+
+
+def both(backend):
+    return parse(PAGE, 'html.parser'), parse(PAGE, backend)
+
+
+@pytest.mark.skipif(not FAST_BACKENDS, reason='neither selectolax nor lxml is installed')
+@pytest.mark.parametrize('backend', FAST_BACKENDS)
+class TestBackendParity:
+    @pytest.mark.parametrize('args, kwargs', [
+        (('div',), {}),
+        (('div',), {'class_': 'listing'}),
+        (('div',), {'class_': 'card featured'}),
+        (('div',), {'class_': re.compile(r'^listing')}),
+        (('div',), {'attrs': {'hidden': True}}),
+        (('div',), {'attrs': {'data-id': '2'}}),
+        ((['h2', 'p'],), {}),
+        (('p',), {'class_': 'price', 'limit': 1}),
+        ((), {'class_': 'title'}),
+    ])
+    def test_find_all(self, backend, args, kwargs):
+        soup, fast = both(backend)
+        assert describe(fast.find_all(*args, **kwargs)) == describe(soup.find_all(*args, **kwargs))
+    
+    @pytest.mark.parametrize('tag', ['a', 'span', 'i', ['a', 'span', 'i']])
+    def test_find_all_string_follows_bs4_string(self, backend, tag):
+        # .string: the only child when it is text, else the .string of the only child element
+        soup, fast = both(backend)
+        pattern = re.compile('Precio')
+        assert describe(fast.find_all(tag, string=pattern)) == describe(soup.find_all(tag, string=pattern))
+    
+    def test_string_rule(self, backend):
+        fast = parse(PAGE, backend)
+        ids = [node.get('id') for node in fast.find_all('a', string=re.compile('Precio'))]
+        # a1/a4 pass through single child tags, a5 is a lone comment; a2 and a7 are mixed content,
+        # a3 has a whitespace sibling and a6 is empty
+        assert ids == ['a1', 'a4', 'a5']
+    
+    def test_find(self, backend):
+        soup, fast = both(backend)
+        for args, kwargs in [(('h2',), {}), (('p',), {'class_': 'price'}), (('table',), {})]:
+            found, expected = fast.find(*args, **kwargs), soup.find(*args, **kwargs)
+            assert describe([found] if found else []) == describe([expected] if expected else [])
+    
+    @pytest.mark.parametrize('css', ['div.listing h2', 'a[href]', 'div[data-id="2"] p.price', 'p > small'])
+    def test_select(self, backend, css):
+        soup, fast = both(backend)
+        assert describe(fast.select(css)) == describe(soup.select(css))
+        assert describe([fast.select_one(css)]) == describe([soup.select_one(css)])
+    
+    def test_text(self, backend):
+        soup, fast = both(backend)
+        for name in ('div', 'p', 'a', 'pre', 'b'):
+            assert [node.text() for node in fast.find_all(name)] == [node.text() for node in soup.find_all(name)]
+            assert ([node.text(strip=True) for node in fast.find_all(name)]
+                    == [node.text(strip=True) for node in soup.find_all(name)])
+    
+    def test_scripts_are_not_text(self, backend):
+        fast = parse(PAGE, backend)
+        assert 'window.state' not in fast.find('div').text()
+        assert fast.scripts() == ['window.state = {"price": 1}']
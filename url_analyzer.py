@@ -7,11 +7,12 @@ Supports: Lamudi, MercadoLibre, Inmuebles24
 import re
 import requests
 import cloudscraper
-from bs4 import BeautifulSoup
 from typing import Dict, Optional
 from dataclasses import dataclass, asdict
 import json
 
+from html_parsing import Document, parse
+
 
 @dataclass
 class PropertyData:
@@ -80,7 +81,7 @@ class URLAnalyzer:
         try:
             response = self.session.get(url, timeout=15)
             response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
+            soup = parse(response.text)
             
             data = PropertyData(url=url, source='lamudi')
             
@@ -153,7 +154,7 @@ class URLAnalyzer:
         try:
             response = self.session.get(url, timeout=15)
             response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
+            soup = parse(response.text)
             
             data = PropertyData(url=url, source='mercadolibre')
             
@@ -221,19 +222,19 @@ class URLAnalyzer:
             # Inmuebles24 uses Cloudflare, need cloudscraper
             response = self.cloudscraper.get(url, timeout=15)
             response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
+            soup = parse(response.text)
             
             data = PropertyData(url=url, source='inmuebles24')
             
             # Title
-            title_elem = soup.find('h1', class_=lambda x: x and 'property-title' in x if x else False)
+            title_elem = soup.find('h1', class_=re.compile(r'property-title'))
             if not title_elem:
                 title_elem = soup.find('h1')
             if title_elem:
                 data.title = title_elem.get_text(strip=True)
             
             # Price
-            price_elem = soup.find('span', class_=lambda x: x and 'price-tag' in x if x else False)
+            price_elem = soup.find('span', class_=re.compile(r'price-tag'))
             if price_elem:
                 price_text = price_elem.get_text(strip=True)
                 price_match = re.search(r'[\d,]+', price_text.replace(',', ''))
@@ -241,7 +242,7 @@ class URLAnalyzer:
                     data.price_mxn = float(price_match.group(0))
             
             # Features section
-            features = soup.find_all('li', class_=lambda x: x and 'feature' in x if x else False)
+            features = soup.find_all('li', class_=re.compile(r'feature'))
             for feature in features:
                 text = feature.get_text(strip=True).lower()
                 
@@ -256,7 +257,7 @@ class URLAnalyzer:
                         data.size_m2 = self._parse_float(text)
             
             # Location
-            location_elem = soup.find('h2', class_=lambda x: x and 'location' in x if x else False)
+            location_elem = soup.find('h2', class_=re.compile(r'location'))
             if location_elem:
                 location_text = location_elem.get_text(strip=True)
                 parts = [p.strip() for p in location_text.split(',')]
@@ -266,7 +267,7 @@ class URLAnalyzer:
                     data.state = 'Ciudad de México'
             
             # Description
-            desc_elem = soup.find('div', class_=lambda x: x and 'description' in x if x else False)
+            desc_elem = soup.find('div', class_=re.compile(r'description'))
             if desc_elem:
                 data.description = desc_elem.get_text(strip=True)[:500]
             
@@ -291,12 +292,9 @@ class URLAnalyzer:
             print(f"Error extracting Inmuebles24 data: {e}")
             return None
     
-    def _extract_coordinates_from_script(self, soup: BeautifulSoup) -> Optional[tuple]:
+    def _extract_coordinates_from_script(self, soup: Document) -> Optional[tuple]:
         """Try to extract lat/lng from JavaScript in page"""
-        scripts = soup.find_all('script')
-        
-        for script in scripts:
-            script_text = script.string if script.string else ''
+        for script_text in soup.scripts():
             
             # Look for common patterns
             # Pattern 1: lat: 19.xxx, lng: -99.xxx
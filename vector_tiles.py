@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+Mapbox Vector Tile (MVT) layer for Polpi MX listings.
+
+Encodes listings as point features in the MVT 2.1 protobuf format without
+any third-party dependency, thins points per zoom so low-zoom tiles stay
+small, and keeps rendered tiles in an on-disk cache that is invalidated
+tile-by-tile as listings change.
+"""
+
+import hashlib
+import logging
+import math
+import os
+import shutil
+import struct
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import config
+from metrics import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+EXTENT = 4096
+LAYER_NAME = 'listings'
+
+# Extra margin around each tile (in tile units) so symbols at edges are not clipped
+BUFFER = 64
+
+# Attributes shipped at each detail level
+LOW_ZOOM_ATTRIBUTES = ('id', 'property_type', 'price_per_m2', 'deal_score', 'point_count')
+HIGH_ZOOM_ATTRIBUTES = ('id', 'property_type', 'price_mxn', 'price_per_m2', 'size_m2',
+                        'bedrooms', 'bathrooms', 'colonia', 'deal_score')
+
+_MAX_LAT = 85.05112878
+
+_CACHE_HITS = CACHE_REQUESTS.labels('tiles', 'hit')
+_CACHE_MISSES = CACHE_REQUESTS.labels('tiles', 'miss')
+
+
+# --- Protobuf primitives --------------------------------------------------
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 63)
+
+
+def _key(field: int, wire_type: int) -> bytes:
+    return _varint((field << 3) | wire_type)
+
+
+def _length_delimited(field: int, payload: bytes) -> bytes:
+    return _key(field, 2) + _varint(len(payload)) + payload
+
+
+def _packed(field: int, values: Iterable[int]) -> bytes:
+    return _length_delimited(field, b''.join(_varint(v) for v in values))
+
+
+def _encode_value(value) -> bytes:
+    """Encode a Value message (string, double, sint or bool)"""
+    if isinstance(value, bool):
+        return _key(7, 0) + _varint(int(value))
+    if isinstance(value, int):
+        return _key(6, 0) + _varint(_zigzag(value))
+    if isinstance(value, float):
+        return _key(3, 1) + struct.pack('<d', value)
+    return _length_delimited(1, str(value).encode('utf-8'))
+
+
+# --- Tile math ------------------------------------------------------------
+
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """Return (west, south, east, north) in degrees for a tile"""
+    n = 1 << z
+    west = x / n * 360.0 - 180.0
+    east = (x + 1) / n * 360.0 - 180.0
+    north = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    south = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return west, south, east, north
+
+
+def lnglat_to_tile(lng: float, lat: float, z: int) -> Tuple[int, int]:
+    """Tile containing a point at zoom z"""
+    lat = max(-_MAX_LAT, min(_MAX_LAT, lat))
+    n = 1 << z
+    x = int((lng + 180.0) / 360.0 * n)
+    sin_lat = math.sin(math.radians(lat))
+    y = int((0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def _to_tile_coords(lng: float, lat: float, z: int, x: int, y: int) -> Tuple[int, int]:
+    """Project a point to integer coordinates inside a tile's extent"""
+    lat = max(-_MAX_LAT, min(_MAX_LAT, lat))
+    n = 1 << z
+    px = (lng + 180.0) / 360.0 * n
+    sin_lat = math.sin(math.radians(lat))
+    py = (0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) * n
+    return int(round((px - x) * EXTENT)), int(round((py - y) * EXTENT))
+
+
+def encode_point_layer(features: List[Dict], z: int, x: int, y: int,
+                       attributes: Tuple[str, ...], name: str = LAYER_NAME) -> bytes:
+    """Encode listing dicts as a single-layer MVT tile of point features"""
+    keys = []
+    key_index = {}
+    values = []
+    value_index = {}
+    encoded_features = []
+    
+    for feature_id, feature in enumerate(features, start=1):
+        tags = []
+        for attr in attributes:
+            value = feature.get(attr)
+            if value is None:
+                continue
+            if isinstance(value, float) and value.is_integer() and attr != 'price_per_m2':
+                value = int(value)
+            if attr not in key_index:
+                key_index[attr] = len(keys)
+                keys.append(attr)
+            value_key = (type(value).__name__, value)
+            if value_key not in value_index:
+                value_index[value_key] = len(values)
+                values.append(value)
+            tags.extend((key_index[attr], value_index[value_key]))
+        
+        px, py = _to_tile_coords(feature['lng'], feature['lat'], z, x, y)
+        geometry = (9, _zigzag(px), _zigzag(py))  # MoveTo(1 point)
+        
+        body = _key(1, 0) + _varint(feature_id)
+        if tags:
+            body += _packed(2, tags)
+        body += _key(3, 0) + _varint(1)  # GeomType.POINT
+        body += _packed(4, geometry)
+        encoded_features.append(_length_delimited(2, body))
+    
+    if not encoded_features:
+        return b''
+    
+    layer = _key(15, 0) + _varint(2)
+    layer += _length_delimited(1, name.encode('utf-8'))
+    layer += b''.join(encoded_features)
+    layer += b''.join(_length_delimited(3, k.encode('utf-8')) for k in keys)
+    layer += b''.join(_length_delimited(4, _encode_value(v)) for v in values)
+    layer += _key(5, 0) + _varint(EXTENT)
+    return _length_delimited(3, layer)
+
+
+# --- Disk cache -----------------------------------------------------------
+
+class TileCache:
+    """
+    On-disk MVT cache laid out as {root}/{filter_signature}/{z}/{x}/{y}.mvt.
+    
+    Shared between API workers and batch jobs through the filesystem, so a
+    scraper run can invalidate tiles that API processes will then re-render.
+    Every filter combination gets its own directory, so the cache is capped
+    at max_bytes: hits touch the tile's mtime, and sweep() drops the least
+    recently used tiles once the cap is passed.
+    """
+    
+    def __init__(self, root: str = None, max_zoom: int = None, max_bytes: int = None):
+        self.root = root or os.path.join(config.TILE_CACHE_DIR, LAYER_NAME)
+        self.max_zoom = config.MVT_MAX_ZOOM if max_zoom is None else max_zoom
+        self.max_bytes = config.TILE_CACHE_MAX_MB * 1024 * 1024 if max_bytes is None else max_bytes
+    
+    @staticmethod
+    def filter_signature(filters: Dict) -> str:
+        """Stable directory name for a filter combination"""
+        if not filters:
+            return 'all'
+        canonical = '&'.join(f"{k}={filters[k]}" for k in sorted(filters))
+        return hashlib.md5(canonical.encode()).hexdigest()[:12]
+    
+    def _path(self, signature: str, z: int, x: int, y: int) -> str:
+        return os.path.join(self.root, signature, str(z), str(x), f"{y}.mvt")
+    
+    def get(self, signature: str, z: int, x: int, y: int) -> Optional[bytes]:
+        path = self._path(signature, z, x, y)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            _CACHE_MISSES.inc()
+            return None
+        _CACHE_HITS.inc()
+        return data
+    
+    def put(self, signature: str, z: int, x: int, y: int, data: bytes):
+        path = self._path(signature, z, x, y)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so readers never see a partial tile
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    
+    def invalidate_points(self, points: Iterable[Tuple[float, float]]) -> int:
+        """Drop every cached tile (all zooms, all filter variants) containing any of the points"""
+        if not os.path.isdir(self.root):
+            return 0
+        
+        tiles = set()
+        for lng, lat in points:
+            if lng is None or lat is None:
+                continue
+            for z in range(self.max_zoom + 1):
+                tiles.add((z,) + lnglat_to_tile(lng, lat, z))
+        
+        removed = 0
+        for signature in os.listdir(self.root):
+            if signature.startswith('.'):
+                continue
+            # Only zoom levels this filter variant has tiles at
+            try:
+                zooms = {int(z) for z in os.listdir(os.path.join(self.root, signature)) if z.isdigit()}
+            except NotADirectoryError:
+                continue
+            for z, x, y in tiles:
+                if z not in zooms:
+                    continue
+                try:
+                    os.remove(self._path(signature, z, x, y))
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+    
+    def sweep(self) -> int:
+        """Remove least recently used tiles until the cache is back under 90% of max_bytes"""
+        tiles = []
+        total = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if not filename.endswith('.mvt'):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                tiles.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        if total <= self.max_bytes:
+            return 0
+        
+        removed = 0
+        target = self.max_bytes * 0.9
+        for _, size, path in sorted(tiles):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+    
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+# --- Layer ----------------------------------------------------------------
+
+class ListingTileLayer:
+    """
+    Renders and caches listing vector tiles.
+    
+    Below MVT_DETAIL_ZOOM each tile is thinned to one representative listing
+    (the best deal) per 64x64 grid cell and carries a reduced attribute set;
+    from MVT_DETAIL_ZOOM up every listing is shipped with full attributes.
+    Cached tiles are invalidated from the PolpiDB change feed at a listing's
+    new position and from listing_moves at the one it left. That work (and
+    the LRU sweep) runs on a background thread: tile requests only start it
+    when it is due and never wait for it.
+    """
+    
+    def __init__(self, db, cache: TileCache = None, refresh_interval: float = None):
+        self.db = db
+        self.cache = cache or TileCache()
+        self.detail_zoom = config.MVT_DETAIL_ZOOM
+        self.refresh_interval = (config.MAP_INDEX_REFRESH_SECONDS
+                                 if refresh_interval is None else refresh_interval)
+        self._watermark = None
+        # Last listing_moves seq applied
+        self._moves = 0
+        self._last_refresh = 0.0
+        self._last_sweep = 0.0
+        self._lock = threading.Lock()
+        # Guards _refresher only; _lock is held for a whole refresh
+        self._refresher_lock = threading.Lock()
+        self._refresher: Optional[threading.Thread] = None
+    
+    def _watermark_path(self) -> str:
+        return os.path.join(self.cache.root, '.watermark')
+    
+    def _load_watermark(self) -> Optional[str]:
+        """Read the updated_at watermark and moves seq (one per line)"""
+        try:
+            with open(self._watermark_path()) as f:
+                lines = f.read().split('\n')
+        except FileNotFoundError:
+            return None
+        self._moves = int(lines[1]) if len(lines) > 1 and lines[1].strip() else 0
+        return lines[0].strip() or None
+    
+    def _save_watermark(self):
+        os.makedirs(self.cache.root, exist_ok=True)
+        with open(self._watermark_path(), 'w') as f:
+            f.write(f"{self._watermark or ''}\n{self._moves}")
+    
+    def refresh(self, force: bool = False) -> int:
+        """Invalidate tiles touched by listings written since the last refresh"""
+        now = time.time()
+        if not force and now - self._last_refresh < self.refresh_interval:
+            return 0
+        
+        with self._lock:
+            self._last_refresh = now
+            if self._watermark is None:
+                self._watermark = self._load_watermark()
+            
+            if self._watermark is None:
+                # No record of what the cache was built from: start clean
+                self.cache.clear()
+                self._watermark = self.db.get_change_watermark()
+                self._moves, _ = self.db.get_listing_moves(self._moves)
+                self.db.prune_listing_moves(self._moves)
+                self._save_watermark()
+                return 0
+            
+            # Old positions first, so a move is never seen without the tile it left
+            self._moves, points = self.db.get_listing_moves(self._moves)
+            for row in self.db.iter_listing_changes(self._watermark, ['lat', 'lng']):
+                points.append((row['lng'], row['lat']))
+                self._watermark = row['updated_at']
+            removed = self.cache.invalidate_points(points)
+            self._save_watermark()
+            self.db.prune_listing_moves(self._moves)
+            
+            if now - self._last_sweep >= config.TILE_CACHE_SWEEP_SECONDS:
+                self._last_sweep = now
+                removed += self.cache.sweep()
+            return removed
+    
+    def refresh_in_background(self):
+        """Start refresh() on a daemon thread if it is due and not already running"""
+        if time.time() - self._last_refresh < self.refresh_interval:
+            return
+        with self._refresher_lock:
+            if self._refresher is not None and self._refresher.is_alive():
+                return
+            self._refresher = threading.Thread(target=self._refresh_logged, name='polpi-tile-refresh',
+                                               daemon=True)
+            self._refresher.start()
+    
+    def _refresh_logged(self):
+        try:
+            removed = self.refresh()
+            if removed:
+                logger.info(f"Tile cache refresh removed {removed} tiles")
+        except Exception as e:
+            logger.error(f"Tile cache refresh failed: {e}")
+    
+    def render(self, z: int, x: int, y: int, filters: Dict = None) -> bytes:
+        """Render a tile straight from the database"""
+        west, south, east, north = tile_bounds(z, x, y)
+        pad_x = (east - west) * BUFFER / EXTENT
+        pad_y = (north - south) * BUFFER / EXTENT
+        bbox = (west - pad_x, south - pad_y, east + pad_x, north + pad_y)
+        
+        if z < self.detail_zoom:
+            grid = EXTENT // 64 + 2 * BUFFER // 64
+            rows = self.db.get_thinned_listings_in_bbox(*bbox, grid=grid, filters=filters)
+            attributes = LOW_ZOOM_ATTRIBUTES
+        else:
+            rows = self.db.get_listings_in_bbox(*bbox, filters=filters)
+            attributes = HIGH_ZOOM_ATTRIBUTES
+        
+        for row in rows:
+            if row.get('price_per_m2') is not None:
+                row['price_per_m2'] = round(row['price_per_m2'], 2)
+        return encode_point_layer(rows, z, x, y, attributes)
+    
+    def get_tile(self, z: int, x: int, y: int, filters: Dict = None) -> Tuple[bytes, bool]:
+        """Return (tile bytes, served_from_cache)"""
+        self.refresh_in_background()
+        signature = TileCache.filter_signature(filters)
+        data = self.cache.get(signature, z, x, y)
+        if data is not None:
+            return data, True
+        data = self.render(z, x, y, filters)
+        # Empty tiles are one indexed query away; caching them would only grow the cache
+        if data:
+            self.cache.put(signature, z, x, y, data)
+        return data, False
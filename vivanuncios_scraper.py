@@ -9,11 +9,12 @@ import time
 import cloudscraper
 import os
 from datetime import datetime
-from bs4 import BeautifulSoup
 
 # Add project root to path for database import
 sys.path.insert(0, '/Users/isaachomefolder/Desktop/polpi-mx')
 from database import PolpiDB
+from html_parsing import make_soup
+from rate_limiter import polite_get
 
 class VivanunciosScraper:
     def __init__(self):
@@ -84,7 +85,7 @@ class VivanunciosScraper:
         
         try:
             print(f"Scraping {listing_type}/{property_category}: {url}")
-            response = self.session.get(url, timeout=30)
+            response = polite_get(self.session, url, timeout=30)
             response.raise_for_status()
             
             # Check for captcha/block
@@ -97,7 +98,7 @@ class VivanunciosScraper:
             with open(os.path.join(self.html_dir, filename), 'w', encoding='utf-8') as f:
                 f.write(response.text)
             
-            soup = BeautifulSoup(response.text, 'html.parser')
+            soup = make_soup(response.text)
             
             # Try multiple parsing strategies
             listings = []
@@ -468,9 +469,6 @@ class VivanunciosScraper:
             print(f"  Sales: {sum(stats['sale'].values())} (res: {stats['sale']['residential']}, land: {stats['sale'].get('terreno', 0)}, com: {stats['sale']['comercial']})")
             print(f"  Rentals: {sum(stats['rental'].values())} (res: {stats['rental']['residential']}, com: {stats['rental']['comercial']})")
             
-            # Sleep to respect rate limits
-            time.sleep(2)
-            
             # Stop if we have enough listings and not in test mode
             if not test_mode and len(all_listings) >= 200:
                 print(f"\n🎯 Reached target of 200+ listings ({len(all_listings)}), stopping")
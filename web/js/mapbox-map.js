@@ -2,6 +2,8 @@
 
 let map;
 let currentMarkers = [];
+let clusterMarkers = [];
+let clusterFallbackListings = [];
 let clusteredProperties = [];
 let hoveredPropertyId = null;
 let popup = null;
@@ -74,6 +76,7 @@ function initProfessionalMap() {
         // Map loaded event
         map.on('load', () => {
             console.log('Professional map loaded successfully');
+            addListingTileLayer();
             setupMapInteractions();
             
             // Mark map as loaded for CSS styling
@@ -92,6 +95,41 @@ function initProfessionalMap() {
     }
 }
 
+// Draw all inventory from cached vector tiles
+function addListingTileLayer() {
+    map.addSource('listings-tiles', {
+        type: 'vector',
+        tiles: [`${window.location.origin}${API_BASE}/tiles/listings/{z}/{x}/{y}.mvt`],
+        maxzoom: 16
+    });
+
+    map.addLayer({
+        id: 'properties',
+        type: 'circle',
+        source: 'listings-tiles',
+        'source-layer': 'listings',
+        paint: {
+            'circle-color': [
+                'match', ['get', 'property_type'],
+                'casa', PROPERTY_STYLES.casa.color,
+                'departamento', PROPERTY_STYLES.departamento.color,
+                'terreno', PROPERTY_STYLES.terreno.color,
+                'oficina', PROPERTY_STYLES.oficina.color,
+                PROPERTY_STYLES.default.color
+            ],
+            'circle-radius': ['interpolate', ['linear'], ['zoom'], 8, 2, 16, 6],
+            'circle-opacity': 0.7
+        }
+    });
+
+    map.on('click', 'properties', (e) => {
+        const feature = e.features && e.features[0];
+        if (feature && feature.properties.id) {
+            showListingDetail(feature.properties.id);
+        }
+    });
+}
+
 // Setup map interactions
 function setupMapInteractions() {
     // Disable map rotation using right click + drag
@@ -108,6 +146,11 @@ function setupMapInteractions() {
     map.on('mouseleave', 'properties', () => {
         map.getCanvas().style.cursor = '';
     });
+
+    // Re-cluster on the server whenever the viewport settles
+    map.on('moveend', () => {
+        addClusteredMarkers(clusterFallbackListings);
+    });
 }
 
 // Update map with property listings (main function)
@@ -277,12 +320,54 @@ function hidePropertyHoverPopup() {
     }
 }
 
-// Add clustered markers for dense areas
-function addClusteredMarkers(listings) {
-    const clusters = createPropertyClusters(listings);
-    
+// Fetch clusters for the current viewport from the API
+async function fetchServerClusters() {
+    const bounds = map.getBounds();
+    const params = new URLSearchParams({
+        bbox: [bounds.getWest(), bounds.getSouth(), bounds.getEast(), bounds.getNorth()].join(','),
+        zoom: Math.floor(map.getZoom())
+    });
+
+    const response = await fetch(`${API_BASE}/api/v1/map/clusters?${params}`);
+    if (!response.ok) {
+        throw new Error(`Cluster request failed: ${response.status}`);
+    }
+
+    const data = await response.json();
+    if (data.type !== 'clusters') {
+        // Zoomed in past clustering - individual pins are already on the map
+        return [];
+    }
+
+    return data.clusters.map(cluster => ({
+        lat: cluster.lat,
+        lng: cluster.lng,
+        count: cluster.count,
+        avgPrice: cluster.avg_price,
+        expansionZoom: cluster.expansion_zoom
+    }));
+}
+
+// Add clustered markers for dense areas (server-side, local fallback)
+async function addClusteredMarkers(listings) {
+    clusterFallbackListings = listings;
+
+    let clusters;
+    try {
+        clusters = await fetchServerClusters();
+    } catch (error) {
+        console.warn('Server clustering unavailable, clustering locally:', error);
+        clusters = createPropertyClusters(listings).map(cluster => ({
+            ...cluster,
+            count: cluster.properties.length
+        }));
+    }
+
+    clusterMarkers.forEach(marker => marker.remove());
+    clusterMarkers = [];
+
     clusters.forEach(cluster => {
-        if (cluster.properties.length > 1) {
+        if (cluster.count > 1) {
             const el = createClusterMarker(cluster);
             
             const marker = new maplibregl.Marker({
@@ -296,12 +381,12 @@ function addClusteredMarkers(listings) {
             el.addEventListener('click', () => {
                 map.flyTo({
                     center: [cluster.lng, cluster.lat],
-                    zoom: Math.min(map.getZoom() + 2, 16),
+                    zoom: Math.min(cluster.expansionZoom || map.getZoom() + 2, 16),
                     duration: 1000
                 });
             });
 
-            currentMarkers.push(marker);
+            clusterMarkers.push(marker);
         }
     });
 }
@@ -311,7 +396,7 @@ function createClusterMarker(cluster) {
     const el = document.createElement('div');
     el.className = 'cluster-marker';
     el.innerHTML = `
-        <div class="cluster-count">${cluster.properties.length}</div>
+        <div class="cluster-count">${cluster.count}</div>
         <div class="cluster-price">Avg ${formatMapPrice(cluster.avgPrice)}</div>
     `;
     return el;
@@ -386,6 +471,8 @@ function fitMapToProperties(listings) {
 function clearMapMarkers() {
     currentMarkers.forEach(marker => marker.remove());
     currentMarkers = [];
+    clusterMarkers.forEach(marker => marker.remove());
+    clusterMarkers = [];
     hidePropertyHoverPopup();
 }
 